@@ -67,37 +67,16 @@ async def root():
 
 
 # ── Auth Status: lightweight role check for routing ──
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
-from services.database import get_db
-from services.auth import get_current_user, AuthenticatedUser
-import uuid
+from services.identity import get_identity, UserIdentity
 
 @app.get("/auth/status")
-async def auth_status(
-    db: AsyncSession = Depends(get_db),
-    user: AuthenticatedUser = Depends(get_current_user)
-):
+async def auth_status(identity: UserIdentity = Depends(get_identity)):
     """Returns the user's role(s) and onboarding status for routing."""
-    user_uuid = uuid.UUID(user.id)
-
-    biz_res = await db.execute(
-        text("SELECT id, status FROM businesses WHERE user_id = :uid"),
-        {"uid": user_uuid}
-    )
-    biz = biz_res.fetchone()
-
-    ref_res = await db.execute(
-        text("SELECT id, status FROM referrers WHERE user_id = :uid"),
-        {"uid": user_uuid}
-    )
-    ref = ref_res.fetchone()
-
     return {
-        "user_id": user.id,
-        "has_business": biz is not None,
-        "business_status": biz[1] if biz else None,
-        "has_referrer": ref is not None,
-        "referrer_status": ref[1] if ref else None,
-        "needs_onboarding": biz is None and ref is None
+        "user_id": identity.user_id,
+        "has_business": identity.has_business,
+        "business_status": identity.business_status,
+        "has_referrer": identity.has_referrer,
+        "referrer_status": identity.referrer_status,
+        "needs_onboarding": not identity.has_business and not identity.has_referrer
     }
@@ -7,7 +7,11 @@ import psycopg2
 from dotenv import load_dotenv
 from psycopg2.extras import RealDictCursor
 
-from utils.business_slugs import canonical_business_slug, canonical_business_slug_from_name, slugify_value
+from utils.business_slugs import (
+    canonical_business_slug,
+    canonical_business_slug_from_name,
+    slugify_value,
+)
 
 
 load_dotenv(".env.local")
@@ -129,11 +133,40 @@ def plan_updates(rows: list[BusinessRow]) -> list[tuple[str, str, str, str]]:
     return updates
 
 
+def check_unique():
+    """Report canonical slugs that still collide; migration 032 needs none."""
+    log("Checking businesses.canonical_slug for duplicates...")
+    conn = connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT canonical_slug, COUNT(*) FROM businesses
+                GROUP BY canonical_slug HAVING COUNT(*) > 1
+                LIMIT 10
+                """
+            )
+            duplicates = cur.fetchall()
+    finally:
+        conn.close()
+    for slug, count in duplicates:
+        log(f"  duplicate canonical_slug {slug!r} ({count} businesses)")
+    if duplicates:
+        raise RuntimeError("Duplicate canonical slugs remain")
+
+
 def temporary_slug(business_id: str) -> str:
     return f"tmp-business-slug-{business_id}"
 
 
-def apply_batch(batch: list[tuple[str, str, str, str]], batch_number: int, total_batches: int, phase_label: str, slug_index: int):
+def apply_batch(
+    batch: list[tuple[str, str, str, str]],
+    batch_number: int,
+    total_batches: int,
+    phase_label: str,
+    slug_index: int,
+    record_redirects: bool = False,
+):
     attempt = 0
     while True:
         conn = connect()
@@ -151,6 +184,16 @@ def apply_batch(batch: list[tuple[str, str, str, str]], batch_number: int, total
                         "UPDATE businesses SET slug = %s, updated_at = now() WHERE id = %s",
                         (next_slug, business_id),
                     )
+                    if record_redirects:
+                        # Old links keep resolving through the redirect table
+                        cur.execute(
+                            """
+                            INSERT INTO business_slug_redirects (old_slug, business_id)
+                            VALUES (%s, %s)
+                            ON CONFLICT (old_slug) DO UPDATE SET business_id = EXCLUDED.business_id
+                            """,
+                            (update[2], business_id),
+                        )
             conn.commit()
             return
         except psycopg2.OperationalError as exc:
@@ -191,7 +234,7 @@ def apply_updates(updates: list[tuple[str, str, str, str]]):
     for offset in range(0, len(updates), BATCH_SIZE):
         batch = staged_updates[offset:offset + BATCH_SIZE]
         batch_number = offset // BATCH_SIZE + 1
-        apply_batch(batch, batch_number, total_batches, "finalize", 4)
+        apply_batch(batch, batch_number, total_batches, "finalize", 4, record_redirects=True)
         total_applied += len(batch)
         log(f"Applied final batch {batch_number}/{total_batches}: {len(batch)} updates ({total_applied}/{len(staged_updates)})")
 
@@ -199,7 +242,9 @@ def apply_updates(updates: list[tuple[str, str, str, str]]):
 
 
 def main():
-    parser = argparse.ArgumentParser(description="Backfill business slugs to canonical clean values.")
+    parser = argparse.ArgumentParser(
+        description="Backfill business slugs to canonical clean values (run after neon/migrations/031)."
+    )
     parser.add_argument("--apply", action="store_true", help="Apply updates instead of running in dry-run mode")
     parser.add_argument("--limit", type=int, default=50, help="How many planned changes to print")
     args = parser.parse_args()
@@ -236,6 +281,8 @@ def main():
         applied = apply_updates(updates)
         log("")
         log(f"Applied {applied} slug updates.")
+        check_unique()
+        log("canonical_slug backfilled; apply neon/migrations/032_business_canonical_slug_unique.sql next.")
     except Exception:
         if not conn.closed:
             conn.rollback()
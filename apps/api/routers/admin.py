@@ -1,19 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Header
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Header, Query
 from services.auth import require_admin, AuthenticatedUser
-from services.database import get_db
+from services.database import get_db, pool_status
+from services.identity import invalidate_business
+from services.cache import invalidate_business_listing, public_cache
+from services.event_bus import event_bus
+from services.ws_rooms import room_manager
+from services.rate_limit import rate_limit_stats
+from services.kv_store import kv_store_stats
 from services.email import send_dispute_resolved_business, send_dispute_resolved_referrer
 from sqlalchemy.ext.asyncio import AsyncSession
 from services.tasks import jobs
+from services.tasks.runner import cron_status, run_jobs as run_cron_jobs
+from services.job_queue import queue_stats, retry_job
+from services.stripe_events import list_events as list_stripe_events, replay as replay_stripe_event, stripe_event_stats
+from services.push import send_push_to_users
 from pydantic import BaseModel
 from typing import Optional
 from sqlalchemy import text
 from datetime import datetime
 import uuid
+import json
 import httpx
 import re
 import asyncio
 import os
 from utils.business_slugs import generate_unique_business_slug
+from utils.pagination import COUNT_MODE_PATTERN, paginate, page_count
 from services.minimax import batch_generate_ai_openings
 
 router = APIRouter()
@@ -93,10 +105,11 @@ async def list_businesses(
     search: Optional[str] = None,
     state: Optional[str] = None,
     trade: Optional[str] = None,
+    cursor: Optional[str] = None,
+    count: Optional[str] = Query(None, pattern=COUNT_MODE_PATTERN),
 ):
-    """List businesses with search, filter, pagination."""
+    """List businesses with search, filter, pagination (pass `cursor` from `next_cursor` for deep pages)."""
     per_page = 50
-    offset = (page - 1) * per_page
 
     where_clauses = ["status = 'active'"]
     params = {}
@@ -111,25 +124,21 @@ async def list_businesses(
         where_clauses.append("trade_category ILIKE :trade")
         params["trade"] = f"%{trade}%"
 
-    where_sql = " AND ".join(where_clauses)
-
-    count_result = await db.execute(text(f"SELECT COUNT(*) as cnt FROM businesses WHERE {where_sql}"), params)
-    total = count_result.scalar() or 0
-    pages = max(1, (total + per_page - 1) // per_page)
-
-    result = await db.execute(text(f"""
-        SELECT id, business_name, slug, trade_category, suburb, city, state,
-               avg_rating, review_count, logo_url, photo_urls, status, clerk_user_id,
-               business_phone, business_email, website, data_source, created_at
-        FROM businesses
-        WHERE {where_sql}
-        ORDER BY created_at DESC
-        LIMIT :limit OFFSET :offset
-    """), {**params, "limit": per_page, "offset": offset})
+    result = await paginate(
+        db,
+        select="""
+            SELECT id, business_name, slug, trade_category, suburb, city, state,
+                   avg_rating, review_count, logo_url, photo_urls, status, clerk_user_id,
+                   business_phone, business_email, website, data_source, created_at""",
+        from_="FROM businesses",
+        where=where_clauses,
+        order=[("created_at", "created_at"), ("id", "id")],
+        params=params, limit=per_page, cursor=cursor, page=page, count=count,
+    )
+    total = result["total"]
 
     businesses = []
-    for r in result.mappings().all():
-        row = dict(r)
+    for row in result["rows"]:
         if row.get("created_at"):
             row["created_at"] = str(row["created_at"])
         if row.get("avg_rating"):
@@ -140,44 +149,38 @@ async def list_businesses(
             row["photo_urls"] = [u.strip() for u in cleaned.split(",") if u.strip()] if cleaned else []
         businesses.append(row)
 
-    return {"businesses": businesses, "total": total, "page": page, "pages": pages}
+    return {
+        "businesses": businesses, "total": total, "page": page, "pages": page_count(total, per_page),
+        "next_cursor": result["next_cursor"], "total_is_estimate": result["total_is_estimate"],
+    }
 
 @router.post("/cron/process-lifecycle")
 async def trigger_lifecycle_tasks(
-    db: AsyncSession = Depends(get_db),
     user: AuthenticatedUser = Depends(require_admin)
 ):
     """
     Manually trigger lead expiry, earning release, and PIN cleanup.
     In production, this can be called by a scheduled job (e.g., GitHub Action or Cron).
+    Jobs run concurrently, each on its own session; see services/tasks/runner.py.
     """
-    expired_leads = await jobs.expire_pending_leads(db)
-    expired_unlocked = await jobs.expire_unlocked_leads(db)
-    released_earnings = await jobs.release_pending_earnings(db)
-    expired_pins = await jobs.cleanup_expired_pins(db)
-    d7_followups = await jobs.send_d7_survey_followups(db)
-    d14_followups = await jobs.send_d14_survey_followups(db)
-    closed_unconfirmed = await jobs.close_unconfirmed_leads(db)
-    auto_passed = await jobs.auto_pass_stalled_screening(db)
-    reengagement_sent = await jobs.send_reengagement_nudges(db)
-
-    await db.commit()
+    runs = await run_cron_jobs(jobs.LIFECYCLE_JOBS)
 
     return {
-        "status": "success",
-        "tasks": {
-            "expired_leads": expired_leads,
-            "expired_unlocked": expired_unlocked,
-            "released_earnings": released_earnings,
-            "expired_pins": expired_pins,
-            "d7_survey_followups": d7_followups,
-            "d14_survey_followups": d14_followups,
-            "closed_unconfirmed": closed_unconfirmed,
-            "auto_passed_screening": auto_passed,
-            "reengagement_nudges_sent": reengagement_sent,
-        }
+        "status": "success" if all(r.status in ("ok", "skipped") for r in runs.values()) else "partial",
+        "tasks": {name: r.result for name, r in runs.items()},
+        "timings_ms": {name: r.duration_ms for name, r in runs.items()},
+        "runs": {name: {"status": r.status, "error": r.error} for name, r in runs.items()},
     }
 
+
+@router.get("/cron/status")
+async def lifecycle_task_status(
+    db: AsyncSession = Depends(get_db),
+    user: AuthenticatedUser = Depends(require_admin)
+):
+    """Latest run of each lifecycle job: status, duration, rows touched, last success."""
+    return {"jobs": await cron_status(db)}
+
 @router.post("/cron/sync-outreach")
 async def cron_sync_outreach(
     x_cron_secret: Optional[str] = Header(None),
@@ -207,50 +210,45 @@ async def list_users(
     tab: str = "businesses",
     page: int = 1,
     search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    count: Optional[str] = Query(None, pattern=COUNT_MODE_PATTERN),
 ):
     """List businesses or referrers for user management."""
     per_page = 50
-    offset = (page - 1) * per_page
-    params: dict = {"limit": per_page, "offset": offset}
+    params: dict = {}
 
     if tab == "referrers":
-        where_clauses = ["1=1"]
+        where_clauses = []
         if search:
             where_clauses.append("(full_name ILIKE :search OR email ILIKE :search)")
             params["search"] = f"%{search}%"
-        where_sql = " AND ".join(where_clauses)
-
-        count_res = await db.execute(text(f"SELECT COUNT(*) FROM referrers WHERE {where_sql}"), params)
-        total = count_res.scalar() or 0
-
-        result = await db.execute(text(f"""
+        select = """
             SELECT id, full_name, email, suburb, state, postcode, phone_verified,
                    wallet_balance_cents, pending_cents, clerk_user_id, created_at,
-                   abn, supplier_statement_declared_at
-            FROM referrers WHERE {where_sql}
-            ORDER BY created_at DESC LIMIT :limit OFFSET :offset
-        """), params)
+                   abn, supplier_statement_declared_at"""
+        table = "referrers"
     else:
         where_clauses = ["status = 'active'", "clerk_user_id IS NOT NULL"]
         if search:
             where_clauses.append("(business_name ILIKE :search OR business_email ILIKE :search OR suburb ILIKE :search)")
             params["search"] = f"%{search}%"
-        where_sql = " AND ".join(where_clauses)
-
-        count_res = await db.execute(text(f"SELECT COUNT(*) FROM businesses WHERE {where_sql}"), params)
-        total = count_res.scalar() or 0
-
-        result = await db.execute(text(f"""
+        select = """
             SELECT id, business_name, slug, business_email, owner_name, suburb, city, state,
-                   avg_rating, review_count, clerk_user_id, created_at
-            FROM businesses WHERE {where_sql}
-            ORDER BY created_at DESC LIMIT :limit OFFSET :offset
-        """), params)
+                   avg_rating, review_count, clerk_user_id, created_at"""
+        table = "businesses"
+
+    result = await paginate(
+        db,
+        select=select,
+        from_=f"FROM {table}",
+        where=where_clauses,
+        order=[("created_at", "created_at"), ("id", "id")],
+        params=params, limit=per_page, cursor=cursor, page=page, count=count, table=table,
+    )
+    total = result["total"]
 
-    pages = max(1, (total + per_page - 1) // per_page)
     users = []
-    for r in result.mappings().all():
-        row = dict(r)
+    for row in result["rows"]:
         if row.get("created_at"):
             row["created_at"] = str(row["created_at"])
         if row.get("supplier_statement_declared_at"):
@@ -259,7 +257,10 @@ async def list_users(
             row["avg_rating"] = float(row["avg_rating"])
         users.append(row)
 
-    return {"users": users, "total": total, "page": page, "pages": pages}
+    return {
+        "users": users, "total": total, "page": page, "pages": page_count(total, per_page),
+        "next_cursor": result["next_cursor"], "total_is_estimate": result["total_is_estimate"],
+    }
 
 
 @router.get("/referrers/tax-export")
@@ -317,13 +318,14 @@ async def list_leads(
     page: int = 1,
     search: Optional[str] = None,
     status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    count: Optional[str] = Query(None, pattern=COUNT_MODE_PATTERN),
 ):
     """List leads or disputes for admin management."""
     per_page = 50
-    offset = (page - 1) * per_page
-    params: dict = {"limit": per_page, "offset": offset}
+    params: dict = {}
 
-    where_clauses = ["1=1"]
+    where_clauses = []
     if tab == "disputes":
         where_clauses.append("l.status = 'DISPUTED'")
     if status:
@@ -333,33 +335,30 @@ async def list_leads(
         where_clauses.append("(l.customer_name ILIKE :search OR b.business_name ILIKE :search)")
         params["search"] = f"%{search}%"
 
-    where_sql = " AND ".join(where_clauses)
-
-    count_res = await db.execute(text(f"""
-        SELECT COUNT(*) FROM leads l
-        LEFT JOIN businesses b ON b.id = l.business_id
-        WHERE {where_sql}
-    """), params)
-    total = count_res.scalar() or 0
-    pages = max(1, (total + per_page - 1) // per_page)
-
-    result = await db.execute(text(f"""
-        SELECT l.id, l.customer_name, l.customer_phone, l.status, l.lead_price_cents,
-               l.referrer_payout_amount_cents, l.created_at,
-               b.business_name, r.full_name as referrer_name,
-               d.reason
-        FROM leads l
-        LEFT JOIN businesses b ON b.id = l.business_id
-        LEFT JOIN referrers r ON r.id = l.referrer_id
-        LEFT JOIN disputes d ON d.lead_id = l.id
-        WHERE {where_sql}
-        ORDER BY l.created_at DESC
-        LIMIT :limit OFFSET :offset
-    """), params)
+    result = await paginate(
+        db,
+        select="""
+            SELECT l.id, l.customer_name, l.customer_phone, l.status, l.lead_price_cents,
+                   l.referrer_payout_amount_cents, l.created_at,
+                   b.business_name, r.full_name as referrer_name,
+                   d.reason""",
+        from_="""
+            FROM leads l
+            LEFT JOIN businesses b ON b.id = l.business_id
+            LEFT JOIN referrers r ON r.id = l.referrer_id
+            LEFT JOIN disputes d ON d.lead_id = l.id""",
+        count_from=(
+            "FROM leads l LEFT JOIN businesses b ON b.id = l.business_id" if search
+            else "FROM leads l"
+        ),
+        where=where_clauses,
+        order=[("l.created_at", "created_at"), ("l.id", "id")],
+        params=params, limit=per_page, cursor=cursor, page=page, count=count, table="leads",
+    )
+    total = result["total"]
 
     items = []
-    for r in result.mappings().all():
-        row = dict(r)
+    for row in result["rows"]:
         if row.get("created_at"):
             row["created_at"] = str(row["created_at"])
         items.append(row)
@@ -370,7 +369,10 @@ async def list_leads(
     """))
     stats = {str(r["status"]): int(r["cnt"]) for r in stats_result.mappings().all()}
 
-    return {"items": items, "total": total, "page": page, "pages": pages, "stats": stats}
+    return {
+        "items": items, "total": total, "page": page, "pages": page_count(total, per_page), "stats": stats,
+        "next_cursor": result["next_cursor"], "total_is_estimate": result["total_is_estimate"],
+    }
 
 @router.get("/fill-queue")
 async def get_fill_queue(
@@ -1407,6 +1409,8 @@ async def update_business(
         UPDATE businesses SET {set_clauses}, updated_at = :now WHERE id = :id
     """), updates)
     await db.commit()
+    invalidate_business(business_id)
+    await invalidate_business_listing(business_id)
     return {"status": "updated", "fields": list(updates.keys())}
 
 
@@ -1453,6 +1457,7 @@ async def create_business(
         "website": req.website, "desc": req.description, "abn": req.abn,
     })
     await db.commit()
+    await invalidate_business_listing()
     return {"status": "created", "id": new_id, "slug": slug}
 
 
@@ -1481,6 +1486,8 @@ async def business_action(
     else:
         raise HTTPException(status_code=400, detail=f"Unknown action: {req.action}")
     await db.commit()
+    invalidate_business(business_id)
+    await invalidate_business_listing(business_id)
     return {"status": "ok", "action": req.action, "business_id": business_id}
 
 
@@ -1498,32 +1505,34 @@ async def list_notifications(
     db: AsyncSession = Depends(get_db),
     user: AuthenticatedUser = Depends(require_admin),
     page: int = 1,
+    cursor: Optional[str] = None,
+    count: Optional[str] = Query(None, pattern=COUNT_MODE_PATTERN),
 ):
     """List all admin-sent notifications."""
     per_page = 50
-    offset = (page - 1) * per_page
 
-    count_result = await db.execute(text("SELECT COUNT(*) FROM notifications WHERE sender_type = 'admin'"))
-    total = count_result.scalar() or 0
-    pages = max(1, (total + per_page - 1) // per_page)
+    result = await paginate(
+        db,
+        select="SELECT id, title, message, audience, link, created_at, recipient_count",
+        from_="FROM notifications",
+        where=["sender_type = 'admin'"],
+        order=[("created_at", "created_at"), ("id", "id")],
+        limit=per_page, cursor=cursor, page=page, count=count,
+    )
+    total = result["total"]
 
-    result = await db.execute(text("""
-        SELECT id, title, message, audience, link, created_at, recipient_count
-        FROM notifications
-        WHERE sender_type = 'admin'
-        ORDER BY created_at DESC
-        LIMIT :limit OFFSET :offset
-    """), {"limit": per_page, "offset": offset})
     items = []
-    for r in result.mappings().all():
-        row = dict(r)
+    for row in result["rows"]:
         if row.get("created_at"):
             row["created_at"] = row["created_at"].isoformat()
         if isinstance(row.get("id"), uuid.UUID):
             row["id"] = str(row["id"])
         items.append(row)
 
-    return {"items": items, "total": total, "page": page, "pages": pages}
+    return {
+        "items": items, "total": total, "page": page, "pages": page_count(total, per_page),
+        "next_cursor": result["next_cursor"], "total_is_estimate": result["total_is_estimate"],
+    }
 
 
 @router.post("/notifications/broadcast")
@@ -1581,9 +1590,90 @@ async def send_broadcast(
         })
         await db.commit()
 
+    # Web Push to every subscribed device in the audience
+    try:
+        audience_sql = {
+            "businesses": "SELECT user_id FROM businesses WHERE user_id IS NOT NULL AND status = 'active'",
+            "referrers": "SELECT user_id FROM referrers WHERE user_id IS NOT NULL",
+        }.get(req.audience, """
+            SELECT user_id FROM businesses WHERE user_id IS NOT NULL AND status = 'active'
+            UNION SELECT user_id FROM referrers WHERE user_id IS NOT NULL
+        """)
+        push_res = await db.execute(text(f"""
+            SELECT DISTINCT user_id FROM push_subscriptions WHERE user_id IN ({audience_sql})
+        """))
+        push_user_ids = [str(r[0]) for r in push_res.fetchall()]
+        if push_user_ids:
+            await send_push_to_users(push_user_ids, req.title, req.message, req.link or "/", tag=f"broadcast-{notif_id}")
+    except Exception as e:
+        print(f"Broadcast push error (non-fatal): {e}")
+
     return {"status": "sent", "id": notif_id, "recipient_count": recipient_count}
 
 
+# ── Background jobs ──
+
+@router.get("/jobs")
+async def list_jobs(
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_db),
+    user: AuthenticatedUser = Depends(require_admin)
+):
+    """Queue depth per job kind plus the most recent dead-lettered jobs."""
+    stats = await queue_stats(db)
+    result = await db.execute(text("""
+        SELECT id, kind, payload, priority, attempts, max_attempts, last_error, created_at, finished_at
+        FROM jobs WHERE status = 'dead'
+        ORDER BY finished_at DESC NULLS LAST, id DESC
+        LIMIT :limit
+    """), {"limit": limit})
+    dead = []
+    for r in result.mappings().all():
+        row = dict(r)
+        if isinstance(row["payload"], str):
+            row["payload"] = json.loads(row["payload"])
+        for key in ("created_at", "finished_at"):
+            if row[key]:
+                row[key] = row[key].isoformat()
+        dead.append(row)
+    return {"stats": stats, "dead": dead}
+
+
+@router.post("/jobs/{job_id}/retry")
+async def retry_dead_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    user: AuthenticatedUser = Depends(require_admin)
+):
+    if not await retry_job(db, job_id):
+        raise HTTPException(status_code=404, detail="Job not found or not retryable")
+    return {"status": "queued", "id": job_id}
+
+
+@router.get("/stripe-events")
+async def stripe_events(
+    status: Optional[str] = Query(None, pattern="^(pending|done|failed)$"),
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_db),
+    user: AuthenticatedUser = Depends(require_admin)
+):
+    """Recent Stripe webhook events, newest first (status=failed for the ones to replay)."""
+    return {"events": await list_stripe_events(db, status, limit)}
+
+
+@router.post("/stripe-events/{event_id}/replay")
+async def replay_stripe_event_endpoint(
+    event_id: str,
+    db: AsyncSession = Depends(get_db),
+    user: AuthenticatedUser = Depends(require_admin)
+):
+    """Queue a failed Stripe event for processing again."""
+    if not await replay_stripe_event(db, event_id):
+        raise HTTPException(status_code=404, detail="Stripe event not found or already processed")
+    await db.commit()
+    return {"status": "queued", "id": event_id}
+
+
 # ── Settings / Health Check ──
 
 @router.get("/health")
@@ -1635,6 +1725,18 @@ async def health_check(
     except:
         checks["db_stats"] = {}
 
+    # Connection pool usage (per router) — used to size Railway replicas
+    checks["db_pool"] = pool_status()
+    checks["public_cache"] = public_cache.stats()
+    checks["event_bus"] = event_bus.stats()
+    checks["ws_rooms"] = room_manager.stats()
+    checks["rate_limits"] = rate_limit_stats()
+    checks["kv_store"] = kv_store_stats()
+    try:
+        checks["stripe_events"] = await stripe_event_stats(db)
+    except Exception as e:
+        checks["stripe_events"] = {"error": str(e)[:60]}
+
     return checks
 
 
@@ -5,6 +5,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from services.database import get_db
 from services.auth import get_current_user, AuthenticatedUser
+from services.identity import resolve_identity
 from services.email import (
     send_referrer_application_received, send_application_approved,
     send_application_rejected, send_application_expired, send_application_reminder
@@ -29,25 +30,17 @@ class ProfileUpdate(BaseModel):
 
 
 async def _get_referrer_id(db: AsyncSession, user: AuthenticatedUser):
-    r = await db.execute(
-        text("SELECT id FROM referrers WHERE user_id = :uid"),
-        {"uid": uuid.UUID(user.id)}
-    )
-    row = r.mappings().first()
-    if not row:
+    identity = await resolve_identity(db, user.id)
+    if not identity.referrer_id:
         raise HTTPException(status_code=404, detail="Referrer profile not found")
-    return row["id"]
+    return identity.referrer_id
 
 
 async def _get_business_id(db: AsyncSession, user: AuthenticatedUser):
-    b = await db.execute(
-        text("SELECT id FROM businesses WHERE user_id = :uid"),
-        {"uid": uuid.UUID(user.id)}
-    )
-    row = b.mappings().first()
-    if not row:
+    identity = await resolve_identity(db, user.id)
+    if not identity.business_id:
         raise HTTPException(status_code=403, detail="Business profile not found")
-    return row["id"]
+    return identity.business_id
 
 
 # ──────────────────────────────────────────────────────────────
@@ -5,12 +5,17 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from services.database import get_db
 from services.auth import get_current_user, AuthenticatedUser
+from services.identity import resolve_identity, invalidate_identity
+from services.cache import invalidate_business_listing
+from services.rate_limit import RateLimit, client_ip
+from services.kv_store import ExpiringStore, verify_code
+from services.wallet import DUPLICATE, credit_wallet, debit_wallet, topup_key
 from services.stripe_service import StripeService
 from services.email import send_business_welcome, send_business_claim_verification_code, send_business_claim_manual_review_notification
 from services.indexnow import submit_single
 from services.sms import _send_sms
 from routers.media import s3_client, S3_BUCKET, S3_PUBLIC_URL, S3_REGION
-from utils.business_slugs import business_slug_exists, canonical_business_slug, generate_unique_business_slug
+from utils.business_slugs import business_slug_exists, canonical_business_slug, generate_unique_business_slug, record_slug_redirect
 import re
 import uuid
 import os
@@ -19,7 +24,6 @@ import secrets
 import string
 import httpx
 import json
-from datetime import datetime, timedelta
 
 class BusinessClaimRequest(BaseModel):
     claimer_name: str
@@ -38,9 +42,15 @@ class DelistingRequestRequest(BaseModel):
 
 router = APIRouter()
 
-_business_claim_phone_store: dict = {}
-_business_claim_email_store: dict = {}
-_business_claim_token_store: dict = {}
+_business_claim_phone_store = ExpiringStore("claim-phone")
+_business_claim_email_store = ExpiringStore("claim-email")
+_business_claim_token_store = ExpiringStore("claim-token")
+CLAIM_CODE_TTL = 600
+CLAIM_TOKEN_TTL = 3600
+# Claim codes: sends per business and channel, sends per IP, and attempts per code
+CLAIM_CODE_SEND_LIMIT = RateLimit("claim-code-send", 3, 600, "Too many codes requested for this business. Please wait before trying again.")
+CLAIM_CODE_SEND_IP_LIMIT = RateLimit("claim-code-send-ip", 10, 3600, "Too many codes requested. Please try again later.")
+CLAIM_CODE_VERIFY_LIMIT = RateLimit("claim-code-verify", 5, 600, "Too many attempts. Please wait before trying again.")
 CLAIM_UPLOAD_EXTENSIONS = {"png", "jpg", "jpeg", "webp", "pdf"}
 CLAIM_UPLOAD_MAX_BYTES = 10 * 1024 * 1024
 API_BASE_URL = os.getenv("API_BASE_URL", "http://127.0.0.1:8000")
@@ -149,25 +159,19 @@ def _normalize_phone_number(phone: str) -> str:
 def _build_claim_store_key(business_id: uuid.UUID, channel: str) -> str:
     return f"{business_id}:{channel}"
 
-def _issue_claim_verification_token(business_id: uuid.UUID, channel: str) -> str:
+async def _issue_claim_verification_token(business_id: uuid.UUID, channel: str) -> str:
     token = secrets.token_urlsafe(24)
-    _business_claim_token_store[token] = {
-        "business_id": str(business_id),
-        "channel": channel,
-        "expires_at": datetime.utcnow() + timedelta(minutes=60),
-    }
+    await _business_claim_token_store.put(token, {"business_id": str(business_id), "channel": channel}, CLAIM_TOKEN_TTL)
     return token
 
-def _consume_claim_verification_token(business_id: uuid.UUID, token: Optional[str]):
+async def _consume_claim_verification_token(business_id: uuid.UUID, token: Optional[str]):
     if not token:
         raise HTTPException(status_code=403, detail="Complete business verification before claiming this profile")
-    entry = _business_claim_token_store.get(token)
+    entry = await _business_claim_token_store.get(token)
     if not entry or entry.get("business_id") != str(business_id):
-        raise HTTPException(status_code=403, detail="Invalid claim verification token")
-    if datetime.utcnow() > entry["expires_at"]:
-        _business_claim_token_store.pop(token, None)
+        raise HTTPException(status_code=403, detail="Invalid or expired claim verification token. Please verify again.")
+    if await _business_claim_token_store.pop(token) is None:
         raise HTTPException(status_code=403, detail="Your verification session has expired. Please verify again.")
-    _business_claim_token_store.pop(token, None)
     return entry
 
 async def _get_claimable_business(db: AsyncSession, business_id: uuid.UUID):
@@ -367,9 +371,11 @@ async def onboarding(
             "invited_by_id": invited_by_id,
         })
         await db.commit()
+        invalidate_identity(user.id)
         row = result.fetchone()
         business_id = str(row[0])
         new_slug = row[1]
+        await invalidate_business_listing(business_id)
 
         # Generate unique invite code for this business
         invite_code = str(uuid.uuid4())[:8].upper()
@@ -495,7 +501,11 @@ async def update_business(
 
     update_query = text(f"UPDATE businesses SET {', '.join(update_fields)}, updated_at = now() WHERE id = :id")
     await db.execute(update_query, params)
+    if update_data.get("slug") and update_data["slug"] != biz["slug"]:
+        await record_slug_redirect(db, biz["id"], biz["slug"], update_data["slug"])
     await db.commit()
+    invalidate_identity(user.id)
+    await invalidate_business_listing(biz["id"])
 
     return {"message": "Business updated successfully"}
 
@@ -929,16 +939,11 @@ async def get_public_projects(
 # --- Referrer Management ---
 
 async def _get_business_id(db: AsyncSession, user: AuthenticatedUser):
-    """Helper: get business ID for authenticated user."""
-    user_uuid = uuid.UUID(user.id)
-    result = await db.execute(
-        text("SELECT id, wallet_balance_cents, referral_fee_cents FROM businesses WHERE user_id = :uid"),
-        {"uid": user_uuid}
-    )
-    biz = result.mappings().first()
-    if not biz:
+    """Helper: get business ID and default fee for authenticated user."""
+    identity = await resolve_identity(db, user.id)
+    if not identity.business_id:
         raise HTTPException(status_code=404, detail="Business not found")
-    return biz
+    return {"id": identity.business_id, "referral_fee_cents": identity.referral_fee_cents}
 
 
 @router.get("/me/referrers")
@@ -1052,7 +1057,8 @@ async def get_referrer_detail(
             r.quality_score, r.status as referrer_status, r.created_at as referrer_since,
             rl.id as link_id, rl.clicks, rl.leads_created, rl.leads_unlocked,
             rl.total_earned_cents, rl.custom_fee_cents, rl.business_notes,
-            rl.is_active, rl.created_at as linked_since
+            rl.is_active, rl.created_at as linked_since,
+            (SELECT wallet_balance_cents FROM businesses WHERE id = :biz_id) as wallet_balance_cents
         FROM referral_links rl
         JOIN referrers r ON rl.referrer_id = r.id
         WHERE rl.business_id = :biz_id AND r.id = :ref_id
@@ -1142,7 +1148,7 @@ async def get_referrer_detail(
         },
         "leads": leads,
         "bonuses": bonuses,
-        "wallet_balance_cents": biz["wallet_balance_cents"],
+        "wallet_balance_cents": row["wallet_balance_cents"],
     }
 
 
@@ -1285,7 +1291,7 @@ async def review_referrer(
           <a href="https://traderefer.au/dashboard/referrer" style="display:inline-block;background:#ea580c;color:#fff;padding:12px 24px;border-radius:8px;text-decoration:none;font-weight:bold">View Dashboard</a>
         </div>
         """
-        _send(ref_row["email"], f"You got a {data.rating}-star review from {business_name}", review_html)
+        await _send(ref_row["email"], f"You got a {data.rating}-star review from {business_name}", review_html)
 
     return {"message": "Review sent to referrer"}
 
@@ -1325,7 +1331,7 @@ async def award_referrer_bonus(
 
     # --- CASE 1: Wallet covers it entirely ---
     if shortfall <= 0:
-        return await _process_bonus(db, biz_id, ref_uuid, link["id"], data.amount_cents, data.reason, "wallet", None, wallet_balance)
+        return await _process_bonus(db, biz_id, ref_uuid, link["id"], data.amount_cents, data.reason, "wallet", None)
 
     # --- CASE 2: Insufficient funds, not charging card Ã¢â€ â€™ return shortfall info ---
     if not data.charge_card and not data.payment_intent_id:
@@ -1376,19 +1382,13 @@ async def award_referrer_bonus(
             # In dev/test mode, accept mock payment intents
             card_amount = shortfall
 
-        # Top up wallet with the card charge amount
-        new_wallet_after_topup = wallet_balance + card_amount
-        await db.execute(
-            text("UPDATE businesses SET wallet_balance_cents = :bal WHERE id = :biz_id"),
-            {"bal": new_wallet_after_topup, "biz_id": biz_id}
-        )
-        await db.execute(
-            text("""INSERT INTO wallet_transactions (business_id, amount_cents, type, payment_ref, notes, balance_after_cents)
-                    VALUES (:biz_id, :amt, 'TOPUP', :pay_ref, 'Auto top-up for referrer bonus', :bal)"""),
-            {"biz_id": biz_id, "amt": card_amount, "pay_ref": data.payment_intent_id, "bal": new_wallet_after_topup}
+        # Top up wallet with the card charge amount (once per payment)
+        await credit_wallet(
+            db, biz_id, card_amount, "TOPUP", payment_ref=data.payment_intent_id,
+            notes="Auto top-up for referrer bonus", idempotency_key=topup_key(data.payment_intent_id),
         )
 
-        return await _process_bonus(db, biz_id, ref_uuid, link["id"], data.amount_cents, data.reason, "card+wallet", data.payment_intent_id, new_wallet_after_topup)
+        return await _process_bonus(db, biz_id, ref_uuid, link["id"], data.amount_cents, data.reason, "card+wallet", data.payment_intent_id)
 
     raise HTTPException(status_code=400, detail="Invalid request state")
 
@@ -1402,23 +1402,28 @@ async def _process_bonus(
     reason: Optional[str],
     funded_from: str,
     payment_ref: Optional[str],
-    wallet_balance: int,
 ):
     """Deduct from business wallet, credit referrer, create records."""
-    new_balance = wallet_balance - amount_cents
-
-    # 1. Deduct from business wallet
-    await db.execute(
-        text("UPDATE businesses SET wallet_balance_cents = :bal WHERE id = :biz_id"),
-        {"bal": new_balance, "biz_id": biz_id}
-    )
-
-    # 2. Log wallet transaction
-    await db.execute(
-        text("""INSERT INTO wallet_transactions (business_id, amount_cents, type, notes, balance_after_cents)
-                VALUES (:biz_id, :amt, 'BONUS', :notes, :bal)"""),
-        {"biz_id": biz_id, "amt": amount_cents, "notes": f"Bonus to referrer: {reason or 'No reason given'}", "bal": new_balance}
+    # 1-2. Deduct from business wallet and log the wallet transaction (a card-funded
+    # bonus is applied once per payment)
+    entry = await debit_wallet(
+        db, biz_id, amount_cents, "BONUS",
+        notes=f"Bonus to referrer: {reason or 'No reason given'}",
+        idempotency_key=f"bonus:{payment_ref}" if payment_ref else None,
     )
+    if entry.status == DUPLICATE:
+        await db.commit()
+        return {
+            "status": "success",
+            "message": "Bonus already sent",
+            "bonus_amount_cents": amount_cents,
+            "funded_from": funded_from,
+            "new_wallet_balance_cents": entry.balance_cents,
+        }
+    if not entry.applied:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Wallet balance changed. Please try again.")
+    new_balance = entry.balance_cents
 
     # 3. Credit referrer wallet + total earned
     await db.execute(
@@ -1502,7 +1507,7 @@ async def wallet_topup_confirm(
 
     user_uuid = uuid.UUID(user.id)
     biz_q = await db.execute(
-        text("SELECT id, wallet_balance_cents FROM businesses WHERE user_id = :uid"),
+        text("SELECT id FROM businesses WHERE user_id = :uid"),
         {"uid": user_uuid}
     )
     biz = biz_q.mappings().first()
@@ -1522,20 +1527,14 @@ async def wallet_topup_confirm(
     except stripe_lib.error.StripeError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    new_balance = (biz["wallet_balance_cents"] or 0) + data.amount_cents
-
-    await db.execute(
-        text("UPDATE businesses SET wallet_balance_cents = :bal WHERE id = :id"),
-        {"bal": new_balance, "id": biz["id"]},
-    )
-    await db.execute(
-        text("""INSERT INTO wallet_transactions (business_id, amount_cents, type, payment_ref, notes, balance_after_cents)
-                VALUES (:biz_id, :amt, 'TOPUP', :pay_ref, 'Stripe wallet top-up', :bal)"""),
-        {"biz_id": biz["id"], "amt": data.amount_cents, "pay_ref": data.payment_intent_id, "bal": new_balance},
+    # Credit what was actually charged, once per payment (the webhook may have got here first)
+    entry = await credit_wallet(
+        db, biz["id"], intent.amount, "TOPUP", payment_ref=data.payment_intent_id,
+        notes="Stripe wallet top-up", idempotency_key=topup_key(data.payment_intent_id),
     )
     await db.commit()
 
-    return {"new_balance_cents": new_balance}
+    return {"new_balance_cents": entry.balance_cents}
 
 
 @router.get("/transactions")
@@ -1885,7 +1884,7 @@ async def claim_and_onboard_business(
 
      biz_id = biz_row[0]
      existing_slug = biz_row[1]
-     _consume_claim_verification_token(business_id, data.claim_verification_token)
+     await _consume_claim_verification_token(business_id, data.claim_verification_token)
 
      slug = canonical_business_slug(data.slug or existing_slug)
      if data.slug and data.slug != existing_slug:
@@ -1963,7 +1962,11 @@ async def claim_and_onboard_business(
              "lng": lng,
          }
      )
+     if existing_slug and slug != existing_slug:
+         await record_slug_redirect(db, biz_id, existing_slug, slug)
      await db.commit()
+     invalidate_identity(user.id)
+     await invalidate_business_listing(biz_id)
 
      if data.business_email:
          await send_business_welcome(data.business_email, data.business_name, slug)
@@ -1971,22 +1974,19 @@ async def claim_and_onboard_business(
      return {"id": str(biz_id), "slug": slug}
 
 
-@router.post("/{business_id}/claim/send-phone-otp")
+@router.post("/{business_id}/claim/send-phone-otp", dependencies=[Depends(CLAIM_CODE_SEND_IP_LIMIT.depends(client_ip))])
 async def send_business_claim_phone_otp(
     business_id: uuid.UUID,
     db: AsyncSession = Depends(get_db)
 ):
+     await CLAIM_CODE_SEND_LIMIT.enforce(_build_claim_store_key(business_id, "phone"))
      business = await _get_claimable_business(db, business_id)
      phone = business.get("business_phone")
      if not phone:
          raise HTTPException(status_code=400, detail="This business does not have a phone number available for verification")
      normalized_phone = _normalize_phone_number(phone)
      code = str(random.randint(100000, 999999))
-     _business_claim_phone_store[_build_claim_store_key(business_id, "phone")] = {
-         "phone": normalized_phone,
-         "code": code,
-         "expires_at": datetime.utcnow() + timedelta(minutes=10),
-     }
+     await _business_claim_phone_store.put(_build_claim_store_key(business_id, "phone"), {"phone": normalized_phone, "code": code}, CLAIM_CODE_TTL)
      await _send_sms(normalized_phone, f"Your TradeRefer code for {business['business_name']} is {code}. It expires in 10 minutes.")
      return {"sent": True}
 
@@ -1997,36 +1997,32 @@ async def verify_business_claim_phone_otp(
     request: BusinessClaimCodeVerifyRequest,
     db: AsyncSession = Depends(get_db)
 ):
-     await _get_claimable_business(db, business_id)
      key = _build_claim_store_key(business_id, "phone")
-     entry = _business_claim_phone_store.get(key)
-     if not entry:
-         raise HTTPException(status_code=400, detail="No phone verification was started. Please request a code first.")
-     if datetime.utcnow() > entry["expires_at"]:
-         _business_claim_phone_store.pop(key, None)
-         raise HTTPException(status_code=400, detail="Your code has expired. Please request a new one.")
-     if entry["code"] != request.code.strip():
+     await CLAIM_CODE_VERIFY_LIMIT.enforce(key)
+     await _get_claimable_business(db, business_id)
+     outcome, _ = await verify_code(_business_claim_phone_store, key, request.code)
+     if outcome == "missing":
+         raise HTTPException(status_code=400, detail="No phone verification is in progress, or your code has expired. Please request a new code.")
+     if outcome == "locked":
+         raise HTTPException(status_code=400, detail="Too many incorrect attempts. Please request a new code.")
+     if outcome == "wrong":
          raise HTTPException(status_code=400, detail="Incorrect code. Please try again.")
-     _business_claim_phone_store.pop(key, None)
-     token = _issue_claim_verification_token(business_id, "phone")
+     token = await _issue_claim_verification_token(business_id, "phone")
      return {"verified": True, "claim_verification_token": token}
 
 
-@router.post("/{business_id}/claim/send-email-code")
+@router.post("/{business_id}/claim/send-email-code", dependencies=[Depends(CLAIM_CODE_SEND_IP_LIMIT.depends(client_ip))])
 async def send_business_claim_email_code(
     business_id: uuid.UUID,
     db: AsyncSession = Depends(get_db)
 ):
+     await CLAIM_CODE_SEND_LIMIT.enforce(_build_claim_store_key(business_id, "email"))
      business = await _get_claimable_business(db, business_id)
      email = (business.get("business_email") or "").strip()
      if not email:
          raise HTTPException(status_code=400, detail="This business does not have an email address available for verification")
      code = str(random.randint(100000, 999999))
-     _business_claim_email_store[_build_claim_store_key(business_id, "email")] = {
-         "email": email,
-         "code": code,
-         "expires_at": datetime.utcnow() + timedelta(minutes=10),
-     }
+     await _business_claim_email_store.put(_build_claim_store_key(business_id, "email"), {"email": email, "code": code}, CLAIM_CODE_TTL)
      await send_business_claim_verification_code(email, business["business_name"], code)
      return {"sent": True}
 
@@ -2037,18 +2033,17 @@ async def verify_business_claim_email_code(
     request: BusinessClaimCodeVerifyRequest,
     db: AsyncSession = Depends(get_db)
 ):
-     await _get_claimable_business(db, business_id)
      key = _build_claim_store_key(business_id, "email")
-     entry = _business_claim_email_store.get(key)
-     if not entry:
-         raise HTTPException(status_code=400, detail="No email verification was started. Please request a code first.")
-     if datetime.utcnow() > entry["expires_at"]:
-         _business_claim_email_store.pop(key, None)
-         raise HTTPException(status_code=400, detail="Your code has expired. Please request a new one.")
-     if entry["code"] != request.code.strip():
+     await CLAIM_CODE_VERIFY_LIMIT.enforce(key)
+     await _get_claimable_business(db, business_id)
+     outcome, _ = await verify_code(_business_claim_email_store, key, request.code)
+     if outcome == "missing":
+         raise HTTPException(status_code=400, detail="No email verification is in progress, or your code has expired. Please request a new code.")
+     if outcome == "locked":
+         raise HTTPException(status_code=400, detail="Too many incorrect attempts. Please request a new code.")
+     if outcome == "wrong":
          raise HTTPException(status_code=400, detail="Incorrect code. Please try again.")
-     _business_claim_email_store.pop(key, None)
-     token = _issue_claim_verification_token(business_id, "email")
+     token = await _issue_claim_verification_token(business_id, "email")
      return {"verified": True, "claim_verification_token": token}
 
 
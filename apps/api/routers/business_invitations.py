@@ -9,6 +9,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from services.database import get_db
 from services.auth import get_current_user, AuthenticatedUser
+from services.identity import resolve_identity
 from utils.logging_config import error_logger, general_logger
 import uuid
 import os
@@ -29,14 +30,10 @@ class BusinessMarkActiveRequest(BaseModel):
 
 
 async def _get_business_id(user: AuthenticatedUser, db: AsyncSession) -> str:
-    res = await db.execute(
-        text("SELECT id FROM businesses WHERE user_id = :uid"),
-        {"uid": uuid.UUID(user.id)}
-    )
-    row = res.fetchone()
-    if not row:
+    identity = await resolve_identity(db, user.id)
+    if not identity.business_id:
         raise HTTPException(status_code=404, detail="Business profile not found")
-    return str(row[0])
+    return str(identity.business_id)
 
 
 @router.post("/send")
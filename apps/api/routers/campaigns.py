@@ -5,8 +5,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from services.database import get_db
 from services.auth import get_current_user, AuthenticatedUser
+from services.identity import resolve_identity
+from services.cache import invalidate_business_content
 from routers.notifications import notify_all_referrers_for_business
-from services.email import send_referrer_campaign_notification
+from services.email import send_referrer_campaign_notifications
 import uuid
 
 router = APIRouter()
@@ -41,14 +43,10 @@ VALID_TYPES = {"flat_bonus", "multiplier", "volume_bonus", "first_referral"}
 
 
 async def _get_business_id(user_id: str, db: AsyncSession):
-    result = await db.execute(
-        text("SELECT id FROM businesses WHERE user_id = :uid"),
-        {"uid": uuid.UUID(user_id)}
-    )
-    row = result.fetchone()
-    if not row:
+    identity = await resolve_identity(db, user_id)
+    if not identity.business_id:
         raise HTTPException(status_code=404, detail="Business not found")
-    return row[0]
+    return identity.business_id
 
 
 # ── Business CRUD ─────────────────────────────────────────────
@@ -120,6 +118,7 @@ async def create_campaign(
         }
     )
     await db.commit()
+    await invalidate_business_content(biz_id)
     row = result.fetchone()
 
     # Notify all connected referrers about the new campaign
@@ -146,15 +145,13 @@ async def create_campaign(
                 """),
                 {"bid": biz_id}
             )
-            for ref in referrer_emails.mappings().all():
-                send_referrer_campaign_notification(
-                    email=ref["email"],
-                    full_name=ref["full_name"] or ref["email"],
-                    business_name=biz_row[0],
-                    campaign_title=data.title,
-                    promo_text=data.promo_text,
-                    business_slug=biz_row[1],
-                )
+            await send_referrer_campaign_notifications(
+                referrers=[dict(ref) for ref in referrer_emails.mappings().all()],
+                business_name=biz_row[0],
+                campaign_title=data.title,
+                promo_text=data.promo_text,
+                business_slug=biz_row[1],
+            )
     except Exception as e:
         print(f"Campaign notification error (non-fatal): {e}")
 
@@ -196,6 +193,7 @@ async def update_campaign(
         params
     )
     await db.commit()
+    await invalidate_business_content(biz_id)
     return {"message": "Campaign updated"}
 
 
@@ -211,6 +209,7 @@ async def delete_campaign(
         {"cid": uuid.UUID(campaign_id), "bid": biz_id}
     )
     await db.commit()
+    await invalidate_business_content(biz_id)
     if not result.fetchone():
         raise HTTPException(status_code=404, detail="Campaign not found")
     return {"message": "Campaign deleted"}
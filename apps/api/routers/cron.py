@@ -1,6 +1,7 @@
 """
-Cron router — protected endpoint for triggering scheduled IndexNow submission.
-Primary execution is via Railway cron worker (scripts/submit_recent_indexnow.py).
+Cron router — protected endpoints for scheduled IndexNow submission and
+sitemap regeneration. Primary execution is via Railway cron workers
+(scripts/submit_recent_indexnow.py, scripts/generate_sitemaps.py).
 This endpoint exists for manual reruns and emergency triggers.
 
 Protect with: Authorization: Bearer <CRON_SECRET>
@@ -16,6 +17,7 @@ from sqlalchemy import text
 
 from services.database import get_db
 from services.indexnow import submit_urls
+from routers.sitemaps import SITEMAP_FAMILIES, build_all, build_family
 
 logger = logging.getLogger(__name__)
 
@@ -79,3 +81,16 @@ async def submit_recent_indexnow(
         "found": len(urls),
         "submitted": len(urls) if ok else 0,
     }
+
+
+@router.post("/sitemaps")
+async def regenerate_sitemaps(
+    family: str | None = None,
+    _: None = Depends(_verify_secret),
+):
+    """Rebuild the stored sitemap files (one family, or all of them)."""
+    if family is not None and family not in SITEMAP_FAMILIES:
+        raise HTTPException(status_code=404, detail=f"Unknown sitemap family: {family}")
+    files = {family: await build_family(family)} if family else await build_all()
+    logger.info("cron/sitemaps: rebuilt %s", files)
+    return {"ok": True, "files": files}
@@ -5,6 +5,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from services.database import get_db
 from services.auth import get_current_user, AuthenticatedUser
+from services.identity import resolve_identity
+from services.cache import invalidate_business_content
 import uuid
 import random
 import os
@@ -40,14 +42,10 @@ class AIGenerateRequest(BaseModel):
 
 async def _get_business_id(user_id: str, db: AsyncSession):
     """Get the business ID for the authenticated user."""
-    result = await db.execute(
-        text("SELECT id FROM businesses WHERE user_id = :uid"),
-        {"uid": uuid.UUID(user_id)}
-    )
-    row = result.fetchone()
-    if not row:
+    identity = await resolve_identity(db, user_id)
+    if not identity.business_id:
         raise HTTPException(status_code=404, detail="Business not found")
-    return row[0]
+    return identity.business_id
 
 
 @router.post("/deals")
@@ -73,6 +71,7 @@ async def create_deal(
         "expires_at": data.expires_at
     })
     await db.commit()
+    await invalidate_business_content(biz_id)
     row = result.fetchone()
     return {"id": str(row[0]), "title": row[1], "created_at": str(row[2])}
 
@@ -139,6 +138,7 @@ async def update_deal(
         params
     )
     await db.commit()
+    await invalidate_business_content(biz_id)
     return {"message": "Deal updated"}
 
 
@@ -155,6 +155,7 @@ async def delete_deal(
         {"did": uuid.UUID(deal_id), "bid": biz_id}
     )
     await db.commit()
+    await invalidate_business_content(biz_id)
     if result.rowcount == 0:
         raise HTTPException(status_code=404, detail="Deal not found")
     return {"message": "Deal deleted"}
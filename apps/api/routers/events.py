@@ -3,14 +3,11 @@ SSE (Server-Sent Events) endpoint for real-time dashboard updates.
 Clients connect via EventSource to receive push notifications instantly.
 """
 
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Header, Query
 from fastapi.responses import StreamingResponse
 from services.event_bus import event_bus
-from services.auth import get_jwks
-from jose import jwt
+from services.auth import verifier
 import asyncio
-import uuid
-from utils.logging_config import error_logger
 
 router = APIRouter()
 
@@ -19,29 +16,12 @@ KEEPALIVE_INTERVAL = 25  # seconds — below typical 30s proxy timeout
 
 async def _verify_sse_token(token: str) -> str | None:
     """Verify a Clerk JWT from an SSE query param. Returns user_id or None."""
-    try:
-        jwks = await get_jwks()
-        header = jwt.get_unverified_header(token)
-        rsa_key = {}
-        for key in jwks["keys"]:
-            if key["kid"] == header["kid"]:
-                rsa_key = {k: key[k] for k in ("kty", "kid", "use", "n", "e")}
-        if not rsa_key:
-            return None
-        payload = jwt.decode(
-            token, rsa_key, algorithms=["RS256"],
-            options={"verify_aud": False, "verify_iss": False, "verify_sub": True}
-        )
-        clerk_id = payload.get("sub")
-        return str(uuid.uuid5(uuid.NAMESPACE_DNS, clerk_id)) if clerk_id else None
-    except Exception as e:
-        error_logger.warning(f"SSE auth error: {e}")
-        return None
+    return await verifier.verify_user_id(token, context="SSE")
 
 
-async def _event_generator(user_id: str):
+async def _event_generator(user_id: str, last_event_id: int | None = None):
     """Async generator that yields SSE-formatted events."""
-    q = event_bus.subscribe(user_id)
+    q = event_bus.subscribe(user_id, last_event_id)
     try:
         # Send initial connected event
         yield f"data: {{\"type\":\"connected\",\"payload\":{{}}}}\n\n"
@@ -49,25 +29,43 @@ async def _event_generator(user_id: str):
         while True:
             try:
                 # Wait for next event or keepalive timeout
-                message = await asyncio.wait_for(q.get(), timeout=KEEPALIVE_INTERVAL)
-                yield f"data: {message}\n\n"
+                item = await asyncio.wait_for(q.get(), timeout=KEEPALIVE_INTERVAL)
             except asyncio.TimeoutError:
                 # Send keepalive comment to prevent proxy/browser timeout
                 yield ": keepalive\n\n"
+                continue
+            if item is None:
+                break  # Dropped as a slow consumer — the client reconnects and replays
+            seq, message = item
+            yield f"id: {seq}\ndata: {message}\n\n" if seq is not None else f"data: {message}\n\n"
     except asyncio.CancelledError:
         pass
     finally:
         event_bus.unsubscribe(user_id, q)
 
 
+def _parse_event_id(value: str | None) -> int | None:
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
 @router.get("/events/stream")
-async def sse_stream(token: str = Query(...)):
+async def sse_stream(
+    token: str = Query(...),
+    last_event_id: str | None = Query(None),
+    last_event_id_header: str | None = Header(None, alias="Last-Event-ID"),
+):
     """
     SSE endpoint for real-time dashboard events.
 
     Connect with: new EventSource('https://api.../api/events/stream?token=<jwt>')
 
     Events are JSON objects: { "type": "notification", "payload": { ... } }
+    and carry an `id:`. Reconnect with the Last-Event-ID header (or
+    ?last_event_id=) to receive missed events; a `resync` event means some
+    could not be replayed and the client should refetch.
     """
     user_id = await _verify_sse_token(token)
     if not user_id:
@@ -78,7 +76,7 @@ async def sse_stream(token: str = Query(...)):
         )
 
     return StreamingResponse(
-        _event_generator(user_id),
+        _event_generator(user_id, _parse_event_id(last_event_id_header or last_event_id)),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -10,6 +10,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from services.database import get_db
 from services.auth import get_current_user, AuthenticatedUser
+from services.identity import resolve_identity
 from utils.logging_config import error_logger, general_logger
 import uuid
 import os
@@ -31,14 +32,10 @@ class MarkActiveRequest(BaseModel):
 
 
 async def _get_referrer_id(user: AuthenticatedUser, db: AsyncSession) -> uuid.UUID:
-    res = await db.execute(
-        text("SELECT id FROM referrers WHERE user_id = :uid"),
-        {"uid": uuid.UUID(user.id)}
-    )
-    row = res.fetchone()
-    if not row:
+    identity = await resolve_identity(db, user.id)
+    if not identity.referrer_id:
         raise HTTPException(status_code=404, detail="Referrer account not found")
-    return row[0]
+    return identity.referrer_id
 
 
 @router.get("/resolve")
@@ -16,6 +16,9 @@ from services.sms import (
     send_sms_consumer_on_the_way, send_sms_referrer_earning_confirmed,
     send_sms_screening_q1, send_sms_business_lead_refunded, send_sms_business_wallet_low,
 )
+from services.job_queue import idempotency_scope
+from services.rate_limit import RateLimit, client_ip as request_ip
+from services.wallet import DUPLICATE, debit_wallet, unlock_key
 import uuid
 import random
 import os
@@ -40,37 +43,57 @@ class DisputeCreate(BaseModel):
     reason: str
     notes: Optional[str] = None
 
-async def check_ip_velocity(ip: str, db: AsyncSession):
-    """
-    Limits the number of leads an IP can submit within a rolling window.
-    Spec: Max 5 leads per hour per IP to prevent spam/automated abuse.
-    """
-    if ip == "unknown":
-        return True
-
-    query = text("""
-        SELECT COUNT(*) 
-        FROM leads 
-        WHERE consumer_ip = :ip 
-          AND created_at > (now() - interval '1 hour')
-    """)
-    result = await db.execute(query, {"ip": ip})
-    count = result.scalar() or 0
-    
-    if count >= 5:
-        error_logger.warning(f"Fraud: IP {ip} blocked (velocity: {count} leads/hr)")
-        raise HTTPException(
-            status_code=429, 
-            detail="Too many lead submissions. Please try again in an hour."
+# 5 leads per hour per IP and per device to stop spam/automated abuse
+LEAD_IP_LIMIT = RateLimit("lead-ip", 5, 3600, "Too many lead submissions. Please try again in an hour.")
+LEAD_DEVICE_LIMIT = RateLimit("lead-device", 5, 3600, "Too many lead submissions. Please try again in an hour.")
+
+INTAKE_SQL = text("""
+    WITH link AS (
+        SELECT id, referrer_id FROM referral_links
+        WHERE link_code = :code AND is_active = true
+        LIMIT 1
+    ), biz AS (
+        SELECT b.id, b.referral_fee_cents, b.business_name, b.trade_category,
+               NOT EXISTS (SELECT 1 FROM leads WHERE business_id = b.id) AS is_first_lead
+        FROM businesses b WHERE b.id = :business_id
+    ), ref AS (
+        SELECT r.accountability_stage FROM referrers r JOIN link ON r.id = link.referrer_id
+    ), ins AS (
+        INSERT INTO leads (
+            business_id, referral_link_id, referrer_id,
+            consumer_name, consumer_phone, consumer_email, consumer_suburb, consumer_address,
+            job_description, status, screening_status,
+            unlock_fee_cents, referral_fee_snapshot_cents, referrer_payout_amount_cents,
+            consumer_ip, consumer_device_hash, lead_urgency, twilio_from_number
         )
-    return True
+        SELECT
+            biz.id, link.id, link.referrer_id,
+            CAST(:consumer_name AS text), CAST(:consumer_phone AS text), CAST(:consumer_email AS text),
+            CAST(:consumer_suburb AS text), CAST(:consumer_address AS text),
+            CAST(:job_description AS text), 'SCREENING', 'Q1_SENT',
+            CASE WHEN biz.is_first_lead THEN 0
+                 ELSE biz.referral_fee_cents + biz.referral_fee_cents * 20 / 100 END,
+            biz.referral_fee_cents,
+            biz.referral_fee_cents * 80 / 100,
+            CAST(:ip AS text), CAST(:device_hash AS text), CAST(:lead_urgency AS text),
+            CAST(:twilio_from_number AS text)
+        FROM biz LEFT JOIN link ON true
+        WHERE NOT EXISTS (SELECT 1 FROM ref WHERE accountability_stage = 'paused')
+        RETURNING id
+    )
+    SELECT (SELECT id FROM ins) AS lead_id,
+           biz.business_name, biz.trade_category,
+           (SELECT accountability_stage FROM ref) AS referrer_stage
+    FROM biz
+""")
 
 @router.post("/")
 async def create_lead(lead: LeadCreate, request: Request, db: AsyncSession = Depends(get_db)):
-    client_ip = request.client.host if request.client else "unknown"
-    
-    # 0. Fraud Check (Placeholder)
-    await check_ip_velocity(client_ip, db)
+    client_ip = request_ip(request) or "unknown"
+
+    # 0. Fraud Check: velocity per IP and device (rejected before touching the database)
+    await LEAD_IP_LIMIT.enforce(request_ip(request))
+    await LEAD_DEVICE_LIMIT.enforce(lead.device_hash)
 
     # Normalize consumer phone to E.164
     _ph = lead.consumer_phone.strip().replace(" ", "").replace("-", "")
@@ -80,156 +103,69 @@ async def create_lead(lead: LeadCreate, request: Request, db: AsyncSession = Dep
         _ph = "+61" + _ph
     lead = lead.model_copy(update={"consumer_phone": _ph})
 
-    referral_link_id = None
-    referrer_id = None
-    
-    # 1. Resolve referral code if provided
-    if lead.referral_code:
-        ref_query = text("""
-            SELECT id, referrer_id FROM referral_links 
-            WHERE link_code = :code AND is_active = true
-            LIMIT 1
-        """)
-        ref_result = await db.execute(ref_query, {"code": lead.referral_code})
-        ref_data = ref_result.fetchone()
-        if ref_data:
-            referral_link_id = ref_data[0]
-            referrer_id = ref_data[1]
-
-    # 2. Get Business Pricing + contact info
-    biz_query = text("""
-        SELECT referral_fee_cents, business_phone
-        FROM businesses WHERE id = :bid LIMIT 1
-    """)
-    biz_result = await db.execute(biz_query, {"bid": lead.business_id})
-    business = biz_result.mappings().first()
-    
-    if not business:
+    try:
+        business_id = uuid.UUID(lead.business_id)
+    except ValueError:
         raise HTTPException(status_code=404, detail="Business not found")
-        
-    referral_fee = business["referral_fee_cents"]
-    platform_fee_percent = 20 # Fixed at 20% per spec
-    
-    # Check if this is the first lead for the business (first = free)
-    first_lead_result = await db.execute(
-        text("SELECT COUNT(*) FROM leads WHERE business_id = :bid"),
-        {"bid": lead.business_id}
-    )
-    existing_lead_count = first_lead_result.scalar() or 0
-    is_first_lead = existing_lead_count == 0
-
-    # Calculate fees (dynamic markup logic). First lead is always free.
-    platform_fee = int(referral_fee * (platform_fee_percent / 100))
-    total_unlock_fee = 0 if is_first_lead else referral_fee + platform_fee
-
-    # Check referrer accountability stage
-    if referrer_id:
-        acct_res = await db.execute(
-            text("SELECT accountability_stage FROM referrers WHERE id = :rid"),
-            {"rid": referrer_id}
-        )
-        acct_row = acct_res.fetchone()
-        if acct_row and acct_row[0] == 'paused':
-            raise HTTPException(status_code=403, detail="Your referrer account is paused. Please contact support.")
 
-    # 3. Insert Lead
-    insert_query = text("""
-        INSERT INTO leads (
-            business_id, 
-            referral_link_id, 
-            referrer_id, 
-            consumer_name, 
-            consumer_phone, 
-            consumer_email, 
-            consumer_suburb,
-            consumer_address,
-            job_description,
-            status,
-            screening_status,
-            unlock_fee_cents,
-            referral_fee_snapshot_cents,
-            referrer_payout_amount_cents,
-            consumer_ip,
-            consumer_device_hash,
-            lead_urgency,
-            twilio_from_number
-        ) VALUES (
-            :business_id, 
-            :referral_link_id, 
-            :referrer_id, 
-            :consumer_name, 
-            :consumer_phone, 
-            :consumer_email, 
-            :consumer_suburb,
-            :consumer_address,
-            :job_description, 
-            'SCREENING',
-            'Q1_SENT',
-            :total_fee,
-            :referral_fee_snapshot,
-            :payout_snapshot,
-            :ip,
-            :device_hash,
-            :lead_urgency,
-            :twilio_from_number
-        ) RETURNING id
-    """)
-    
     # Pick a random Twilio number for this lead's entire conversation
     from services.sms import TWILIO_FROM_NUMBERS
-    from utils.logging_config import email_logger
-    
-    email_logger.info(f"TWILIO_FROM_NUMBERS available: {TWILIO_FROM_NUMBERS}")
     twilio_from = random.choice(TWILIO_FROM_NUMBERS) if TWILIO_FROM_NUMBERS else None
-    email_logger.info(f"Selected twilio_from: {twilio_from}")
-    
+
+    # 1-3. One statement: resolve the referral link, business pricing and referrer
+    # stage, and insert the lead unless the referrer is paused. Fees: 20% platform
+    # markup on the referral fee, 80% referrer payout, first lead per business free.
     try:
-        result = await db.execute(insert_query, {
-            "business_id": lead.business_id,
-            "referral_link_id": referral_link_id,
-            "referrer_id": referrer_id,
+        result = await db.execute(INTAKE_SQL, {
+            "business_id": business_id,
+            "code": lead.referral_code or None,
             "consumer_name": lead.consumer_name,
             "consumer_phone": lead.consumer_phone,
             "consumer_email": lead.consumer_email,
             "consumer_suburb": lead.consumer_suburb,
             "consumer_address": lead.consumer_address,
             "job_description": lead.job_description,
-            "total_fee": total_unlock_fee,
-            "referral_fee_snapshot": referral_fee,
-            "payout_snapshot": int(referral_fee * 0.8), # 80% referrer payout
             "ip": client_ip,
             "device_hash": lead.device_hash,
             "lead_urgency": lead.lead_urgency,
-            "twilio_from_number": twilio_from
+            "twilio_from_number": twilio_from,
         })
-        new_lead_id = result.scalar()
-        await db.commit()
-
-        # Fetch business info for screening SMS
-        biz_info = await db.execute(
-            text("SELECT business_name, trade_category FROM businesses WHERE id = :id"),
-            {"id": lead.business_id}
-        )
-        biz_row = biz_info.mappings().first()
-
-        # Send consumer AI screening Q1 (business notified only after screening PASS)
-        if lead.consumer_phone and biz_row and twilio_from:
-            await send_sms_screening_q1(
-                phone=lead.consumer_phone,
-                consumer_name=lead.consumer_name,
-                business_name=biz_row["business_name"],
-                trade_category=biz_row["trade_category"] or "trade",
-                from_number=twilio_from,
-            )
-
-        return {"id": str(new_lead_id), "status": "SCREENING"}
+        row = result.mappings().first()
     except Exception as e:
         await db.rollback()
         error_logger.error(f"Error creating lead: {e}")
         error_logger.error(f"Lead data: business_id={lead.business_id}, consumer_name={lead.consumer_name}, consumer_phone={lead.consumer_phone}, consumer_email={lead.consumer_email}, consumer_suburb={lead.consumer_suburb}")
-        error_logger.error(f"Calculated values: referral_fee={referral_fee}, total_unlock_fee={total_unlock_fee}, platform_fee={platform_fee}")
         raise HTTPException(status_code=500, detail="Failed to create lead")
 
+    if not row:
+        raise HTTPException(status_code=404, detail="Business not found")
+    if row["lead_id"] is None:
+        if row["referrer_stage"] == "paused":
+            raise HTTPException(status_code=403, detail="Your referrer account is paused. Please contact support.")
+        raise HTTPException(status_code=500, detail="Failed to create lead")
+    new_lead_id = row["lead_id"]
+
+    try:
+        # Send consumer AI screening Q1 (business notified only after screening PASS).
+        # The job is queued in this transaction, so it exists only if the lead does.
+        if lead.consumer_phone and twilio_from:
+            with idempotency_scope(f"lead-created:{new_lead_id}"):
+                await send_sms_screening_q1(
+                    phone=lead.consumer_phone,
+                    consumer_name=lead.consumer_name,
+                    business_name=row["business_name"],
+                    trade_category=row["trade_category"] or "trade",
+                    from_number=twilio_from,
+                    db=db,
+                )
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        error_logger.error(f"Error creating lead {new_lead_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to create lead")
+
+    return {"id": str(new_lead_id), "status": "SCREENING"}
+
 
 @router.get("/{lead_id}")
 async def get_lead(lead_id: str, db: AsyncSession = Depends(get_db)):
@@ -303,57 +239,56 @@ async def unlock_lead(
     if lead["status"] not in ("READY_FOR_BUSINESS", "SCREENING"):
         raise HTTPException(status_code=400, detail=f"Lead cannot be unlocked in status: {lead['status']}")
 
-    # 3. Wallet balance checks
+    # 3-4. Deduct from wallet (only while the balance covers the fee and the $25
+    # minimum floor, once per lead) and unlock
     unlock_fee = lead["unlock_fee_cents"] or 0
-    wallet_balance = business["wallet_balance_cents"] or 0
-
-    if wallet_balance < 2500:  # $25 minimum floor
-        raise HTTPException(
-            status_code=402,
-            detail=f"Wallet balance must be at least $25.00 to unlock leads. Current balance: ${wallet_balance/100:.2f}."
-        )
-    if wallet_balance < unlock_fee:
-        raise HTTPException(
-            status_code=402,
-            detail=f"Insufficient wallet balance. Need ${unlock_fee/100:.2f}, have ${wallet_balance/100:.2f}."
-        )
-
-    # 4. Deduct from wallet and unlock
-    new_balance = wallet_balance - unlock_fee
     try:
-        await db.execute(
-            text("UPDATE businesses SET wallet_balance_cents = :bal, total_leads_unlocked = total_leads_unlocked + 1 WHERE id = :id"),
-            {"bal": new_balance, "id": business["id"]}
+        entry = await debit_wallet(
+            db, business["id"], unlock_fee, "LEAD_UNLOCK",
+            min_balance_cents=2500, lead_id=lead_id, notes="Lead unlocked — fee held",
+            idempotency_key=unlock_key(lead_id), leads_unlocked=1,
         )
-        await db.execute(text("""
-            INSERT INTO wallet_transactions (business_id, amount_cents, type, lead_id, notes, balance_after_cents)
-            VALUES (:bid, :amt, 'LEAD_UNLOCK', :lid, 'Lead unlocked — fee held', :bal)
-        """), {"bid": business["id"], "amt": unlock_fee, "lid": lead_id, "bal": new_balance})
-
-        await db.execute(
-            text("UPDATE leads SET status = 'UNLOCKED', unlocked_at = now(), unlock_payment_type = 'WALLET' WHERE id = :id"),
+        if entry.status == DUPLICATE:
+            await db.rollback()
+            return {"message": "Lead already unlocked", "status": "UNLOCKED"}
+        if not entry.applied:
+            await db.rollback()
+            balance = entry.balance_cents or 0
+            if balance < 2500:
+                raise HTTPException(
+                    status_code=402,
+                    detail=f"Wallet balance must be at least $25.00 to unlock leads. Current balance: ${balance/100:.2f}."
+                )
+            raise HTTPException(
+                status_code=402,
+                detail=f"Insufficient wallet balance. Need ${unlock_fee/100:.2f}, have ${balance/100:.2f}."
+            )
+        new_balance = entry.balance_cents
+
+        unlocked = await db.execute(
+            text("""
+                UPDATE leads SET status = 'UNLOCKED', unlocked_at = now(), unlock_payment_type = 'WALLET'
+                WHERE id = :id
+                RETURNING referrer_payout_amount_cents
+            """),
             {"id": lead_id}
         )
+        payout_cents = unlocked.scalar() or int(unlock_fee * 0.8)
 
-        # Referrer pending earnings record
+        # Referrer pending earnings record + stats
         if lead["referrer_id"]:
-            payout_res = await db.execute(
-                text("SELECT referrer_payout_amount_cents FROM leads WHERE id = :id"),
-                {"id": lead_id}
-            )
-            payout_cents = payout_res.scalar() or int(unlock_fee * 0.8)
             await db.execute(text("""
-                INSERT INTO referrer_earnings (referrer_id, lead_id, gross_cents, platform_cut_cents, status, available_at)
-                VALUES (:rid, :lid, :gross, :cut, 'PENDING', now() + interval '7 days')
-                ON CONFLICT DO NOTHING
+                WITH earning AS (
+                    INSERT INTO referrer_earnings (referrer_id, lead_id, gross_cents, platform_cut_cents, status, available_at)
+                    VALUES (:rid, :lid, :gross, :cut, 'PENDING', now() + interval '7 days')
+                    ON CONFLICT DO NOTHING
+                )
+                UPDATE referrers SET total_leads_unlocked = total_leads_unlocked + 1,
+                    pending_cents = pending_cents + :gross WHERE id = :rid
             """), {
                 "rid": lead["referrer_id"], "lid": lead_id,
                 "gross": payout_cents, "cut": unlock_fee - payout_cents,
             })
-            await db.execute(text("""
-                UPDATE referrers SET total_leads_unlocked = total_leads_unlocked + 1,
-                    pending_cents = pending_cents + :amt WHERE id = :rid
-            """), {"amt": payout_cents, "rid": lead["referrer_id"]})
 
         await db.commit()
 
@@ -395,34 +330,35 @@ async def unlock_lead(
                 pass
 
         # Notify business of unlocked lead (full contact details)
-        try:
-            full_res = await db.execute(text("""
-                SELECT l.consumer_name, l.consumer_phone, l.consumer_email, l.consumer_suburb, l.job_description,
-                       b.business_name, b.business_email, b.business_phone
-                FROM leads l JOIN businesses b ON b.id = l.business_id WHERE l.id = :id
-            """), {"id": lead_id})
-            full = full_res.mappings().first()
-            if full:
-                if full["business_email"]:
-                    await send_business_lead_unlocked(
-                        email=full["business_email"],
-                        business_name=full["business_name"],
-                        consumer_name=full["consumer_name"],
-                        consumer_phone=full["consumer_phone"],
-                        consumer_email=full["consumer_email"],
-                        suburb=full["consumer_suburb"],
-                        job_description=full["job_description"],
-                    )
-                if full["business_phone"]:
-                    await send_sms_business_lead_unlocked(
-                        phone=full["business_phone"],
-                        business_name=full["business_name"],
-                        consumer_name=full["consumer_name"],
-                        consumer_phone=full["consumer_phone"],
-                        suburb=full["consumer_suburb"],
-                    )
-        except Exception as e:
-            error_logger.warning(f"Unlock notification error (non-fatal): {e}")
+        with idempotency_scope(f"lead-unlock:{lead_id}"):
+            try:
+                full_res = await db.execute(text("""
+                    SELECT l.consumer_name, l.consumer_phone, l.consumer_email, l.consumer_suburb, l.job_description,
+                           b.business_name, b.business_email, b.business_phone
+                    FROM leads l JOIN businesses b ON b.id = l.business_id WHERE l.id = :id
+                """), {"id": lead_id})
+                full = full_res.mappings().first()
+                if full:
+                    if full["business_email"]:
+                        await send_business_lead_unlocked(
+                            email=full["business_email"],
+                            business_name=full["business_name"],
+                            consumer_name=full["consumer_name"],
+                            consumer_phone=full["consumer_phone"],
+                            consumer_email=full["consumer_email"],
+                            suburb=full["consumer_suburb"],
+                            job_description=full["job_description"],
+                        )
+                    if full["business_phone"]:
+                        await send_sms_business_lead_unlocked(
+                            phone=full["business_phone"],
+                            business_name=full["business_name"],
+                            consumer_name=full["consumer_name"],
+                            consumer_phone=full["consumer_phone"],
+                            suburb=full["consumer_suburb"],
+                        )
+            except Exception as e:
+                error_logger.warning(f"Unlock notification error (non-fatal): {e}")
 
         payment_logger.info(f"Lead unlocked via wallet | lead={lead_id} | fee=${unlock_fee/100:.2f} | wallet_after=${new_balance/100:.2f}")
         return {"status": "UNLOCKED"}
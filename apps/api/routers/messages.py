@@ -1,13 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, Query
 from pydantic import BaseModel
-from typing import Optional, Dict, List
+from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from services.database import get_db, AsyncSessionLocal
-from services.auth import get_current_user, AuthenticatedUser, get_jwks
+from services.auth import get_current_user, AuthenticatedUser, verifier
+from services.identity import resolve_identity
 from services.email import send_new_message_notification
 from services.push import send_push_to_user
-from jose import jwt
+from services.ws_rooms import room_manager
+from services.conversations import record_message, mark_read, message_page, unread_total
 import uuid
 import os
 import json
@@ -16,83 +18,9 @@ from utils.logging_config import error_logger
 router = APIRouter()
 
 
-# ─── WebSocket Connection Manager ──────────────────────────────────────────────
-
-class ConnectionManager:
-    """Manages active WebSocket connections per conversation room."""
-    
-    def __init__(self):
-        # Maps conversation_id -> list of (websocket, user_id) tuples
-        self._rooms: Dict[str, List[tuple]] = {}
-
-    async def connect(self, conversation_id: str, websocket: WebSocket, user_id: str):
-        await websocket.accept()
-        if conversation_id not in self._rooms:
-            self._rooms[conversation_id] = []
-        self._rooms[conversation_id].append((websocket, user_id))
-
-    def disconnect(self, conversation_id: str, websocket: WebSocket):
-        if conversation_id in self._rooms:
-            self._rooms[conversation_id] = [
-                (ws, uid) for ws, uid in self._rooms[conversation_id] if ws is not websocket
-            ]
-            if not self._rooms[conversation_id]:
-                del self._rooms[conversation_id]
-
-    async def broadcast(self, conversation_id: str, message: dict, exclude_ws: WebSocket = None, exclude_user_id: str = None, sender_user_id: str = None):
-        """Send a message to all connected clients in a conversation room."""
-        if conversation_id not in self._rooms:
-            return
-        dead = []
-        for ws, uid in self._rooms[conversation_id]:
-            if ws is exclude_ws or (exclude_user_id and uid == exclude_user_id):
-                continue
-            
-            # Tailor the payload for messages: set is_mine correctly for this recipient's specific session
-            # This ensures that if a user is logged in on both mobile and web, their messages appear as 'mine' on both.
-            final_payload = message
-            if sender_user_id and message.get("type") == "message" and "data" in message:
-                data = message["data"].copy()
-                data["is_mine"] = (str(uid) == str(sender_user_id))
-                final_payload = {"type": "message", "data": data}
-
-            try:
-                await ws.send_json(final_payload)
-            except Exception:
-                dead.append(ws)
-        # Cleanup dead connections
-        for ws in dead:
-            self.disconnect(conversation_id, ws)
-
-    def active_count(self, conversation_id: str) -> int:
-        return len(self._rooms.get(conversation_id, []))
-
-
-# Global singleton — lives for the lifetime of the process
-manager = ConnectionManager()
-
-
 async def _verify_ws_token(token: str) -> Optional[str]:
     """Verify a Clerk JWT from a WebSocket query param. Returns user_id or None."""
-    try:
-        jwks = await get_jwks()
-        header = jwt.get_unverified_header(token)
-        rsa_key = {}
-        for key in jwks["keys"]:
-            if key["kid"] == header["kid"]:
-                rsa_key = {k: key[k] for k in ("kty", "kid", "use", "n", "e")}
-        if not rsa_key:
-            return None
-        payload = jwt.decode(
-            token, rsa_key, algorithms=["RS256"],
-            options={"verify_aud": False, "verify_iss": False, "verify_sub": True}
-        )
-        clerk_id = payload.get("sub")
-        return str(uuid.uuid5(uuid.NAMESPACE_DNS, clerk_id)) if clerk_id else None
-    except Exception as e:
-        error_logger.warning(f"WS auth error: {e}")
-        return None
-
+    return await verifier.verify_user_id(token, context="WS")
 
 
 class SendMessage(BaseModel):
@@ -102,21 +30,10 @@ class SendMessage(BaseModel):
 
 async def _get_user_identity(db: AsyncSession, user: AuthenticatedUser):
     """Determine if the authenticated user is a business owner, referrer, or both."""
-    user_uuid = uuid.UUID(user.id)
-
-    biz_result = await db.execute(
-        text("SELECT id FROM businesses WHERE user_id = :uid"), {"uid": user_uuid}
-    )
-    biz = biz_result.mappings().first()
-
-    ref_result = await db.execute(
-        text("SELECT id FROM referrers WHERE user_id = :uid"), {"uid": user_uuid}
-    )
-    ref = ref_result.mappings().first()
-
+    identity = await resolve_identity(db, user.id)
     return {
-        "business_id": biz["id"] if biz else None,
-        "referrer_id": ref["id"] if ref else None,
+        "business_id": identity.business_id,
+        "referrer_id": identity.referrer_id,
     }
 
 
@@ -154,18 +71,9 @@ async def websocket_conversation(
             await websocket.close(code=4004, reason="Invalid conversation ID")
             return
 
-        user_uuid = uuid.UUID(user_id)
-        biz_result = await db.execute(
-            text("SELECT id FROM businesses WHERE user_id = :uid"), {"uid": user_uuid}
-        )
-        biz = biz_result.mappings().first()
-        ref_result = await db.execute(
-            text("SELECT id FROM referrers WHERE user_id = :uid"), {"uid": user_uuid}
-        )
-        ref = ref_result.mappings().first()
-
-        biz_id = biz["id"] if biz else None
-        ref_id = ref["id"] if ref else None
+        identity = await resolve_identity(db, user_id)
+        biz_id = identity.business_id
+        ref_id = identity.referrer_id
 
         conv_result = await db.execute(
             text("SELECT business_id, referrer_id FROM conversations WHERE id = :cid"),
@@ -183,11 +91,11 @@ async def websocket_conversation(
         my_type = "business" if conv["business_id"] == biz_id else "referrer"
 
     # 3. Join the room
-    await manager.connect(conversation_id, websocket, user_id)
+    await room_manager.connect(conversation_id, websocket, user_id)
     
     try:
         # Send a "connected" handshake
-        await websocket.send_json({"type": "connected", "conversation_id": conversation_id})
+        room_manager.send(websocket, {"type": "connected", "conversation_id": conversation_id})
         
         # 4. Listen loop — handle pings, typing events, and detect disconnects
         while True:
@@ -199,10 +107,10 @@ async def websocket_conversation(
                 msg_type = data.get("type")
                 
                 if msg_type == "ping":
-                    await websocket.send_json({"type": "pong"})
+                    room_manager.send(websocket, {"type": "pong"})
                 elif msg_type == "typing":
                     # Broadcast typing status to the partner only (exclude all of the sender's own devices)
-                    await manager.broadcast(
+                    await room_manager.broadcast(
                         conversation_id, 
                         {
                             "type": "typing",
@@ -217,7 +125,7 @@ async def websocket_conversation(
     except WebSocketDisconnect:
         pass
     finally:
-        manager.disconnect(conversation_id, websocket)
+        room_manager.disconnect(conversation_id, websocket)
 
 
 @router.get("/unread-count")
@@ -236,22 +144,7 @@ async def get_unread_count(
     my_type = "business" if biz_id else "referrer"
     my_id = biz_id if biz_id else ref_id
 
-    # Count unread messages where sender_type != my_type
-    result = await db.execute(
-        text("""
-            SELECT COUNT(*) as unread_count
-            FROM messages m
-            JOIN conversations c ON m.conversation_id = c.id
-            WHERE (
-                (c.business_id = :my_id AND m.sender_type != 'business' AND m.is_read = false)
-                OR
-                (c.referrer_id = :my_id AND m.sender_type != 'referrer' AND m.is_read = false)
-            )
-        """),
-        {"my_id": my_id}
-    )
-    row = result.mappings().first()
-    return {"unread_count": row["unread_count"] if row else 0}
+    return {"unread_count": await unread_total(db, my_type, my_id)}
 
 
 @router.get("/contacts")
@@ -289,13 +182,10 @@ async def list_contacts(
                 rl.created_at as linked_since,
                 c.id as conversation_id,
                 c.last_message_at,
-                (SELECT body FROM messages m WHERE m.conversation_id = c.id ORDER BY m.created_at DESC LIMIT 1) as last_message,
-                (SELECT image_url FROM messages m WHERE m.conversation_id = c.id ORDER BY m.created_at DESC LIMIT 1) as last_image,
-                (SELECT sender_type FROM messages m WHERE m.conversation_id = c.id ORDER BY m.created_at DESC LIMIT 1) as last_sender_type,
-                COALESCE(
-                    (SELECT COUNT(*) FROM messages m WHERE m.conversation_id = c.id AND m.is_read = false AND m.sender_type != 'business'),
-                    0
-                ) as unread_count
+                c.last_message_preview as last_message,
+                c.last_message_has_image as last_image,
+                c.last_sender_type,
+                COALESCE(c.business_unread, 0) as unread_count
             FROM referral_links rl
             JOIN referrers r ON rl.referrer_id = r.id
             LEFT JOIN conversations c ON c.business_id = rl.business_id AND c.referrer_id = rl.referrer_id
@@ -313,13 +203,10 @@ async def list_contacts(
                 rl.created_at as linked_since,
                 c.id as conversation_id,
                 c.last_message_at,
-                (SELECT body FROM messages m WHERE m.conversation_id = c.id ORDER BY m.created_at DESC LIMIT 1) as last_message,
-                (SELECT image_url FROM messages m WHERE m.conversation_id = c.id ORDER BY m.created_at DESC LIMIT 1) as last_image,
-                (SELECT sender_type FROM messages m WHERE m.conversation_id = c.id ORDER BY m.created_at DESC LIMIT 1) as last_sender_type,
-                COALESCE(
-                    (SELECT COUNT(*) FROM messages m WHERE m.conversation_id = c.id AND m.is_read = false AND m.sender_type != 'referrer'),
-                    0
-                ) as unread_count
+                c.last_message_preview as last_message,
+                c.last_message_has_image as last_image,
+                c.last_sender_type,
+                COALESCE(c.referrer_unread, 0) as unread_count
             FROM referral_links rl
             JOIN businesses b ON rl.business_id = b.id
             LEFT JOIN conversations c ON c.business_id = rl.business_id AND c.referrer_id = rl.referrer_id
@@ -353,19 +240,16 @@ async def list_contacts(
     return {"contacts": contacts, "my_type": my_type}
 
 
-@router.get("/conversations/{conversation_id}")
-async def get_messages(
-    conversation_id: str,
-    db: AsyncSession = Depends(get_db),
-    user: AuthenticatedUser = Depends(get_current_user),
-):
-    """Get all messages in a conversation. Marks incoming messages as read."""
+async def _authorize_conversation(db: AsyncSession, user: AuthenticatedUser, conversation_id: str):
+    """Return (conversation uuid, conversation row, my_type) or raise 404/403."""
     identity = await _get_user_identity(db, user)
     biz_id = identity["business_id"]
     ref_id = identity["referrer_id"]
-    conv_uuid = uuid.UUID(conversation_id)
+    try:
+        conv_uuid = uuid.UUID(conversation_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Conversation not found")
 
-    # Verify user is part of this conversation
     conv_result = await db.execute(
         text("SELECT business_id, referrer_id FROM conversations WHERE id = :cid"),
         {"cid": conv_uuid},
@@ -378,39 +262,62 @@ async def get_messages(
         raise HTTPException(status_code=403, detail="Not authorized to view this conversation")
 
     my_type = "business" if conv["business_id"] == biz_id else "referrer"
+    return conv_uuid, conv, my_type
 
-    # Mark incoming messages as read
-    await db.execute(
-        text("""
-            UPDATE messages SET is_read = true
-            WHERE conversation_id = :cid AND sender_type != :my_type AND is_read = false
-        """),
-        {"cid": conv_uuid, "my_type": my_type},
-    )
-    await db.commit()
 
-    # Fetch messages
-    msg_result = await db.execute(
-        text("""
-            SELECT id, sender_type, sender_id, body, image_url, is_read, created_at
-            FROM messages
-            WHERE conversation_id = :cid
-            ORDER BY created_at ASC
-        """),
-        {"cid": conv_uuid},
-    )
-    messages = []
-    for m in msg_result.mappings().all():
-        messages.append({
-            "id": str(m["id"]),
-            "sender_type": m["sender_type"],
-            "sender_id": str(m["sender_id"]),
-            "body": m["body"],
-            "image_url": m["image_url"],
-            "is_read": m["is_read"],
-            "created_at": str(m["created_at"]),
-            "is_mine": m["sender_type"] == my_type,
-        })
+def _message_id(value: Optional[str]) -> Optional[uuid.UUID]:
+    if value is None:
+        return None
+    try:
+        return uuid.UUID(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _serialize_message(m, my_type: str) -> dict:
+    return {
+        "id": str(m["id"]),
+        "sender_type": m["sender_type"],
+        "sender_id": str(m["sender_id"]),
+        "body": m["body"],
+        "image_url": m["image_url"],
+        "is_read": m["is_read"],
+        "created_at": str(m["created_at"]),
+        "is_mine": m["sender_type"] == my_type,
+    }
+
+
+async def _mark_seen(db: AsyncSession, conv_uuid, conv, my_type: str, rows) -> None:
+    """Read receipts: mark incoming messages read up to the newest one just delivered."""
+    if not any(m["sender_type"] != my_type and not m["is_read"] for m in rows):
+        return
+    if await mark_read(db, conv_uuid, my_type, up_to_id=rows[-1]["id"]):
+        await db.commit()
+
+
+@router.get("/conversations/{conversation_id}")
+async def get_messages(
+    conversation_id: str,
+    before: Optional[str] = Query(None, description="Message id; return the page just older than it"),
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_db),
+    user: AuthenticatedUser = Depends(get_current_user),
+):
+    """
+    Get the newest `limit` messages of a conversation (oldest first), or the
+    page just older than `before`. `has_more` means older messages remain —
+    pass the first message's id as `before` to fetch them. Incoming messages
+    up to the newest one returned are marked read.
+    """
+    conv_uuid, conv, my_type = await _authorize_conversation(db, user, conversation_id)
+
+    page = await message_page(db, conv_uuid, limit, before=_message_id(before))
+    if page is None:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    rows, has_more = page
+    if before is None:
+        await _mark_seen(db, conv_uuid, conv, my_type, rows)
+    messages = [_serialize_message(m, my_type) for m in rows]
 
     # Get participant info
     biz_result = await db.execute(
@@ -427,6 +334,7 @@ async def get_messages(
 
     return {
         "messages": messages,
+        "has_more": has_more,
         "my_type": my_type,
         "business_name": biz_info["business_name"] if biz_info else "Unknown",
         "business_logo": biz_info["logo_url"] if biz_info else None,
@@ -434,6 +342,51 @@ async def get_messages(
     }
 
 
+@router.get("/conversations/{conversation_id}/since")
+async def get_new_messages(
+    conversation_id: str,
+    after: str = Query(..., description="Id of the newest message the client already has"),
+    limit: int = Query(100, ge=1, le=200),
+    db: AsyncSession = Depends(get_db),
+    user: AuthenticatedUser = Depends(get_current_user),
+):
+    """
+    Delta fetch for polling clients: only messages newer than `after`, oldest
+    first. When `has_more` is true, call again with the last returned id.
+    """
+    conv_uuid, conv, my_type = await _authorize_conversation(db, user, conversation_id)
+
+    page = await message_page(db, conv_uuid, limit, after=_message_id(after))
+    if page is None:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    rows, has_more = page
+    await _mark_seen(db, conv_uuid, conv, my_type, rows)
+    return {
+        "messages": [_serialize_message(m, my_type) for m in rows],
+        "has_more": has_more,
+        "my_type": my_type,
+    }
+
+
+class MarkRead(BaseModel):
+    last_seen_id: str
+
+
+@router.post("/conversations/{conversation_id}/read")
+async def mark_conversation_read(
+    conversation_id: str,
+    data: MarkRead,
+    db: AsyncSession = Depends(get_db),
+    user: AuthenticatedUser = Depends(get_current_user),
+):
+    """Read receipt for messages received live (WebSocket): marks incoming messages up to `last_seen_id`."""
+    conv_uuid, conv, my_type = await _authorize_conversation(db, user, conversation_id)
+    marked = await mark_read(db, conv_uuid, my_type, up_to_id=_message_id(data.last_seen_id))
+    if marked:
+        await db.commit()
+    return {"marked": marked}
+
+
 @router.post("/conversations/{conversation_id}")
 async def send_message(
     conversation_id: str,
@@ -467,25 +420,12 @@ async def send_message(
 
     # Insert message
     body_text = data.body.strip() if data.body else ""
-    msg_result = await db.execute(
-        text("""
-            INSERT INTO messages (conversation_id, sender_type, sender_id, body, image_url)
-            VALUES (:cid, :stype, :sid, :body, :image_url)
-            RETURNING id, created_at
-        """),
-        {"cid": conv_uuid, "stype": sender_type, "sid": sender_id, "body": body_text, "image_url": data.image_url},
-    )
-    msg = msg_result.mappings().first()
-
-    # Update conversation last_message_at
-    await db.execute(
-        text("UPDATE conversations SET last_message_at = now() WHERE id = :cid"),
-        {"cid": conv_uuid},
-    )
+    # Insert message and update the conversation summary/unread counter
+    msg = await record_message(db, conv_uuid, sender_type, sender_id, body_text, data.image_url)
     await db.commit()
 
     # Notify the recipient via in-app, email and SMS ONLY IF they aren't already in the room
-    is_active = manager.active_count(conversation_id) >= 2
+    is_active = any(uid != str(user.id) for uid in room_manager.present_users(conversation_id))
     
     try:
         from services.sms import _send_sms
@@ -607,7 +547,7 @@ async def send_message(
         # Broadcast to all connected clients in the room (including other devices of the same user)
         # Duplicate detection on the sender's device is handled by msg.id checks on the frontend
         # Pass sender_user_id so specific sessions can correctly determine 'is_mine'
-        await manager.broadcast(conversation_id, ws_payload, sender_user_id=user.id)
+        await room_manager.broadcast(conversation_id, ws_payload, sender_user_id=user.id)
     except Exception as ws_err:
         error_logger.warning(f"WebSocket broadcast error (non-fatal): {ws_err}")
 
@@ -1,11 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response
 from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from services.database import get_db
+from services.database import get_db, AsyncSessionLocal
+from services.cache import public_cache
+from services.search import search_businesses
+from utils.pagination import COUNT_MODE_PATTERN
 from utils.business_slugs import canonical_business_slug, find_business_by_slug
+from datetime import datetime, timezone
+import hashlib
 import httpx
+import json
 
 router = APIRouter()
 
@@ -24,6 +30,19 @@ PUBLIC_BUSINESS_COLUMNS = """
 """
 
 
+# Public directory responses are identical for every visitor, so they're
+# served from services.cache and invalidated on business/deal/campaign edits.
+DIRECTORY_CACHE_TTL = 120
+PROFILE_CACHE_TTL = 300
+LEADERBOARD_CACHE_TTL = 300
+STALE_TTL = 600
+
+
+def _norm(value: Optional[str]) -> str:
+    """Normalise a case-insensitive (ILIKE) filter for use in a cache key."""
+    return (value or "").lower()
+
+
 def _serialize_business_row(row: dict):
     data = dict(row)
     if data.get("id") is not None:
@@ -39,93 +58,242 @@ async def get_businesses(
     q: Optional[str] = None,
     page: int = 1,
     limit: int = 20,
-    db: AsyncSession = Depends(get_db)
+    cursor: Optional[str] = None,
+    count: Optional[str] = Query(None, pattern=COUNT_MODE_PATTERN),
 ):
     # Clamp limit to prevent abuse
     limit = max(1, min(limit, 100))
-    offset = (max(1, page) - 1) * limit
-
-    # Construct safe query strings
-    base_where = "WHERE status = 'active' AND listing_visibility = 'public'"
-    query_params = {"limit": limit, "offset": offset}
-    
-    if q:
-        base_where += " AND (business_name ILIKE :q_pattern OR trade_category ILIKE :q_pattern OR suburb ILIKE :q_pattern)"
-        query_params["q_pattern"] = f"%{q}%"
-    if suburb:
-        base_where += " AND suburb ILIKE :suburb_pattern"
-        query_params["suburb_pattern"] = f"%{suburb}%"
-    if category:
-        base_where += " AND trade_category = :category"
-        query_params["category"] = category
-
-    query_str = text(f"""
-        SELECT {PUBLIC_BUSINESS_COLUMNS} 
-        FROM businesses 
-        {base_where}
-        ORDER BY listing_rank DESC, created_at DESC
-        LIMIT :limit OFFSET :offset
-    """)
-    
-    count_str = text(f"SELECT COUNT(*) FROM businesses {base_where}")
-    
-    result = await db.execute(query_str, query_params)
-    businesses = [_serialize_business_row(dict(row._mapping)) for row in result]
-    
-    count_result = await db.execute(count_str, query_params)
-    total = count_result.scalar() or 0
-    
-    return {
-        "businesses": businesses,
-        "total": total,
-        "page": page,
-        "limit": limit
-    }
 
-@router.get("/businesses/{slug}")
-async def get_business(slug: str, db: AsyncSession = Depends(get_db)):
-    business = await find_business_by_slug(db, PUBLIC_BUSINESS_COLUMNS, slug)
-    
-    if not business:
-        raise HTTPException(status_code=404, detail="Business not found")
+    async def load():
+        async with AsyncSessionLocal() as db:
+            data = await search_businesses(
+                db, PUBLIC_BUSINESS_COLUMNS,
+                q=q, suburb=suburb, category=category,
+                limit=limit, cursor=cursor, page=page, count=count,
+            )
+        data["businesses"] = [_serialize_business_row(row) for row in data["businesses"]]
+        data["page"] = page
+        data["limit"] = limit
+        return data
 
-    data = _serialize_business_row(dict(business))
-    bid = data.get("id")
+    key = f"businesses:{_norm(q).strip()}:{_norm(suburb)}:{category or ''}:{page}:{limit}:{cursor or ''}:{count or ''}"
+    return await public_cache.get_or_load(key, load, ttl=DIRECTORY_CACHE_TTL, stale_ttl=STALE_TTL, tags=["businesses"])
 
-    # Trusted By counts
-    ref_count = await db.execute(
-        text("SELECT COUNT(*) FROM referral_links WHERE business_id = :bid"),
-        {"bid": bid}
-    )
-    biz_rec_count = await db.execute(
-        text("SELECT COUNT(*) FROM business_recommendations WHERE to_business_id = :bid"),
-        {"bid": bid}
-    )
-    # Businesses this business recommends
-    recommends_count = await db.execute(
-        text("SELECT COUNT(*) FROM business_recommendations WHERE from_business_id = :bid"),
-        {"bid": bid}
+
+@router.get("/businesses/{slug}")
+async def get_business(slug: str):
+    async def load():
+        async with AsyncSessionLocal() as db:
+            return await _load_business_profile(db, slug)
+
+    data = await public_cache.get_or_load(
+        f"business:{slug}", load,
+        ttl=PROFILE_CACHE_TTL, stale_ttl=STALE_TTL,
+        tags=lambda d: [f"business:{d['id']}"],
     )
-    data["trusted_by_referrers"] = ref_count.scalar() or 0
-    data["trusted_by_businesses"] = biz_rec_count.scalar() or 0
-    data["recommends_count"] = recommends_count.scalar() or 0
+    if data is None:
+        raise HTTPException(status_code=404, detail="Business not found")
+    return data
 
-    # Get recommended businesses list
-    recs = await db.execute(
-        text("""
+
+# Per-business aggregates, each a scalar subquery so the whole profile page
+# is one round trip after the slug lookup. JSON sections come back as text.
+_PROFILE_SECTIONS = {
+    "trusted_by_referrers": "(SELECT COUNT(*) FROM referral_links WHERE business_id = :bid)",
+    "trusted_by_businesses": "(SELECT COUNT(*) FROM business_recommendations WHERE to_business_id = :bid)",
+    "recommends_count": "(SELECT COUNT(*) FROM business_recommendations WHERE from_business_id = :bid)",
+    "recommended_businesses": """COALESCE((
+        SELECT json_agg(x) FROM (
             SELECT b.business_name, b.slug, b.trade_category, b.logo_url
             FROM business_recommendations br
             JOIN businesses b ON b.id = br.to_business_id
             WHERE br.from_business_id = :bid
             ORDER BY br.created_at DESC LIMIT 6
-        """),
-        {"bid": bid}
-    )
-    data["recommended_businesses"] = [_serialize_business_row(dict(r)) for r in recs.mappings().all()]
+        ) x), '[]')""",
+}
 
+_FULL_PROFILE_SECTIONS = {
+    **_PROFILE_SECTIONS,
+    "deals": """COALESCE((
+        SELECT json_agg(x) FROM (
+            SELECT id, title, description, discount_text, terms, expires_at, created_at
+            FROM deals
+            WHERE business_id = :bid AND is_active = true
+              AND (expires_at IS NULL OR expires_at > now())
+            ORDER BY created_at DESC
+        ) x), '[]')""",
+    "reviews": """COALESCE((
+        SELECT json_agg(x) FROM (
+            SELECT rr.id, rr.rating, rr.comment, r.full_name as referrer_name, rr.created_at
+            FROM referrer_reviews rr
+            JOIN referrers r ON r.id = rr.referrer_id
+            WHERE rr.business_id = :bid
+            ORDER BY rr.created_at DESC
+            LIMIT 20
+        ) x), '[]')""",
+    "google_reviews": """COALESCE((
+        SELECT json_agg(x) FROM (
+            SELECT id, profile_name, rating, review_text, owner_answer, source, created_at
+            FROM business_reviews
+            WHERE business_id = :bid
+            ORDER BY rating DESC, created_at DESC
+            LIMIT 20
+        ) x), '[]')""",
+    "campaigns": """COALESCE((
+        SELECT json_agg(x) FROM (
+            SELECT id, title, description, campaign_type, bonus_amount_cents,
+                   multiplier, volume_threshold, promo_text, starts_at, ends_at
+            FROM campaigns
+            WHERE business_id = :bid AND is_active = true
+              AND starts_at <= now() AND ends_at > now()
+            ORDER BY created_at DESC
+        ) x), '[]')""",
+    # When the deals/campaigns above next change by time alone (epoch seconds)
+    "valid_until": """(
+        SELECT EXTRACT(EPOCH FROM MIN(t)) FROM (
+            SELECT expires_at AS t FROM deals
+            WHERE business_id = :bid AND is_active = true AND expires_at > now()
+            UNION ALL
+            SELECT starts_at FROM campaigns
+            WHERE business_id = :bid AND is_active = true AND starts_at > now()
+            UNION ALL
+            SELECT ends_at FROM campaigns
+            WHERE business_id = :bid AND is_active = true AND ends_at > now()
+        ) boundaries)""",
+}
+
+
+# Row formatting shared by the per-section endpoints and /full, so both return
+# the same shapes. /full's rows come from json_agg, with ISO timestamps.
+
+def _timestamp(value):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+    return str(value) if value else None
+
+
+def _deal_json(row) -> dict:
+    return {
+        "id": str(row["id"]),
+        "title": row["title"],
+        "description": row["description"],
+        "discount_text": row["discount_text"],
+        "terms": row["terms"],
+        "expires_at": _timestamp(row["expires_at"]),
+        "created_at": _timestamp(row["created_at"]),
+    }
+
+
+def _google_review_json(row) -> dict:
+    return {
+        "id": str(row["id"]),
+        "profile_name": row["profile_name"],
+        "rating": row["rating"],
+        "review_text": row["review_text"],
+        "owner_answer": row["owner_answer"],
+        "source": row["source"],
+        "created_at": _timestamp(row["created_at"]),
+    }
+
+
+def _referrer_review_json(row) -> dict:
+    return {
+        "id": str(row["id"]),
+        "rating": row["rating"],
+        "comment": row["comment"],
+        "referrer_name": row["referrer_name"],
+        "created_at": _timestamp(row["created_at"]),
+    }
+
+
+def _campaign_json(row) -> dict:
+    c = dict(row)
+    c["id"] = str(c["id"])
+    if c.get("slug"):
+        c["slug"] = canonical_business_slug(c["slug"])
+    for dt in ("starts_at", "ends_at"):
+        if c.get(dt):
+            c[dt] = _timestamp(c[dt])
+    if c.get("multiplier") is not None:
+        c["multiplier"] = float(c["multiplier"])
+    return c
+
+
+async def _load_profile_sections(db: AsyncSession, bid: str, sections: dict) -> dict:
+    select_sql = ",\n".join(f"{expr} AS {name}" for name, expr in sections.items())
+    result = await db.execute(text(f"SELECT {select_sql}"), {"bid": bid})
+    row = dict(result.mappings().first())
+    for name, value in row.items():
+        if isinstance(value, str):
+            row[name] = json.loads(value)
+    row["recommended_businesses"] = [_serialize_business_row(r) for r in row["recommended_businesses"]]
+    return row
+
+
+async def _load_business_profile(db: AsyncSession, slug: str, sections: dict = _PROFILE_SECTIONS):
+    business = await find_business_by_slug(db, PUBLIC_BUSINESS_COLUMNS, slug)
+
+    if not business:
+        return None
+
+    data = _serialize_business_row(dict(business))
+    data.update(await _load_profile_sections(db, data["id"], sections))
     return data
 
 
+def _etag_for(data) -> str:
+    body = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return '"' + hashlib.sha1(body.encode()).hexdigest() + '"'
+
+
+@router.get("/businesses/{slug}/full")
+async def get_business_full(slug: str, request: Request):
+    """
+    Everything the public business page needs in one call: profile, trust counts,
+    recommendations, deals, referrer + Google reviews and active campaigns.
+    Supports If-None-Match so the frontend can revalidate with a 304.
+    """
+    async def load():
+        async with AsyncSessionLocal() as db:
+            data = await _load_business_profile(db, slug, _FULL_PROFILE_SECTIONS)
+        if data is None:
+            return None
+        valid_until = data.pop("valid_until")
+        # Same shape as GET /businesses/{slug}, with the page's lists alongside
+        full = {
+            "profile": data,
+            "deals": [_deal_json(r) for r in data.pop("deals")],
+            "reviews": [_referrer_review_json(r) for r in data.pop("reviews")],
+            "google_reviews": [_google_review_json(r) for r in data.pop("google_reviews")],
+            "campaigns": [_campaign_json(r) for r in data.pop("campaigns")],
+        }
+        return {
+            "etag": _etag_for(full), "data": full,
+            "valid_until": float(valid_until) if valid_until is not None else None,
+        }
+
+    # Not cached past the next deal expiry or campaign start/end
+    cached = await public_cache.get_or_load(
+        f"business-full:{slug}", load,
+        ttl=PROFILE_CACHE_TTL, stale_ttl=STALE_TTL,
+        tags=lambda v: [f"business:{v['data']['profile']['id']}"],
+        until=lambda v: v["valid_until"],
+    )
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Business not found")
+
+    headers = {
+        "ETag": cached["etag"],
+        "Cache-Control": "public, max-age=60, stale-while-revalidate=300",
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    if cached["etag"] in (t.strip() for t in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=cached["data"], headers=headers)
+
+
 @router.get("/businesses/{slug}/deals")
 async def get_business_deals(slug: str, db: AsyncSession = Depends(get_db)):
     """Get active deals for a business (public endpoint)."""
@@ -144,18 +312,7 @@ async def get_business_deals(slug: str, db: AsyncSession = Depends(get_db)):
         """),
         {"bid": biz["id"]}
     )
-    deals = []
-    for row in result.mappings().all():
-        deals.append({
-            "id": str(row["id"]),
-            "title": row["title"],
-            "description": row["description"],
-            "discount_text": row["discount_text"],
-            "terms": row["terms"],
-            "expires_at": str(row["expires_at"]) if row["expires_at"] else None,
-            "created_at": str(row["created_at"])
-        })
-    return deals
+    return [_deal_json(row) for row in result.mappings().all()]
 
 
 @router.get("/businesses/{slug}/google-reviews")
@@ -175,18 +332,7 @@ async def get_business_google_reviews(slug: str, db: AsyncSession = Depends(get_
         """),
         {"bid": biz["id"]}
     )
-    reviews = []
-    for row in result.mappings().all():
-        reviews.append({
-            "id": str(row["id"]),
-            "profile_name": row["profile_name"],
-            "rating": row["rating"],
-            "review_text": row["review_text"],
-            "owner_answer": row["owner_answer"],
-            "source": row["source"],
-            "created_at": str(row["created_at"]) if row["created_at"] else None
-        })
-    return reviews
+    return [_google_review_json(row) for row in result.mappings().all()]
 
 
 @router.get("/businesses/{slug}/reviews")
@@ -208,16 +354,7 @@ async def get_business_reviews(slug: str, db: AsyncSession = Depends(get_db)):
         """),
         {"bid": biz["id"]}
     )
-    reviews = []
-    for row in result.mappings().all():
-        reviews.append({
-            "id": str(row["id"]),
-            "rating": row["rating"],
-            "comment": row["comment"],
-            "referrer_name": row["referrer_name"],
-            "created_at": str(row["created_at"])
-        })
-    return reviews
+    return [_referrer_review_json(row) for row in result.mappings().all()]
 
 
 @router.get("/businesses/{slug}/campaigns")
@@ -238,147 +375,149 @@ async def get_business_campaigns(slug: str, db: AsyncSession = Depends(get_db)):
         """),
         {"bid": biz["id"]}
     )
-    campaigns = []
-    for row in result.mappings().all():
-        c = {k: v for k, v in dict(row).items()}
-        c["id"] = str(c["id"])
-        if c.get("slug"):
-            c["slug"] = canonical_business_slug(c["slug"])
-        for dt in ("starts_at", "ends_at"):
-            if c.get(dt):
-                c[dt] = str(c[dt])
-        if c.get("multiplier") is not None:
-            c["multiplier"] = float(c["multiplier"])
-        campaigns.append(c)
-    return campaigns
+    return [_campaign_json(row) for row in result.mappings().all()]
 
 
 @router.get("/campaigns/hot")
-async def get_hot_campaigns(db: AsyncSession = Depends(get_db)):
+async def get_hot_campaigns():
     """Get all active campaigns across the platform (public endpoint for referrer dashboard)."""
-    result = await db.execute(
-        text("""
-            SELECT c.id, c.title, c.description, c.campaign_type,
-                   c.bonus_amount_cents, c.multiplier, c.volume_threshold,
-                   c.promo_text, c.starts_at, c.ends_at,
-                   b.business_name, b.slug, b.trade_category, b.suburb, b.logo_url
-            FROM campaigns c
-            JOIN businesses b ON b.id = c.business_id
-            WHERE c.is_active = true
-              AND c.starts_at <= now() AND c.ends_at > now()
-              AND b.status = 'active'
-              AND (b.listing_visibility = 'public' OR b.listing_visibility IS NULL)
-            ORDER BY c.bonus_amount_cents DESC, c.created_at DESC
-            LIMIT 20
-        """)
-    )
-    campaigns = []
-    for row in result.mappings().all():
-        c = {k: v for k, v in dict(row).items()}
-        c["id"] = str(c["id"])
-        for dt in ("starts_at", "ends_at"):
-            if c.get(dt):
-                c[dt] = str(c[dt])
-        if c.get("multiplier") is not None:
-            c["multiplier"] = float(c["multiplier"])
-        campaigns.append(c)
-    return campaigns
+    async def load():
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                text("""
+                    SELECT c.id, c.title, c.description, c.campaign_type,
+                           c.bonus_amount_cents, c.multiplier, c.volume_threshold,
+                           c.promo_text, c.starts_at, c.ends_at,
+                           b.business_name, b.slug, b.trade_category, b.suburb, b.logo_url
+                    FROM campaigns c
+                    JOIN businesses b ON b.id = c.business_id
+                    WHERE c.is_active = true
+                      AND c.starts_at <= now() AND c.ends_at > now()
+                      AND b.status = 'active'
+                      AND (b.listing_visibility = 'public' OR b.listing_visibility IS NULL)
+                    ORDER BY c.bonus_amount_cents DESC, c.created_at DESC
+                    LIMIT 20
+                """)
+            )
+            campaigns = []
+            for row in result.mappings().all():
+                c = {k: v for k, v in dict(row).items()}
+                c["id"] = str(c["id"])
+                for dt in ("starts_at", "ends_at"):
+                    if c.get(dt):
+                        c[dt] = str(c[dt])
+                if c.get("multiplier") is not None:
+                    c["multiplier"] = float(c["multiplier"])
+                campaigns.append(c)
+            return campaigns
+
+    return await public_cache.get_or_load("campaigns:hot", load, ttl=DIRECTORY_CACHE_TTL, stale_ttl=STALE_TTL, tags=["campaigns", "businesses"])
 
 
 @router.get("/discover/hot")
 async def hot_right_now(
     suburb: Optional[str] = None,
     state: Optional[str] = None,
-    db: AsyncSession = Depends(get_db)
 ):
     """Businesses with highest referral fees — 'Hot Right Now'. Local-first when suburb/state provided."""
-    result = await db.execute(
-        text("""
-            SELECT id, business_name, slug, trade_category, suburb, state,
-                   referral_fee_cents, logo_url, trust_score, is_verified,
-                   avg_response_minutes,
-                   CASE
-                       WHEN :suburb IS NOT NULL AND suburb ILIKE '%' || :suburb || '%' THEN 0
-                       WHEN :state IS NOT NULL AND state ILIKE '%' || :state || '%' THEN 1
-                       ELSE 2
-                   END AS locality_rank
-            FROM businesses
-            WHERE status = 'active'
-              AND (listing_visibility = 'public' OR listing_visibility IS NULL)
-              AND referral_fee_cents > 0
-            ORDER BY locality_rank ASC, referral_fee_cents DESC
-            LIMIT 8
-        """),
-        {"suburb": suburb, "state": state}
-    )
-    rows = []
-    for row in result.mappings().all():
-        d = _serialize_business_row(dict(row))
-        d.pop("locality_rank", None)
-        rows.append(d)
-    return rows
+    async def load():
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                text("""
+                    SELECT id, business_name, slug, trade_category, suburb, state,
+                           referral_fee_cents, logo_url, trust_score, is_verified,
+                           avg_response_minutes,
+                           CASE
+                               WHEN :suburb IS NOT NULL AND suburb ILIKE '%' || :suburb || '%' THEN 0
+                               WHEN :state IS NOT NULL AND state ILIKE '%' || :state || '%' THEN 1
+                               ELSE 2
+                           END AS locality_rank
+                    FROM businesses
+                    WHERE status = 'active'
+                      AND (listing_visibility = 'public' OR listing_visibility IS NULL)
+                      AND referral_fee_cents > 0
+                    ORDER BY locality_rank ASC, referral_fee_cents DESC
+                    LIMIT 8
+                """),
+                {"suburb": suburb, "state": state}
+            )
+            rows = []
+            for row in result.mappings().all():
+                d = _serialize_business_row(dict(row))
+                d.pop("locality_rank", None)
+                rows.append(d)
+            return rows
+
+    return await public_cache.get_or_load(f"discover:hot:{_norm(suburb)}:{_norm(state)}", load, ttl=DIRECTORY_CACHE_TTL, stale_ttl=STALE_TTL, tags=["businesses"])
 
 
 @router.get("/discover/new")
 async def new_on_traderefer(
     suburb: Optional[str] = None,
     state: Optional[str] = None,
-    db: AsyncSession = Depends(get_db)
 ):
     """Recently listed businesses — 'New on TradeRefer'. Local-first when suburb/state provided."""
-    result = await db.execute(
-        text("""
-            SELECT id, business_name, slug, trade_category, suburb, state,
-                   referral_fee_cents, logo_url, trust_score, is_verified,
-                   created_at,
-                   CASE
-                       WHEN :suburb IS NOT NULL AND suburb ILIKE '%' || :suburb || '%' THEN 0
-                       WHEN :state IS NOT NULL AND state ILIKE '%' || :state || '%' THEN 1
-                       ELSE 2
-                   END AS locality_rank
-            FROM businesses
-            WHERE status = 'active'
-              AND (listing_visibility = 'public' OR listing_visibility IS NULL)
-            ORDER BY locality_rank ASC, created_at DESC
-            LIMIT 8
-        """),
-        {"suburb": suburb, "state": state}
-    )
-    rows = []
-    for row in result.mappings().all():
-        d = _serialize_business_row(dict(row))
-        if d.get("created_at"):
-            d["created_at"] = str(d["created_at"])
-        d.pop("locality_rank", None)
-        rows.append(d)
-    return rows
+    async def load():
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                text("""
+                    SELECT id, business_name, slug, trade_category, suburb, state,
+                           referral_fee_cents, logo_url, trust_score, is_verified,
+                           created_at,
+                           CASE
+                               WHEN :suburb IS NOT NULL AND suburb ILIKE '%' || :suburb || '%' THEN 0
+                               WHEN :state IS NOT NULL AND state ILIKE '%' || :state || '%' THEN 1
+                               ELSE 2
+                           END AS locality_rank
+                    FROM businesses
+                    WHERE status = 'active'
+                      AND (listing_visibility = 'public' OR listing_visibility IS NULL)
+                    ORDER BY locality_rank ASC, created_at DESC
+                    LIMIT 8
+                """),
+                {"suburb": suburb, "state": state}
+            )
+            rows = []
+            for row in result.mappings().all():
+                d = _serialize_business_row(dict(row))
+                if d.get("created_at"):
+                    d["created_at"] = str(d["created_at"])
+                d.pop("locality_rank", None)
+                rows.append(d)
+            return rows
+
+    return await public_cache.get_or_load(f"discover:new:{_norm(suburb)}:{_norm(state)}", load, ttl=DIRECTORY_CACHE_TTL, stale_ttl=STALE_TTL, tags=["businesses"])
 
 
 @router.get("/discover/top-earners")
-async def top_earners(db: AsyncSession = Depends(get_db)):
+async def top_earners():
     """Anonymous leaderboard — top referrer earnings this month."""
-    result = await db.execute(
-        text("""
-            SELECT r.tier,
-                   COALESCE(SUM(e.gross_cents), 0) as month_earnings_cents,
-                   COUNT(DISTINCT e.lead_id) as leads_this_month
-            FROM referrer_earnings e
-            JOIN referrers r ON r.id = e.referrer_id
-            WHERE e.created_at >= date_trunc('month', now())
-            GROUP BY r.id, r.tier
-            ORDER BY month_earnings_cents DESC
-            LIMIT 5
-        """)
-    )
-    leaderboard = []
-    for i, row in enumerate(result.mappings().all()):
-        leaderboard.append({
-            "rank": i + 1,
-            "tier": row["tier"],
-            "month_earnings_cents": row["month_earnings_cents"],
-            "leads_this_month": row["leads_this_month"],
-        })
-    return leaderboard
+    async def load():
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                text("""
+                    SELECT r.tier,
+                           COALESCE(SUM(e.gross_cents), 0) as month_earnings_cents,
+                           COUNT(DISTINCT e.lead_id) as leads_this_month
+                    FROM referrer_earnings e
+                    JOIN referrers r ON r.id = e.referrer_id
+                    WHERE e.created_at >= date_trunc('month', now())
+                    GROUP BY r.id, r.tier
+                    ORDER BY month_earnings_cents DESC
+                    LIMIT 5
+                """)
+            )
+            leaderboard = []
+            for i, row in enumerate(result.mappings().all()):
+                leaderboard.append({
+                    "rank": i + 1,
+                    "tier": row["tier"],
+                    "month_earnings_cents": row["month_earnings_cents"],
+                    "leads_this_month": row["leads_this_month"],
+                })
+            return leaderboard
+
+    return await public_cache.get_or_load("discover:top-earners", load, ttl=LEADERBOARD_CACHE_TTL, stale_ttl=STALE_TTL, tags=())
 
 
 @router.get("/referrer/{referrer_id}/team")
@@ -5,21 +5,28 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from services.database import get_db
 from services.auth import get_current_user, AuthenticatedUser
+from services.identity import invalidate_identity
+from services.rate_limit import RateLimit, client_ip
+from services.kv_store import ExpiringStore, verify_code
 from services.stripe_service import StripeService
 from services.email import send_referrer_welcome, send_referrer_payout_processed, send_business_new_review, send_referrer_review_request
 import uuid
 import os
 import random
 import asyncio
-from datetime import datetime, timedelta
 from utils.logging_config import error_logger, general_logger
 from utils.business_slugs import canonical_business_slug, find_business_by_slug
 
 router = APIRouter()
 
-# In-memory OTP store (keyed by phone number). Fine for single-instance Railway deployment.
-# Format: { "+61412345678": {"code": "123456", "expires_at": datetime} }
-_otp_store: dict = {}
+# OTP codes keyed by phone number, shared across workers: { "+61412345678": {"code": "123456"} }
+_otp_store = ExpiringStore("otp")
+OTP_TTL = 600
+
+# SMS pumping and code guessing: per number, per IP, and attempts per code
+OTP_SEND_LIMIT = RateLimit("otp-send", 3, 600, "Too many codes requested for this number. Please wait before trying again.")
+OTP_SEND_IP_LIMIT = RateLimit("otp-send-ip", 10, 3600, "Too many codes requested. Please try again later.")
+OTP_VERIFY_LIMIT = RateLimit("otp-verify", 5, 600, "Too many attempts. Please wait before trying again.")
 
 class ReferrerOnboarding(BaseModel):
     full_name: Optional[str] = None
@@ -48,13 +55,14 @@ class ReviewBusiness(BaseModel):
     rating: int  # 1-5
     comment: Optional[str] = None
 
-@router.post("/otp/send")
+@router.post("/otp/send", dependencies=[Depends(OTP_SEND_IP_LIMIT.depends(client_ip))])
 async def send_otp(data: OTPSendRequest):
     """Send a 6-digit OTP to the given phone number via Twilio SMS."""
     from services.sms import _send_sms
     phone = data.phone.strip()
+    await OTP_SEND_LIMIT.enforce(phone)
     code = str(random.randint(100000, 999999))
-    _otp_store[phone] = {"code": code, "expires_at": datetime.utcnow() + timedelta(minutes=10)}
+    await _otp_store.put(phone, {"code": code}, OTP_TTL)
     try:
         await _send_sms(phone, f"Your TradeRefer verification code is: {code}\nExpires in 10 minutes.", raise_on_error=True)
         return {"sent": True}
@@ -67,15 +75,14 @@ async def send_otp(data: OTPSendRequest):
 async def verify_otp(data: OTPVerifyRequest):
     """Verify a previously sent OTP code."""
     phone = data.phone.strip()
-    entry = _otp_store.get(phone)
-    if not entry:
-        raise HTTPException(status_code=400, detail="No OTP found for this number. Please request a new code.")
-    if datetime.utcnow() > entry["expires_at"]:
-        _otp_store.pop(phone, None)
-        raise HTTPException(status_code=400, detail="OTP has expired. Please request a new code.")
-    if entry["code"] != data.code.strip():
+    await OTP_VERIFY_LIMIT.enforce(phone)
+    outcome, _ = await verify_code(_otp_store, phone, data.code)
+    if outcome == "missing":
+        raise HTTPException(status_code=400, detail="No OTP found for this number, or it has expired. Please request a new code.")
+    if outcome == "locked":
+        raise HTTPException(status_code=400, detail="Too many incorrect attempts. Please request a new code.")
+    if outcome == "wrong":
         raise HTTPException(status_code=400, detail="Incorrect code. Please try again.")
-    _otp_store.pop(phone, None)
     return {"verified": True}
 
 
@@ -136,6 +143,7 @@ async def onboarding(
             "stripe_account_id": f"acct_mock_ref_{user.id[:8]}"
         })
         await db.commit()
+        invalidate_identity(user.id)
         row = result.fetchone()
         referrer_id = str(row[0])
 
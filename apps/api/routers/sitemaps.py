@@ -1,34 +1,55 @@
+"""
+Sitemaps for traderefer.au.
+
+Files are generated off the request path: each family streams its rows from a
+server-side cursor straight into gzip'd chunks of at most 50,000 URLs, stored
+in `sitemap_files` (neon/migrations/022_sitemap_files.sql) together with the
+newest lastmod of their URLs. Requests only serve those stored bytes with
+ETag/304, so a crawler burst never touches the businesses table.
+
+Regenerate with `python scripts/generate_sitemaps.py` (cron) or
+POST /cron/sitemaps; a family that is missing or older than SITEMAP_MAX_AGE is
+also rebuilt once in the background on first request.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import io
+import os
 import re
-from fastapi import APIRouter, Depends
+import time
+from datetime import date, datetime, timezone
+from email.utils import format_datetime
+from typing import AsyncIterator, Dict, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from services.database import get_db
+from services.database import AsyncSessionLocal
+from utils.logging_config import error_logger, general_logger
 
 router = APIRouter()
 
 BASE_URL = "https://traderefer.au"
-CHUNK_SIZE = 5000
+MAX_URLS_PER_FILE = 50_000
+MAX_BYTES_PER_FILE = 50 * 1024 * 1024  # protocol limit, uncompressed
+SITEMAP_MAX_AGE = int(os.getenv("SITEMAP_MAX_AGE", "86400"))
+FILE_CACHE_TTL = 300  # seconds a stored file is served from memory
+STREAM_BATCH = 2000
 
 # ── Helpers ──────────────────────────────────────────────────────────────
 
 def _slug(text_: str) -> str:
     return re.sub(r"[^a-z0-9]+", "-", text_.lower()).strip("-")
 
-def _xml_response(body: str) -> Response:
-    return Response(
-        content=body,
-        media_type="application/xml",
-        headers={"Cache-Control": "public, max-age=86400, stale-while-revalidate=3600"},
-    )
-
-def _urlset(urls: list[str]) -> str:
-    inner = "\n".join(urls)
-    return f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n{inner}\n</urlset>'
-
 def _url(loc: str, lastmod: str, freq: str, priority: str) -> str:
     return f"  <url><loc>{loc}</loc><lastmod>{lastmod}</lastmod><changefreq>{freq}</changefreq><priority>{priority}</priority></url>"
 
+def _sub_segment(sub: str, addr: Optional[str]) -> str:
+    pc = _extract_postcode(addr)
+    return f"{sub}-{pc}" if pc else sub
+
 def _extract_postcode(address: str | None) -> str | None:
     if not address:
         return None
@@ -120,17 +141,30 @@ JOB_TYPES: dict[str, list[str]] = {
 }
 
 
-# ── Endpoints ─────────────────────────────────────────────────────────────
+# ── URL families ──────────────────────────────────────────────────────────
+#
+# Each family is an async generator of (<url> line, lastmod) pairs in a stable
+# order, so chunk N keeps holding the same URLs between rebuilds.
 
-@router.get("/sitemaps/general")
-async def sitemap_general(db: AsyncSession = Depends(get_db)):
-    """Static pages, states, cities, near-me, trades/job hub pages."""
-    from datetime import date
-    today = date.today().isoformat()
+_ACTIVE_LOCATED = """
+    status='active'
+      AND state IS NOT NULL AND state != ''
+      AND city IS NOT NULL AND city != ''
+"""
+
+async def _stream(db: AsyncSession, sql: str) -> AsyncIterator[dict]:
+    result = await db.stream(text(sql).execution_options(yield_per=STREAM_BATCH))
+    async for row in result.mappings():
+        yield row
 
-    urls: list[str] = []
 
-    # Static pages
+async def _general_urls(db: AsyncSession):
+    """Static pages, states, cities, near-me, trades/job hub pages."""
+    site = await db.execute(text("""
+        SELECT MAX(COALESCE(updated_at, created_at))::date FROM businesses WHERE status='active'
+    """))
+    site_lastmod = str(site.scalar() or datetime.now(timezone.utc).date())
+
     statics = [
         (BASE_URL, "1.0", "daily"),
         (f"{BASE_URL}/businesses", "0.9", "daily"),
@@ -143,97 +177,80 @@ async def sitemap_general(db: AsyncSession = Depends(get_db)):
         (f"{BASE_URL}/cookies", "0.2", "monthly"),
     ]
     for loc, pri, freq in statics:
-        urls.append(_url(loc, today, freq, pri))
+        yield _url(loc, site_lastmod, freq, pri), site_lastmod
 
     # State hubs
-    state_rows = await db.execute(text("""
-        SELECT DISTINCT LOWER(state) as s FROM businesses
+    async for r in _stream(db, """
+        SELECT LOWER(state) as s, MAX(COALESCE(updated_at, created_at))::date AS lastmod
+        FROM businesses
         WHERE status='active' AND state IS NOT NULL AND state != ''
-    """))
-    for r in state_rows.mappings():
-        urls.append(_url(f"{BASE_URL}/local/{r['s']}", today, "weekly", "0.9"))
+        GROUP BY 1 ORDER BY 1
+    """):
+        lm = str(r['lastmod'])
+        yield _url(f"{BASE_URL}/local/{r['s']}", lm, "weekly", "0.9"), lm
 
     # City hubs
-    city_rows = await db.execute(text("""
-        SELECT DISTINCT LOWER(state) as s, LOWER(REPLACE(city,' ','-')) as c
-        FROM businesses WHERE status='active'
-          AND state IS NOT NULL AND state != ''
-          AND city IS NOT NULL AND city != ''
-    """))
-    for r in city_rows.mappings():
-        urls.append(_url(f"{BASE_URL}/local/{r['s']}/{r['c']}", today, "weekly", "0.85"))
-
-    # Near-me pages
-    for slug in NEAR_ME_SLUGS:
-        urls.append(_url(f"{BASE_URL}/{slug}", today, "weekly", "0.95"))
-
-    # Find-a-trade pages
-    for slug in FIND_TRADE_PAGES:
-        urls.append(_url(f"{BASE_URL}/{slug}", today, "weekly", "0.95"))
-
-    # Local trade editorial pages
+    async for r in _stream(db, f"""
+        SELECT LOWER(state) as s, LOWER(REPLACE(city,' ','-')) as c,
+               MAX(COALESCE(updated_at, created_at))::date AS lastmod
+        FROM businesses WHERE {_ACTIVE_LOCATED}
+        GROUP BY 1, 2 ORDER BY 1, 2
+    """):
+        lm = str(r['lastmod'])
+        yield _url(f"{BASE_URL}/local/{r['s']}/{r['c']}", lm, "weekly", "0.85"), lm
+
+    # Near-me, find-a-trade and local editorial pages
+    for slug in NEAR_ME_SLUGS + FIND_TRADE_PAGES:
+        yield _url(f"{BASE_URL}/{slug}", site_lastmod, "weekly", "0.95"), site_lastmod
     for slug in LOCAL_TRADE_PAGES:
-        urls.append(_url(f"{BASE_URL}/{slug}", today, "weekly", "0.9"))
+        yield _url(f"{BASE_URL}/{slug}", site_lastmod, "weekly", "0.9"), site_lastmod
 
-    # Trade hub pages (/trades/[job-slug])
-    for jobs in JOB_TYPES.values():
+    # Trade hub pages (/trades/[job-slug]) change when their trade's listings do
+    trade_rows = await db.execute(text("""
+        SELECT trade_category, MAX(COALESCE(updated_at, created_at))::date AS lastmod
+        FROM businesses WHERE status='active'
+        GROUP BY trade_category
+    """))
+    trade_lastmod = {r["trade_category"]: str(r["lastmod"]) for r in trade_rows.mappings()}
+    for trade, jobs in JOB_TYPES.items():
+        lm = trade_lastmod.get(trade, site_lastmod)
         for job in jobs:
-            urls.append(_url(f"{BASE_URL}/trades/{_slug(job)}", today, "monthly", "0.8"))
-
-    return _xml_response(_urlset(urls))
+            yield _url(f"{BASE_URL}/trades/{_slug(job)}", lm, "monthly", "0.8"), lm
 
 
-@router.get("/sitemaps/profiles")
-async def sitemap_profiles(db: AsyncSession = Depends(get_db)):
+async def _profile_urls(db: AsyncSession):
     """All active business profile pages /b/[slug]."""
-    result = await db.execute(text("""
-        SELECT slug,
-               COALESCE(updated_at, created_at)::date AS lastmod
+    async for r in _stream(db, """
+        SELECT slug, COALESCE(updated_at, created_at)::date AS lastmod
         FROM businesses
         WHERE status='active' AND slug IS NOT NULL AND slug != ''
-        ORDER BY created_at ASC
-    """))
-    rows = result.mappings().all()
-    urls = [
-        _url(f"{BASE_URL}/b/{r['slug']}", str(r['lastmod']), "weekly", "0.5")
-        for r in rows
-    ]
-    return _xml_response(_urlset(urls))
+        ORDER BY created_at ASC, id ASC
+    """):
+        lm = str(r['lastmod'])
+        yield _url(f"{BASE_URL}/b/{r['slug']}", lm, "weekly", "0.5"), lm
 
 
-@router.get("/sitemaps/suburbs")
-async def sitemap_suburbs(db: AsyncSession = Depends(get_db)):
+async def _suburb_urls(db: AsyncSession):
     """All suburb-level hub pages /local/[state]/[city]/[suburb-postcode]."""
-    from datetime import date
-    today = date.today().isoformat()
-    result = await db.execute(text("""
-        SELECT DISTINCT
-               LOWER(state) as s,
+    async for r in _stream(db, f"""
+        SELECT LOWER(state) as s,
                LOWER(REPLACE(city,' ','-')) as c,
                LOWER(REPLACE(suburb,' ','-')) as sub,
-               MAX(address) as addr
+               MAX(address) as addr,
+               MAX(COALESCE(updated_at, created_at))::date AS lastmod
         FROM businesses
-        WHERE status='active'
-          AND state IS NOT NULL AND state != ''
-          AND city IS NOT NULL AND city != ''
+        WHERE {_ACTIVE_LOCATED}
           AND suburb IS NOT NULL AND suburb != ''
-        GROUP BY LOWER(state), LOWER(REPLACE(city,' ','-')), LOWER(REPLACE(suburb,' ','-'))
-    """))
-    rows = result.mappings().all()
-    urls = []
-    for r in rows:
-        pc = _extract_postcode(r['addr'])
-        sub = f"{r['sub']}-{pc}" if pc else r['sub']
-        urls.append(_url(f"{BASE_URL}/local/{r['s']}/{r['c']}/{sub}", today, "weekly", "0.75"))
-    return _xml_response(_urlset(urls))
+        GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+    """):
+        lm = str(r['lastmod'])
+        sub = _sub_segment(r['sub'], r['addr'])
+        yield _url(f"{BASE_URL}/local/{r['s']}/{r['c']}/{sub}", lm, "weekly", "0.75"), lm
 
 
-@router.get("/sitemaps/trades")
-async def sitemap_trades(db: AsyncSession = Depends(get_db)):
+async def _trade_urls(db: AsyncSession):
     """All suburb+trade landing pages /local/[state]/[city]/[suburb]/[trade]."""
-    from datetime import date
-    today = date.today().isoformat()
-    result = await db.execute(text("""
+    async for r in _stream(db, f"""
         SELECT LOWER(state) as s,
                LOWER(REPLACE(city,' ','-')) as c,
                LOWER(REPLACE(suburb,' ','-')) as sub,
@@ -241,34 +258,24 @@ async def sitemap_trades(db: AsyncSession = Depends(get_db)):
                MAX(COALESCE(updated_at, created_at))::date AS lastmod,
                MAX(address) as addr
         FROM businesses
-        WHERE status='active'
-          AND state IS NOT NULL AND state != ''
-          AND city IS NOT NULL AND city != ''
+        WHERE {_ACTIVE_LOCATED}
           AND suburb IS NOT NULL AND suburb != ''
           AND trade_category IS NOT NULL AND trade_category != ''
-        GROUP BY LOWER(state), LOWER(REPLACE(city,' ','-')), LOWER(REPLACE(suburb,' ','-')), trade_category
-    """))
-    rows = result.mappings().all()
-    urls = []
-    for r in rows:
-        pc = _extract_postcode(r['addr'])
-        sub = f"{r['sub']}-{pc}" if pc else r['sub']
+        GROUP BY 1, 2, 3, 4 ORDER BY 1, 2, 3, 4
+    """):
+        lm = str(r['lastmod'])
+        sub = _sub_segment(r['sub'], r['addr'])
         trade = _slug(r['trade_category'])
-        lm = str(r['lastmod']) if r['lastmod'] else today
-        urls.append(_url(f"{BASE_URL}/local/{r['s']}/{r['c']}/{sub}/{trade}", lm, "weekly", "0.7"))
-    return _xml_response(_urlset(urls))
+        yield _url(f"{BASE_URL}/local/{r['s']}/{r['c']}/{sub}/{trade}", lm, "weekly", "0.7"), lm
 
 
-@router.get("/sitemaps/top")
-async def sitemap_top(db: AsyncSession = Depends(get_db)):
+async def _top_urls(db: AsyncSession):
     """All /top/[trade]/[state]/[city] pages."""
-    from datetime import date
-    today = date.today().isoformat()
-    result = await db.execute(text("""
-        SELECT DISTINCT
-               trade_category,
+    async for r in _stream(db, """
+        SELECT trade_category,
                LOWER(state) as s,
-               LOWER(REPLACE(city,' ','-')) as c
+               LOWER(REPLACE(city,' ','-')) as c,
+               MAX(COALESCE(updated_at, created_at))::date AS lastmod
         FROM businesses
         WHERE status='active'
           AND trade_category IS NOT NULL
@@ -276,47 +283,272 @@ async def sitemap_top(db: AsyncSession = Depends(get_db)):
           AND city IS NOT NULL
           AND avg_rating > 0
           AND total_reviews > 0
-        ORDER BY trade_category, s, c
-    """))
-    rows = result.mappings().all()
-    urls = []
-    for r in rows:
+        GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+    """):
+        lm = str(r['lastmod'])
         trade = _slug(r['trade_category'])
-        urls.append(_url(f"{BASE_URL}/top/{trade}/{r['s']}/{r['c']}", today, "weekly", "0.8"))
-    return _xml_response(_urlset(urls))
-
+        yield _url(f"{BASE_URL}/top/{trade}/{r['s']}/{r['c']}", lm, "weekly", "0.8"), lm
 
-@router.get("/sitemaps/jobs/{chunk}")
-async def sitemap_jobs_chunk(chunk: int, db: AsyncSession = Depends(get_db)):
-    """Chunked job-type URL sitemaps (reserved for future crawl-budget expansion)."""
-    from datetime import date
-    today = date.today().isoformat()
-    if chunk < 0:
-        return Response("Not Found", status_code=404)
 
-    result = await db.execute(text("""
-        SELECT DISTINCT
-               LOWER(state) as s,
+async def _job_urls(db: AsyncSession):
+    """Job-type URLs (reserved for future crawl-budget expansion; disallowed in robots.txt)."""
+    async for r in _stream(db, f"""
+        SELECT LOWER(state) as s,
                LOWER(REPLACE(city,' ','-')) as c,
                LOWER(REPLACE(suburb,' ','-')) as sub,
-               trade_category
+               trade_category,
+               MAX(COALESCE(updated_at, created_at))::date AS lastmod
         FROM businesses
-        WHERE status='active'
-          AND state IS NOT NULL AND state != ''
-          AND city IS NOT NULL AND city != ''
+        WHERE {_ACTIVE_LOCATED}
           AND suburb IS NOT NULL AND suburb != ''
           AND trade_category IS NOT NULL AND trade_category != ''
-    """))
-    rows = result.mappings().all()
-
-    all_urls: list[str] = []
-    for r in rows:
+        GROUP BY 1, 2, 3, 4 ORDER BY 1, 2, 3, 4
+    """):
+        lm = str(r['lastmod'])
         trade_slug = _slug(r['trade_category'])
         for job in JOB_TYPES.get(r['trade_category'], []):
-            all_urls.append(
-                _url(f"{BASE_URL}/local/{r['s']}/{r['c']}/{r['sub']}/{trade_slug}/{_slug(job)}",
-                     today, "monthly", "0.65")
-            )
+            loc = f"{BASE_URL}/local/{r['s']}/{r['c']}/{r['sub']}/{trade_slug}/{_slug(job)}"
+            yield _url(loc, lm, "monthly", "0.65"), lm
+
+
+SITEMAP_FAMILIES = {
+    "general": _general_urls,
+    "profiles": _profile_urls,
+    "suburbs": _suburb_urls,
+    "trades": _trade_urls,
+    "top": _top_urls,
+    "jobs": _job_urls,
+}
+# Families listed in the sitemap index (jobs stays out while robots.txt disallows it)
+INDEXED_FAMILIES = ("general", "profiles", "suburbs", "trades", "top")
+
+
+# ── Generation ────────────────────────────────────────────────────────────
+
+_URLSET_OPEN = b'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+_URLSET_CLOSE = b'</urlset>'
+
+
+class _ChunkWriter:
+    """One gzip'd <urlset> file, compressed as URLs arrive."""
+
+    def __init__(self):
+        self._buf = io.BytesIO()
+        # mtime=0 keeps the bytes (and so the ETag) identical for identical content
+        self._gz = gzip.GzipFile(fileobj=self._buf, mode="wb", mtime=0)
+        self._gz.write(_URLSET_OPEN)
+        self.size = len(_URLSET_OPEN) + len(_URLSET_CLOSE)
+        self.count = 0
+        self.lastmod: Optional[str] = None
+
+    def fits(self, line: bytes) -> bool:
+        return self.count < MAX_URLS_PER_FILE and self.size + len(line) <= MAX_BYTES_PER_FILE
+
+    def add(self, line: bytes, lastmod: str) -> None:
+        self._gz.write(line)
+        self.size += len(line)
+        self.count += 1
+        if self.lastmod is None or lastmod > self.lastmod:
+            self.lastmod = lastmod
+
+    def finish(self) -> bytes:
+        self._gz.write(_URLSET_CLOSE)
+        self._gz.close()
+        return self._buf.getvalue()
+
+
+async def _store_chunk(db: AsyncSession, family: str, chunk: int, writer: _ChunkWriter) -> None:
+    body = writer.finish()
+    await db.execute(text("""
+        INSERT INTO sitemap_files (family, chunk, body_gz, url_count, lastmod, etag, generated_at)
+        VALUES (:family, :chunk, :body, :count, :lastmod, :etag, NOW())
+        ON CONFLICT (family, chunk) DO UPDATE SET
+            body_gz = EXCLUDED.body_gz, url_count = EXCLUDED.url_count,
+            lastmod = EXCLUDED.lastmod, etag = EXCLUDED.etag, generated_at = NOW()
+    """), {
+        "family": family, "chunk": chunk, "body": body, "count": writer.count,
+        "lastmod": date.fromisoformat(writer.lastmod) if writer.lastmod else None, "etag": f'"{hashlib.sha1(body).hexdigest()}"',
+    })
+    await db.commit()
+
+
+async def build_family(family: str) -> int:
+    """Regenerate every chunk of `family`. Returns the number of files written."""
+    produce = SITEMAP_FAMILIES[family]
+    started = time.perf_counter()
+    chunks = 0
+    urls = 0
+    writer = _ChunkWriter()
+    async with AsyncSessionLocal() as read_db, AsyncSessionLocal() as write_db:
+        async for line, lastmod in produce(read_db):
+            data = (line + "\n").encode()
+            if not writer.fits(data):
+                await _store_chunk(write_db, family, chunks, writer)
+                chunks += 1
+                writer = _ChunkWriter()
+            writer.add(data, lastmod)
+            urls += 1
+        if writer.count or chunks == 0:
+            await _store_chunk(write_db, family, chunks, writer)
+            chunks += 1
+        await write_db.execute(
+            text("DELETE FROM sitemap_files WHERE family = :family AND chunk >= :chunks"),
+            {"family": family, "chunks": chunks},
+        )
+        await write_db.commit()
+
+    for key in [k for k in _file_cache if k[0] in (family, "")]:
+        _file_cache.pop(key, None)
+    general_logger.info(
+        f"Sitemap {family}: {urls} URLs in {chunks} file(s), {time.perf_counter() - started:.1f}s"
+    )
+    return chunks
+
+
+async def build_all() -> Dict[str, int]:
+    """Regenerate every family (cron entry point)."""
+    return {family: await build_family(family) for family in SITEMAP_FAMILIES}
+
+
+_builds: Dict[str, asyncio.Task] = {}
+
+
+def _start_build(family: str) -> asyncio.Task:
+    """Single-flight rebuild of one family in this process."""
+    task = _builds.get(family)
+    if task is None or task.done():
+        task = asyncio.create_task(build_family(family))
+        _builds[family] = task
+        task.add_done_callback(_log_build_failure)
+    return task
+
+
+def _log_build_failure(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        error_logger.error(f"Sitemap build failed: {task.exception()}")
+
+
+# ── Serving ───────────────────────────────────────────────────────────────
+
+# (family, chunk) -> (expires_at, file row or None); ("", -1) holds the index
+_file_cache: Dict[Tuple[str, int], Tuple[float, Optional[dict]]] = {}
+
+
+async def _load_file(family: str, chunk: int) -> Optional[dict]:
+    key = (family, chunk)
+    cached = _file_cache.get(key)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(text("""
+            SELECT body_gz, etag, lastmod, generated_at
+            FROM sitemap_files WHERE family = :family AND chunk = :chunk
+        """), {"family": family, "chunk": chunk})
+        row = result.mappings().first()
+    data = dict(row) if row else None
+    _file_cache[key] = (time.monotonic() + FILE_CACHE_TTL, data)
+    return data
+
+
+async def _get_file(family: str, chunk: int) -> Optional[dict]:
+    data = await _load_file(family, chunk)
+    if data is None and chunk == 0:
+        # Never generated: build it now (concurrent crawlers share the build)
+        await asyncio.shield(_start_build(family))
+        data = await _load_file(family, chunk)
+    elif data is not None:
+        age = datetime.now(timezone.utc) - data["generated_at"]
+        if age.total_seconds() > SITEMAP_MAX_AGE:
+            _start_build(family)
+    return data
+
+
+def _http_date(day) -> str:
+    return format_datetime(datetime(day.year, day.month, day.day, tzinfo=timezone.utc), usegmt=True)
+
+
+def _xml_response(request: Request, body_gz: bytes, etag: str, lastmod=None) -> Response:
+    gzipped = "gzip" in request.headers.get("accept-encoding", "")
+    # The stored ETag is the gzip body's; the decompressed body is another representation
+    if not gzipped:
+        etag = etag[:-1] + '-id"'
+    headers = {
+        "Cache-Control": "public, max-age=86400, stale-while-revalidate=3600",
+        "ETag": etag,
+        "Vary": "Accept-Encoding",
+    }
+    if lastmod:
+        headers["Last-Modified"] = _http_date(lastmod)
+    if etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+        return Response(status_code=304, headers=headers)
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=body_gz, media_type="application/xml", headers=headers)
+    return Response(content=gzip.decompress(body_gz), media_type="application/xml", headers=headers)
+
+
+async def _sitemap_index() -> Optional[dict]:
+    key = ("", -1)
+    cached = _file_cache.get(key)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(text("""
+            SELECT family, chunk, lastmod FROM sitemap_files
+            WHERE family = ANY(:families)
+            ORDER BY family, chunk
+        """), {"families": list(INDEXED_FAMILIES)})
+        rows = result.mappings().all()
+    if not rows:
+        return None
+
+    entries = []
+    for r in sorted(rows, key=lambda r: (INDEXED_FAMILIES.index(r["family"]), r["chunk"])):
+        lastmod = f"<lastmod>{r['lastmod']}</lastmod>" if r["lastmod"] else ""
+        entries.append(f"  <sitemap><loc>{BASE_URL}/sitemaps/{r['family']}/{r['chunk']}</loc>{lastmod}</sitemap>")
+    xml = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+        + "\n".join(entries) + "\n</sitemapindex>"
+    )
+    body = gzip.compress(xml.encode(), mtime=0)
+    data = {
+        "body_gz": body,
+        "etag": f'"{hashlib.sha1(body).hexdigest()}"',
+        "lastmod": max((r["lastmod"] for r in rows if r["lastmod"]), default=None),
+    }
+    _file_cache[key] = (time.monotonic() + FILE_CACHE_TTL, data)
+    return data
+
+
+# ── Endpoints ─────────────────────────────────────────────────────────────
+
+@router.get("/sitemaps/index.xml")
+async def sitemap_index(request: Request):
+    """Sitemap index listing every stored chunk of the indexed families."""
+    data = await _sitemap_index()
+    if data is None:
+        # First deploy: build the indexed families once, then list them
+        await asyncio.gather(*(asyncio.shield(_start_build(f)) for f in INDEXED_FAMILIES), return_exceptions=True)
+        _file_cache.pop(("", -1), None)
+        data = await _sitemap_index()
+    if data is None:
+        raise HTTPException(status_code=503, detail="Sitemaps are being generated")
+    return _xml_response(request, data["body_gz"], data["etag"], data["lastmod"])
+
+
+@router.get("/sitemaps/{family}/{chunk}")
+async def sitemap_chunk(family: str, chunk: int, request: Request):
+    """One stored sitemap file (`/sitemaps/profiles/3`, `/sitemaps/jobs/0`, ...)."""
+    if family not in SITEMAP_FAMILIES or chunk < 0:
+        return Response("Not Found", status_code=404)
+    data = await _get_file(family, chunk)
+    if data is None:
+        return Response("Not Found", status_code=404)
+    return _xml_response(request, data["body_gz"], data["etag"], data["lastmod"])
+
 
-    chunk_urls = all_urls[chunk * CHUNK_SIZE: (chunk + 1) * CHUNK_SIZE]
-    return _xml_response(_urlset(chunk_urls))
+@router.get("/sitemaps/{family}")
+async def sitemap_family(family: str, request: Request):
+    """First file of a family — keeps the original unchunked URLs working."""
+    return await sitemap_chunk(family, 0, request)
@@ -17,6 +17,7 @@ from services.sms import (
     send_sms_business_survey_job_value, send_sms_business_survey_reason,
     send_sms_customer_survey_reason,
 )
+from services.job_queue import idempotency_scope
 from utils.logging_config import lead_logger, error_logger
 import json
 
@@ -167,7 +168,9 @@ async def handle_screening_reply(lead: dict, body: str, db: AsyncSession):
         status = result["status"]
 
         if status == "PASS":
-            await _screening_pass(lead_id, db)
+            # Twilio retries the webhook on slow responses — notify the business once
+            with idempotency_scope(f"screening-pass:{lead_id}"):
+                await _screening_pass(lead_id, db)
 
         elif status == "UNCLEAR" and screening_status != "UNCLEAR":
             follow_up = result.get("follow_up") or "Can you describe the job in a bit more detail?"
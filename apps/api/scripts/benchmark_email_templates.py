@@ -0,0 +1,133 @@
+"""
+Micro-benchmark — email rendering throughput, legacy f-string layout vs
+pre-compiled EmailTemplate (services/email_templates.py).
+
+Run:
+    python scripts/benchmark_email_templates.py [recipients]
+
+Renders the campaign notification for N recipients (default 10,000) three ways:
+    legacy       f-string body + _wrap()/_logo_bar()/_email_footer() per message
+    render       EmailTemplate.render() per message
+    render_many  EmailTemplate.render_many() over the whole list
+and checks the three produce identical HTML.
+"""
+
+import sys
+import os
+import time
+
+# Ensure the api root is on the path so services.* imports work
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.email_templates import FRONTEND_URL, EmailTemplate
+
+
+# ── Legacy rendering (as services/email.py built every message before) ──
+
+def _logo_bar() -> str:
+    return f"""
+    <table width="100%" cellpadding="0" cellspacing="0" border="0" style="background:#18181b;border-radius:12px 12px 0 0">
+      <tr>
+        <td style="padding:18px 24px">
+          <a href="{FRONTEND_URL}" style="text-decoration:none;display:inline-flex;align-items:center;gap:10px">
+            <img src="{FRONTEND_URL}/logo-dark.png" alt="traderefer" width="36" height="36"
+                 style="border-radius:8px;display:block" />
+            <span style="font-size:20px;font-weight:900;letter-spacing:-0.5px;line-height:1;font-family:sans-serif">
+              <span style="color:#ffffff">TRADE</span><span style="color:#ea580c">REFER</span>
+            </span>
+          </a>
+        </td>
+      </tr>
+    </table>"""
+
+
+def _email_footer(unsubscribe_note: str = "") -> str:
+    return f"""
+    <div style="padding:16px 24px;border-top:1px solid #e5e7eb;margin-top:8px">
+      <p style="font-size:11px;color:#9ca3af;margin:0;line-height:1.6">
+        &copy; {__import__('datetime').datetime.now().year} traderefer.au &nbsp;&mdash;&nbsp;
+        <a href="{FRONTEND_URL}" style="color:#9ca3af">traderefer.au</a>
+        {f' &nbsp;&mdash;&nbsp; {unsubscribe_note}' if unsubscribe_note else ''}
+      </p>
+    </div>"""
+
+
+def _wrap(body_html: str, unsubscribe_note: str = "") -> str:
+    return f"""
+    <div style="font-family:sans-serif;max-width:600px;margin:0 auto;background:#fff;border-radius:12px;overflow:hidden;border:1px solid #e5e7eb">
+      {_logo_bar()}
+      <div style="padding:28px 24px">
+        {body_html}
+      </div>
+      {_email_footer(unsubscribe_note)}
+    </div>"""
+
+
+def legacy_render(full_name, business_name, campaign_title, promo_text, business_slug):
+    body = f"""
+      <h1 style="color:#ea580c;margin-top:0">New campaign from {business_name}</h1>
+      <p>Hi {full_name}, <strong>{business_name}</strong> launched a new campaign for referrers.</p>
+      <div style="background:#fff7ed;border:1px solid #fed7aa;border-radius:12px;padding:16px 20px;margin:20px 0">
+        <p style="margin:0;font-weight:700;color:#9a3412">{campaign_title}</p>
+        <p style="margin:8px 0 0 0;color:#555">{promo_text}</p>
+      </div>
+      <div style="text-align:center;margin:28px 0">
+        <a href="{FRONTEND_URL}/b/{business_slug}/refer" style="display:inline-block;background:#ea580c;color:#fff;padding:14px 32px;border-radius:999px;text-decoration:none;font-weight:900">View Campaign </a>
+      </div>
+    """
+    return f"New campaign from {business_name}", _wrap(body, "You're receiving this as a referrer on traderefer.au.")
+
+
+# ── Pre-compiled ──
+
+CAMPAIGN = EmailTemplate(
+    subject="New campaign from {business_name}",
+    body="""
+      <h1 style="color:#ea580c;margin-top:0">New campaign from {business_name}</h1>
+      <p>Hi {full_name}, <strong>{business_name}</strong> launched a new campaign for referrers.</p>
+      <div style="background:#fff7ed;border:1px solid #fed7aa;border-radius:12px;padding:16px 20px;margin:20px 0">
+        <p style="margin:0;font-weight:700;color:#9a3412">{campaign_title}</p>
+        <p style="margin:8px 0 0 0;color:#555">{promo_text}</p>
+      </div>
+      <div style="text-align:center;margin:28px 0">
+        <a href="{FRONTEND_URL}/b/{business_slug}/refer" style="display:inline-block;background:#ea580c;color:#fff;padding:14px 32px;border-radius:999px;text-decoration:none;font-weight:900">View Campaign </a>
+      </div>
+    """,
+    unsubscribe_note="You're receiving this as a referrer on traderefer.au.",
+)
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main(n: int) -> int:
+    rows = [
+        {
+            "full_name": f"Referrer {i}",
+            "business_name": "Smith & Sons Plumbing",
+            "campaign_title": "Winter hot water special",
+            "promo_text": "$50 bonus on every confirmed hot water job",
+            "business_slug": "smith-sons-plumbing",
+        }
+        for i in range(n)
+    ]
+
+    legacy_s, legacy = _timed(lambda: [legacy_render(**row) for row in rows])
+    render_s, rendered = _timed(lambda: [CAMPAIGN.render(**row) for row in rows])
+    many_s, many = _timed(lambda: CAMPAIGN.render_many(rows))
+
+    if not (legacy == rendered == many):
+        print("MISMATCH: template output differs from legacy rendering")
+        return 1
+
+    print(f"{n:,} recipients")
+    for label, seconds in (("legacy", legacy_s), ("render", render_s), ("render_many", many_s)):
+        print(f"  {label:<12} {seconds * 1000:8.1f} ms  {n / seconds:12,.0f} msg/s  {legacy_s / seconds:5.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000))
@@ -0,0 +1,51 @@
+"""
+Railway Cron Worker entrypoint — regenerate the stored sitemap files.
+
+Run command (Railway cron service start command):
+    python scripts/generate_sitemaps.py [family ...]
+
+Cron schedule (Railway dashboard):
+    30 17 * * *   →  17:30 UTC daily  (≈ 3:30 AM AEST / 4:30 AM AEDT)
+
+Environment variables required:
+    DATABASE_URL   — Neon PostgreSQL connection string
+"""
+
+import asyncio
+import json
+import logging
+import sys
+import os
+
+# Ensure the api root is on the path so services.* imports work
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv(".env.local")
+load_dotenv()
+
+from routers.sitemaps import SITEMAP_FAMILIES, build_all, build_family
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(name)s — %(message)s",
+)
+logger = logging.getLogger("generate_sitemaps")
+
+
+async def main(families: list[str]) -> int:
+    unknown = [f for f in families if f not in SITEMAP_FAMILIES]
+    if unknown:
+        logger.error("Unknown sitemap families: %s (choose from %s)", unknown, list(SITEMAP_FAMILIES))
+        return 1
+
+    if families:
+        result = {family: await build_family(family) for family in families}
+    else:
+        result = await build_all()
+    print(json.dumps({"ok": True, "files": result}))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1:])))
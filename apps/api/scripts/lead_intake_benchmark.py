@@ -0,0 +1,137 @@
+"""
+Benchmark — POST /leads latency under concurrent submissions (routers/leads.py).
+
+Run against a staging database (it inserts real leads, then deletes them):
+    DATABASE_URL=... python scripts/lead_intake_benchmark.py --business-id <uuid> \
+        [--referral-code CODE] [--requests 200] [--concurrency 20] [--keep]
+
+Serves the leads router in-process (no network hop) with rate limits off,
+submits --requests leads with --concurrency in flight, and reports latency
+percentiles, throughput and SQL statements per request. The screening SMS
+runs inline against the fake transport, so nothing is queued for a worker
+and nothing is sent; latencies include that handler. Each lead has its own
+consumer phone from the ACMA range reserved for fiction (0491 570 006 to
+0491 579 999). The leads are removed afterwards unless --keep is given.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+
+# Ensure the api root is on the path so services.* imports work
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["SMS_TRANSPORT"] = "fake"
+os.environ["JOB_QUEUE_MODE"] = "inline"
+os.environ.setdefault("TWILIO_FROM_NUMBERS", "+61400000000")
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import event, text
+
+from routers import leads
+from services.database import AsyncSessionLocal, engine
+from services.sms_delivery import FakeSmsTransport, set_sms_transport
+
+set_sms_transport(FakeSmsTransport())
+
+app = FastAPI()
+app.include_router(leads.router, prefix="/leads")
+
+statements = 0
+
+FICTIONAL_PHONE_FIRST = 491570006   # 0491 570 006, first number reserved for fiction
+FICTIONAL_PHONES = 9994             # ... to 0491 579 999
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _count(*_args):
+    global statements
+    statements += 1
+
+
+def _pct(values: list, p: float) -> float:
+    return sorted(values)[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+async def _submit(client: httpx.AsyncClient, args, n: int, run: int, latencies: list, created: list, errors: list):
+    body = {
+        "business_id": args.business_id,
+        "consumer_name": f"Benchmark {n}",
+        "consumer_phone": f"+61{FICTIONAL_PHONE_FIRST + (run + n) % FICTIONAL_PHONES}",
+        "consumer_email": f"bench+{run}-{n}@example.com",
+        "consumer_suburb": "Richmond",
+        "job_description": "Lead intake benchmark",
+        "referral_code": args.referral_code,
+    }
+    t0 = time.perf_counter()
+    resp = await client.post("/leads/", json=body)
+    latencies.append(time.perf_counter() - t0)
+    if resp.status_code == 200:
+        created.append(resp.json()["id"])
+    else:
+        errors.append(f"{resp.status_code} {resp.text[:120]}")
+
+
+async def _cleanup(lead_ids: list):
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            text("DELETE FROM leads WHERE id = ANY(CAST(:ids AS uuid[]))"),
+            {"ids": lead_ids},
+        )
+        await db.commit()
+
+
+async def main(args) -> int:
+    global statements
+    run = uuid.uuid4().int % FICTIONAL_PHONES
+    latencies: list = []
+    created: list = []
+    errors: list = []
+    limiter = asyncio.Semaphore(args.concurrency)
+
+    async def one(n: int):
+        async with limiter:
+            await _submit(client, args, n, run, latencies, created, errors)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await _submit(client, args, 0, run, [], created, errors)   # warm the pool
+        statements = 0
+        started = time.perf_counter()
+        await asyncio.gather(*(one(n) for n in range(1, args.requests + 1)))
+        elapsed = time.perf_counter() - started
+    per_request = statements / max(1, len(latencies))
+
+    try:
+        print(f"{len(created) - (1 if created else 0):,}/{args.requests:,} leads created "
+              f"in {elapsed:.2f}s ({args.requests / elapsed:.1f}/s, concurrency {args.concurrency})")
+        print(f"  latency  p50 {_pct(latencies, 0.5):7.1f} ms  p95 {_pct(latencies, 0.95):7.1f} ms"
+              f"  p99 {_pct(latencies, 0.99):7.1f} ms  mean {statistics.mean(latencies) * 1000:7.1f} ms")
+        print(f"  SQL statements per request: {per_request:.1f}")
+        for err in errors[:5]:
+            print(f"  error: {err}")
+    finally:
+        if created and not args.keep:
+            await _cleanup(created)
+            print(f"  removed {len(created):,} benchmark leads")
+    await engine.dispose()
+    return 0 if not errors else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--business-id", required=True)
+    parser.add_argument("--referral-code", default=None)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="leave the benchmark leads in place")
+    args = parser.parse_args()
+    if args.requests >= FICTIONAL_PHONES:
+        parser.error(f"--requests must be below {FICTIONAL_PHONES:,} (one fictional phone per lead)")
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,104 @@
+"""
+Replay Stripe webhook events (services/stripe_events.py).
+
+    python scripts/replay_stripe_events.py --failed
+    python scripts/replay_stripe_events.py --event evt_123 [--event evt_456]
+    python scripts/replay_stripe_events.py --since 2026-10-01 [--dry-run]
+
+--failed and --event queue stored events that haven't been processed.
+--since backfills from Stripe: events created since the date that never
+reached the webhook (endpoint down, secret rotated, ...) are stored and
+queued like a normal delivery; the ones already stored are skipped.
+
+Environment variables required:
+    DATABASE_URL       — Neon PostgreSQL connection string
+    STRIPE_SECRET_KEY  — for --since
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+# Ensure the api root is on the path so services.* imports work
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv(".env.local")
+load_dotenv()
+
+from sqlalchemy import text
+
+from services.database import AsyncSessionLocal, engine
+from services.stripe_events import ingest, replay
+from services.stripe_service import stripe
+
+
+async def replay_stored(event_ids: list, dry_run: bool) -> int:
+    queued = 0
+    async with AsyncSessionLocal() as db:
+        for event_id in event_ids:
+            if dry_run:
+                print(f"  would replay {event_id}")
+                continue
+            if await replay(db, event_id):
+                queued += 1
+                print(f"  queued {event_id}")
+            else:
+                print(f"  skipped {event_id} (not stored or already processed)")
+        await db.commit()
+    return queued
+
+
+async def failed_event_ids() -> list:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(text("SELECT id FROM stripe_events WHERE status = 'failed' ORDER BY received_at"))
+        return [r[0] for r in result.all()]
+
+
+async def backfill(since: datetime, dry_run: bool) -> int:
+    created = int(since.timestamp())
+    # Oldest first, so each object's events are queued in order
+    events = [json.loads(str(e)) for e in stripe.Event.list(created={"gte": created}, limit=100).auto_paging_iter()]
+    events.sort(key=lambda e: e["created"])
+    stored = 0
+    for event in events:
+        if dry_run:
+            print(f"  {event['id']} {event['type']}")
+            continue
+        async with AsyncSessionLocal() as db:
+            if await ingest(db, event):
+                stored += 1
+                print(f"  stored {event['id']} {event['type']}")
+    print(f"{len(events):,} events from Stripe since {since:%Y-%m-%d}, {stored:,} new")
+    return stored
+
+
+async def main(args) -> int:
+    try:
+        if args.since:
+            since = datetime.strptime(args.since, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+            await backfill(since, args.dry_run)
+        event_ids = list(args.event or [])
+        if args.failed:
+            event_ids += await failed_event_ids()
+        if event_ids:
+            queued = await replay_stored(event_ids, args.dry_run)
+            print(f"{queued:,}/{len(event_ids):,} stored events queued")
+    finally:
+        await engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--event", action="append", help="stored event id to replay (repeatable)")
+    parser.add_argument("--failed", action="store_true", help="replay every failed event")
+    parser.add_argument("--since", help="fetch events created since YYYY-MM-DD from Stripe and store the missing ones")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    if not (args.event or args.failed or args.since):
+        parser.error("give --event, --failed or --since")
+    sys.exit(asyncio.run(main(args)))
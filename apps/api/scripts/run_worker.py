@@ -0,0 +1,62 @@
+"""
+Railway worker entrypoint — run queued background jobs (email, SMS, push,
+Stripe webhook events).
+
+Run command (Railway worker service start command):
+    python scripts/run_worker.py
+
+Runs until SIGTERM/SIGINT, finishing the jobs already claimed. Scale out by
+running more replicas; jobs are claimed with FOR UPDATE SKIP LOCKED.
+
+Exits at once if the event bus is in-process only (EVENT_BUS_BACKEND=memory):
+the SSE events its jobs publish would never reach the API.
+
+Environment variables required:
+    DATABASE_URL            — Neon PostgreSQL connection string
+    JOB_WORKER_CONCURRENCY  — jobs run at once per process (default 10)
+"""
+
+import asyncio
+import logging
+import signal
+import sys
+import os
+
+# Ensure the api root is on the path so services.* imports work
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv(".env.local")
+load_dotenv()
+
+from services.email_delivery import get_email_delivery
+from services.event_bus import event_bus
+from services.job_queue import JobWorker, load_handlers
+from services.sms_delivery import get_sms_dispatcher
+from services.push_delivery import get_push_engine
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(name)s — %(message)s",
+)
+
+
+async def main() -> int:
+    if not event_bus.cross_process():
+        logging.error("Event bus is in-process only; set EVENT_BUS_BACKEND=postgres or redis so job events reach the API")
+        return 1
+    load_handlers()
+    worker = JobWorker()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, worker.stop)
+    await worker.run_forever()
+    for engine in (get_email_delivery(), get_sms_dispatcher(), get_push_engine()):
+        if engine is not None:
+            await engine.aclose()
+    await event_bus.aclose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,128 @@
+"""
+Load test — WebSocket room broadcast latency (services/ws_rooms.py).
+
+Run:
+    python scripts/ws_load_test.py [--sockets 2000] [--rooms 1] [--messages 20] [--slow 0]
+
+Serves the RoomManager behind a bare WebSocket endpoint (no auth, no
+database) on a local port, opens --sockets client connections spread over
+--rooms rooms, then broadcasts --messages messages to every room and reports
+the time from broadcast to receipt on each socket. --slow opens that many
+extra sockets in the first room that never read, to show they don't delay
+the others.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import sys
+import time
+
+# Ensure the api root is on the path so services.* imports work
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn
+import websockets
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+
+from services.ws_rooms import RoomManager
+
+manager = RoomManager(backend=None)
+app = FastAPI()
+
+
+@app.websocket("/ws/{room}/{user}")
+async def ws_endpoint(websocket: WebSocket, room: str, user: str):
+    await manager.connect(room, websocket, user)
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        manager.disconnect(room, websocket)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _client(url: str, expected: int, latencies: list, ready: asyncio.Event, connected: list):
+    async with websockets.connect(url, max_queue=None) as ws:
+        connected.append(ws)
+        await ready.wait()
+        for _ in range(expected):
+            data = json.loads(await ws.recv())
+            latencies.append(time.perf_counter() - data["sent_at"])
+
+
+async def _idle_client(url: str, done: asyncio.Event):
+    # Connects and never reads; its socket buffers fill and the server drops it
+    async with websockets.connect(url, max_queue=1):
+        await done.wait()
+
+
+def _pct(values: list, p: float) -> float:
+    return sorted(values)[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+async def main(args) -> int:
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", ws_max_queue=32))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    ready, done = asyncio.Event(), asyncio.Event()
+    latencies: list = []
+    connected: list = []
+    base = f"ws://127.0.0.1:{port}/ws"
+    started = time.perf_counter()
+    clients = [
+        asyncio.create_task(_client(f"{base}/room{i % args.rooms}/user{i}", args.messages, latencies, ready, connected))
+        for i in range(args.sockets)
+    ]
+    idle = [asyncio.create_task(_idle_client(f"{base}/room0/slow{i}", done)) for i in range(args.slow)]
+    while len(connected) < args.sockets or manager.stats()["connections"] < args.sockets + args.slow:
+        await asyncio.sleep(0.05)
+    print(f"{args.sockets + args.slow:,} sockets connected in {time.perf_counter() - started:.2f}s")
+    ready.set()
+
+    padding = "x" * args.size
+    fanout = []
+    for n in range(args.messages):
+        for r in range(args.rooms):
+            t0 = time.perf_counter()
+            await manager.broadcast(f"room{r}", {"type": "message", "n": n, "sent_at": t0, "body": padding})
+            fanout.append(time.perf_counter() - t0)
+        await asyncio.sleep(args.interval)
+
+    await asyncio.wait_for(asyncio.gather(*clients), timeout=60)
+    done.set()
+    await asyncio.gather(*idle, return_exceptions=True)
+    server.should_exit = True
+    await server_task
+
+    expected = args.sockets * args.messages
+    print(f"{len(latencies):,}/{expected:,} messages received")
+    print(f"  broadcast call  avg {statistics.mean(fanout) * 1000:7.2f} ms  max {max(fanout) * 1000:7.2f} ms")
+    print(f"  delivery        p50 {_pct(latencies, 0.5):7.2f} ms  p95 {_pct(latencies, 0.95):7.2f} ms"
+          f"  p99 {_pct(latencies, 0.99):7.2f} ms  max {max(latencies) * 1000:7.2f} ms")
+    print(f"  manager         {manager.stats()}")
+    return 0 if len(latencies) == expected else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sockets", type=int, default=2000)
+    parser.add_argument("--rooms", type=int, default=1)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--slow", type=int, default=0, help="extra sockets in room0 that never read")
+    parser.add_argument("--size", type=int, default=200, help="message body bytes")
+    parser.add_argument("--interval", type=float, default=0.05, help="seconds between broadcast rounds")
+    sys.exit(asyncio.run(main(parser.parse_args())))
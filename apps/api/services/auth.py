@@ -1,41 +1,165 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import jwt
+from jose import jwk, jwt
+from jose.exceptions import JWTError
+import asyncio
+import hashlib
 import httpx
 import os
 import uuid
 import time
+from collections import OrderedDict
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from utils.logging_config import auth_logger, error_logger
 
 security = HTTPBearer()
 
 # Cache for JWKS with TTL (1 hour)
-_jwks = None
-_jwks_fetched_at: float = 0
 JWKS_CACHE_TTL = 3600  # 1 hour in seconds
+# Minimum gap between forced refreshes triggered by an unknown `kid`, so a
+# flood of forged tokens can't hammer the auth provider.
+JWKS_MIN_REFRESH_INTERVAL = 60
+# Max number of verified tokens remembered until their `exp`
+VERIFIED_TOKEN_CACHE_SIZE = 10_000
 
-async def get_jwks():
-    global _jwks, _jwks_fetched_at
-    now = time.time()
-    if _jwks is None or (now - _jwks_fetched_at) > JWKS_CACHE_TTL:
+_DECODE_OPTIONS = {"verify_aud": False, "verify_iss": False, "verify_sub": True}
+
+
+class JWTVerifier:
+    """
+    RS256 verifier for Clerk / Neon Auth tokens.
+
+    - JWKS keys are parsed into key objects once per fetch, indexed by `kid`.
+    - Stale JWKS are refreshed in the background (single-flight); requests
+      keep using the current keys instead of waiting on the provider.
+    - Successfully verified tokens are kept in a bounded LRU keyed by their
+      SHA-256 until `exp`, so repeat dashboard calls skip the RSA check.
+    """
+
+    def __init__(self, ttl: int = JWKS_CACHE_TTL, cache_size: int = VERIFIED_TOKEN_CACHE_SIZE):
+        self._ttl = ttl
+        self._cache_size = cache_size
+        self._jwks: Optional[dict] = None
+        self._keys: Dict[str, object] = {}
+        self._fetched_at: float = 0
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._verified: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+
+    async def _fetch(self) -> None:
         jwks_url = os.getenv("CLERK_JWKS_URL") or os.getenv("NEON_AUTH_JWKS_URL")
         if not jwks_url:
             raise Exception("No JWKS URL configured (CLERK_JWKS_URL or NEON_AUTH_JWKS_URL)")
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            response = await client.get(jwks_url)
+            response.raise_for_status()
+            jwks = response.json()
+
+        keys = {}
+        for key in jwks.get("keys", []):
+            kid = key.get("kid")
+            if not kid:
+                continue
+            try:
+                keys[kid] = jwk.construct(key, key.get("alg") or "RS256")
+            except Exception as e:
+                auth_logger.warning(f"Skipping unusable JWKS key {kid}: {e}")
+        self._jwks = jwks
+        self._keys = keys
+        self._fetched_at = time.time()
+
+    async def _refresh(self) -> None:
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(jwks_url)
-                response.raise_for_status()
-                _jwks = response.json()
-                _jwks_fetched_at = now
+            await self._fetch()
         except Exception as e:
             auth_logger.error(f"Error fetching JWKS: {e}")
-            # If we have stale keys, use them rather than failing
-            if _jwks is not None:
-                return _jwks
-            raise HTTPException(status_code=500, detail="Failed to verify authentication provider")
-    return _jwks
+            # Back off before the next attempt; stale keys stay in use meanwhile
+            self._fetched_at = max(self._fetched_at, time.time() - self._ttl + JWKS_MIN_REFRESH_INTERVAL)
+            if not self._keys:
+                raise
+
+    def _start_refresh(self) -> asyncio.Task:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh())
+        return self._refresh_task
+
+    async def _ensure_keys(self) -> None:
+        if not self._keys:
+            # Cold start: everyone waits on the same fetch
+            try:
+                await asyncio.shield(self._start_refresh())
+            except Exception:
+                raise HTTPException(status_code=500, detail="Failed to verify authentication provider")
+        elif time.time() - self._fetched_at > self._ttl:
+            self._start_refresh()
+
+    async def get_jwks(self) -> dict:
+        await self._ensure_keys()
+        return self._jwks
+
+    async def _key_for(self, kid: str):
+        key = self._keys.get(kid)
+        if key is None and time.time() - self._fetched_at > JWKS_MIN_REFRESH_INTERVAL:
+            # Possibly a rotated key — refresh once and look again
+            try:
+                await asyncio.shield(self._start_refresh())
+            except Exception:
+                pass
+            key = self._keys.get(kid)
+        return key
+
+    def _remember(self, digest: str, payload: dict) -> None:
+        exp = payload.get("exp")
+        if not isinstance(exp, (int, float)):
+            return
+        self._verified[digest] = (float(exp), payload)
+        self._verified.move_to_end(digest)
+        while len(self._verified) > self._cache_size:
+            self._verified.popitem(last=False)
+
+    async def verify(self, token: str) -> dict:
+        """Return the verified claims for `token` or raise JWTError."""
+        digest = hashlib.sha256(token.encode()).hexdigest()
+        cached = self._verified.get(digest)
+        if cached is not None:
+            exp, payload = cached
+            if exp > time.time():
+                self._verified.move_to_end(digest)
+                return payload
+            del self._verified[digest]
+
+        await self._ensure_keys()
+        header = jwt.get_unverified_header(token)
+        key = await self._key_for(header.get("kid"))
+        if key is None:
+            raise JWTError("Signing key not found")
+
+        payload = jwt.decode(token, key, algorithms=["RS256"], options=_DECODE_OPTIONS)
+        self._remember(digest, payload)
+        return payload
+
+    async def verify_user_id(self, token: str, context: str = "Token") -> Optional[str]:
+        """Verify a token passed outside the Authorization header (SSE/WS). Returns user_id or None."""
+        try:
+            payload = await self.verify(token)
+        except Exception as e:
+            error_logger.warning(f"{context} auth error: {e}")
+            return None
+        clerk_id = payload.get("sub")
+        return stable_user_id(clerk_id) if clerk_id else None
+
+
+verifier = JWTVerifier()
+
+
+async def get_jwks():
+    return await verifier.get_jwks()
+
+
+def stable_user_id(clerk_id: str) -> str:
+    # Generate a stable UUID from the Clerk ID to maintain database compatibility
+    return str(uuid.uuid5(uuid.NAMESPACE_DNS, clerk_id))
+
 
 class AuthenticatedUser(BaseModel):
     id: str
@@ -43,60 +167,42 @@ class AuthenticatedUser(BaseModel):
     is_admin: bool = False
 
 async def get_current_user(token: HTTPAuthorizationCredentials = Depends(security)) -> AuthenticatedUser:
-    jwks = await get_jwks()
-    
     try:
-        # Note: Neon Auth currently doesn't provide the 'aud' in the same way some others do, 
+        # Note: Neon Auth currently doesn't provide the 'aud' in the same way some others do,
         # or it might be the project ID. For now, we skip 'aud' check if unknown.
-        header = jwt.get_unverified_header(token.credentials)
-        rsa_key = {}
-        for key in jwks["keys"]:
-            if key["kid"] == header["kid"]:
-                rsa_key = {
-                    "kty": key["kty"],
-                    "kid": key["kid"],
-                    "use": key["use"],
-                    "n": key["n"],
-                    "e": key["e"]
-                }
-        
-        if rsa_key:
-            payload = jwt.decode(
-                token.credentials,
-                rsa_key,
-                algorithms=["RS256"],
-                options={"verify_aud": False, "verify_iss": False, "verify_sub": True}
-            )
-            
-            clerk_id = payload.get("sub")
-            email = payload.get("email")
-            # Generate a stable UUID from the Clerk ID to maintain database compatibility
-            stable_uuid = str(uuid.uuid5(uuid.NAMESPACE_DNS, clerk_id))
-            
-            # Admin check: support both Clerk user IDs (always in JWT) and emails (optional)
-            admin_clerk_ids = [x.strip() for x in (os.getenv("ADMIN_CLERK_IDS") or "").split(",") if x.strip()]
-            admin_emails = [x.strip() for x in (os.getenv("ADMIN_EMAILS") or "").split(",") if x.strip()]
-            is_admin = (clerk_id in admin_clerk_ids) or (bool(email) and email in admin_emails)
-            
-            return AuthenticatedUser(
-                id=stable_uuid,
-                email=email,
-                is_admin=is_admin
-            )
+        payload = await verifier.verify(token.credentials)
+    except HTTPException:
+        raise
     except Exception as e:
         error_logger.error(f"Auth error (Token Decoding): {e}")
-        unverified_header = jwt.get_unverified_header(token.credentials)
-        auth_logger.info(f"Token Header: {unverified_header}")
+        try:
+            auth_logger.info(f"Token Header: {jwt.get_unverified_header(token.credentials)}")
+        except Exception:
+            pass
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=f"Could not validate credentials: {str(e)}",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
-    raise HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
+
+    clerk_id = payload.get("sub")
+    if not clerk_id:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    email = payload.get("email")
+
+    # Admin check: support both Clerk user IDs (always in JWT) and emails (optional)
+    admin_clerk_ids = [x.strip() for x in (os.getenv("ADMIN_CLERK_IDS") or "").split(",") if x.strip()]
+    admin_emails = [x.strip() for x in (os.getenv("ADMIN_EMAILS") or "").split(",") if x.strip()]
+    is_admin = (clerk_id in admin_clerk_ids) or (bool(email) and email in admin_emails)
+
+    return AuthenticatedUser(
+        id=stable_user_id(clerk_id),
+        email=email,
+        is_admin=is_admin
     )
 
 async def require_admin(user: AuthenticatedUser = Depends(get_current_user)) -> AuthenticatedUser:
@@ -0,0 +1,236 @@
+"""
+Cache for public, visitor-independent API responses (directory listings,
+business profiles, discover feeds).
+
+- Backends: in-process LRU (default) or Redis when REDIS_URL is set, so all
+  replicas share entries and invalidations.
+- TTL + stale-while-revalidate: within `ttl` an entry is served as-is; for a
+  further `stale_ttl` it is still served while one background task reloads it.
+  `until(value)` may return an epoch time after which the value is wrong
+  (an expiring deal, say); neither window runs past it.
+- Concurrent misses for the same key share a single loader call.
+- Invalidation is tag based: each entry records the version of its tags when
+  stored, and `invalidate(tag)` bumps the version so older entries are ignored.
+
+Loaders run outside the request (background refresh), so they must open their
+own session (`async with AsyncSessionLocal() as db`) rather than reuse one
+from `Depends(get_db)`.
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Union
+from fastapi.encoders import jsonable_encoder
+from services.redis_client import get_redis
+from utils.logging_config import error_logger
+
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "5000"))
+
+TagsArg = Union[Iterable[str], Callable[[Any], Iterable[str]]]
+UntilArg = Optional[Callable[[Any], Optional[float]]]
+
+
+class MemoryBackend:
+    """Process-local LRU. Entries and tag versions live in this worker only."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+        self._tags: Dict[str, int] = {}
+
+    async def get(self, key: str) -> Optional[dict]:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        expires_at, entry = item
+        if expires_at <= time.time():
+            self._entries.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    async def set(self, key: str, entry: dict, ttl: int) -> None:
+        self._entries[key] = (time.time() + ttl, entry)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    async def tag_versions(self, tags: List[str]) -> List[int]:
+        return [self._tags.get(t, 0) for t in tags]
+
+    async def bump(self, tags: List[str]) -> None:
+        for t in tags:
+            self._tags[t] = self._tags.get(t, 0) + 1
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "entries": len(self._entries)}
+
+
+class RedisBackend:
+    """Shared backend: entries stored as JSON, tag versions as Redis counters."""
+
+    def __init__(self, client, prefix: str = "tr:cache"):
+        self._redis = client
+        self._prefix = prefix
+
+    async def get(self, key: str) -> Optional[dict]:
+        raw = await self._redis.get(f"{self._prefix}:k:{key}")
+        return json.loads(raw) if raw else None
+
+    async def set(self, key: str, entry: dict, ttl: int) -> None:
+        await self._redis.set(f"{self._prefix}:k:{key}", json.dumps(entry), ex=max(1, int(ttl)))
+
+    async def tag_versions(self, tags: List[str]) -> List[int]:
+        if not tags:
+            return []
+        raw = await self._redis.mget([f"{self._prefix}:t:{t}" for t in tags])
+        return [int(v or 0) for v in raw]
+
+    async def bump(self, tags: List[str]) -> None:
+        for t in tags:
+            await self._redis.incr(f"{self._prefix}:t:{t}")
+
+    def stats(self) -> dict:
+        return {"backend": "redis"}
+
+
+class ResponseCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    async def _is_current(self, entry: dict) -> bool:
+        tags = entry.get("tags") or {}
+        if not tags:
+            return True
+        names = list(tags)
+        return await self.backend.tag_versions(names) == [tags[n] for n in names]
+
+    async def _load_and_store(self, key: str, loader, ttl: int, stale_ttl: int, tags: TagsArg, until: UntilArg):
+        # Snapshot static tag versions before loading, so an invalidation that
+        # lands mid-load leaves this entry already outdated.
+        versions = None
+        if not callable(tags):
+            tag_names = list(tags)
+            try:
+                versions = await self.backend.tag_versions(tag_names)
+            except Exception as e:
+                error_logger.warning(f"Cache read failed for {key}: {e}")
+
+        value = await loader()
+        if value is None:
+            return None
+        value = jsonable_encoder(value)
+        try:
+            deadline = until(value) if until is not None else None
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining < 1:
+                    return value
+                ttl = min(ttl, remaining)
+                stale_ttl = min(stale_ttl, remaining - ttl)
+            if versions is None:
+                tag_names = list(tags(value) if callable(tags) else tags)
+                versions = await self.backend.tag_versions(tag_names)
+            entry = {
+                "value": value,
+                "fresh_until": time.time() + ttl,
+                "tags": dict(zip(tag_names, versions)),
+            }
+            await self.backend.set(key, entry, ttl + stale_ttl)
+        except Exception as e:
+            error_logger.warning(f"Cache store failed for {key}: {e}")
+        return value
+
+    def _start_load(self, key: str, loader, ttl: int, stale_ttl: int, tags: TagsArg, until: UntilArg) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None or task.done():
+            task = asyncio.create_task(self._load_and_store(key, loader, ttl, stale_ttl, tags, until))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+        return task
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            error_logger.warning(f"Cache loader failed for {key}: {task.exception()}")
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: int = 60,
+        stale_ttl: int = 0,
+        tags: TagsArg = (),
+        until: UntilArg = None,
+    ) -> Any:
+        """
+        Return the cached value for `key`, calling `loader()` on a miss.
+        A `None` result is returned but not cached (e.g. 404s).
+        """
+        try:
+            entry = await self.backend.get(key)
+            if entry is not None and not await self._is_current(entry):
+                entry = None
+        except Exception as e:
+            error_logger.warning(f"Cache read failed for {key}: {e}")
+            entry = None
+
+        if entry is not None:
+            if entry["fresh_until"] > time.time():
+                self.hits += 1
+                return entry["value"]
+            # Stale but within the grace window: serve it, refresh once in the background
+            self.stale_hits += 1
+            self._start_load(key, loader, ttl, stale_ttl, tags, until)
+            return entry["value"]
+
+        self.misses += 1
+        return await asyncio.shield(self._start_load(key, loader, ttl, stale_ttl, tags, until))
+
+    async def invalidate(self, *tags: str) -> None:
+        """Drop every entry stored under any of `tags` (across replicas with Redis)."""
+        try:
+            await self.backend.bump([t for t in tags if t])
+        except Exception as e:
+            error_logger.warning(f"Cache invalidation failed for {tags}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            **self.backend.stats(),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "inflight": len(self._inflight),
+        }
+
+
+def _make_backend():
+    client = get_redis()
+    return RedisBackend(client) if client is not None else MemoryBackend()
+
+
+# Singleton — import this from anywhere
+public_cache = ResponseCache(_make_backend())
+
+
+# ── Invalidation hooks ──
+
+async def invalidate_business_listing(business_id=None) -> None:
+    """Call after a business profile/listing changes (owner edit, admin edit, claim)."""
+    tags = ["businesses"]
+    if business_id:
+        tags.append(f"business:{business_id}")
+    await public_cache.invalidate(*tags)
+
+
+async def invalidate_business_content(business_id) -> None:
+    """Call after deals or campaigns change for one business."""
+    await public_cache.invalidate(f"business:{business_id}", "campaigns")
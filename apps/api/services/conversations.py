@@ -0,0 +1,149 @@
+"""
+Conversation summaries and unread counters.
+
+`conversations` carries a denormalized summary of its latest message
+(last_message_preview, last_message_has_image, last_sender_type,
+last_message_at) and an unread count per side (business_unread,
+referrer_unread) — see neon/migrations/025_conversation_summaries.sql.
+They are maintained in the same statement that inserts a message or marks
+messages read, so the contacts list and the unread badge never touch
+`messages`.
+
+The unread badge sums a party's counters straight from conversations; the
+partial indexes on business_unread/referrer_unread keep that a single
+indexed read, so it isn't cached.
+
+History is paged with message ids as cursors over (created_at, id), and
+read receipts only flip rows up to the last message the reader has seen.
+"""
+
+from typing import Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+PREVIEW_LENGTH = 200
+
+
+async def record_message(db: AsyncSession, conversation_id, sender_type: str, sender_id, body: str, image_url=None):
+    """Insert a message and update the conversation summary in one statement. Caller commits."""
+    result = await db.execute(
+        text("""
+            WITH m AS (
+                INSERT INTO messages (conversation_id, sender_type, sender_id, body, image_url)
+                VALUES (:cid, :stype, :sid, :body, :image_url)
+                RETURNING id, created_at
+            )
+            UPDATE conversations c SET
+                last_message_at = m.created_at,
+                last_message_preview = NULLIF(LEFT(:body, :preview_len), ''),
+                last_message_has_image = COALESCE(CAST(:image_url AS text), '') <> '',
+                last_sender_type = :stype,
+                business_unread = c.business_unread + CASE WHEN :stype = 'business' THEN 0 ELSE 1 END,
+                referrer_unread = c.referrer_unread + CASE WHEN :stype = 'referrer' THEN 0 ELSE 1 END
+            FROM m
+            WHERE c.id = :cid
+            RETURNING m.id, m.created_at, c.business_id, c.referrer_id
+        """),
+        {
+            "cid": conversation_id, "stype": sender_type, "sid": sender_id,
+            "body": body, "image_url": image_url, "preview_len": PREVIEW_LENGTH,
+        },
+    )
+    return result.mappings().first()
+
+
+async def mark_read(db: AsyncSession, conversation_id, reader_type: str, up_to_id=None) -> int:
+    """
+    Mark the other side's messages read — all of them, or only those up to
+    and including `up_to_id` (the newest message the reader has seen) — and
+    decrement the reader's counter by the rows actually flipped (safe against
+    a message landing concurrently). Caller commits. Returns the number of
+    messages marked.
+    """
+    counter = "business_unread" if reader_type == "business" else "referrer_unread"
+    seen_sql = ""
+    params = {"cid": conversation_id, "my_type": reader_type}
+    if up_to_id is not None:
+        seen_sql = "AND (created_at, id) <= (SELECT created_at, id FROM messages WHERE id = :up_to AND conversation_id = :cid)"
+        params["up_to"] = up_to_id
+    result = await db.execute(
+        text(f"""
+            WITH r AS (
+                UPDATE messages SET is_read = true
+                WHERE conversation_id = :cid AND sender_type != :my_type AND is_read = false
+                {seen_sql}
+                RETURNING 1
+            ), n AS (
+                SELECT COUNT(*) AS marked FROM r
+            ), c AS (
+                UPDATE conversations SET {counter} = GREATEST({counter} - n.marked, 0)
+                FROM n
+                WHERE id = :cid AND n.marked > 0
+            )
+            SELECT marked FROM n
+        """),
+        params,
+    )
+    return result.scalar() or 0
+
+
+# ── History ──
+
+MESSAGE_COLUMNS = "id, sender_type, sender_id, body, image_url, is_read, created_at"
+
+
+async def message_page(db: AsyncSession, conversation_id, limit: int, before=None, after=None) -> Optional[Tuple[list, bool]]:
+    """
+    One page of a conversation, oldest first, using message ids as cursors:
+    - neither: the newest `limit` messages
+    - before:  the `limit` messages just older than `before`
+    - after:   the `limit` messages just newer than `after` (delta polling)
+    Returns (rows, has_more) — more older rows, or more newer rows for
+    `after` — or None when the cursor isn't a message of this conversation.
+    """
+    params = {"cid": conversation_id, "limit": limit + 1}
+    cursor = after if after is not None else before
+    cursor_sql = ""
+    if cursor is not None:
+        op = ">" if after is not None else "<"
+        cursor_sql = f"AND (created_at, id) {op} (SELECT created_at, id FROM messages WHERE id = :cursor AND conversation_id = :cid)"
+        params["cursor"] = cursor
+    direction = "ASC" if after is not None else "DESC"
+    result = await db.execute(
+        text(f"""
+            SELECT {MESSAGE_COLUMNS}
+            FROM messages
+            WHERE conversation_id = :cid {cursor_sql}
+            ORDER BY created_at {direction}, id {direction}
+            LIMIT :limit
+        """),
+        params,
+    )
+    rows = result.mappings().all()
+    if not rows and cursor is not None:
+        exists = await db.execute(
+            text("SELECT 1 FROM messages WHERE id = :cursor AND conversation_id = :cid"),
+            {"cursor": cursor, "cid": conversation_id},
+        )
+        if exists.scalar() is None:
+            return None
+    has_more = len(rows) > limit
+    rows = list(rows[:limit])
+    if after is None:
+        rows.reverse()
+    return rows, has_more
+
+
+async def unread_total(db: AsyncSession, party_type: str, party_id) -> int:
+    """Unread messages across all of a business's or referrer's conversations."""
+    column = "business" if party_type == "business" else "referrer"
+    result = await db.execute(
+        text(f"""
+            SELECT COALESCE(SUM({column}_unread), 0) FROM conversations
+            WHERE {column}_id = :pid AND {column}_unread > 0
+        """),
+        {"pid": party_id},
+    )
+    return int(result.scalar() or 0)
@@ -1,6 +1,12 @@
 import os
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Dict, Optional
+from fastapi import Request
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from dotenv import load_dotenv
 
 load_dotenv(".env.local")
@@ -18,13 +24,150 @@ if DATABASE_URL.startswith("postgresql://"):
 if "?" in DATABASE_URL:
     DATABASE_URL = DATABASE_URL.split("?")[0]
 
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# ── Pool configuration (all overridable per Railway service) ──
+POOL_SIZE = _env_int("DB_POOL_SIZE", 10)
+MAX_OVERFLOW = _env_int("DB_MAX_OVERFLOW", 20)
+POOL_TIMEOUT = _env_int("DB_POOL_TIMEOUT", 30)
+# Neon drops idle connections after ~5 min; recycle before that instead of
+# paying a pre-ping round trip on every checkout.
+POOL_RECYCLE = _env_int("DB_POOL_RECYCLE", 240)
+POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", False)
+STATEMENT_CACHE_SIZE = _env_int("DB_STATEMENT_CACHE_SIZE", 500)
+# Neon's pooled endpoint ("-pooler" host) runs PgBouncer in transaction mode,
+# which cannot keep named prepared statements between transactions.
+PGBOUNCER_SAFE = _env_bool("DB_PGBOUNCER_SAFE", "-pooler" in DATABASE_URL)
+
+
+# ── Per-router pool metrics ──
+
+# Label of the router currently holding a session, e.g. "public" or "messages".
+_current_router: ContextVar[str] = ContextVar("db_router", default="background")
+
+
+class _RouterStats:
+    __slots__ = ("sessions", "active", "checkouts", "wait_total", "wait_max")
+
+    def __init__(self):
+        self.sessions = 0
+        self.active = 0
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "sessions": self.sessions,
+            "active_sessions": self.active,
+            "checkouts": self.checkouts,
+            "avg_wait_ms": round(self.wait_total / self.checkouts * 1000, 2) if self.checkouts else 0.0,
+            "max_wait_ms": round(self.wait_max * 1000, 2),
+        }
+
+
+_router_stats: Dict[str, _RouterStats] = {}
+
+
+def _stats_for(label: str) -> _RouterStats:
+    stats = _router_stats.get(label)
+    if stats is None:
+        stats = _router_stats[label] = _RouterStats()
+    return stats
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited, keyed by router."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            stats = _stats_for(_current_router.get())
+            stats.checkouts += 1
+            stats.wait_total += waited
+            if waited > stats.wait_max:
+                stats.wait_max = waited
+
+
+def _connect_args() -> dict:
+    args = {"ssl": True}
+    if PGBOUNCER_SAFE:
+        args["statement_cache_size"] = 0
+        args["prepared_statement_cache_size"] = 0
+        args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+    else:
+        args["statement_cache_size"] = STATEMENT_CACHE_SIZE
+        args["prepared_statement_cache_size"] = STATEMENT_CACHE_SIZE
+    return args
+
+
 engine = create_async_engine(
-    DATABASE_URL, 
-    connect_args={"ssl": True},
-    pool_pre_ping=True
+    DATABASE_URL,
+    connect_args=_connect_args(),
+    poolclass=InstrumentedPool,
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW,
+    pool_timeout=POOL_TIMEOUT,
+    pool_recycle=POOL_RECYCLE,
+    pool_pre_ping=POOL_PRE_PING,
 )
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
-async def get_db():
-    async with AsyncSessionLocal() as session:
-        yield session
+
+def _router_label(request: Optional[Request]) -> str:
+    if request is None:
+        return "background"
+    endpoint = request.scope.get("endpoint")
+    module = getattr(endpoint, "__module__", None) or "unknown"
+    return module.rsplit(".", 1)[-1]
+
+
+async def get_db(request: Request = None):
+    label = _router_label(request)
+    # No reset needed: each request runs in its own task/context.
+    _current_router.set(label)
+    stats = _stats_for(label)
+    stats.sessions += 1
+    stats.active += 1
+    try:
+        async with AsyncSessionLocal() as session:
+            yield session
+    finally:
+        stats.active -= 1
+
+
+def pool_status() -> dict:
+    """Snapshot of the connection pool and per-router usage for /admin/health."""
+    pool = engine.sync_engine.pool
+    return {
+        "config": {
+            "pool_size": POOL_SIZE,
+            "max_overflow": MAX_OVERFLOW,
+            "pool_timeout": POOL_TIMEOUT,
+            "pool_recycle": POOL_RECYCLE,
+            "pre_ping": POOL_PRE_PING,
+            "statement_cache_size": 0 if PGBOUNCER_SAFE else STATEMENT_CACHE_SIZE,
+            "pgbouncer_safe": PGBOUNCER_SAFE,
+        },
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "capacity": POOL_SIZE + MAX_OVERFLOW,
+        "routers": {label: stats.as_dict() for label, stats in sorted(_router_stats.items())},
+    }
@@ -1,95 +1,110 @@
+import hashlib
+import json
 import os
-import resend
-import asyncio
+import uuid
 from typing import Optional
-from utils.logging_config import email_logger, error_logger
+from utils.logging_config import email_logger
+from services.email_delivery import get_email_delivery
+from services.email_templates import EmailTemplate
+from services.job_queue import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, enqueue, job_handler, submit
 
-resend.api_key = os.getenv("RESEND_API_KEY", "")
-FROM_ADDRESS = os.getenv("RESEND_FROM", "traderefer.au <no-reply@traderefer.au>")
 FRONTEND_URL = os.getenv("FRONTEND_URL", "https://traderefer.au")
 BUSINESS_VERIFICATION_EMAIL = os.getenv("BUSINESS_VERIFICATION_EMAIL", "support@traderefer.au")
 BUSINESS_VERIFICATION_OWNER_EMAIL = "stevejford007@gmail.com"
+JOB_BATCH_SIZE = 500  # messages per queued batch job; the engine splits these into provider batches
 
 
-async def _send(to: str, subject: str, html: str):
-    """Async email send using Resend. Runs in thread pool to avoid blocking."""
-    if not resend.api_key:
+async def _send_now(to: str, subject: str, html: str, raise_on_error: bool = False, key: Optional[str] = None):
+    """Send one email right away through the shared delivery engine (`key`: Resend idempotency key)."""
+    delivery = get_email_delivery()
+    if delivery is None:
         email_logger.error(f"RESEND_API_KEY not set ÃƒÂ¢Ã¢â€šÂ¬Ã¢â‚¬Â skipping email to {to}: {subject}")
         return
-    
-    # Validate from address
-    if not FROM_ADDRESS or "@" not in FROM_ADDRESS:
-        email_logger.error(f"Invalid RESEND_FROM address: {FROM_ADDRESS}")
-    
-    try:
-        # Run sync Resend SDK in thread pool to avoid blocking async event loop
-        def send_email():
-            return resend.Emails.send({
-                "from": FROM_ADDRESS,
-                "to": [to],
-                "subject": subject,
-                "html": html
-            })
-        
-        result = await asyncio.to_thread(send_email)
-        email_logger.info(f"Email sent successfully | to={to} | subject={subject} | result={result}")
-        return result
-        
-    except Exception as e:
-        error_msg = f"Failed to send email | to={to} | subject={subject} | error={e}"
-        email_logger.error(error_msg)
-        error_logger.error(error_msg, exc_info=True)
-
-
-async def _send_many(recipients: list[str], subject: str, html: str):
-    for recipient in recipients:
-        await _send(recipient, subject, html)
+    result = await delivery.send({"to": to, "subject": subject, "html": html}, key)
+    if not result["ok"] and raise_on_error:
+        raise RuntimeError(result["error"])
+    return result
 
 
-# ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬
-# SHARED EMAIL LAYOUT HELPERS
-# ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬
+@job_handler("email.send")
+async def _deliver_email(payload: dict):
+    await _send_now(payload["to"], payload["subject"], payload["html"], raise_on_error=True, key=payload.get("send_key"))
 
-def _logo_bar() -> str:
-    """Dark top bar with the traderefer logo (PNG icon + TRADE white / REFER orange)."""
-    return f"""
-    <table width="100%" cellpadding="0" cellspacing="0" border="0" style="background:#18181b;border-radius:12px 12px 0 0">
-      <tr>
-        <td style="padding:18px 24px">
-          <a href="{FRONTEND_URL}" style="text-decoration:none;display:inline-flex;align-items:center;gap:10px">
-            <img src="{FRONTEND_URL}/logo-dark.png" alt="traderefer" width="36" height="36"
-                 style="border-radius:8px;display:block" />
-            <span style="font-size:20px;font-weight:900;letter-spacing:-0.5px;line-height:1;font-family:sans-serif">
-              <span style="color:#ffffff">TRADE</span><span style="color:#ea580c">REFER</span>
-            </span>
-          </a>
-        </td>
-      </tr>
-    </table>"""
-
-
-def _email_footer(unsubscribe_note: str = "") -> str:
-    return f"""
-    <div style="padding:16px 24px;border-top:1px solid #e5e7eb;margin-top:8px">
-      <p style="font-size:11px;color:#9ca3af;margin:0;line-height:1.6">
-        &copy; {__import__('datetime').datetime.now().year} traderefer.au &nbsp;&mdash;&nbsp;
-        <a href="{FRONTEND_URL}" style="color:#9ca3af">traderefer.au</a>
-        {f' &nbsp;&mdash;&nbsp; {unsubscribe_note}' if unsubscribe_note else ''}
-      </p>
-    </div>"""
+
+@job_handler("email.batch")
+async def _deliver_email_batch(payload: dict):
+    """
+    Fan-out mail: batched sends; recipients rejected one by one are re-queued.
+    Sends are keyed by batch_id, so a retried job doesn't re-deliver what went out.
+    """
+    messages = payload["messages"]
+    delivery = get_email_delivery()
+    if delivery is None:
+        email_logger.error(f"RESEND_API_KEY not set ÃƒÂ¢Ã¢â€šÂ¬Ã¢â‚¬Â skipping {len(messages)} emails")
+        return
+    batch_id = payload.get("batch_id") or hashlib.sha1(json.dumps(messages, sort_keys=True).encode()).hexdigest()
+    results = await delivery.send_many(messages, idempotency_key=batch_id)
+    failed = [(i, m) for i, (m, r) in enumerate(zip(messages, results)) if not r["ok"]]
+    for i, message in failed:
+        # Same send key as the failed attempt; job key per batch and message so a retried batch doesn't queue it twice
+        await enqueue(
+            "email.send", {**message, "send_key": f"{batch_id}:{i}"},
+            priority=payload.get("priority", PRIORITY_NORMAL), delay=60,
+            idempotency_key=f"email.retry:{batch_id}:{i}:{message['to']}",
+        )
+    if failed:
+        email_logger.warning(f"Email batch: {len(results) - len(failed)} sent, {len(failed)} re-queued")
+
+
+async def _send(to: str, subject: str, html: str, priority: int = PRIORITY_NORMAL, db=None):
+    """Queue an email for the background worker (retried with backoff on failure)."""
+    await submit(
+        "email.send", {"to": to, "subject": subject, "html": html, "send_key": uuid.uuid4().hex},
+        priority=priority, subject=to, db=db,
+    )
 
 
-def _wrap(body_html: str, unsubscribe_note: str = "") -> str:
-    """Wrap email body with the standard logo header and footer."""
-    return f"""
-    <div style="font-family:sans-serif;max-width:600px;margin:0 auto;background:#fff;border-radius:12px;overflow:hidden;border:1px solid #e5e7eb">
-      {_logo_bar()}
-      <div style="padding:28px 24px">
-        {body_html}
-      </div>
-      {_email_footer(unsubscribe_note)}
-    </div>"""
+async def _send_batch(messages: list[dict], priority: int = PRIORITY_NORMAL, db=None):
+    """Queue fan-out mail ({"to", "subject", "html"} dicts) as batched jobs (in `db`'s transaction if given)."""
+    messages = [m for m in messages if m.get("to")]
+    if len(messages) == 1:
+        await _send(messages[0]["to"], messages[0]["subject"], messages[0]["html"], priority=priority, db=db)
+        return
+    for i in range(0, len(messages), JOB_BATCH_SIZE):
+        chunk = messages[i:i + JOB_BATCH_SIZE]
+        await submit(
+            "email.batch", {"messages": chunk, "priority": priority, "batch_id": uuid.uuid4().hex},
+            priority=priority, subject=hashlib.sha1(",".join(m["to"] for m in chunk).encode()).hexdigest(), db=db,
+        )
+
+
+async def _send_many(recipients: list[str], subject: str, html: str, priority: int = PRIORITY_NORMAL):
+    await _send_batch([{"to": r, "subject": subject, "html": html} for r in recipients], priority=priority)
+
 
+async def _send_template(to: str, template: EmailTemplate, priority: int = PRIORITY_NORMAL, **values):
+    subject, html = template.render(**values)
+    await _send(to, subject, html, priority=priority)
+
+
+async def _send_template_many(recipients: list[str], template: EmailTemplate, priority: int = PRIORITY_NORMAL, **values):
+    """Same copy to several recipients: rendered once."""
+    subject, html = template.render(**values)
+    await _send_many(recipients, subject, html, priority=priority)
+
+
+async def _send_template_bulk(template: EmailTemplate, rows: list[dict], priority: int = PRIORITY_NORMAL, db=None):
+    """Per-recipient copy for fan-out sends: each row holds "to" plus the template values."""
+    rendered = template.render_many(rows)
+    await _send_batch(
+        [{"to": row["to"], "subject": subject, "html": html} for row, (subject, html) in zip(rows, rendered)],
+        priority=priority, db=db,
+    )
+
+
+# ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬
+# SHARED EMAIL LAYOUT HELPERS
+# ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬ÃƒÂ¢Ã¢â‚¬ÂÃ¢â€šÂ¬
 
 def _lead_first_name(full_name: str) -> str:
     parts = [part for part in (full_name or "").strip().split() if part]
@@ -105,18 +120,24 @@ def _lead_summary(job_description: str, max_len: int = 140) -> str:
 
 # BUSINESS EMAILS
 
-async def send_business_welcome(email: str, business_name: str, slug: str):
-    body = f"""
+_BUSINESS_WELCOME = EmailTemplate(
+    subject="Welcome to traderefer.au ÃƒÂ¢Ã¢â€šÂ¬Ã¢â‚¬Â {business_name} is live!",
+    body="""
       <h1 style="color:#ea580c;margin-top:0">Welcome to traderefer.au, {business_name}!</h1>
       <p>Your business profile is live. Referrers can now start sending you leads.</p>
       <a href="{FRONTEND_URL}/b/{slug}" style="display:inline-block;background:#ea580c;color:#fff;padding:12px 24px;border-radius:8px;text-decoration:none;font-weight:bold">View Your Profile</a>
       <p style="margin-top:24px">Head to your <a href="{FRONTEND_URL}/dashboard/business">dashboard</a> to manage leads and set your referral fee.</p>
-    """
-    await _send(email, f"Welcome to traderefer.au ÃƒÂ¢Ã¢â€šÂ¬Ã¢â‚¬Â {business_name} is live!", _wrap(body))
+    """,
+)
 
 
-async def send_business_claim_verification_code(email: str, business_name: str, code: str):
-    body = f"""
+async def send_business_welcome(email: str, business_name: str, slug: str):
+    await _send_template(email, _BUSINESS_WELCOME, business_name=business_name, slug=slug)
+
+
+_BUSINESS_CLAIM_VERIFICATION_CODE = EmailTemplate(
+    subject="Your TradeRefer claim code for {business_name}",
+    body="""
       <h1 style="color:#ea580c;margin-top:0">Verify your claim for {business_name}</h1>
       <p>Use the verification code below to confirm you manage this business on traderefer.au.</p>
       <div style="background:#fff7ed;border:2px solid #ea580c;border-radius:12px;padding:24px;text-align:center;margin:24px 0">
@@ -125,56 +146,79 @@ async def send_business_claim_verification_code(email: str, business_name: str,
         <p style="color:#666;margin:8px 0 0 0;font-size:13px">Expires in 10 minutes</p>
       </div>
       <p style="color:#666">If you did not request this code, you can ignore this email.</p>
-    """
-    await _send(email, f"Your TradeRefer claim code for {business_name}", _wrap(body))
+    """,
+)
 
 
-async def send_business_claim_manual_review_notification(
-    claimant_name: str,
-    claimant_email: str,
-    claimant_phone: Optional[str],
-    business_name: str,
-    business_slug: Optional[str],
-    business_address: str,
-    reason: str,
-    government_id_url: str,
-    business_proof_url: str,
-    supporting_document_url: Optional[str] = None,
-):
-    recipients = [BUSINESS_VERIFICATION_OWNER_EMAIL]
-    if BUSINESS_VERIFICATION_EMAIL and BUSINESS_VERIFICATION_EMAIL not in recipients:
-        recipients.insert(0, BUSINESS_VERIFICATION_EMAIL)
-    body = f"""
+async def send_business_claim_verification_code(email: str, business_name: str, code: str):
+    await _send_template(
+        email,
+        _BUSINESS_CLAIM_VERIFICATION_CODE,
+        business_name=business_name,
+        code=code,
+        priority=PRIORITY_HIGH,
+    )
+
+
+_BUSINESS_CLAIM_MANUAL_REVIEW_NOTIFICATION = EmailTemplate(
+    subject="Manual verification submitted ÃƒÂ¢Ã¢â€šÂ¬Ã¢â‚¬Â {business_name}",
+    body="""
       <h1 style="color:#ea580c;margin-top:0">Manual business verification submitted</h1>
       <p>A claimant submitted paperwork for manual review on traderefer.au.</p>
       <table style="width:100%;border-collapse:collapse;margin:16px 0">
         <tr><td style="padding:8px;color:#666;font-weight:bold">Claimant</td><td style="padding:8px">{claimant_name}</td></tr>
         <tr style="background:#f9f9f9"><td style="padding:8px;color:#666;font-weight:bold">Email</td><td style="padding:8px">{claimant_email}</td></tr>
-        <tr><td style="padding:8px;color:#666;font-weight:bold">Phone</td><td style="padding:8px">{claimant_phone or 'Not provided'}</td></tr>
+        <tr><td style="padding:8px;color:#666;font-weight:bold">Phone</td><td style="padding:8px">{claimant_phone}</td></tr>
         <tr style="background:#f9f9f9"><td style="padding:8px;color:#666;font-weight:bold">Business</td><td style="padding:8px">{business_name}</td></tr>
-        <tr><td style="padding:8px;color:#666;font-weight:bold">Slug</td><td style="padding:8px">{business_slug or 'Not provided'}</td></tr>
+        <tr><td style="padding:8px;color:#666;font-weight:bold">Slug</td><td style="padding:8px">{business_slug}</td></tr>
         <tr style="background:#f9f9f9"><td style="padding:8px;color:#666;font-weight:bold">Address</td><td style="padding:8px">{business_address}</td></tr>
         <tr><td style="padding:8px;color:#666;font-weight:bold">Reason</td><td style="padding:8px">{reason}</td></tr>
       </table>
       <div style="background:#f9f9f9;border-radius:8px;padding:16px;margin:16px 0">
         <p style="margin:0 0 8px 0"><a href="{government_id_url}" style="color:#ea580c;font-weight:bold">View government ID</a></p>
         <p style="margin:0 0 8px 0"><a href="{business_proof_url}" style="color:#ea580c;font-weight:bold">View business proof</a></p>
-        {f'<p style="margin:0"><a href="{supporting_document_url}" style="color:#ea580c;font-weight:bold">View supporting document</a></p>' if supporting_document_url else ''}
+        {supporting_link}
       </div>
       <p style="color:#666">Review the paperwork and update the claim status in admin.</p>
-    """
-    await _send_many(recipients, f"Manual verification submitted ÃƒÂ¢Ã¢â€šÂ¬Ã¢â‚¬Â {business_name}", _wrap(body))
+    """,
+)
 
 
-async def send_business_new_lead(email: str, business_name: str, consumer_name: str, suburb: str, job_description: str, lead_id: str, unlock_fee_dollars: float, is_first_lead: bool = False):
-    fee_line = (
-        '<p style="color:#16a34a;font-weight:bold">&#127881; Your first enquiry is free to unlock!</p>'
-        if is_first_lead
-        else f'<p>Unlock fee: <strong style="color:#ea580c">${unlock_fee_dollars:.2f}</strong></p>'
+async def send_business_claim_manual_review_notification(
+    claimant_name: str,
+    claimant_email: str,
+    claimant_phone: Optional[str],
+    business_name: str,
+    business_slug: Optional[str],
+    business_address: str,
+    reason: str,
+    government_id_url: str,
+    business_proof_url: str,
+    supporting_document_url: Optional[str] = None,
+):
+    recipients = [BUSINESS_VERIFICATION_OWNER_EMAIL]
+    if BUSINESS_VERIFICATION_EMAIL and BUSINESS_VERIFICATION_EMAIL not in recipients:
+        recipients.insert(0, BUSINESS_VERIFICATION_EMAIL)
+    supporting_link = f'<p style="margin:0"><a href="{supporting_document_url}" style="color:#ea580c;font-weight:bold">View supporting document</a></p>' if supporting_document_url else ''
+    await _send_template_many(
+        recipients,
+        _BUSINESS_CLAIM_MANUAL_REVIEW_NOTIFICATION,
+        business_name=business_name,
+        claimant_name=claimant_name,
+        claimant_email=claimant_email,
+        claimant_phone=claimant_phone or 'Not provided',
+        business_slug=business_slug or 'Not provided',
+        business_address=business_address,
+        reason=reason,
+        government_id_url=government_id_url,
+        business_proof_url=business_proof_url,
+        supporting_link=supporting_link,
     )
-    first_name = _lead_first_name(consumer_name)
-    summary = _lead_summary(job_description)
-    body = f"""
+
+
+_BUSINESS_NEW_LEAD = EmailTemplate(
+    subject="New enquiry in {suburb} ÃƒÂ¢Ã¢â€šÂ¬Ã¢â‚¬Â log in to respond",
+    body="""
       <div style="background:#ea580c;padding:20px 24px;text-align:center;margin:-28px -24px 24px">
         <h1 style="color:#fff;margin:0;font-size:24px;font-weight:900">New enquiry for {business_name}</h1>
         <p style="color:#fed7aa;margin:8px 0 0;font-size:15px">Someone in {suburb} is waiting for your response on TradeRefer</p>
@@ -189,12 +233,51 @@ async def send_business_new_lead(email: str, business_name: str, consumer_name:
       <div style="text-align:center;margin:28px 0">
         <a href="{FRONTEND_URL}/dashboard/business/leads" style="display:inline-block;background:#ea580c;color:#fff;padding:14px 36px;border-radius:8px;text-decoration:none;font-weight:900;font-size:16px">Log In to View Enquiry &rarr;</a>
       </div>
-    """
-    await _send(email, f"New enquiry in {suburb} ÃƒÂ¢Ã¢â€šÂ¬Ã¢â‚¬Â log in to respond", _wrap(body, "You're receiving this as a registered business on traderefer.au."))
+    """,
+    unsubscribe_note="You're receiving this as a registered business on traderefer.au.",
+)
 
 
-async def send_business_lead_unlocked(email: str, business_name: str, consumer_name: str, consumer_phone: str, consumer_email: str, suburb: str, job_description: str):
-    body = f"""
+def _new_lead_fee_line(unlock_fee_dollars: float, is_first_lead: bool) -> str:
+    return (
+        '<p style="color:#16a34a;font-weight:bold">&#127881; Your first enquiry is free to unlock!</p>'
+        if is_first_lead
+        else f'<p>Unlock fee: <strong style="color:#ea580c">${unlock_fee_dollars:.2f}</strong></p>'
+    )
+
+
+async def send_business_new_lead(email: str, business_name: str, consumer_name: str, suburb: str, job_description: str, lead_id: str, unlock_fee_dollars: float, is_first_lead: bool = False):
+    first_name = _lead_first_name(consumer_name)
+    summary = _lead_summary(job_description)
+    await _send_template(
+        email,
+        _BUSINESS_NEW_LEAD,
+        suburb=suburb,
+        business_name=business_name,
+        first_name=first_name,
+        summary=summary,
+        fee_line=_new_lead_fee_line(unlock_fee_dollars, is_first_lead),
+    )
+
+
+async def send_business_new_leads(leads: list[dict], db=None):
+    """Fan-out version: `leads` are {"email", "business_name", "consumer_name", "suburb", "job_description", "unlock_fee_dollars"} rows."""
+    await _send_template_bulk(_BUSINESS_NEW_LEAD, [
+        {
+            "to": lead["email"],
+            "suburb": lead["suburb"],
+            "business_name": lead["business_name"],
+            "first_name": _lead_first_name(lead["consumer_name"]),
+            "summary": _lead_summary(lead["job_description"]),
+            "fee_line": _new_lead_fee_line(lead["unlock_fee_dollars"], False),
+        }
+        for lead in leads if lead.get("email")
+    ], db=db)
+
+
+_BUSINESS_LEAD_UNLOCKED = EmailTemplate(
+    subject="Lead unlocked ÃƒÂ¢Ã¢â€šÂ¬Ã¢â‚¬Â {consumer_name} in {suburb}",
+    body="""
       <h1 style="color:#ea580c;margin-top:0">Lead Unlocked ÃƒÂ¢Ã¢â€šÂ¬Ã¢â‚¬Â Contact Your Customer</h1>
       <p>You've successfully unlocked a lead. Here are the full contact details:</p>
       <table style="width:100%;border-collapse:collapse;margin:16px 0">
@@ -205,15 +288,25 @@ async def send_business_lead_unlocked(email: str, business_name: str, consumer_n
         <tr><td style="padding:8px;color:#666;font-weight:bold">Job</td><td style="padding:8px">{job_description}</td></tr>
       </table>
       <a href="{FRONTEND_URL}/dashboard/business/leads" style="display:inline-block;background:#ea580c;color:#fff;padding:12px 24px;border-radius:8px;text-decoration:none;font-weight:bold">View in Dashboard</a>
-    """
-    await _send(email, f"Lead unlocked ÃƒÂ¢Ã¢â€šÂ¬Ã¢â‚¬Â {consumer_name} in {suburb}", _wrap(body))
+    """,
+)
 
 
-async def send_business_enquiry_teaser(email: str, business_name: str, business_id: str, slug: str, consumer_name: str, suburb: str, job_description: str):
-    claim_url = f"{FRONTEND_URL}/claim/{slug}"
-    first_name = _lead_first_name(consumer_name)
-    summary = _lead_summary(job_description)
-    body = f"""
+async def send_business_lead_unlocked(email: str, business_name: str, consumer_name: str, consumer_phone: str, consumer_email: str, suburb: str, job_description: str):
+    await _send_template(
+        email,
+        _BUSINESS_LEAD_UNLOCKED,
+        consumer_name=consumer_name,
+        suburb=suburb,
+        consumer_phone=consumer_phone,
+        consumer_email=consumer_email,
+        job_description=job_description,
+    )
+
+
+_BUSINESS_ENQUIRY_TEASER = EmailTemplate(
+    subject="New enquiry in {suburb} ÃƒÂ¢Ã¢â€šÂ¬Ã¢â‚¬Â claim your profile to respond",
+    body="""
       <div style="background:#ea580c;padding:20px 24px;text-align:center;margin:-28px -24px 24px">
         <h1 style="color:#fff;margin:0;font-size:24px;font-weight:900">You have a new enquiry!</h1>
         <p style="color:#fed7aa;margin:8px 0 0;font-size:15px">A customer in {suburb} wants to hire {business_name}</p>
@@ -232,14 +325,29 @@ async def send_business_enquiry_teaser(email: str, business_name: str, business_
       <p style="font-size:14px;color:#666;border-top:1px solid #eee;padding-top:16px;margin-top:20px">
         Your first enquiry is completely free to view. traderefer.au is a free directory ÃƒÂ¢Ã¢â€šÂ¬Ã¢â‚¬Â claiming your profile takes 2 minutes.
       </p>
-    """
-    await _send(email, f"New enquiry in {suburb} ÃƒÂ¢Ã¢â€šÂ¬Ã¢â‚¬Â claim your profile to respond", _wrap(body, f"You received this because {business_name} is listed on traderefer.au. To opt out reply to this email."))
+    """,
+    unsubscribe_note="You received this because {business_name} is listed on traderefer.au. To opt out reply to this email.",
+)
 
 
-async def send_business_website_quote(email: str, business_name: str, consumer_name: str, suburb: str, job_description: str):
+async def send_business_enquiry_teaser(email: str, business_name: str, business_id: str, slug: str, consumer_name: str, suburb: str, job_description: str):
+    claim_url = f"{FRONTEND_URL}/claim/{slug}"
     first_name = _lead_first_name(consumer_name)
     summary = _lead_summary(job_description)
-    body = f"""
+    await _send_template(
+        email,
+        _BUSINESS_ENQUIRY_TEASER,
+        suburb=suburb,
+        business_name=business_name,
+        first_name=first_name,
+        summary=summary,
+        claim_url=claim_url,
+    )
+
+
+_BUSINESS_WEBSITE_QUOTE = EmailTemplate(
+    subject="Free website quote in {suburb} — respond now",
+    body="""
       <div style="background:#ea580c;padding:20px 24px;text-align:center;margin:-28px -24px 24px">
         <h1 style="color:#fff;margin:0;font-size:24px;font-weight:900">New free website quote</h1>
         <p style="color:#fed7aa;margin:8px 0 0;font-size:15px">A customer in {suburb} is waiting for your response</p>
@@ -253,26 +361,54 @@ async def send_business_website_quote(email: str, business_name: str, consumer_n
       <div style="text-align:center;margin:28px 0">
         <a href="{FRONTEND_URL}/dashboard/business/leads" style="display:inline-block;background:#ea580c;color:#fff;padding:14px 36px;border-radius:8px;text-decoration:none;font-weight:900;font-size:16px">Open Leads Dashboard &rarr;</a>
       </div>
-    """
-    await _send(email, f"Free website quote in {suburb} — respond now", _wrap(body, "You're receiving this as a claimed business on traderefer.au."))
+    """,
+    unsubscribe_note="You're receiving this as a claimed business on traderefer.au.",
+)
 
 
-async def send_consumer_quote_request_confirmation(email: str, consumer_name: str, match_count: int, trade_category: str, job_description: str, location: str):
-    body = f"""
+async def send_business_website_quote(email: str, business_name: str, consumer_name: str, suburb: str, job_description: str):
+    first_name = _lead_first_name(consumer_name)
+    summary = _lead_summary(job_description)
+    await _send_template(
+        email,
+        _BUSINESS_WEBSITE_QUOTE,
+        suburb=suburb,
+        business_name=business_name,
+        first_name=first_name,
+        summary=summary,
+    )
+
+
+_CONSUMER_QUOTE_REQUEST_CONFIRMATION = EmailTemplate(
+    subject="Your {trade_category} quote request has been received",
+    body="""
       <h1 style="color:#ea580c;margin-top:0">Your quote request has been received</h1>
       <p>Hi {consumer_name}, we’ve sent your request to up to <strong>{match_count} local providers</strong> for {trade_category} in <strong>{location}</strong>.</p>
       <table style="width:100%;border-collapse:collapse;margin:16px 0">
         <tr><td style="padding:8px;color:#666;font-weight:bold">Trade</td><td style="padding:8px">{trade_category}</td></tr>
         <tr style="background:#f9f9f9"><td style="padding:8px;color:#666;font-weight:bold">Location</td><td style="padding:8px">{location}</td></tr>
-        <tr><td style="padding:8px;color:#666;font-weight:bold">Job</td><td style="padding:8px">{job_description[:300]}</td></tr>
+        <tr><td style="padding:8px;color:#666;font-weight:bold">Job</td><td style="padding:8px">{job_description}</td></tr>
       </table>
       <p style="color:#666">Matched businesses may contact you directly by phone, SMS, or email.</p>
-    """
-    await _send(email, f"Your {trade_category} quote request has been received", _wrap(body))
+    """,
+)
 
 
-async def send_admin_quote_queue_alert(email: str, trade_category: str, location: str, job_description: str, urgency: str, claimed_count: int, target_count: int, request_id: str):
-    body = f"""
+async def send_consumer_quote_request_confirmation(email: str, consumer_name: str, match_count: int, trade_category: str, job_description: str, location: str):
+    await _send_template(
+        email,
+        _CONSUMER_QUOTE_REQUEST_CONFIRMATION,
+        trade_category=trade_category,
+        consumer_name=consumer_name,
+        match_count=match_count,
+        location=location,
+        job_description=job_description[:300],
+    )
+
+
+_ADMIN_QUOTE_QUEUE_ALERT = EmailTemplate(
+    subject="Admin review needed: {trade_category} quote in {location}",
+    body="""
       <h1 style="color:#ea580c;margin-top:0">Website quote needs admin review</h1>
       <p>A website quote request could not be fully supplied with claimed businesses and has been placed into the admin allocation queue.</p>
       <table style="width:100%;border-collapse:collapse;margin:16px 0">
@@ -281,17 +417,32 @@ async def send_admin_quote_queue_alert(email: str, trade_category: str, location
         <tr><td style="padding:8px;color:#666;font-weight:bold">Urgency</td><td style="padding:8px">{urgency}</td></tr>
         <tr style="background:#f9f9f9"><td style="padding:8px;color:#666;font-weight:bold">Claimed matches</td><td style="padding:8px">{claimed_count} / {target_count}</td></tr>
         <tr><td style="padding:8px;color:#666;font-weight:bold">Request ID</td><td style="padding:8px">{request_id}</td></tr>
-        <tr style="background:#f9f9f9"><td style="padding:8px;color:#666;font-weight:bold">Job</td><td style="padding:8px">{job_description[:400]}</td></tr>
+        <tr style="background:#f9f9f9"><td style="padding:8px;color:#666;font-weight:bold">Job</td><td style="padding:8px">{job_description}</td></tr>
       </table>
       <div style="text-align:center;margin:28px 0">
         <a href="{FRONTEND_URL}/admin" style="display:inline-block;background:#ea580c;color:#fff;padding:14px 36px;border-radius:8px;text-decoration:none;font-weight:900;font-size:16px">Open Admin Console &rarr;</a>
       </div>
-    """
-    await _send(email, f"Admin review needed: {trade_category} quote in {location}", _wrap(body))
+    """,
+)
 
 
-async def send_business_claimed_success(email: str, business_name: str, dashboard_url: str):
-    body = f"""
+async def send_admin_quote_queue_alert(email: str, trade_category: str, location: str, job_description: str, urgency: str, claimed_count: int, target_count: int, request_id: str):
+    await _send_template(
+        email,
+        _ADMIN_QUOTE_QUEUE_ALERT,
+        trade_category=trade_category,
+        location=location,
+        urgency=urgency,
+        claimed_count=claimed_count,
+        target_count=target_count,
+        request_id=request_id,
+        job_description=job_description[:400],
+    )
+
+
+_BUSINESS_CLAIMED_SUCCESS = EmailTemplate(
+    subject="Your profile is live on TradeRefer",
+    body="""
       <div style="background:#16a34a;padding:20px 24px;text-align:center;margin:-28px -24px 24px">
         <h1 style="color:#fff;margin:0;font-size:24px;font-weight:900">Your profile is live!</h1>
         <p style="color:#fff;margin:8px 0 0;font-size:15px">You can now view and respond to leads in your dashboard.</p>
@@ -301,22 +452,22 @@ async def send_business_claimed_success(email: str, business_name: str, dashboar
       <div style="text-align:center;margin:28px 0">
         <a href="{dashboard_url}" style="display:inline-block;background:#ea580c;color:#fff;padding:14px 36px;border-radius:8px;text-decoration:none;font-weight:900;font-size:16px">Open Dashboard &rarr;</a>
       </div>
-    """
-    await _send(email, f"Your profile is live on TradeRefer", _wrap(body))
+    """,
+)
 
 
-async def send_invitation_email(to_email: str, invitee_name: str, inviter_name: str, invitation_type: str, signup_url: str):
-    if invitation_type == "business":
-        headline = f"{inviter_name} invited you to get more leads ÃƒÂ¢Ã¢â€šÂ¬Ã¢â‚¬Â for free"
-        sub = "Join TradeRefer and start receiving qualified job enquiries from referrers who know you."
-        cta = "Claim Your Free Business Profile"
-        benefit = "Get leads, grow your business, pay only when you unlock a customer's details."
-    else:
-        headline = f"{inviter_name} thinks you'd be great at this"
-        sub = "Join TradeRefer and earn Prezzee gift cards just by recommending tradies to people you know."
-        cta = "Start Earning Rewards"
-        benefit = "Refer customers to tradies, earn $25+ Prezzee gift cards. No experience needed."
-    body = f"""
+async def send_business_claimed_success(email: str, business_name: str, dashboard_url: str):
+    await _send_template(
+        email,
+        _BUSINESS_CLAIMED_SUCCESS,
+        business_name=business_name,
+        dashboard_url=dashboard_url,
+    )
+
+
+_INVITATION = EmailTemplate(
+    subject="{inviter_name} invited you to join traderefer.au",
+    body="""
       <h1 style="color:#ea580c;margin-top:0">{headline}</h1>
       <p>Hi {invitee_name}, <strong>{inviter_name}</strong> has invited you to join <strong>traderefer.au</strong>.</p>
       <div style="background:#fff7ed;border:1px solid #fed7aa;border-radius:12px;padding:16px 20px;margin:20px 0">
@@ -330,12 +481,37 @@ async def send_invitation_email(to_email: str, invitee_name: str, inviter_name:
         </a>
       </div>
       <p style="color:#9ca3af;font-size:13px">This invitation was sent by {inviter_name} via traderefer.au.</p>
-    """
-    await _send(to_email, f"{inviter_name} invited you to join traderefer.au", _wrap(body))
+    """,
+)
 
 
-async def send_referral_reward_email(email: str, full_name: str, friends_count: int, amount_dollars: float):
-    body = f"""
+async def send_invitation_email(to_email: str, invitee_name: str, inviter_name: str, invitation_type: str, signup_url: str):
+    if invitation_type == "business":
+        headline = f"{inviter_name} invited you to get more leads ÃƒÂ¢Ã¢â€šÂ¬Ã¢â‚¬Â for free"
+        sub = "Join TradeRefer and start receiving qualified job enquiries from referrers who know you."
+        cta = "Claim Your Free Business Profile"
+        benefit = "Get leads, grow your business, pay only when you unlock a customer's details."
+    else:
+        headline = f"{inviter_name} thinks you'd be great at this"
+        sub = "Join TradeRefer and earn Prezzee gift cards just by recommending tradies to people you know."
+        cta = "Start Earning Rewards"
+        benefit = "Refer customers to tradies, earn $25+ Prezzee gift cards. No experience needed."
+    await _send_template(
+        to_email,
+        _INVITATION,
+        inviter_name=inviter_name,
+        headline=headline,
+        invitee_name=invitee_name,
+        sub=sub,
+        benefit=benefit,
+        signup_url=signup_url,
+        cta=cta,
+    )
+
+
+_REFERRAL_REWARD = EmailTemplate(
+    subject="ÃƒÂ°Ã…Â¸Ã…Â½Ã¢â‚¬Â° Your ${amount_dollars:.0f} Prezzee gift card is on its way!",
+    body="""
       <h1 style="color:#ea580c;margin-top:0">ÃƒÂ°Ã…Â¸Ã…Â½Ã¢â‚¬Â° You've earned a ${amount_dollars:.0f} gift card!</h1>
       <p>Congratulations {full_name}! You've successfully invited <strong>{friends_count} active friends</strong> to TradeRefer.</p>
       <div style="background:#f0fdf4;border:1px solid #86efac;border-radius:12px;padding:16px 20px;margin:20px 0;text-align:center">
@@ -350,13 +526,23 @@ async def send_referral_reward_email(email: str, full_name: str, friends_count:
           View My Dashboard ÃƒÂ¢Ã¢â‚¬Â Ã¢â‚¬â„¢
         </a>
       </div>
-    """
-    await _send(email, f"ÃƒÂ°Ã…Â¸Ã…Â½Ã¢â‚¬Â° Your ${amount_dollars:.0f} Prezzee gift card is on its way!", _wrap(body))
+    """,
+)
 
 
-async def send_referrer_application_received(business_email: str, business_name: str, referrer_name: str, referrer_suburb: str, application_id: str, intro_message: str = None):
-    intro_html = f'<div style="background:#f9f9f9;border-left:4px solid #ea580c;padding:12px 16px;border-radius:4px;margin:16px 0"><p style="margin:0;font-style:italic;color:#333">"{intro_message}"</p></div>' if intro_message else ""
-    body = f"""
+async def send_referral_reward_email(email: str, full_name: str, friends_count: int, amount_dollars: float):
+    await _send_template(
+        email,
+        _REFERRAL_REWARD,
+        amount_dollars=amount_dollars,
+        full_name=full_name,
+        friends_count=friends_count,
+    )
+
+
+_REFERRER_APPLICATION_RECEIVED = EmailTemplate(
+    subject="New referrer application from {referrer_name} ÃƒÂ¢Ã¢â€šÂ¬Ã¢â‚¬Â review now",
+    body="""
       <h1 style="color:#ea580c;margin-top:0">New referrer application from {referrer_name}</h1>
       <p><strong>{referrer_name}</strong> ({referrer_suburb}) has applied to join your referral network on TradeRefer.</p>
       {intro_html}
@@ -367,12 +553,25 @@ async def send_referrer_application_received(business_email: str, business_name:
           Review Application ÃƒÂ¢Ã¢â‚¬Â Ã¢â‚¬â„¢
         </a>
       </div>
-    """
-    await _send(business_email, f"New referrer application from {referrer_name} ÃƒÂ¢Ã¢â€šÂ¬Ã¢â‚¬Â review now", _wrap(body))
+    """,
+)
 
 
-async def send_application_approved(referrer_email: str, referrer_name: str, business_name: str, business_slug: str):
-    body = f"""
+async def send_referrer_application_received(business_email: str, business_name: str, referrer_name: str, referrer_suburb: str, application_id: str, intro_message: str = None):
+    intro_html = f'<div style="background:#f9f9f9;border-left:4px solid #ea580c;padding:12px 16px;border-radius:4px;margin:16px 0"><p style="margin:0;font-style:italic;color:#333">"{intro_message}"</p></div>' if intro_message else ""
+    await _send_template(
+        business_email,
+        _REFERRER_APPLICATION_RECEIVED,
+        referrer_name=referrer_name,
+        referrer_suburb=referrer_suburb,
+        intro_html=intro_html,
+        application_id=application_id,
+    )
+
+
+_APPLICATION_APPROVED = EmailTemplate(
+    subject="You're approved ÃƒÂ¢Ã¢â€šÂ¬Ã¢â‚¬Â manage {business_name} now!",
+    body="""
       <h1 style="color:#16a34a;margin-top:0">ÃƒÂ°Ã…Â¸Ã…Â½Ã¢â‚¬Â° You've been approved by {business_name}!</h1>
       <p>Hi {referrer_name}, great news ÃƒÂ¢Ã¢â€šÂ¬Ã¢â‚¬Â <strong>{business_name}</strong> has approved your referrer application.</p>
       <p>You can now open your command centre, copy your public referral link, and submit leads for AI follow-up and SMS verification.</p>
@@ -382,12 +581,23 @@ async def send_application_approved(referrer_email: str, referrer_name: str, bus
            Open Your Command Centre ÃƒÂ¢Ã¢â‚¬Â Ã¢â‚¬â„¢
         </a>
       </div>
-    """
-    await _send(referrer_email, f"You're approved ÃƒÂ¢Ã¢â€šÂ¬Ã¢â‚¬Â manage {business_name} now!", _wrap(body))
+    """,
+)
 
 
-async def send_application_rejected(referrer_email: str, referrer_name: str, business_name: str):
-    body = f"""
+async def send_application_approved(referrer_email: str, referrer_name: str, business_name: str, business_slug: str):
+    await _send_template(
+        referrer_email,
+        _APPLICATION_APPROVED,
+        business_name=business_name,
+        referrer_name=referrer_name,
+        business_slug=business_slug,
+    )
+
+
+_APPLICATION_REJECTED = EmailTemplate(
+    subject="Update on your application to {business_name}",
+    body="""
       <h1 style="color:#ea580c;margin-top:0">Update on your application to {business_name}</h1>
       <p>Hi {referrer_name}, unfortunately <strong>{business_name}</strong> has decided not to approve your referrer application at this time.</p>
       <p>There are thousands of other businesses on TradeRefer looking for great referrers ÃƒÂ¢Ã¢â€šÂ¬Ã¢â‚¬Â keep exploring!</p>
@@ -397,12 +607,22 @@ async def send_application_rejected(referrer_email: str, referrer_name: str, bus
           Find Other Businesses ÃƒÂ¢Ã¢â‚¬Â Ã¢â‚¬â„¢
         </a>
       </div>
-    """
-    await _send(referrer_email, f"Update on your application to {business_name}", _wrap(body))
+    """,
+)
 
 
-async def send_application_expired(referrer_email: str, referrer_name: str, business_name: str):
-    body = f"""
+async def send_application_rejected(referrer_email: str, referrer_name: str, business_name: str):
+    await _send_template(
+        referrer_email,
+        _APPLICATION_REJECTED,
+        business_name=business_name,
+        referrer_name=referrer_name,
+    )
+
+
+_APPLICATION_EXPIRED = EmailTemplate(
+    subject="Your application to {business_name} has expired",
+    body="""
       <h1 style="color:#ea580c;margin-top:0">Your application to {business_name} has expired</h1>
       <p>Hi {referrer_name}, your referrer application to <strong>{business_name}</strong> expired after 72 hours with no response.</p>
       <p>This can happen when businesses are busy. You're welcome to apply again, or explore other businesses on our platform.</p>
@@ -412,13 +632,22 @@ async def send_application_expired(referrer_email: str, referrer_name: str, busi
           Find Other Businesses ÃƒÂ¢Ã¢â‚¬Â Ã¢â‚¬â„¢
         </a>
       </div>
-    """
-    await _send(referrer_email, f"Your application to {business_name} has expired", _wrap(body))
+    """,
+)
 
 
-async def send_application_reminder(business_email: str, business_name: str, referrer_name: str, application_id: str, reminder_number: int):
-    hours_left = (3 - reminder_number) * 24
-    body = f"""
+async def send_application_expired(referrer_email: str, referrer_name: str, business_name: str):
+    await _send_template(
+        referrer_email,
+        _APPLICATION_EXPIRED,
+        business_name=business_name,
+        referrer_name=referrer_name,
+    )
+
+
+_APPLICATION_REMINDER = EmailTemplate(
+    subject="Reminder {reminder_number}/3: Action needed on referrer application",
+    body="""
       <h1 style="color:#ea580c;margin-top:0">Reminder {reminder_number}/3: Referrer application awaiting your review</h1>
       <p>Hi {business_name}, <strong>{referrer_name}</strong> is still waiting for your response on their referrer application.</p>
       <p style="color:#dc2626;font-weight:bold">ÃƒÂ¢Ã‚ÂÃ‚Â° Only ~{hours_left} hours left before this application auto-expires.</p>
@@ -428,25 +657,51 @@ async def send_application_reminder(business_email: str, business_name: str, ref
           Review Now ÃƒÂ¢Ã¢â‚¬Â Ã¢â‚¬â„¢
         </a>
       </div>
-    """
-    await _send(business_email, f"Reminder {reminder_number}/3: Action needed on referrer application", _wrap(body))
+    """,
+)
 
 
-async def send_consumer_lead_confirmation(email: str, consumer_name: str, business_name: str, trade_category: str, job_description: str):
-    body = f"""
+async def send_application_reminder(business_email: str, business_name: str, referrer_name: str, application_id: str, reminder_number: int):
+    hours_left = (3 - reminder_number) * 24
+    await _send_template(
+        business_email,
+        _APPLICATION_REMINDER,
+        reminder_number=reminder_number,
+        business_name=business_name,
+        referrer_name=referrer_name,
+        hours_left=hours_left,
+        application_id=application_id,
+    )
+
+
+_CONSUMER_LEAD_CONFIRMATION = EmailTemplate(
+    subject="Your request to {business_name} has been received",
+    body="""
       <h1 style="color:#ea580c;margin-top:0">Your request has been received</h1>
       <p>Hi {consumer_name}, your job request has been sent to <strong>{business_name}</strong>.</p>
       <table style="width:100%;border-collapse:collapse;margin:16px 0">
         <tr><td style="padding:8px;color:#666;font-weight:bold">Trade</td><td style="padding:8px">{trade_category}</td></tr>
-        <tr style="background:#f9f9f9"><td style="padding:8px;color:#666;font-weight:bold">Job</td><td style="padding:8px">{job_description[:300]}</td></tr>
+        <tr style="background:#f9f9f9"><td style="padding:8px;color:#666;font-weight:bold">Job</td><td style="padding:8px">{job_description}</td></tr>
       </table>
       <p style="color:#666">The business will be in touch with you soon. You may receive a call or SMS from them directly.</p>
-    """
-    await _send(email, f"Your request to {business_name} has been received", _wrap(body))
+    """,
+)
 
 
-async def send_consumer_on_the_way(email: str, consumer_name: str, business_name: str, pin: str):
-    body = f"""
+async def send_consumer_lead_confirmation(email: str, consumer_name: str, business_name: str, trade_category: str, job_description: str):
+    await _send_template(
+        email,
+        _CONSUMER_LEAD_CONFIRMATION,
+        business_name=business_name,
+        consumer_name=consumer_name,
+        trade_category=trade_category,
+        job_description=job_description[:300],
+    )
+
+
+_CONSUMER_ON_THE_WAY = EmailTemplate(
+    subject="{business_name} is on the way  your PIN is {pin}",
+    body="""
       <h1 style="color:#ea580c;margin-top:0">{business_name} is on the way</h1>
       <p>Hi {consumer_name}, your tradie from <strong>{business_name}</strong> is on the way to you now.</p>
       <div style="background:#fff7ed;border:2px solid #ea580c;border-radius:12px;padding:24px;text-align:center;margin:24px 0">
@@ -455,11 +710,22 @@ async def send_consumer_on_the_way(email: str, consumer_name: str, business_name
         <p style="color:#666;margin:8px 0 0 0;font-size:13px">Show this PIN when they arrive. It expires in 4 hours.</p>
       </div>
       <p style="color:#666">When the tradie arrives, show them this PIN so they can confirm the visit in TradeRefer.</p>
-    """
-    await _send(email, f"{business_name} is on the way  your PIN is {pin}", _wrap(body))
+    """,
+)
 
-async def send_referrer_lead_unlocked(email: str, full_name: str, business_name: str, suburb: str, payout_dollars: float, available_date: str):
-    body = f"""
+
+async def send_consumer_on_the_way(email: str, consumer_name: str, business_name: str, pin: str):
+    await _send_template(
+        email,
+        _CONSUMER_ON_THE_WAY,
+        business_name=business_name,
+        pin=pin,
+        consumer_name=consumer_name,
+    )
+
+_REFERRER_LEAD_UNLOCKED = EmailTemplate(
+    subject="Referral confirmed  ${payout_dollars:.2f} from {business_name}",
+    body="""
       <h1 style="color:#16a34a;margin-top:0">Your referral has been confirmed </h1>
       <p>Hi {full_name}, your referral for <strong>{business_name}</strong> in <strong>{suburb}</strong> has been confirmed.</p>
       <div style="background:#f0fdf4;border:1px solid #86efac;border-radius:12px;padding:16px 20px;margin:20px 0;text-align:center">
@@ -472,13 +738,26 @@ async def send_referrer_lead_unlocked(email: str, full_name: str, business_name:
           View My Dashboard 
         </a>
       </div>
-    """
-    await _send(email, f"Referral confirmed  ${payout_dollars:.2f} from {business_name}", _wrap(body))
+    """,
+)
 
 
-async def send_business_dispute_raised(email: str, business_name: str, lead_id: str, reason: str):
-    body = f"""
-      <h1 style="color:#ea580c;margin-top:0">Dispute received for lead {lead_id[:8]}</h1>
+async def send_referrer_lead_unlocked(email: str, full_name: str, business_name: str, suburb: str, payout_dollars: float, available_date: str):
+    await _send_template(
+        email,
+        _REFERRER_LEAD_UNLOCKED,
+        payout_dollars=payout_dollars,
+        business_name=business_name,
+        full_name=full_name,
+        suburb=suburb,
+        available_date=available_date,
+    )
+
+
+_BUSINESS_DISPUTE_RAISED = EmailTemplate(
+    subject="Dispute received for lead {lead_ref}",
+    body="""
+      <h1 style="color:#ea580c;margin-top:0">Dispute received for lead {lead_ref}</h1>
       <p>Hi {business_name}, your dispute has been recorded and our team will review it.</p>
       <div style="background:#fff7ed;border:1px solid #fed7aa;border-radius:12px;padding:16px 20px;margin:20px 0">
         <p style="margin:0;color:#9a3412;font-weight:600">Reason provided: {reason}</p>
@@ -490,188 +769,121 @@ async def send_business_dispute_raised(email: str, business_name: str, lead_id:
           View Leads Dashboard 
         </a>
       </div>
-    """
-    await _send(email, f"Dispute received for lead {lead_id[:8]}", _wrap(body))
-async def send_referrer_welcome(email: str, full_name: str):
-    body = f"""
-      <h1 style="color:#ea580c;margin-top:0">Welcome to TradeRefer, {full_name}!</h1>
-      <p>Your referrer profile is ready. You can now join businesses, submit leads, and track rewards from your dashboard.</p>
-      <div style="text-align:center;margin:28px 0">
-        <a href="{FRONTEND_URL}/dashboard/referrer" style="display:inline-block;background:#ea580c;color:#fff;padding:14px 32px;border-radius:999px;text-decoration:none;font-weight:900">Open Referrer Dashboard </a>
-      </div>
-    """
-    await _send(email, "Welcome to TradeRefer", _wrap(body))
-
-
-async def send_referrer_payout_processed(email: str, full_name: str, amount_dollars: float, method: str):
-    body = f"""
-      <h1 style="color:#16a34a;margin-top:0">Your withdrawal has been processed</h1>
-      <p>Hi {full_name}, your withdrawal of <strong>${amount_dollars:.2f}</strong> has been processed.</p>
-      <p>Method: <strong>{method}</strong></p>
-      <div style="text-align:center;margin:28px 0">
-        <a href="{FRONTEND_URL}/dashboard/referrer/withdraw" style="display:inline-block;background:#ea580c;color:#fff;padding:14px 32px;border-radius:999px;text-decoration:none;font-weight:900">View Withdrawals </a>
-      </div>
-    """
-    await _send(email, f"Withdrawal processed  ${amount_dollars:.2f}", _wrap(body))
-
-
-async def send_business_new_review(email: str, business_name: str, referrer_name: str, rating: int, comment: Optional[str], slug: str):
-    stars = "" * rating + "" * (5 - rating)
-    body = f"""
-      <h1 style="color:#ea580c;margin-top:0">You received a new review</h1>
-      <p><strong>{referrer_name}</strong> left a review for <strong>{business_name}</strong>.</p>
-      <div style="background:#fff7ed;border:1px solid #fed7aa;border-radius:12px;padding:16px 20px;margin:20px 0">
-        <p style="margin:0;font-size:24px;color:#ea580c;letter-spacing:4px">{stars}</p>
-        <p style="margin:8px 0 0 0;color:#555">{comment or 'No written comment provided.'}</p>
-      </div>
-      <div style="text-align:center;margin:28px 0">
-        <a href="{FRONTEND_URL}/b/{slug}" style="display:inline-block;background:#ea580c;color:#fff;padding:14px 32px;border-radius:999px;text-decoration:none;font-weight:900">View Business Profile </a>
-      </div>
-    """
-    await _send(email, f"New {rating}-star review for {business_name}", _wrap(body))
-
-
-async def send_referrer_review_request(email: str, full_name: str, business_name: str, rating: Optional[int] = None, comment: Optional[str] = None):
-    body = f"""
-      <h1 style="color:#ea580c;margin-top:0">You received feedback from {business_name}</h1>
-      <p>Hi {full_name}, <strong>{business_name}</strong> sent you new feedback in TradeRefer.</p>
-      {f'<p><strong>Rating:</strong> {rating}/5</p>' if rating is not None else ''}
-      {f'<p><strong>Comment:</strong> {comment}</p>' if comment else ''}
-      <div style="text-align:center;margin:28px 0">
-        <a href="{FRONTEND_URL}/dashboard/referrer" style="display:inline-block;background:#ea580c;color:#fff;padding:14px 32px;border-radius:999px;text-decoration:none;font-weight:900">View Dashboard </a>
-      </div>
-    """
-    await _send(email, f"Feedback from {business_name}", _wrap(body))
-
-
-async def send_referrer_earning_available(email: str, full_name: str, amount_dollars: float, business_name: str):
-    body = f"""
-      <h1 style="color:#16a34a;margin-top:0">Your earning is now available</h1>
-      <p>Hi {full_name}, your earning from <strong>{business_name}</strong> is now available in your wallet.</p>
-      <div style="background:#f0fdf4;border:1px solid #86efac;border-radius:12px;padding:16px 20px;margin:20px 0;text-align:center">
-        <p style="font-size:32px;font-weight:900;color:#16a34a;margin:0">${amount_dollars:.2f}</p>
-      </div>
-      <div style="text-align:center;margin:28px 0">
-        <a href="{FRONTEND_URL}/dashboard/referrer/withdraw" style="display:inline-block;background:#ea580c;color:#fff;padding:14px 32px;border-radius:999px;text-decoration:none;font-weight:900">Withdraw Earnings </a>
-      </div>
-    """
-    await _send(email, f"${amount_dollars:.2f} is now available", _wrap(body))
-
-
-async def send_dispute_resolved_business(email: str, business_name: str, outcome: str, admin_notes: Optional[str] = None):
-    outcome_label = 'confirmed' if outcome == 'confirm' else 'rejected'
-    body = f"""
-      <h1 style="color:#ea580c;margin-top:0">Your dispute has been resolved</h1>
-      <p>Hi {business_name}, your dispute has been <strong>{outcome_label}</strong>.</p>
-      <p>{admin_notes or 'No additional admin notes were provided.'}</p>
-      <div style="text-align:center;margin:28px 0">
-        <a href="{FRONTEND_URL}/dashboard/business/leads" style="display:inline-block;background:#ea580c;color:#fff;padding:14px 32px;border-radius:999px;text-decoration:none;font-weight:900">View Leads </a>
-      </div>
-    """
-    await _send(email, f"Dispute resolved for {business_name}", _wrap(body))
-
-
-async def send_dispute_resolved_referrer(email: str, full_name: str, outcome: str, business_name: str, amount_dollars: float):
-    outcome_label = 'confirmed' if outcome == 'confirm' else 'rejected'
-    body = f"""
-      <h1 style="color:#ea580c;margin-top:0">A disputed referral has been resolved</h1>
-      <p>Hi {full_name}, the dispute for your referral with <strong>{business_name}</strong> has been <strong>{outcome_label}</strong>.</p>
-      <p>Amount affected: <strong>${amount_dollars:.2f}</strong></p>
-      <div style="text-align:center;margin:28px 0">
-        <a href="{FRONTEND_URL}/dashboard/referrer" style="display:inline-block;background:#ea580c;color:#fff;padding:14px 32px;border-radius:999px;text-decoration:none;font-weight:900">View Dashboard </a>
-      </div>
-    """
-    await _send(email, f"Dispute resolved for {business_name}", _wrap(body))
-
-
-async def send_new_message_notification(email: str, recipient_name: str, sender_name: str, message_preview: str, conversation_url: str):
-    preview = message_preview[:180] + ('...' if len(message_preview) > 180 else '')
-    body = f"""
-      <h1 style="color:#ea580c;margin-top:0">You have a new message</h1>
-      <p>Hi {recipient_name}, <strong>{sender_name}</strong> sent you a new message.</p>
-      <div style="background:#f9fafb;border:1px solid #e5e7eb;border-radius:12px;padding:16px 20px;margin:20px 0">
-        <p style="margin:0;color:#555">{preview}</p>
-      </div>
-      <div style="text-align:center;margin:28px 0">
-        <a href="{FRONTEND_URL}{conversation_url}" style="display:inline-block;background:#ea580c;color:#fff;padding:14px 32px;border-radius:999px;text-decoration:none;font-weight:900">Reply in Dashboard </a>
-      </div>
-    """
-    await _send(email, f"New message from {sender_name}", _wrap(body))
-
-
-async def send_referrer_campaign_notification(email: str, full_name: str, business_name: str, campaign_title: str, promo_text: Optional[str], business_slug: str):
-    body = f"""
-      <h1 style="color:#ea580c;margin-top:0">New campaign from {business_name}</h1>
-      <p>Hi {full_name}, <strong>{business_name}</strong> launched a new campaign for referrers.</p>
-      <div style="background:#fff7ed;border:1px solid #fed7aa;border-radius:12px;padding:16px 20px;margin:20px 0">
-        <p style="margin:0;font-weight:700;color:#9a3412">{campaign_title}</p>
-        <p style="margin:8px 0 0 0;color:#555">{promo_text or 'Open the campaign to see the latest bonus details.'}</p>
-      </div>
-      <div style="text-align:center;margin:28px 0">
-        <a href="{FRONTEND_URL}/b/{business_slug}/refer" style="display:inline-block;background:#ea580c;color:#fff;padding:14px 32px;border-radius:999px;text-decoration:none;font-weight:900">View Campaign </a>
-      </div>
-    """
-    await _send(email, f"New campaign from {business_name}", _wrap(body))
+    """,
+)
 
 
+async def send_business_dispute_raised(email: str, business_name: str, lead_id: str, reason: str):
+    await _send_template(
+        email,
+        _BUSINESS_DISPUTE_RAISED,
+        lead_ref=lead_id[:8],
+        business_name=business_name,
+        reason=reason,
+    )
 async def send_email(to_email: str, subject: str, html_body: str):
     await _send(to_email, subject, html_body)
 
 
-async def send_referrer_welcome(email: str, full_name: str):
-    body = f"""
+_REFERRER_WELCOME = EmailTemplate(
+    subject="Welcome to TradeRefer",
+    body="""
       <h1 style="color:#ea580c;margin-top:0">Welcome to TradeRefer, {full_name}!</h1>
       <p>Your referrer profile is ready. You can now join businesses, submit leads, and track rewards from your dashboard.</p>
       <div style="text-align:center;margin:28px 0">
         <a href="{FRONTEND_URL}/dashboard/referrer" style="display:inline-block;background:#ea580c;color:#fff;padding:14px 32px;border-radius:999px;text-decoration:none;font-weight:900">Open Referrer Dashboard </a>
       </div>
-    """
-    await _send(email, "Welcome to TradeRefer", _wrap(body))
+    """,
+)
 
 
-async def send_referrer_payout_processed(email: str, full_name: str, amount_dollars: float, method: str):
-    body = f"""
+async def send_referrer_welcome(email: str, full_name: str):
+    await _send_template(email, _REFERRER_WELCOME, full_name=full_name)
+
+
+_REFERRER_PAYOUT_PROCESSED = EmailTemplate(
+    subject="Withdrawal processed  ${amount_dollars:.2f}",
+    body="""
       <h1 style="color:#16a34a;margin-top:0">Your withdrawal has been processed</h1>
       <p>Hi {full_name}, your withdrawal of <strong>${amount_dollars:.2f}</strong> has been processed.</p>
       <p>Method: <strong>{method}</strong></p>
       <div style="text-align:center;margin:28px 0">
         <a href="{FRONTEND_URL}/dashboard/referrer/withdraw" style="display:inline-block;background:#ea580c;color:#fff;padding:14px 32px;border-radius:999px;text-decoration:none;font-weight:900">View Withdrawals </a>
       </div>
-    """
-    await _send(email, f"Withdrawal processed  ${amount_dollars:.2f}", _wrap(body))
+    """,
+)
 
 
-async def send_business_new_review(email: str, business_name: str, referrer_name: str, rating: int, comment: Optional[str], slug: str):
-    stars = "" * rating + "" * (5 - rating)
-    body = f"""
+async def send_referrer_payout_processed(email: str, full_name: str, amount_dollars: float, method: str):
+    await _send_template(
+        email,
+        _REFERRER_PAYOUT_PROCESSED,
+        amount_dollars=amount_dollars,
+        full_name=full_name,
+        method=method,
+    )
+
+
+_BUSINESS_NEW_REVIEW = EmailTemplate(
+    subject="New {rating}-star review for {business_name}",
+    body="""
       <h1 style="color:#ea580c;margin-top:0">You received a new review</h1>
       <p><strong>{referrer_name}</strong> left a review for <strong>{business_name}</strong>.</p>
       <div style="background:#fff7ed;border:1px solid #fed7aa;border-radius:12px;padding:16px 20px;margin:20px 0">
         <p style="margin:0;font-size:24px;color:#ea580c;letter-spacing:4px">{stars}</p>
-        <p style="margin:8px 0 0 0;color:#555">{comment or 'No written comment provided.'}</p>
+        <p style="margin:8px 0 0 0;color:#555">{comment}</p>
       </div>
       <div style="text-align:center;margin:28px 0">
         <a href="{FRONTEND_URL}/b/{slug}" style="display:inline-block;background:#ea580c;color:#fff;padding:14px 32px;border-radius:999px;text-decoration:none;font-weight:900">View Business Profile </a>
       </div>
-    """
-    await _send(email, f"New {rating}-star review for {business_name}", _wrap(body))
+    """,
+)
 
 
-async def send_referrer_review_request(email: str, full_name: str, business_name: str, rating: Optional[int] = None, comment: Optional[str] = None):
-    body = f"""
+async def send_business_new_review(email: str, business_name: str, referrer_name: str, rating: int, comment: Optional[str], slug: str):
+    stars = "" * rating + "" * (5 - rating)
+    await _send_template(
+        email,
+        _BUSINESS_NEW_REVIEW,
+        rating=rating,
+        business_name=business_name,
+        referrer_name=referrer_name,
+        stars=stars,
+        comment=comment or 'No written comment provided.',
+        slug=slug,
+    )
+
+
+_REFERRER_REVIEW_REQUEST = EmailTemplate(
+    subject="Feedback from {business_name}",
+    body="""
       <h1 style="color:#ea580c;margin-top:0">You received feedback from {business_name}</h1>
       <p>Hi {full_name}, <strong>{business_name}</strong> sent you new feedback in TradeRefer.</p>
-      {f'<p><strong>Rating:</strong> {rating}/5</p>' if rating is not None else ''}
-      {f'<p><strong>Comment:</strong> {comment}</p>' if comment else ''}
+      {rating_line}
+      {comment_line}
       <div style="text-align:center;margin:28px 0">
         <a href="{FRONTEND_URL}/dashboard/referrer" style="display:inline-block;background:#ea580c;color:#fff;padding:14px 32px;border-radius:999px;text-decoration:none;font-weight:900">View Dashboard </a>
       </div>
-    """
-    await _send(email, f"Feedback from {business_name}", _wrap(body))
+    """,
+)
 
 
-async def send_referrer_earning_available(email: str, full_name: str, amount_dollars: float, business_name: str):
-    body = f"""
+async def send_referrer_review_request(email: str, full_name: str, business_name: str, rating: Optional[int] = None, comment: Optional[str] = None):
+    rating_line = f'<p><strong>Rating:</strong> {rating}/5</p>' if rating is not None else ''
+    comment_line = f'<p><strong>Comment:</strong> {comment}</p>' if comment else ''
+    await _send_template(
+        email,
+        _REFERRER_REVIEW_REQUEST,
+        business_name=business_name,
+        full_name=full_name,
+        rating_line=rating_line,
+        comment_line=comment_line,
+    )
+
+
+_REFERRER_EARNING_AVAILABLE = EmailTemplate(
+    subject="${amount_dollars:.2f} is now available",
+    body="""
       <h1 style="color:#16a34a;margin-top:0">Your earning is now available</h1>
       <p>Hi {full_name}, your earning from <strong>{business_name}</strong> is now available in your wallet.</p>
       <div style="background:#f0fdf4;border:1px solid #86efac;border-radius:12px;padding:16px 20px;margin:20px 0;text-align:center">
@@ -680,39 +892,85 @@ async def send_referrer_earning_available(email: str, full_name: str, amount_dol
       <div style="text-align:center;margin:28px 0">
         <a href="{FRONTEND_URL}/dashboard/referrer/withdraw" style="display:inline-block;background:#ea580c;color:#fff;padding:14px 32px;border-radius:999px;text-decoration:none;font-weight:900">Withdraw Earnings </a>
       </div>
-    """
-    await _send(email, f"${amount_dollars:.2f} is now available", _wrap(body))
+    """,
+)
 
 
-async def send_dispute_resolved_business(email: str, business_name: str, outcome: str, admin_notes: Optional[str] = None):
-    outcome_label = 'confirmed' if outcome == 'confirm' else 'rejected'
-    body = f"""
+async def send_referrer_earning_available(email: str, full_name: str, amount_dollars: float, business_name: str):
+    await _send_template(
+        email,
+        _REFERRER_EARNING_AVAILABLE,
+        amount_dollars=amount_dollars,
+        full_name=full_name,
+        business_name=business_name,
+    )
+
+
+async def send_referrer_earnings_available(earnings: list[dict], db=None):
+    """Fan-out version: `earnings` are {"email", "full_name", "amount_dollars", "business_name"} rows."""
+    await _send_template_bulk(_REFERRER_EARNING_AVAILABLE, [
+        {
+            "to": row["email"],
+            "full_name": row["full_name"],
+            "amount_dollars": row["amount_dollars"],
+            "business_name": row["business_name"],
+        }
+        for row in earnings if row.get("email")
+    ], db=db)
+
+
+_DISPUTE_RESOLVED_BUSINESS = EmailTemplate(
+    subject="Dispute resolved for {business_name}",
+    body="""
       <h1 style="color:#ea580c;margin-top:0">Your dispute has been resolved</h1>
       <p>Hi {business_name}, your dispute has been <strong>{outcome_label}</strong>.</p>
-      <p>{admin_notes or 'No additional admin notes were provided.'}</p>
+      <p>{admin_notes}</p>
       <div style="text-align:center;margin:28px 0">
         <a href="{FRONTEND_URL}/dashboard/business/leads" style="display:inline-block;background:#ea580c;color:#fff;padding:14px 32px;border-radius:999px;text-decoration:none;font-weight:900">View Leads </a>
       </div>
-    """
-    await _send(email, f"Dispute resolved for {business_name}", _wrap(body))
+    """,
+)
 
 
-async def send_dispute_resolved_referrer(email: str, full_name: str, outcome: str, business_name: str, amount_dollars: float):
+async def send_dispute_resolved_business(email: str, business_name: str, outcome: str, admin_notes: Optional[str] = None):
     outcome_label = 'confirmed' if outcome == 'confirm' else 'rejected'
-    body = f"""
+    await _send_template(
+        email,
+        _DISPUTE_RESOLVED_BUSINESS,
+        business_name=business_name,
+        outcome_label=outcome_label,
+        admin_notes=admin_notes or 'No additional admin notes were provided.',
+    )
+
+
+_DISPUTE_RESOLVED_REFERRER = EmailTemplate(
+    subject="Dispute resolved for {business_name}",
+    body="""
       <h1 style="color:#ea580c;margin-top:0">A disputed referral has been resolved</h1>
       <p>Hi {full_name}, the dispute for your referral with <strong>{business_name}</strong> has been <strong>{outcome_label}</strong>.</p>
       <p>Amount affected: <strong>${amount_dollars:.2f}</strong></p>
       <div style="text-align:center;margin:28px 0">
         <a href="{FRONTEND_URL}/dashboard/referrer" style="display:inline-block;background:#ea580c;color:#fff;padding:14px 32px;border-radius:999px;text-decoration:none;font-weight:900">View Dashboard </a>
       </div>
-    """
-    await _send(email, f"Dispute resolved for {business_name}", _wrap(body))
+    """,
+)
 
 
-async def send_new_message_notification(email: str, recipient_name: str, sender_name: str, message_preview: str, conversation_url: str):
-    preview = message_preview[:180] + ('...' if len(message_preview) > 180 else '')
-    body = f"""
+async def send_dispute_resolved_referrer(email: str, full_name: str, outcome: str, business_name: str, amount_dollars: float):
+    outcome_label = 'confirmed' if outcome == 'confirm' else 'rejected'
+    await _send_template(
+        email,
+        _DISPUTE_RESOLVED_REFERRER,
+        business_name=business_name,
+        full_name=full_name,
+        outcome_label=outcome_label,
+        amount_dollars=amount_dollars,
+    )
+
+
+_NEW_MESSAGE_NOTIFICATION = EmailTemplate(
+    subject="New message from {sender_name}",
+    body="""
       <h1 style="color:#ea580c;margin-top:0">You have a new message</h1>
       <p>Hi {recipient_name}, <strong>{sender_name}</strong> sent you a new message.</p>
       <div style="background:#f9fafb;border:1px solid #e5e7eb;border-radius:12px;padding:16px 20px;margin:20px 0">
@@ -721,27 +979,71 @@ async def send_new_message_notification(email: str, recipient_name: str, sender_
       <div style="text-align:center;margin:28px 0">
         <a href="{FRONTEND_URL}{conversation_url}" style="display:inline-block;background:#ea580c;color:#fff;padding:14px 32px;border-radius:999px;text-decoration:none;font-weight:900">Reply in Dashboard </a>
       </div>
-    """
-    await _send(email, f"New message from {sender_name}", _wrap(body))
+    """,
+)
 
 
-async def send_referrer_campaign_notification(email: str, full_name: str, business_name: str, campaign_title: str, promo_text: Optional[str], business_slug: str):
-    body = f"""
+async def send_new_message_notification(email: str, recipient_name: str, sender_name: str, message_preview: str, conversation_url: str):
+    preview = message_preview[:180] + ('...' if len(message_preview) > 180 else '')
+    await _send_template(
+        email,
+        _NEW_MESSAGE_NOTIFICATION,
+        sender_name=sender_name,
+        recipient_name=recipient_name,
+        preview=preview,
+        conversation_url=conversation_url,
+    )
+
+
+_REFERRER_CAMPAIGN_NOTIFICATION = EmailTemplate(
+    subject="New campaign from {business_name}",
+    body="""
       <h1 style="color:#ea580c;margin-top:0">New campaign from {business_name}</h1>
       <p>Hi {full_name}, <strong>{business_name}</strong> launched a new campaign for referrers.</p>
       <div style="background:#fff7ed;border:1px solid #fed7aa;border-radius:12px;padding:16px 20px;margin:20px 0">
         <p style="margin:0;font-weight:700;color:#9a3412">{campaign_title}</p>
-        <p style="margin:8px 0 0 0;color:#555">{promo_text or 'Open the campaign to see the latest bonus details.'}</p>
+        <p style="margin:8px 0 0 0;color:#555">{promo_text}</p>
       </div>
       <div style="text-align:center;margin:28px 0">
         <a href="{FRONTEND_URL}/b/{business_slug}/refer" style="display:inline-block;background:#ea580c;color:#fff;padding:14px 32px;border-radius:999px;text-decoration:none;font-weight:900">View Campaign </a>
       </div>
-    """
-    await _send(email, f"New campaign from {business_name}", _wrap(body))
+    """,
+)
 
-async def send_referrer_reward_claimable_email(email: str, full_name: str, balance_dollars: float):
-    """Notify referrer that their balance is claimable ($25–$249). Drive them to claim manually."""
-    body = f"""
+_CAMPAIGN_PROMO_FALLBACK = "Open the campaign to see the latest bonus details."
+
+
+async def send_referrer_campaign_notification(email: str, full_name: str, business_name: str, campaign_title: str, promo_text: Optional[str], business_slug: str):
+    await _send_template(
+        email,
+        _REFERRER_CAMPAIGN_NOTIFICATION,
+        full_name=full_name,
+        business_name=business_name,
+        campaign_title=campaign_title,
+        promo_text=promo_text or _CAMPAIGN_PROMO_FALLBACK,
+        business_slug=business_slug,
+        priority=PRIORITY_LOW,
+    )
+
+
+async def send_referrer_campaign_notifications(referrers: list[dict], business_name: str, campaign_title: str, promo_text: Optional[str], business_slug: str):
+    """Fan-out version: `referrers` are {"email", "full_name"} rows, sent as batches."""
+    await _send_template_bulk(_REFERRER_CAMPAIGN_NOTIFICATION, [
+        {
+            "to": ref["email"],
+            "full_name": ref["full_name"] or ref["email"],
+            "business_name": business_name,
+            "campaign_title": campaign_title,
+            "promo_text": promo_text or _CAMPAIGN_PROMO_FALLBACK,
+            "business_slug": business_slug,
+        }
+        for ref in referrers if ref.get("email")
+    ], priority=PRIORITY_LOW)
+
+
+_REFERRER_REWARD_CLAIMABLE = EmailTemplate(
+    subject="🎁 ${balance_dollars:.2f} in Prezzee credit is ready to claim!",
+    body="""
       <div style="background:#ea580c;padding:20px 24px;text-align:center;margin:-28px -24px 24px">
         <h1 style="color:#fff;margin:0;font-size:24px;font-weight:900">🎁 You have claimable Prezzee credit!</h1>
         <p style="color:#fed7aa;margin:8px 0 0;font-size:15px">Log in to claim your gift card now</p>
@@ -760,14 +1062,24 @@ async def send_referrer_reward_claimable_email(email: str, full_name: str, balan
           Claim My Gift Card →
         </a>
       </div>
-    """
-    await _send(email, f"🎁 ${balance_dollars:.2f} in Prezzee credit is ready to claim!", _wrap(body, "You're receiving this as a referrer on traderefer.au."))
+    """,
+    unsubscribe_note="You're receiving this as a referrer on traderefer.au.",
+)
 
 
-async def send_referrer_declaration_needed_email(email: str, full_name: str, balance_dollars: float):
-    """Notify referrer that their balance exceeds $75 and a tax declaration is needed."""
-    first = full_name.split()[0] if full_name else "there"
-    body = f"""
+async def send_referrer_reward_claimable_email(email: str, full_name: str, balance_dollars: float):
+    """Notify referrer that their balance is claimable ($25–$249). Drive them to claim manually."""
+    await _send_template(
+        email,
+        _REFERRER_REWARD_CLAIMABLE,
+        balance_dollars=balance_dollars,
+        full_name=full_name,
+    )
+
+
+_REFERRER_DECLARATION_NEEDED = EmailTemplate(
+    subject="📋 Quick declaration needed to claim ${balance_dollars:.2f}",
+    body="""
       <div style="background:#2563eb;padding:20px 24px;text-align:center;margin:-28px -24px 24px">
         <h1 style="color:#fff;margin:0;font-size:24px;font-weight:900">📋 Quick declaration needed</h1>
         <p style="color:#bfdbfe;margin:8px 0 0;font-size:15px">Unlock your ${balance_dollars:.2f} reward balance</p>
@@ -786,13 +1098,20 @@ async def send_referrer_declaration_needed_email(email: str, full_name: str, bal
         </a>
       </div>
       <p style="color:#888;font-size:13px">Alternatively, if you have an ABN, you can enter it on the claim page to skip the declaration entirely.</p>
-    """
-    await _send(email, f"📋 Quick declaration needed to claim ${balance_dollars:.2f}", _wrap(body, "You're receiving this as a referrer on traderefer.au."))
+    """,
+    unsubscribe_note="You're receiving this as a referrer on traderefer.au.",
+)
 
 
-async def send_referrer_prezzee_issued_email(email: str, full_name: str, amount_dollars: float):
-    """Notify referrer that their Prezzee gift card was automatically issued at $74.99."""
-    body = f"""
+async def send_referrer_declaration_needed_email(email: str, full_name: str, balance_dollars: float):
+    """Notify referrer that their balance exceeds $75 and a tax declaration is needed."""
+    first = full_name.split()[0] if full_name else "there"
+    await _send_template(email, _REFERRER_DECLARATION_NEEDED, balance_dollars=balance_dollars, first=first)
+
+
+_REFERRER_PREZZEE_ISSUED = EmailTemplate(
+    subject="🎉 Your ${amount_dollars:.2f} Prezzee gift card has been issued!",
+    body="""
       <div style="background:#16a34a;padding:20px 24px;text-align:center;margin:-28px -24px 24px">
         <h1 style="color:#fff;margin:0;font-size:24px;font-weight:900">🎉 Your Prezzee gift card is on its way!</h1>
         <p style="color:#bbf7d0;margin:8px 0 0;font-size:15px">Automatically issued — check your inbox</p>
@@ -811,20 +1130,19 @@ async def send_referrer_prezzee_issued_email(email: str, full_name: str, amount_
           View My Dashboard →
         </a>
       </div>
-    """
-    await _send(email, f"🎉 Your ${amount_dollars:.2f} Prezzee gift card has been issued!", _wrap(body, "You're receiving this as a referrer on traderefer.au."))
+    """,
+    unsubscribe_note="You're receiving this as a referrer on traderefer.au.",
+)
 
 
-async def send_badge_unlock_email(email: str, full_name: str, badge_label: str, badge_desc: str, next_badge_label: str | None = None):
-    next_section = ""
-    if next_badge_label:
-        next_section = f"""
-      <div style="background:#fff7ed;border:1px solid #fed7aa;border-radius:12px;padding:16px 20px;margin:20px 0">
-        <p style="margin:0;font-size:13px;font-weight:700;color:#9a3412;text-transform:uppercase;letter-spacing:0.05em">Next badge to unlock</p>
-        <p style="margin:6px 0 0;font-size:15px;font-weight:600;color:#c2410c">{next_badge_label}</p>
-      </div>
-    """
-    body = f"""
+async def send_referrer_prezzee_issued_email(email: str, full_name: str, amount_dollars: float):
+    """Notify referrer that their Prezzee gift card was automatically issued at $74.99."""
+    await _send_template(email, _REFERRER_PREZZEE_ISSUED, amount_dollars=amount_dollars, full_name=full_name)
+
+
+_BADGE_UNLOCK = EmailTemplate(
+    subject="🎖️ You just unlocked: {badge_label}!",
+    body="""
       <h1 style="color:#ea580c;margin-top:0">🎖️ Badge Unlocked: {badge_label}!</h1>
       <p>Congrats {full_name} — you just earned a new badge on TradeRefer.</p>
       <div style="background:#f0fdf4;border:1px solid #86efac;border-radius:12px;padding:20px 24px;margin:20px 0;text-align:center">
@@ -839,8 +1157,44 @@ async def send_badge_unlock_email(email: str, full_name: str, badge_label: str,
           View My Profile →
         </a>
       </div>
+    """,
+)
+
+
+async def send_badge_unlock_email(email: str, full_name: str, badge_label: str, badge_desc: str, next_badge_label: str | None = None):
+    next_section = ""
+    if next_badge_label:
+        next_section = f"""
+      <div style="background:#fff7ed;border:1px solid #fed7aa;border-radius:12px;padding:16px 20px;margin:20px 0">
+        <p style="margin:0;font-size:13px;font-weight:700;color:#9a3412;text-transform:uppercase;letter-spacing:0.05em">Next badge to unlock</p>
+        <p style="margin:6px 0 0;font-size:15px;font-weight:600;color:#c2410c">{next_badge_label}</p>
+      </div>
     """
-    await _send(email, f"🎖️ You just unlocked: {badge_label}!", _wrap(body))
+    await _send_template(
+        email,
+        _BADGE_UNLOCK,
+        badge_label=badge_label,
+        full_name=full_name,
+        badge_desc=badge_desc,
+        next_section=next_section,
+        priority=PRIORITY_LOW,
+    )
+
+
+_REENGAGEMENT = EmailTemplate(
+    subject="{subject}",
+    body="""
+      <h1 style="color:#ea580c;margin-top:0">{headline}</h1>
+      <p>{body_text}</p>
+      <div style="text-align:center;margin:28px 0">
+        <a href="{FRONTEND_URL}/dashboard/referrer"
+           style="background:#ea580c;color:#fff;font-weight:900;font-size:16px;padding:14px 32px;border-radius:999px;text-decoration:none;display:inline-block">
+          Open My Dashboard →
+        </a>
+      </div>
+      <p style="color:#888;font-size:13px">You're receiving this because you're a referrer on TradeRefer. <a href="{FRONTEND_URL}/dashboard/referrer" style="color:#888">Manage notifications</a></p>
+    """,
+)
 
 
 async def send_reengagement_email(email: str, full_name: str, next_badge_label: str | None, days_inactive: int):
@@ -858,15 +1212,11 @@ async def send_reengagement_email(email: str, full_name: str, next_badge_label:
         headline = f"New opportunities waiting, {full_name.split()[0]}"
         body_text = "There are new businesses in your area accepting referrer applications. Log in to grow your network."
 
-    body = f"""
-      <h1 style="color:#ea580c;margin-top:0">{headline}</h1>
-      <p>{body_text}</p>
-      <div style="text-align:center;margin:28px 0">
-        <a href="{FRONTEND_URL}/dashboard/referrer"
-           style="background:#ea580c;color:#fff;font-weight:900;font-size:16px;padding:14px 32px;border-radius:999px;text-decoration:none;display:inline-block">
-          Open My Dashboard →
-        </a>
-      </div>
-      <p style="color:#888;font-size:13px">You're receiving this because you're a referrer on TradeRefer. <a href="{FRONTEND_URL}/dashboard/referrer" style="color:#888">Manage notifications</a></p>
-    """
-    await _send(email, subject, _wrap(body))
\ No newline at end of file
+    await _send_template(
+        email,
+        _REENGAGEMENT,
+        subject=subject,
+        headline=headline,
+        body_text=body_text,
+        priority=PRIORITY_LOW,
+    )
\ No newline at end of file
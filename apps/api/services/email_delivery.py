@@ -0,0 +1,224 @@
+"""
+Email delivery engine.
+
+Every email goes through `get_email_delivery()`: one shared HTTP client to the
+Resend REST API, a semaphore bounding in-flight requests (Resend rate-limits
+per account), and batched sends for fan-out mail — up to BATCH_SIZE messages
+per `/emails/batch` request instead of one request per recipient.
+
+Results are reported per recipient as dicts:
+    {"to": "...", "ok": True, "id": "<resend id>", "error": None}
+
+Sends carry an Idempotency-Key header when the caller gives a key, so a
+retried job can't deliver the same email twice: Resend answers a repeated
+key with the original result. A batch falls back to one request per message
+only when Resend rejects it as invalid (400/422); after a timeout or a 5xx
+the batch may have been accepted, so the error is raised for the job to
+retry with the same keys.
+
+EMAIL_TRANSPORT=fake selects FakeEmailTransport, which records messages in
+memory instead of sending them — for local development and tests.
+"""
+
+import asyncio
+import os
+from typing import Dict, List, Optional
+
+import httpx
+
+from utils.logging_config import email_logger, error_logger
+
+RESEND_API_URL = os.getenv("RESEND_API_URL", "https://api.resend.com")
+EMAIL_TRANSPORT = os.getenv("EMAIL_TRANSPORT", "resend")  # resend | fake
+EMAIL_CONCURRENCY = int(os.getenv("EMAIL_CONCURRENCY", "4"))
+BATCH_SIZE = 100            # Resend's limit per /emails/batch request
+REQUEST_TIMEOUT = 15.0
+MAX_RATE_LIMIT_RETRIES = 2
+MAX_RETRY_AFTER = 10        # seconds; longer waits go back to the job queue
+REJECTED_STATUSES = (400, 422)  # batch refused as invalid, nothing sent
+
+Message = Dict[str, str]    # {"to", "subject", "html"}
+
+
+class EmailSendError(Exception):
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+def _result(to: str, ok: bool, id: Optional[str] = None, error: Optional[str] = None) -> dict:
+    return {"to": to, "ok": ok, "id": id, "error": error}
+
+
+class ResendTransport:
+    """Resend REST API over a shared httpx client."""
+
+    def __init__(self, api_key: str, from_address: str):
+        self.api_key = api_key
+        self.from_address = from_address
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=RESEND_API_URL,
+                timeout=REQUEST_TIMEOUT,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                limits=httpx.Limits(max_connections=EMAIL_CONCURRENCY, max_keepalive_connections=EMAIL_CONCURRENCY),
+            )
+        return self._client
+
+    def _body(self, message: Message) -> dict:
+        return {
+            "from": self.from_address,
+            "to": [message["to"]],
+            "subject": message["subject"],
+            "html": message["html"],
+        }
+
+    async def _post(self, path: str, json, idempotency_key: Optional[str] = None) -> dict | list:
+        headers = {"Idempotency-Key": idempotency_key} if idempotency_key else None
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            response = await self._http().post(path, json=json, headers=headers)
+            if response.status_code == 429 and attempt < MAX_RATE_LIMIT_RETRIES:
+                retry_after = float(response.headers.get("retry-after") or 1)
+                if retry_after <= MAX_RETRY_AFTER:
+                    await asyncio.sleep(retry_after)
+                    continue
+            if response.status_code >= 400:
+                raise EmailSendError(
+                    f"Resend {path} HTTP {response.status_code}: {response.text[:300]}", response.status_code
+                )
+            return response.json()
+        raise EmailSendError(f"Resend {path} rate limited", 429)
+
+    async def send(self, message: Message, idempotency_key: Optional[str] = None) -> str:
+        data = await self._post("/emails", self._body(message), idempotency_key)
+        return data.get("id")
+
+    async def send_batch(self, messages: List[Message], idempotency_key: Optional[str] = None) -> List[str]:
+        data = await self._post("/emails/batch", [self._body(m) for m in messages], idempotency_key)
+        items = data.get("data", []) if isinstance(data, dict) else data
+        return [item.get("id") for item in items]
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class FakeEmailTransport:
+    """Records messages instead of sending them; `fail` holds recipients that error."""
+
+    def __init__(self):
+        self.sent: List[Message] = []
+        self.batches: List[List[Message]] = []
+        self.fail: set[str] = set()
+        self.keys: Dict[str, object] = {}   # idempotency key -> first result, as Resend keeps them
+
+    def _accept(self, message: Message) -> str:
+        if message["to"] in self.fail:
+            raise EmailSendError(f"fake failure for {message['to']}")
+        self.sent.append(dict(message))
+        return f"fake-{len(self.sent)}"
+
+    async def send(self, message: Message, idempotency_key: Optional[str] = None) -> str:
+        if idempotency_key in self.keys:
+            return self.keys[idempotency_key]
+        message_id = self._accept(message)
+        if idempotency_key:
+            self.keys[idempotency_key] = message_id
+        return message_id
+
+    async def send_batch(self, messages: List[Message], idempotency_key: Optional[str] = None) -> List[str]:
+        if idempotency_key in self.keys:
+            return self.keys[idempotency_key]
+        # Mirror Resend: a batch is accepted or rejected as a whole
+        bad = [m["to"] for m in messages if m["to"] in self.fail]
+        if bad:
+            raise EmailSendError(f"fake batch failure for {bad}", 422)
+        self.batches.append([dict(m) for m in messages])
+        ids = [self._accept(m) for m in messages]
+        if idempotency_key:
+            self.keys[idempotency_key] = ids
+        return ids
+
+    async def aclose(self) -> None:
+        pass
+
+
+class EmailDelivery:
+    """Bounded-concurrency sends with per-recipient results."""
+
+    def __init__(self, transport, concurrency: int = EMAIL_CONCURRENCY):
+        self.transport = transport
+        self._limit = asyncio.Semaphore(concurrency)
+
+    async def send(self, message: Message, idempotency_key: Optional[str] = None) -> dict:
+        try:
+            async with self._limit:
+                message_id = await self.transport.send(message, idempotency_key)
+        except Exception as e:
+            error_logger.error(f"Failed to send email | to={message['to']} | subject={message['subject']} | error={e}")
+            return _result(message["to"], False, error=str(e)[:500])
+        email_logger.info(f"Email sent | to={message['to']} | subject={message['subject']} | id={message_id}")
+        return _result(message["to"], True, id=message_id)
+
+    async def send_many(self, messages: List[Message], idempotency_key: Optional[str] = None) -> List[dict]:
+        """
+        Send fan-out mail in batches of BATCH_SIZE. A batch rejected as invalid
+        is retried message by message so one bad address doesn't sink the
+        rest. Other batch errors are raised. With `idempotency_key`, batch n
+        is sent as "<key>:batch:<n>" and message i on its own as "<key>:<i>".
+        """
+        results = await asyncio.gather(*(
+            self._send_chunk(messages[i:i + BATCH_SIZE], i, idempotency_key)
+            for i in range(0, len(messages), BATCH_SIZE)
+        ))
+        return [r for chunk_results in results for r in chunk_results]
+
+    async def _send_chunk(self, chunk: List[Message], offset: int, key: Optional[str]) -> List[dict]:
+        message_keys = [f"{key}:{offset + i}" if key else None for i in range(len(chunk))]
+        if len(chunk) == 1:
+            return [await self.send(chunk[0], message_keys[0])]
+        try:
+            async with self._limit:
+                ids = await self.transport.send_batch(chunk, f"{key}:batch:{offset // BATCH_SIZE}" if key else None)
+        except EmailSendError as e:
+            if e.status not in REJECTED_STATUSES:
+                raise
+            email_logger.warning(f"Batch of {len(chunk)} emails rejected, sending individually: {e}")
+            return list(await asyncio.gather(*(self.send(m, k) for m, k in zip(chunk, message_keys))))
+        email_logger.info(f"Email batch sent | count={len(chunk)} | subject={chunk[0]['subject']}")
+        return [_result(m["to"], True, id=ids[i] if i < len(ids) else None) for i, m in enumerate(chunk)]
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+_delivery: Optional[EmailDelivery] = None
+
+
+def get_email_delivery() -> Optional[EmailDelivery]:
+    """Process-wide delivery engine, or None when no transport is configured."""
+    global _delivery
+    if _delivery is not None:
+        return _delivery
+    if EMAIL_TRANSPORT == "fake":
+        _delivery = EmailDelivery(FakeEmailTransport())
+        return _delivery
+    api_key = os.getenv("RESEND_API_KEY", "")
+    if not api_key:
+        return None
+    from_address = os.getenv("RESEND_FROM", "traderefer.au <no-reply@traderefer.au>")
+    if "@" not in from_address:
+        email_logger.error(f"Invalid RESEND_FROM address: {from_address}")
+    _delivery = EmailDelivery(ResendTransport(api_key, from_address))
+    return _delivery
+
+
+def set_email_transport(transport) -> EmailDelivery:
+    """Swap the transport (tests: `set_email_transport(FakeEmailTransport())`)."""
+    global _delivery
+    _delivery = EmailDelivery(transport)
+    return _delivery
@@ -0,0 +1,192 @@
+"""
+Pre-compiled email templates.
+
+Each `EmailTemplate` is compiled once at import: the shared layout (logo bar,
+card wrapper, footer) and constants such as FRONTEND_URL are folded into the
+literal text, and what remains is turned into a single generated f-string
+function. Rendering a recipient's copy is one call of that function instead
+of rebuilding the layout with nested f-strings. The footer year is re-baked
+only when the year changes.
+
+Placeholders use str.format syntax (`{business_name}`, `{amount:.2f}`);
+literal braces must be doubled. `render_many` renders a list of per-recipient
+value dicts for fan-out sends.
+
+Benchmark: python scripts/benchmark_email_templates.py
+"""
+
+import ast
+import os
+import time
+from string import Formatter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+FRONTEND_URL = os.getenv("FRONTEND_URL", "https://traderefer.au")
+
+TEMPLATE_CONSTANTS = {"FRONTEND_URL": FRONTEND_URL}
+
+# A compiled template is a list of literal strings and (name, conversion, spec) fields
+Piece = Union[str, Tuple[str, Optional[str], str]]
+
+_formatter = Formatter()
+
+
+def parse_template(source: str, constants: Optional[Dict[str, str]] = None) -> List[Piece]:
+    """
+    Split a str.format template into pieces, resolving `constants` into the
+    literal text. Raises ValueError on positional, attribute/index or nested
+    fields so mistakes fail at import.
+    """
+    constants = TEMPLATE_CONSTANTS if constants is None else constants
+    pieces: List[Piece] = []
+
+    def literal(text: str) -> None:
+        if not text:
+            return
+        if pieces and isinstance(pieces[-1], str):
+            pieces[-1] += text
+        else:
+            pieces.append(text)
+
+    for text, name, spec, conversion in _formatter.parse(source):
+        literal(text)
+        if name is None:
+            continue
+        if not name.isidentifier() or "{" in (spec or ""):
+            raise ValueError(f"Unsupported template field {{{name}}}")
+        if name in constants:
+            literal(_formatter.format_field(_formatter.convert_field(constants[name], conversion), spec or ""))
+        else:
+            pieces.append((name, conversion, spec or ""))
+    return pieces
+
+
+def _join(*parts: List[Piece]) -> List[Piece]:
+    joined: List[Piece] = []
+    for part in parts:
+        for piece in part:
+            if isinstance(piece, str) and joined and isinstance(joined[-1], str):
+                joined[-1] += piece
+            else:
+                joined.append(piece)
+    return joined
+
+
+def compile_pieces(pieces: List[Piece]) -> Callable[[dict], str]:
+    """Generate `lambda values: f"...{values['name']}..."` for the pieces."""
+    values = []
+    for piece in pieces:
+        if isinstance(piece, str):
+            values.append(ast.Constant(piece))
+            continue
+        name, conversion, spec = piece
+        values.append(ast.FormattedValue(
+            value=ast.Subscript(ast.Name("values", ast.Load()), ast.Constant(name), ast.Load()),
+            conversion=ord(conversion) if conversion else -1,
+            format_spec=ast.JoinedStr([ast.Constant(spec)]) if spec else None,
+        ))
+    fn = ast.Lambda(
+        args=ast.arguments(posonlyargs=[], args=[ast.arg("values")], kwonlyargs=[], kw_defaults=[], defaults=[]),
+        body=ast.JoinedStr(values),
+    )
+    code = compile(ast.fix_missing_locations(ast.Expression(fn)), "<email template>", "eval")
+    return eval(code, {})
+
+
+# ── Layout ──
+# Kept byte-for-byte compatible with the layout the send_* helpers used to build per call.
+
+_LOGO_BAR = f"""
+    <table width="100%" cellpadding="0" cellspacing="0" border="0" style="background:#18181b;border-radius:12px 12px 0 0">
+      <tr>
+        <td style="padding:18px 24px">
+          <a href="{FRONTEND_URL}" style="text-decoration:none;display:inline-flex;align-items:center;gap:10px">
+            <img src="{FRONTEND_URL}/logo-dark.png" alt="traderefer" width="36" height="36"
+                 style="border-radius:8px;display:block" />
+            <span style="font-size:20px;font-weight:900;letter-spacing:-0.5px;line-height:1;font-family:sans-serif">
+              <span style="color:#ffffff">TRADE</span><span style="color:#ea580c">REFER</span>
+            </span>
+          </a>
+        </td>
+      </tr>
+    </table>"""
+
+
+def _footer(year: int, unsubscribe_note: str = "") -> str:
+    return f"""
+    <div style="padding:16px 24px;border-top:1px solid #e5e7eb;margin-top:8px">
+      <p style="font-size:11px;color:#9ca3af;margin:0;line-height:1.6">
+        &copy; {year} traderefer.au &nbsp;&mdash;&nbsp;
+        <a href="{FRONTEND_URL}" style="color:#9ca3af">traderefer.au</a>
+        {f' &nbsp;&mdash;&nbsp; {unsubscribe_note}' if unsubscribe_note else ''}
+      </p>
+    </div>"""
+
+
+def _layout(body_html: str, footer_html: str) -> str:
+    return f"""
+    <div style="font-family:sans-serif;max-width:600px;margin:0 auto;background:#fff;border-radius:12px;overflow:hidden;border:1px solid #e5e7eb">
+      {_LOGO_BAR}
+      <div style="padding:28px 24px">
+        {body_html}
+      </div>
+      {footer_html}
+    </div>"""
+
+
+_year_cache = (0.0, 0)  # (valid_until epoch seconds, year)
+
+
+def _current_year() -> int:
+    global _year_cache
+    now = time.time()
+    if now >= _year_cache[0]:
+        year = time.localtime(now).tm_year
+        next_year = time.mktime((year + 1, 1, 1, 0, 0, 0, 0, 0, -1))
+        _year_cache = (min(next_year, now + 3600), year)
+    return _year_cache[1]
+
+
+def wrap(body_html: str, unsubscribe_note: str = "") -> str:
+    """Wrap already-rendered body HTML in the standard layout (ad-hoc emails)."""
+    return _layout(body_html, _footer(_current_year(), unsubscribe_note))
+
+
+class EmailTemplate:
+    """A subject + body pair compiled once, rendered many times."""
+
+    def __init__(self, subject: str, body: str, unsubscribe_note: str = ""):
+        subject_pieces = parse_template(subject)
+        self._body = parse_template(body)
+        self._note = parse_template(unsubscribe_note)
+        self.fields = tuple(dict.fromkeys(
+            p[0] for p in subject_pieces + self._body + self._note if not isinstance(p, str)
+        ))
+        self._subject = compile_pieces(subject_pieces)
+        self._year = 0
+        self._html: Callable[[dict], str] = str
+        self._compile_html(_current_year())
+
+    def _compile_html(self, year: int) -> None:
+        marker_body, marker_note = "\x00body\x00", "\x00note\x00"
+        layout = _layout(marker_body, _footer(year, marker_note if self._note else ""))
+        head, rest = layout.split(marker_body)
+        middle, tail = rest.split(marker_note) if self._note else (rest, "")
+        note = self._note if self._note else []
+        self._html = compile_pieces(_join([head], self._body, [middle], note, [tail]))
+        self._year = year
+
+    def _html_fn(self) -> Callable[[dict], str]:
+        year = _current_year()
+        if year != self._year:
+            self._compile_html(year)
+        return self._html
+
+    def render(self, **values) -> Tuple[str, str]:
+        """Return (subject, html) for one recipient."""
+        return self._subject(values), self._html_fn()(values)
+
+    def render_many(self, rows: Iterable[dict]) -> List[Tuple[str, str]]:
+        """Render (subject, html) for each value dict, sharing the compiled functions."""
+        subject, html = self._subject, self._html_fn()
+        return [(subject(row), html(row)) for row in rows]
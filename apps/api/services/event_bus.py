@@ -1,26 +1,85 @@
 """
-In-memory SSE event bus. Maps user_id → set of asyncio.Queue.
+SSE event bus. Maps user_id → set of asyncio.Queue.
 Supports multiple tabs/devices per user (each gets its own queue).
+
+Events are fanned out across uvicorn workers, replicas and the job worker
+through the pub/sub backend selected by EVENT_BUS_BACKEND (services/pubsub.py);
+on the memory backend only listeners in the publishing process receive them,
+so the job worker won't run with it.
+
+Every event carries a sequence number that increases per user (drawn from a
+shared counter, so one user's ids have gaps). Each process keeps the last
+EVENT_REPLAY_SIZE events per user, so a reconnecting client that sends
+Last-Event-ID gets what it missed; when the gap can't be proven closed it
+also gets a `resync` event telling it to refetch.
+
+Queue items are (seq, message) tuples; seq is None for events that can't be
+replayed. A None item means the listener was dropped for being too slow and
+should disconnect (the client reconnects and replays).
 """
 
 import asyncio
 import json
-from typing import Dict, Set
+import os
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional, Set, Tuple
+
+from services.pubsub import Channel, select_backend
 from utils.logging_config import error_logger
 
+EVENT_BUS_CHANNEL = os.getenv("EVENT_BUS_CHANNEL", "traderefer_events")
+EVENT_REPLAY_SIZE = int(os.getenv("EVENT_REPLAY_SIZE", "50"))      # events kept per user
+EVENT_REPLAY_USERS = int(os.getenv("EVENT_REPLAY_USERS", "5000"))  # users kept, least recent evicted
+QUEUE_SIZE = 50
+
+RESYNC_MESSAGE = json.dumps({"type": "resync", "payload": {}})
+
+Event = Tuple[Optional[int], str]
+
+_UNSET = object()
+
 
 class EventBus:
-    def __init__(self):
+    def __init__(self, backend=_UNSET):
         self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._history: "OrderedDict[str, Deque[Event]]" = OrderedDict()
+        self._backend = backend
+        self._channel: Optional[Channel] = None
+        self._seq = 0                       # memory backend only
+        self._pending: Set[asyncio.Task] = set()
+        self._stats = {"published": 0, "delivered": 0, "dropped": 0, "replayed": 0, "resyncs": 0, "local_fallbacks": 0}
+
+    # ── Listeners ──
 
-    def subscribe(self, user_id: str) -> asyncio.Queue:
-        """Register a new SSE listener for a user. Returns a Queue to await on."""
-        q: asyncio.Queue = asyncio.Queue(maxsize=50)
+    def subscribe(self, user_id: str, last_event_id: Optional[int] = None) -> asyncio.Queue:
+        """
+        Register a new SSE listener for a user. Returns a Queue to await on,
+        pre-filled with the events after `last_event_id` when given.
+        """
+        self._ensure_started()
+        q: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE + EVENT_REPLAY_SIZE + 1)
+        if last_event_id is not None:
+            self._replay(user_id, last_event_id, q)
         if user_id not in self._subscribers:
             self._subscribers[user_id] = set()
         self._subscribers[user_id].add(q)
         return q
 
+    def _replay(self, user_id: str, last_event_id: int, q: asyncio.Queue) -> None:
+        history = list(self._history.get(user_id, ()))
+        seqs = [seq for seq, _ in history]
+        if last_event_id in seqs:
+            missed = history[seqs.index(last_event_id) + 1:]
+        else:
+            # The client's last event was evicted or predates this process
+            missed = [e for e in history if e[0] > last_event_id]
+        for event in missed:
+            q.put_nowait(event)
+        self._stats["replayed"] += len(missed)
+        if last_event_id not in seqs:
+            q.put_nowait((None, RESYNC_MESSAGE))
+            self._stats["resyncs"] += 1
+
     def unsubscribe(self, user_id: str, q: asyncio.Queue):
         """Remove a listener when the SSE connection closes."""
         subs = self._subscribers.get(user_id)
@@ -29,26 +88,100 @@ class EventBus:
             if not subs:
                 del self._subscribers[user_id]
 
+    # ── Publishing ──
+
     def publish(self, user_id: str, event_type: str, payload: dict = None):
-        """Push an event to all connected listeners for a user. Non-blocking, fire-and-forget."""
+        """Push an event to all connected listeners for a user, on every process. Non-blocking, fire-and-forget."""
+        message = json.dumps({"type": event_type, "payload": payload or {}})
+        self._stats["published"] += 1
+        self._ensure_started()
+        if self._channel is None:
+            self._seq += 1
+            self._deliver(user_id, self._seq, message)
+            return
+        try:
+            task = asyncio.get_running_loop().create_task(self._publish_remote(user_id, message))
+        except RuntimeError:
+            self._deliver(user_id, None, message)
+            return
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _publish_remote(self, user_id: str, message: str):
+        try:
+            await self._channel.publish(user_id, message)
+        except Exception as e:
+            error_logger.warning(f"Event bus publish via {self._channel.backend.name} failed, delivering locally: {e}")
+            self._stats["local_fallbacks"] += 1
+            self._deliver(user_id, None, message)
+
+    def _deliver(self, user_id: str, seq: Optional[int], message: str):
+        if seq is not None:
+            history = self._history.get(user_id)
+            if history is None:
+                history = self._history[user_id] = deque(maxlen=EVENT_REPLAY_SIZE)
+                if len(self._history) > EVENT_REPLAY_USERS:
+                    self._history.popitem(last=False)
+            else:
+                self._history.move_to_end(user_id)
+            history.append((seq, message))
+
         subs = self._subscribers.get(user_id)
         if not subs:
-            return  # No one listening — skip
-        message = json.dumps({"type": event_type, "payload": payload or {}})
+            return  # No one listening here — skip
         dead: list[asyncio.Queue] = []
         for q in subs:
             try:
-                q.put_nowait(message)
+                q.put_nowait((seq, message))
+                self._stats["delivered"] += 1
             except asyncio.QueueFull:
                 dead.append(q)
-        # Drop slow consumers
+        # Drop slow consumers; they reconnect and replay from Last-Event-ID
         for q in dead:
             subs.discard(q)
+            while not q.empty():
+                q.get_nowait()
+            q.put_nowait(None)
+            self._stats["dropped"] += 1
             error_logger.warning(f"SSE queue full for user {user_id[:8]}…, dropped")
+        if not subs:
+            del self._subscribers[user_id]
+
+    # ── Backend lifecycle ──
+
+    def _ensure_started(self):
+        if self._backend is _UNSET:
+            self._backend = select_backend(EVENT_BUS_CHANNEL, sequence="event_bus_seq")
+        if self._backend is not None and self._channel is None:
+            self._channel = Channel(self._backend, self._deliver)
+        if self._channel is not None:
+            self._channel.start()
+
+    def cross_process(self) -> bool:
+        """Whether events published here reach listeners in other processes."""
+        self._ensure_started()
+        return self._channel is not None
+
+    async def aclose(self):
+        if self._channel is not None:
+            await self._channel.aclose()
+
+    # ── Metrics ──
 
     def connected_count(self) -> int:
         return sum(len(s) for s in self._subscribers.values())
 
+    def stats(self) -> dict:
+        """Per-process listener and delivery counters."""
+        return {
+            "backend": self._channel.backend.name if self._channel else "memory",
+            "backend_ready": self._channel.ready if self._channel else True,
+            "connected": self.connected_count(),
+            "connected_users": len(self._subscribers),
+            "replay_users": len(self._history),
+            **self._stats,
+        }
+
 
 # Singleton — import this from anywhere
 event_bus = EventBus()
@@ -0,0 +1,109 @@
+"""
+Request-scoped identity resolver.
+
+Resolves the business and referrer profiles owned by the authenticated user in
+one query and keeps the result in a short-TTL in-process cache, so handlers
+stop issuing their own `SELECT id FROM businesses/referrers WHERE user_id = …`.
+
+Use `Depends(get_identity)` in routes (FastAPI resolves it once per request),
+or `await resolve_identity(db, user_id)` from helpers. Call the `invalidate_*`
+hooks after onboarding, claims and any change to status/fee/stage.
+
+Users with neither profile yet aren't cached: the invalidate hooks only reach
+the worker that ran them, and a user who has just onboarded must not be sent
+back to onboarding by another worker.
+"""
+
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional, Tuple
+from fastapi import Depends
+from pydantic import BaseModel
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.auth import get_current_user, AuthenticatedUser
+from services.database import get_db
+
+IDENTITY_CACHE_TTL = 30  # seconds
+IDENTITY_CACHE_SIZE = 5000
+
+
+class UserIdentity(BaseModel):
+    user_id: str
+    business_id: Optional[uuid.UUID] = None
+    business_status: Optional[str] = None
+    referral_fee_cents: Optional[int] = None
+    referrer_id: Optional[uuid.UUID] = None
+    referrer_status: Optional[str] = None
+    accountability_stage: Optional[str] = None
+
+    @property
+    def has_business(self) -> bool:
+        return self.business_id is not None
+
+    @property
+    def has_referrer(self) -> bool:
+        return self.referrer_id is not None
+
+
+_IDENTITY_QUERY = text("""
+    SELECT b.id AS business_id, b.status AS business_status, b.referral_fee_cents,
+           r.id AS referrer_id, r.status AS referrer_status, r.accountability_stage
+    FROM (SELECT CAST(:uid AS uuid) AS uid) u
+    LEFT JOIN LATERAL (
+        SELECT id, status, referral_fee_cents FROM businesses WHERE user_id = u.uid LIMIT 1
+    ) b ON true
+    LEFT JOIN LATERAL (
+        SELECT id, status, accountability_stage FROM referrers WHERE user_id = u.uid LIMIT 1
+    ) r ON true
+""")
+
+_cache: "OrderedDict[str, Tuple[float, UserIdentity]]" = OrderedDict()
+
+
+async def resolve_identity(db: AsyncSession, user_id: str) -> UserIdentity:
+    """Return the cached identity for `user_id`, loading it in one query on a miss."""
+    cached = _cache.get(user_id)
+    if cached is not None:
+        expires_at, identity = cached
+        if expires_at > time.monotonic():
+            return identity
+        _cache.pop(user_id, None)
+
+    result = await db.execute(_IDENTITY_QUERY, {"uid": uuid.UUID(user_id)})
+    row = result.mappings().first() or {}
+    identity = UserIdentity(user_id=user_id, **dict(row))
+    if not identity.has_business and not identity.has_referrer:
+        return identity
+
+    _cache[user_id] = (time.monotonic() + IDENTITY_CACHE_TTL, identity)
+    while len(_cache) > IDENTITY_CACHE_SIZE:
+        _cache.popitem(last=False)
+    return identity
+
+
+async def get_identity(
+    db: AsyncSession = Depends(get_db),
+    user: AuthenticatedUser = Depends(get_current_user),
+) -> UserIdentity:
+    return await resolve_identity(db, user.id)
+
+
+def invalidate_identity(user_id: str) -> None:
+    _cache.pop(str(user_id), None)
+
+
+def invalidate_business(business_id) -> None:
+    """Drop cached identities owning `business_id` (admin edits, where the user id is unknown)."""
+    business_id = str(business_id)
+    for key, (_, identity) in list(_cache.items()):
+        if identity.business_id is not None and str(identity.business_id) == business_id:
+            _cache.pop(key, None)
+
+
+def invalidate_referrer(referrer_id) -> None:
+    referrer_id = str(referrer_id)
+    for key, (_, identity) in list(_cache.items()):
+        if identity.referrer_id is not None and str(identity.referrer_id) == referrer_id:
+            _cache.pop(key, None)
@@ -0,0 +1,367 @@
+"""
+Durable background jobs on Postgres.
+
+Jobs live in the `jobs` table (neon/migrations/023_jobs.sql). Producers call
+`await enqueue(kind, payload)`; workers (`python scripts/run_worker.py`) claim
+ready rows with `FOR UPDATE SKIP LOCKED`, run the registered handler, then
+mark the job done, reschedule it with exponential backoff, or dead-letter it
+once `max_attempts` is used up. Dead jobs stay in the table for inspection and
+can be re-queued from /admin/jobs.
+
+- Priorities: a lower number runs first (PRIORITY_HIGH / NORMAL / LOW).
+- Idempotency: a job with an `idempotency_key` is queued at most once.
+  Inside `with idempotency_scope("stripe:evt_123"):` keys are derived
+  automatically, so a retried webhook or request doesn't notify twice.
+- JOB_QUEUE_MODE=inline runs handlers immediately instead (local dev, no worker).
+"""
+
+import asyncio
+import json
+import os
+import random
+import socket
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, List, Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.database import AsyncSessionLocal
+from utils.logging_config import cron_logger, error_logger
+
+PRIORITY_HIGH = 10      # OTPs, screening questions
+PRIORITY_NORMAL = 100
+PRIORITY_LOW = 200      # re-engagement, marketing fan-out
+
+JOB_QUEUE_MODE = os.getenv("JOB_QUEUE_MODE", "queue")  # queue | inline
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "10"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+JOB_TIMEOUT = int(os.getenv("JOB_TIMEOUT", "120"))  # seconds per attempt
+DEFAULT_MAX_ATTEMPTS = 5
+BACKOFF_BASE = 15       # seconds; attempt n waits BACKOFF_BASE * 2^(n-1), plus jitter
+BACKOFF_MAX = 3600
+LOCK_TIMEOUT = 600      # a running job older than this is presumed orphaned
+DONE_RETENTION_DAYS = 7
+MAINTENANCE_INTERVAL = 60
+
+Handler = Callable[[dict], Awaitable[None]]
+_handlers: Dict[str, Handler] = {}
+
+
+def job_handler(kind: str):
+    """Register the coroutine that runs jobs of `kind`: `@job_handler("email.send")`."""
+    def register(fn: Handler) -> Handler:
+        _handlers[kind] = fn
+        return fn
+    return register
+
+
+# ── Idempotency scopes ──
+
+_scope: ContextVar[Optional[dict]] = ContextVar("job_idempotency_scope", default=None)
+
+
+@contextmanager
+def idempotency_scope(key: str):
+    """Derive idempotency keys for every job enqueued in this block from `key`."""
+    token = _scope.set({"key": key, "seen": {}})
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def _scoped_key(kind: str, subject: str) -> Optional[str]:
+    scope = _scope.get()
+    if scope is None:
+        return None
+    base = f"{kind}:{subject}"
+    n = scope["seen"].get(base, 0)
+    scope["seen"][base] = n + 1
+    return f"{scope['key']}:{base}:{n}"
+
+
+# ── Producers ──
+
+async def _insert_job(db: AsyncSession, kind: str, payload: dict, priority: int, delay: float,
+                      idempotency_key: Optional[str], max_attempts: int) -> Optional[int]:
+    result = await db.execute(text("""
+        INSERT INTO jobs (kind, payload, priority, run_at, idempotency_key, max_attempts)
+        VALUES (:kind, CAST(:payload AS jsonb), :priority,
+                NOW() + make_interval(secs => :delay), :key, :max_attempts)
+        ON CONFLICT (idempotency_key) WHERE idempotency_key IS NOT NULL DO NOTHING
+        RETURNING id
+    """), {
+        "kind": kind, "payload": json.dumps(payload, default=str), "priority": priority,
+        "delay": float(delay), "key": idempotency_key, "max_attempts": max_attempts,
+    })
+    return result.scalar()
+
+
+async def enqueue(
+    kind: str,
+    payload: dict,
+    *,
+    priority: int = PRIORITY_NORMAL,
+    delay: float = 0,
+    idempotency_key: Optional[str] = None,
+    subject: Optional[str] = None,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    db: Optional[AsyncSession] = None,
+) -> Optional[int]:
+    """
+    Queue a job and return its id (None if the idempotency key was already used).
+
+    With `db` the insert joins the caller's transaction and is committed with
+    it; otherwise it is committed straight away on a separate session.
+    `subject` (usually the recipient) feeds keys derived from idempotency_scope.
+    """
+    if kind not in _handlers:
+        raise ValueError(f"No job handler registered for {kind!r}")
+    if idempotency_key is None and subject is not None:
+        idempotency_key = _scoped_key(kind, subject)
+
+    if JOB_QUEUE_MODE == "inline":
+        await _run_inline(kind, payload)
+        return None
+
+    if db is not None:
+        return await _insert_job(db, kind, payload, priority, delay, idempotency_key, max_attempts)
+    async with AsyncSessionLocal() as own_db:
+        job_id = await _insert_job(own_db, kind, payload, priority, delay, idempotency_key, max_attempts)
+        await own_db.commit()
+        return job_id
+
+
+async def submit(kind: str, payload: dict, **kwargs) -> Optional[int]:
+    """
+    enqueue(), falling back to running the handler now if the queue is
+    unreachable. With `db` a failure is re-raised instead: the caller's
+    transaction is aborted and must roll back rather than act on the job.
+    """
+    try:
+        return await enqueue(kind, payload, **kwargs)
+    except Exception as e:
+        if kwargs.get("db") is not None:
+            raise
+        error_logger.error(f"Enqueue failed for {kind}, running inline: {e}")
+        await _run_inline(kind, payload)
+        return None
+
+
+async def enqueue_many(
+    kind: str,
+    payloads: List[dict],
+    *,
+    priority: int = PRIORITY_NORMAL,
+    idempotency_keys: Optional[List[Optional[str]]] = None,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    db: Optional[AsyncSession] = None,
+) -> int:
+    """
+    Queue one job per payload in a single INSERT; returns how many were
+    queued (keys already used are skipped). `db` works as for enqueue().
+    """
+    if kind not in _handlers:
+        raise ValueError(f"No job handler registered for {kind!r}")
+    if not payloads:
+        return 0
+    if JOB_QUEUE_MODE == "inline":
+        for payload in payloads:
+            await _run_inline(kind, payload)
+        return len(payloads)
+
+    keys = idempotency_keys or [None] * len(payloads)
+    params = {
+        "kind": kind, "priority": priority, "max_attempts": max_attempts,
+        "rows": json.dumps([{"payload": p, "key": k} for p, k in zip(payloads, keys)], default=str),
+    }
+    sql = text("""
+        WITH ins AS (
+            INSERT INTO jobs (kind, payload, priority, run_at, idempotency_key, max_attempts)
+            SELECT :kind, r.payload, :priority, NOW(), r.key, :max_attempts
+            FROM jsonb_to_recordset(CAST(:rows AS jsonb)) AS r(payload jsonb, key text)
+            ON CONFLICT (idempotency_key) WHERE idempotency_key IS NOT NULL DO NOTHING
+            RETURNING 1
+        )
+        SELECT COUNT(*) FROM ins
+    """)
+    if db is not None:
+        return (await db.execute(sql, params)).scalar()
+    async with AsyncSessionLocal() as own_db:
+        queued = (await own_db.execute(sql, params)).scalar()
+        await own_db.commit()
+        return queued
+
+
+async def submit_many(kind: str, payloads: List[dict], **kwargs) -> int:
+    """enqueue_many() with submit()'s inline fallback."""
+    try:
+        return await enqueue_many(kind, payloads, **kwargs)
+    except Exception as e:
+        if kwargs.get("db") is not None:
+            raise
+        error_logger.error(f"Bulk enqueue failed for {len(payloads)} {kind} jobs, running inline: {e}")
+        for payload in payloads:
+            await _run_inline(kind, payload)
+        return len(payloads)
+
+
+async def _run_inline(kind: str, payload: dict) -> None:
+    try:
+        await _handlers[kind](payload)
+    except Exception as e:
+        error_logger.error(f"Inline job {kind} failed: {e}", exc_info=True)
+
+
+# ── Worker ──
+
+def _backoff(attempt: int) -> float:
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** max(0, attempt - 1))
+    return delay + random.uniform(0, delay / 4)
+
+
+class JobWorker:
+    """Claims and runs ready jobs; run several processes for more throughput."""
+
+    def __init__(self, concurrency: int = JOB_WORKER_CONCURRENCY, name: Optional[str] = None):
+        self.concurrency = concurrency
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = asyncio.Event()
+        self._last_maintenance = 0.0
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    async def _claim(self, limit: int) -> List[dict]:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(text("""
+                UPDATE jobs SET status = 'running', attempts = attempts + 1,
+                                locked_by = :worker, locked_at = NOW()
+                WHERE id IN (
+                    SELECT id FROM jobs
+                    WHERE status = 'queued' AND run_at <= NOW()
+                    ORDER BY priority, run_at, id
+                    LIMIT :limit
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, kind, payload, attempts, max_attempts
+            """), {"worker": self.name, "limit": limit})
+            jobs = [dict(r) for r in result.mappings().all()]
+            await db.commit()
+        for job in jobs:
+            if isinstance(job["payload"], str):
+                job["payload"] = json.loads(job["payload"])
+        return jobs
+
+    async def _finish(self, job: dict, error: Optional[str]) -> None:
+        async with AsyncSessionLocal() as db:
+            if error is None:
+                await db.execute(text("""
+                    UPDATE jobs SET status = 'done', finished_at = NOW(), last_error = NULL, locked_by = NULL
+                    WHERE id = :id
+                """), {"id": job["id"]})
+            elif job["attempts"] >= job["max_attempts"]:
+                await db.execute(text("""
+                    UPDATE jobs SET status = 'dead', finished_at = NOW(), last_error = :error, locked_by = NULL
+                    WHERE id = :id
+                """), {"id": job["id"], "error": error})
+                error_logger.error(f"Job {job['id']} ({job['kind']}) dead-lettered after {job['attempts']} attempts: {error}")
+            else:
+                await db.execute(text("""
+                    UPDATE jobs SET status = 'queued', last_error = :error, locked_by = NULL,
+                                    run_at = NOW() + make_interval(secs => :delay)
+                    WHERE id = :id
+                """), {"id": job["id"], "error": error, "delay": _backoff(job["attempts"])})
+            await db.commit()
+
+    async def _run(self, job: dict) -> None:
+        handler = _handlers.get(job["kind"])
+        error = None
+        started = time.perf_counter()
+        try:
+            if handler is None:
+                raise LookupError(f"No job handler registered for {job['kind']!r}")
+            await asyncio.wait_for(handler(job["payload"]), timeout=JOB_TIMEOUT)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"[:2000]
+            error_logger.warning(f"Job {job['id']} ({job['kind']}) attempt {job['attempts']} failed: {error}")
+        else:
+            cron_logger.info(f"Job {job['id']} ({job['kind']}) done in {time.perf_counter() - started:.2f}s")
+        try:
+            await self._finish(job, error)
+        except Exception as e:
+            # The row stays 'running' and is re-queued by maintenance after LOCK_TIMEOUT
+            error_logger.error(f"Could not record result of job {job['id']}: {e}")
+
+    async def _maintenance(self) -> None:
+        async with AsyncSessionLocal() as db:
+            await db.execute(text("""
+                UPDATE jobs SET status = 'queued', locked_by = NULL
+                WHERE status = 'running' AND locked_at < NOW() - make_interval(secs => :timeout)
+            """), {"timeout": LOCK_TIMEOUT})
+            await db.execute(text("""
+                DELETE FROM jobs WHERE status = 'done' AND finished_at < NOW() - make_interval(days => :days)
+            """), {"days": DONE_RETENTION_DAYS})
+            await db.commit()
+
+    async def run_once(self) -> int:
+        """Claim one batch of ready jobs and run them concurrently. Returns how many ran."""
+        jobs = await self._claim(self.concurrency)
+        if jobs:
+            await asyncio.gather(*(self._run(job) for job in jobs))
+        return len(jobs)
+
+    async def run_forever(self) -> None:
+        cron_logger.info(f"Job worker {self.name} started (concurrency={self.concurrency})")
+        while not self._stop.is_set():
+            try:
+                if time.monotonic() - self._last_maintenance > MAINTENANCE_INTERVAL:
+                    self._last_maintenance = time.monotonic()
+                    await self._maintenance()
+                ran = await self.run_once()
+            except Exception as e:
+                error_logger.error(f"Job worker loop error: {e}", exc_info=True)
+                ran = 0
+            if not ran:
+                try:
+                    await asyncio.wait_for(self._stop.wait(), timeout=JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+        cron_logger.info(f"Job worker {self.name} stopped")
+
+
+# ── Admin helpers ──
+
+async def queue_stats(db: AsyncSession) -> dict:
+    result = await db.execute(text("""
+        SELECT kind, status, COUNT(*) AS n, MIN(run_at) FILTER (WHERE status = 'queued') AS oldest_queued
+        FROM jobs GROUP BY kind, status ORDER BY kind, status
+    """))
+    stats: Dict[str, dict] = {}
+    for r in result.mappings().all():
+        entry = stats.setdefault(r["kind"], {})
+        entry[r["status"]] = int(r["n"])
+        if r["oldest_queued"] is not None:
+            entry["oldest_queued"] = r["oldest_queued"].isoformat()
+    return stats
+
+
+async def retry_job(db: AsyncSession, job_id: int) -> bool:
+    """Put a dead (or finished) job back in the queue with a fresh attempt budget."""
+    result = await db.execute(text("""
+        UPDATE jobs SET status = 'queued', attempts = 0, run_at = NOW(), last_error = NULL, finished_at = NULL
+        WHERE id = :id AND status IN ('dead', 'done')
+        RETURNING id
+    """), {"id": job_id})
+    found = result.scalar() is not None
+    await db.commit()
+    return found
+
+
+def load_handlers() -> None:
+    """Import every module that registers job handlers (used by the worker)."""
+    import services.email  # noqa: F401
+    import services.sms  # noqa: F401
+    import services.push  # noqa: F401
+    import services.stripe_events  # noqa: F401
@@ -0,0 +1,302 @@
+"""
+Short-lived key/value entries: OTP codes and claim verification tokens.
+
+`ExpiringStore(namespace)` holds JSON-able dicts with a TTL and a per-entry
+attempt counter, on a backend shared by every namespace:
+
+- redis:    REDIS_URL set (fake:// gives an in-process fake for local dev)
+- postgres: the kv_entries table (neon/migrations/027_kv_entries.sql)
+- memory:   this process only, bounded to KV_STORE_MAX_KEYS per namespace
+
+Defaults to redis when REDIS_URL is set, otherwise postgres, so codes sent
+by one worker can be checked by another. Expired entries are never returned;
+a background sweeper deletes them (Redis expires keys itself).
+
+`pop()` is atomic, so a code or token can only be consumed once, and
+`verify_code()` counts every guess against the entry it checks.
+"""
+
+import asyncio
+import hmac
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import text
+
+from services.database import AsyncSessionLocal
+from services.redis_client import get_redis
+from utils.logging_config import error_logger
+
+KV_STORE_BACKEND = os.getenv("KV_STORE_BACKEND", "").strip().lower()
+KV_STORE_MAX_KEYS = int(os.getenv("KV_STORE_MAX_KEYS", "10000"))   # memory backend, per namespace
+KV_SWEEP_INTERVAL = 60
+MAX_CODE_ATTEMPTS = 5
+
+
+# ── Backends ──
+
+class MemoryBackend:
+    """Process-local entries: (namespace, key) -> [value, expires_at, attempts]."""
+
+    name = "memory"
+
+    def __init__(self, max_keys: int = KV_STORE_MAX_KEYS):
+        self._max_keys = max_keys
+        self._spaces: Dict[str, "OrderedDict[str, list]"] = {}
+
+    def _live(self, namespace: str, key: str) -> Optional[list]:
+        space = self._spaces.get(namespace)
+        item = space.get(key) if space else None
+        if item is None:
+            return None
+        if item[1] <= time.time():
+            del space[key]
+            return None
+        return item
+
+    async def put(self, namespace: str, key: str, value: dict, ttl: int) -> None:
+        space = self._spaces.setdefault(namespace, OrderedDict())
+        space.pop(key, None)
+        space[key] = [value, time.time() + ttl, 0]
+        while len(space) > self._max_keys:
+            space.popitem(last=False)   # oldest issued goes first
+
+    async def get(self, namespace: str, key: str) -> Optional[dict]:
+        item = self._live(namespace, key)
+        return item[0] if item else None
+
+    async def pop(self, namespace: str, key: str) -> Optional[dict]:
+        item = self._live(namespace, key)
+        if item is None:
+            return None
+        del self._spaces[namespace][key]
+        return item[0]
+
+    async def attempt(self, namespace: str, key: str) -> Optional[Tuple[dict, int]]:
+        item = self._live(namespace, key)
+        if item is None:
+            return None
+        item[2] += 1
+        return item[0], item[2]
+
+    async def sweep(self) -> int:
+        now = time.time()
+        removed = 0
+        for space in self._spaces.values():
+            for key in [k for k, item in space.items() if item[1] <= now]:
+                del space[key]
+                removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "keys": sum(len(s) for s in self._spaces.values())}
+
+
+def _decode(value):
+    # asyncpg returns jsonb as text unless a codec is registered
+    return json.loads(value) if isinstance(value, str) else value
+
+
+class PostgresBackend:
+    """Rows in kv_entries; every operation is a single statement."""
+
+    name = "postgres"
+
+    async def _execute(self, sql: str, params: dict):
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(text(sql), params)
+            row = result.first()
+            await db.commit()
+            return row
+
+    async def put(self, namespace: str, key: str, value: dict, ttl: int) -> None:
+        await self._execute(
+            """
+            INSERT INTO kv_entries (namespace, key, value, attempts, expires_at)
+            VALUES (:ns, :key, CAST(:value AS jsonb), 0, now() + make_interval(secs => :ttl))
+            ON CONFLICT (namespace, key) DO UPDATE
+            SET value = EXCLUDED.value, attempts = 0, expires_at = EXCLUDED.expires_at
+            RETURNING 1
+            """,
+            {"ns": namespace, "key": key, "value": json.dumps(value), "ttl": ttl},
+        )
+
+    async def get(self, namespace: str, key: str) -> Optional[dict]:
+        row = await self._execute(
+            "SELECT value FROM kv_entries WHERE namespace = :ns AND key = :key AND expires_at > now()",
+            {"ns": namespace, "key": key},
+        )
+        return _decode(row[0]) if row else None
+
+    async def pop(self, namespace: str, key: str) -> Optional[dict]:
+        row = await self._execute(
+            "DELETE FROM kv_entries WHERE namespace = :ns AND key = :key AND expires_at > now() RETURNING value",
+            {"ns": namespace, "key": key},
+        )
+        return _decode(row[0]) if row else None
+
+    async def attempt(self, namespace: str, key: str) -> Optional[Tuple[dict, int]]:
+        row = await self._execute(
+            """
+            UPDATE kv_entries SET attempts = attempts + 1
+            WHERE namespace = :ns AND key = :key AND expires_at > now()
+            RETURNING value, attempts
+            """,
+            {"ns": namespace, "key": key},
+        )
+        return (_decode(row[0]), row[1]) if row else None
+
+    async def sweep(self) -> int:
+        row = await self._execute(
+            """
+            WITH d AS (DELETE FROM kv_entries WHERE expires_at <= now() RETURNING 1)
+            SELECT COUNT(*) FROM d
+            """,
+            {},
+        )
+        return int(row[0]) if row else 0
+
+    def stats(self) -> dict:
+        return {"backend": self.name}
+
+
+class RedisBackend:
+    """Entry JSON under one key, its attempt counter under a sibling key with the same expiry."""
+
+    name = "redis"
+
+    def __init__(self, client, prefix: str = "tr:kv"):
+        self._redis = client
+        self._prefix = prefix
+
+    def _keys(self, namespace: str, key: str) -> Tuple[str, str]:
+        base = f"{self._prefix}:{namespace}:{key}"
+        return base, f"{base}:n"
+
+    async def put(self, namespace: str, key: str, value: dict, ttl: int) -> None:
+        k, n = self._keys(namespace, key)
+        await self._redis.delete(n)
+        await self._redis.set(k, json.dumps(value), ex=ttl)
+
+    async def get(self, namespace: str, key: str) -> Optional[dict]:
+        raw = await self._redis.get(self._keys(namespace, key)[0])
+        return json.loads(raw) if raw else None
+
+    async def pop(self, namespace: str, key: str) -> Optional[dict]:
+        k, n = self._keys(namespace, key)
+        raw = await self._redis.getdel(k)
+        if raw is None:
+            return None
+        await self._redis.delete(n)
+        return json.loads(raw)
+
+    async def attempt(self, namespace: str, key: str) -> Optional[Tuple[dict, int]]:
+        k, n = self._keys(namespace, key)
+        raw = await self._redis.get(k)
+        if raw is None:
+            return None
+        attempts = await self._redis.incr(n)
+        if attempts == 1:
+            ttl = await self._redis.ttl(k)
+            await self._redis.expire(n, max(ttl, 1))
+        return json.loads(raw), attempts
+
+    async def sweep(self) -> int:
+        return 0    # keys expire on their own
+
+    def stats(self) -> dict:
+        return {"backend": self.name}
+
+
+_backend = None
+_sweeper: Optional[asyncio.Task] = None
+
+
+def _get_backend():
+    global _backend
+    if _backend is None:
+        choice = KV_STORE_BACKEND or ("redis" if get_redis() is not None else "postgres")
+        client = get_redis() if choice == "redis" else None
+        if choice == "redis" and client is None:
+            error_logger.warning("KV_STORE_BACKEND=redis but REDIS_URL is not usable; using postgres")
+            choice = "postgres"
+        if choice == "redis":
+            _backend = RedisBackend(client)
+        elif choice == "memory":
+            _backend = MemoryBackend()
+        else:
+            _backend = PostgresBackend()
+    _ensure_sweeper()
+    return _backend
+
+
+def _ensure_sweeper():
+    global _sweeper
+    if isinstance(_backend, RedisBackend):
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    if _sweeper is None or _sweeper.done() or _sweeper.get_loop() is not loop:
+        _sweeper = loop.create_task(_sweep_loop())
+
+
+async def _sweep_loop():
+    while True:
+        await asyncio.sleep(KV_SWEEP_INTERVAL)
+        try:
+            await _backend.sweep()
+        except Exception as e:
+            error_logger.warning(f"KV store sweep failed: {e}")
+
+
+# ── Store ──
+
+class ExpiringStore:
+    """One namespace of expiring entries (e.g. "otp", "claim-token")."""
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+
+    async def put(self, key: str, value: dict, ttl: int) -> None:
+        """Store `value` for `ttl` seconds, replacing any entry (and its attempts) under `key`."""
+        await _get_backend().put(self.namespace, key, value, ttl)
+
+    async def get(self, key: str) -> Optional[dict]:
+        return await _get_backend().get(self.namespace, key)
+
+    async def pop(self, key: str) -> Optional[dict]:
+        """Remove and return the entry; only one concurrent caller gets it."""
+        return await _get_backend().pop(self.namespace, key)
+
+    async def attempt(self, key: str) -> Optional[Tuple[dict, int]]:
+        """Count an attempt against the entry; returns (value, attempts so far)."""
+        return await _get_backend().attempt(self.namespace, key)
+
+
+async def verify_code(store: ExpiringStore, key: str, code: str, max_attempts: int = MAX_CODE_ATTEMPTS) -> Tuple[str, Optional[dict]]:
+    """
+    Check a code stored as value["code"]. Returns (status, value):
+    "ok" (entry consumed), "wrong", "locked" (too many attempts, entry
+    discarded) or "missing" (never sent, expired or already used).
+    """
+    found = await store.attempt(key)
+    if found is None:
+        return "missing", None
+    value, attempts = found
+    if attempts > max_attempts:
+        await store.pop(key)
+        return "locked", None
+    if not hmac.compare_digest(str(value.get("code", "")), code.strip()):
+        return "wrong", None
+    if await store.pop(key) is None:
+        return "missing", None
+    return "ok", value
+
+
+def kv_store_stats() -> dict:
+    return _get_backend().stats()
@@ -0,0 +1,208 @@
+"""
+Cross-process pub/sub for the live-update subsystems (SSE event bus,
+WebSocket chat rooms), so every uvicorn worker, replica and the job worker
+see the same events.
+
+Backends (EVENT_BUS_BACKEND):
+- memory    no backend; each process only sees its own events
+- postgres  LISTEN/NOTIFY on a dedicated direct connection (the default
+            without REDIS_URL, so job worker events reach the web process)
+- redis     pub/sub (the default when REDIS_URL is set)
+
+Messages are (key, text) pairs. A sequenced channel also stamps each message
+with the next value of a shared counter (a Postgres sequence or a Redis
+INCR), so receivers can order and replay them.
+"""
+
+import asyncio
+import os
+from typing import Callable, Optional, Tuple
+
+import asyncpg
+
+from utils.logging_config import error_logger
+
+EVENT_BUS_BACKEND = os.getenv("EVENT_BUS_BACKEND", "")  # memory | postgres | redis
+PUBLISH_WAIT = 5.0          # seconds to wait for the listener before giving up
+PING_INTERVAL = 30          # seconds between liveness checks on the LISTEN connection
+RECONNECT_MAX = 30
+NOTIFY_MAX_BYTES = 7900     # Postgres caps NOTIFY payloads at 8000 bytes
+
+# Called with (seq or None, key, message) for every message on the channel
+Handler = Callable[[Optional[int], str, str], None]
+
+
+# ── Backends ──
+# Wire format on every backend: "<seq or ->|<key>|<message>"
+
+class PostgresBackend:
+    name = "postgres"
+
+    def __init__(self, dsn: str, channel: str, sequence: Optional[str] = None):
+        self._dsn = dsn
+        self._channel = channel
+        self._seq_sql = f"nextval('{sequence}')::text" if sequence else "'-'"
+        self._conn: Optional[asyncpg.Connection] = None
+        self._lock = asyncio.Lock()
+
+    async def listen(self, on_wire: Callable[[str], None], ready: Callable[[], None]) -> None:
+        """Hold a LISTEN connection until it drops."""
+        conn = await asyncpg.connect(self._dsn, ssl=True)
+        lost = asyncio.Event()
+        conn.add_termination_listener(lambda _conn: lost.set())
+        try:
+            await conn.add_listener(self._channel, lambda _conn, _pid, _channel, payload: on_wire(payload))
+            self._conn = conn
+            ready()
+            while not lost.is_set():
+                try:
+                    await asyncio.wait_for(lost.wait(), PING_INTERVAL)
+                except asyncio.TimeoutError:
+                    async with self._lock:
+                        await conn.execute("SELECT 1")
+        finally:
+            self._conn = None
+            if not conn.is_closed():
+                await conn.close()
+
+    async def publish(self, key: str, message: str) -> None:
+        wire = f"{key}|{message}"
+        if len(wire.encode()) > NOTIFY_MAX_BYTES:
+            raise ValueError(f"message too large for NOTIFY ({len(wire)} bytes)")
+        if self._conn is None:
+            raise ConnectionError("LISTEN connection is down")
+        async with self._lock:
+            await self._conn.execute(f"SELECT pg_notify($1, {self._seq_sql} || '|' || $2)", self._channel, wire)
+
+
+class RedisBackend:
+    name = "redis"
+
+    # INCR and PUBLISH in one round trip so the sequence matches publish order
+    _PUBLISH_SCRIPT = """
+        local seq = redis.call('INCR', KEYS[1])
+        redis.call('PUBLISH', ARGV[1], seq .. '|' .. ARGV[2])
+        return seq
+    """
+
+    def __init__(self, client, channel: str, sequenced: bool = False):
+        self._client = client
+        self._channel = channel
+        self._sequenced = sequenced
+
+    async def listen(self, on_wire: Callable[[str], None], ready: Callable[[], None]) -> None:
+        pubsub = self._client.pubsub()
+        try:
+            await pubsub.subscribe(self._channel)
+            ready()
+            async for item in pubsub.listen():
+                if item.get("type") == "message":
+                    on_wire(item["data"])
+        finally:
+            await pubsub.reset()
+
+    async def publish(self, key: str, message: str) -> None:
+        wire = f"{key}|{message}"
+        if self._sequenced:
+            await self._client.eval(self._PUBLISH_SCRIPT, 1, f"{self._channel}:seq", self._channel, wire)
+        else:
+            await self._client.publish(self._channel, f"-|{wire}")
+
+
+def _listen_dsn() -> str:
+    dsn = os.getenv("EVENT_BUS_DATABASE_URL", "")
+    if not dsn:
+        from services.database import DATABASE_URL
+        # LISTEN needs a session-level connection; Neon's "-pooler" endpoint pools per transaction
+        dsn = DATABASE_URL.replace("-pooler", "")
+    return dsn.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+def select_backend(channel: str, sequence: Optional[str] = None):
+    """
+    The configured backend for `channel`, or None for in-process only.
+    `sequence` names the Postgres sequence that stamps messages; on Redis
+    any value enables an INCR counter instead.
+    """
+    choice = EVENT_BUS_BACKEND or ("redis" if os.getenv("REDIS_URL") else "postgres")
+    if choice == "redis":
+        from services.redis_client import FakeRedis, get_redis
+        client = get_redis()
+        if isinstance(client, FakeRedis):
+            return None
+        if client is None:
+            error_logger.warning("EVENT_BUS_BACKEND=redis but REDIS_URL is not usable; using postgres")
+            choice = "postgres"
+        else:
+            return RedisBackend(client, channel, sequenced=sequence is not None)
+    if choice == "postgres":
+        return PostgresBackend(_listen_dsn(), channel, sequence)
+    return None
+
+
+def parse_wire(raw: str) -> Tuple[Optional[int], str, str]:
+    seq, key, message = raw.split("|", 2)
+    return (None if seq == "-" else int(seq)), key, message
+
+
+# ── Channel ──
+
+class Channel:
+    """Keeps a backend listener running on the current event loop and publishes through it."""
+
+    def __init__(self, backend, handler: Handler):
+        self.backend = backend
+        self._handler = handler
+        self._task: Optional[asyncio.Task] = None
+        self._ready: Optional[asyncio.Event] = None
+
+    @property
+    def ready(self) -> bool:
+        return bool(self._ready and self._ready.is_set())
+
+    def start(self) -> None:
+        """Start (or restart on a new loop) the listener. No-op outside a running loop."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._ready = asyncio.Event()
+            self._task = loop.create_task(self._run())
+
+    def _on_wire(self, raw: str) -> None:
+        try:
+            seq, key, message = parse_wire(raw)
+        except ValueError:
+            error_logger.warning(f"Malformed {self.backend.name} pub/sub message: {raw[:120]}")
+            return
+        self._handler(seq, key, message)
+
+    async def _run(self):
+        delay = 1
+        while True:
+            try:
+                await self.backend.listen(self._on_wire, self._ready.set)
+                delay = 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error_logger.warning(f"{self.backend.name} pub/sub listener error: {e}")
+            self._ready.clear()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX)
+
+    async def publish(self, key: str, message: str) -> None:
+        """Publish to every process (including this one, via the listener). Raises on failure."""
+        self.start()
+        await asyncio.wait_for(self._ready.wait(), PUBLISH_WAIT)
+        await self.backend.publish(key, message)
+
+    async def aclose(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
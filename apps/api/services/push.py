@@ -1,15 +1,15 @@
 """Web Push notification service for TradeRefer."""
 
-import os
-import json
-from pywebpush import webpush, WebPushException
+import hashlib
+from typing import List
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
+from services.database import AsyncSessionLocal
+from services.job_queue import job_handler, submit
+from services.push_delivery import get_push_engine
 from utils.logging_config import error_logger
 
-VAPID_PRIVATE_KEY = os.getenv("VAPID_PRIVATE_KEY", "")
-VAPID_PUBLIC_KEY = os.getenv("VAPID_PUBLIC_KEY", "")
-VAPID_CLAIMS = {"sub": "mailto:hello@traderefer.au"}
+PUSH_JOB_USERS = 1000  # users per queued push job
 
 
 async def save_subscription(db: AsyncSession, user_id: str, subscription: dict):
@@ -38,56 +38,62 @@ async def save_subscription(db: AsyncSession, user_id: str, subscription: dict):
 
 
 async def send_push_to_user(db: AsyncSession, user_id: str, title: str, body: str, url: str = "/", tag: str = "traderefer-message"):
-    """Send a Web Push notification to all of a user's subscribed devices."""
-    if not VAPID_PRIVATE_KEY or not VAPID_PUBLIC_KEY:
+    """Queue a Web Push notification to all of a user's subscribed devices."""
+    await send_push_to_users([user_id], title, body, url, tag)
+
+
+async def send_push_to_users(user_ids: List[str], title: str, body: str, url: str = "/", tag: str = "traderefer-message"):
+    """Queue one notification for many users (broadcasts); delivered in chunks by the worker."""
+    if get_push_engine() is None:
         error_logger.warning("VAPID keys not configured, skipping push")
         return
+    user_ids = [str(uid) for uid in user_ids]
+    for i in range(0, len(user_ids), PUSH_JOB_USERS):
+        chunk = user_ids[i:i + PUSH_JOB_USERS]
+        await submit(
+            "push.send",
+            {"user_ids": chunk, "title": title, "body": body, "url": url, "tag": tag},
+            subject=chunk[0] if len(chunk) == 1 else hashlib.sha1(",".join(chunk).encode()).hexdigest(),
+        )
+
+
+@job_handler("push.send")
+async def _deliver_push(payload: dict):
+    async with AsyncSessionLocal() as db:
+        await deliver_push(
+            db, payload["user_ids"], payload["title"], payload["body"],
+            payload.get("url", "/"), payload.get("tag", "traderefer-message"),
+        )
+
+
+async def deliver_push(db: AsyncSession, user_ids: List[str], title: str, body: str, url: str, tag: str) -> dict:
+    """Send to every device of `user_ids` now; expired subscriptions are removed in one statement."""
+    engine = get_push_engine()
+    if engine is None:
+        return {"sent": 0, "failed": 0, "gone": []}
 
     result = await db.execute(
-        text("SELECT endpoint, p256dh, auth FROM push_subscriptions WHERE user_id = :uid"),
-        {"uid": user_id},
+        text("""
+            SELECT user_id, endpoint, p256dh, auth FROM push_subscriptions
+            WHERE user_id = ANY(CAST(:uids AS uuid[]))
+        """),
+        {"uids": list(user_ids)},
     )
-    subs = result.mappings().all()
-
-    dead_endpoints = []
-
-    for sub in subs:
-        subscription_info = {
-            "endpoint": sub["endpoint"],
-            "keys": {
-                "p256dh": sub["p256dh"],
-                "auth": sub["auth"],
-            },
-        }
-
-        payload = json.dumps({
-            "title": title,
-            "body": body,
-            "url": url,
-            "tag": tag,
-        })
-
-        try:
-            webpush(
-                subscription_info=subscription_info,
-                data=payload,
-                vapid_private_key=VAPID_PRIVATE_KEY,
-                vapid_claims=VAPID_CLAIMS,
-            )
-        except WebPushException as e:
-            # 410 Gone or 404 = subscription expired, clean it up
-            if hasattr(e, 'response') and e.response is not None and e.response.status_code in (404, 410):
-                dead_endpoints.append(sub["endpoint"])
-            else:
-                error_logger.warning(f"Push send failed: {e}")
-        except Exception as e:
-            error_logger.warning(f"Push send error: {e}")
-
-    # Clean up expired subscriptions
-    for endpoint in dead_endpoints:
+    subs = [dict(r) for r in result.mappings().all()]
+    if not subs:
+        return {"sent": 0, "failed": 0, "gone": []}
+
+    outcome = await engine.send(subs, {"title": title, "body": body, "url": url, "tag": tag})
+
+    # 404/410 = subscription expired, clean them all up at once
+    if outcome["gone"]:
         await db.execute(
-            text("DELETE FROM push_subscriptions WHERE user_id = :uid AND endpoint = :ep"),
-            {"uid": user_id, "ep": endpoint},
+            text("""
+                DELETE FROM push_subscriptions ps
+                USING unnest(CAST(:uids AS uuid[]), CAST(:eps AS text[])) AS gone(user_id, endpoint)
+                WHERE ps.user_id = gone.user_id AND ps.endpoint = gone.endpoint
+            """),
+            {"uids": [u for u, _ in outcome["gone"]], "eps": [e for _, e in outcome["gone"]]},
         )
-    if dead_endpoints:
         await db.commit()
+    return outcome
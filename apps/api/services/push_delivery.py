@@ -0,0 +1,135 @@
+"""
+Web Push delivery engine.
+
+pywebpush's `webpush()` is synchronous: it encrypts, signs a fresh VAPID JWT
+and does a blocking HTTP round trip per subscription. The engine splits that
+up instead:
+- payload encryption (ECDH + AES-GCM) runs in a small dedicated thread pool
+  (PUSH_ENCRYPT_WORKERS), never on the event loop;
+- the VAPID Authorization header is signed once per push-service origin and
+  reused until shortly before it expires;
+- requests go out concurrently (PUSH_CONCURRENCY) on one shared httpx client.
+
+`send()` reports sent/failed counts and the subscriptions the push service
+says are gone (404/410) so the caller can delete them in one statement.
+"""
+
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+
+from utils.logging_config import error_logger
+
+VAPID_PRIVATE_KEY = os.getenv("VAPID_PRIVATE_KEY", "")
+VAPID_PUBLIC_KEY = os.getenv("VAPID_PUBLIC_KEY", "")
+VAPID_SUBJECT = os.getenv("VAPID_SUBJECT", "mailto:hello@traderefer.au")
+PUSH_CONCURRENCY = int(os.getenv("PUSH_CONCURRENCY", "20"))
+PUSH_ENCRYPT_WORKERS = int(os.getenv("PUSH_ENCRYPT_WORKERS", "4"))
+PUSH_TTL = 0                       # seconds the push service keeps an undelivered message
+VAPID_TOKEN_LIFETIME = 12 * 3600   # the spec caps VAPID JWTs at 24h
+VAPID_REFRESH_MARGIN = 600
+REQUEST_TIMEOUT = 10.0
+GONE_STATUSES = {404, 410}
+
+
+class VapidSigner:
+    """VAPID Authorization headers, cached per audience origin until near expiry."""
+
+    def __init__(self, private_key: str, subject: str):
+        from py_vapid import Vapid
+        self._vapid = Vapid.from_string(private_key=private_key)
+        self._subject = subject
+        self._cache: Dict[str, Tuple[float, dict]] = {}
+
+    def headers_for(self, endpoint: str) -> dict:
+        url = urlparse(endpoint)
+        origin = f"{url.scheme}://{url.netloc}"
+        now = time.time()
+        cached = self._cache.get(origin)
+        if cached is not None and cached[0] - VAPID_REFRESH_MARGIN > now:
+            return cached[1]
+        exp = int(now) + VAPID_TOKEN_LIFETIME
+        headers = self._vapid.sign({"sub": self._subject, "aud": origin, "exp": exp})
+        self._cache[origin] = (exp, headers)
+        return headers
+
+
+def _encrypt(subscription: dict, data: bytes) -> bytes:
+    from pywebpush import WebPusher
+    return WebPusher(subscription).encode(data, "aes128gcm")["body"]
+
+
+class PushEngine:
+    def __init__(self, private_key: str, subject: str = VAPID_SUBJECT,
+                 concurrency: int = PUSH_CONCURRENCY, encrypt_workers: int = PUSH_ENCRYPT_WORKERS):
+        self._signer = VapidSigner(private_key, subject)
+        self._executor = ThreadPoolExecutor(max_workers=encrypt_workers, thread_name_prefix="webpush")
+        self._limit = asyncio.Semaphore(concurrency)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=REQUEST_TIMEOUT)
+        return self._client
+
+    async def _send_one(self, sub: dict, data: bytes) -> str:
+        """Returns "sent", "gone" or "failed"."""
+        info = {"endpoint": sub["endpoint"], "keys": {"p256dh": sub["p256dh"], "auth": sub["auth"]}}
+        async with self._limit:
+            try:
+                loop = asyncio.get_running_loop()
+                body = await loop.run_in_executor(self._executor, _encrypt, info, data)
+                headers = {
+                    **self._signer.headers_for(sub["endpoint"]),
+                    "TTL": str(PUSH_TTL),
+                    "Content-Encoding": "aes128gcm",
+                    "Content-Type": "application/octet-stream",
+                }
+                response = await self._http().post(sub["endpoint"], content=body, headers=headers)
+            except Exception as e:
+                error_logger.warning(f"Push send error: {e}")
+                return "failed"
+        if response.status_code in GONE_STATUSES:
+            return "gone"
+        if response.status_code > 202:
+            error_logger.warning(f"Push send failed: HTTP {response.status_code} {response.text[:200]}")
+            return "failed"
+        return "sent"
+
+    async def send(self, subscriptions: List[dict], payload: dict) -> dict:
+        """
+        Deliver one payload to every subscription ({user_id, endpoint, p256dh,
+        auth} rows) concurrently. Returns counts plus `gone` (user_id, endpoint)
+        pairs to delete.
+        """
+        data = json.dumps(payload).encode()
+        outcomes = await asyncio.gather(*(self._send_one(sub, data) for sub in subscriptions))
+        gone = [(str(sub["user_id"]), sub["endpoint"]) for sub, o in zip(subscriptions, outcomes) if o == "gone"]
+        return {
+            "sent": outcomes.count("sent"),
+            "failed": outcomes.count("failed"),
+            "gone": gone,
+        }
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._executor.shutdown(wait=False)
+
+
+_engine: Optional[PushEngine] = None
+
+
+def get_push_engine() -> Optional[PushEngine]:
+    """Process-wide push engine, or None when VAPID keys aren't configured."""
+    global _engine
+    if _engine is None and VAPID_PRIVATE_KEY and VAPID_PUBLIC_KEY:
+        _engine = PushEngine(VAPID_PRIVATE_KEY)
+    return _engine
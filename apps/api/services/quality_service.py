@@ -5,6 +5,7 @@ Called after every screening result, OTP verification, and survey outcome.
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from utils.logging_config import lead_logger, error_logger
+from services.identity import invalidate_referrer
 from services.sms import (
     send_sms_referrer_advisory, send_sms_referrer_warning, send_sms_referrer_paused
 )
@@ -115,6 +116,7 @@ async def check_and_apply_accountability(
                 WHERE id = :rid
             """), {"stage": new_stage, "rid": referrer_id})
             await db.commit()
+            invalidate_referrer(referrer_id)
 
             lead_logger.info(f"Accountability escalated | referrer={referrer_id} | {current_stage} → {new_stage}")
 
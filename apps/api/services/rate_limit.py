@@ -0,0 +1,213 @@
+"""
+Rate limiting for abuse-prone routes (lead intake, OTP and claim codes).
+
+Each `RateLimit` allows `limit` hits per `window` seconds per key, using a
+sliding-window counter: the current fixed window's count plus the previous
+window's count weighted by how much of it still overlaps the sliding window.
+That is two integers per key, checked and incremented atomically.
+
+- Backends: in-process (default) or Redis when REDIS_URL is set, so limits
+  hold across workers and replicas. A Redis check is one round trip (Lua).
+- Rejections raise 429 with Retry-After, before any database work.
+- Keys are free-form strings: client IP, phone, device hash, user id, ...
+  `depends()` builds a FastAPI dependency from a key function of the
+  request; routes keyed by the body or the user call `enforce()` directly.
+- Backend errors fail open (logged): throttling must not take a route down.
+"""
+
+import hashlib
+import math
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from services.redis_client import FakeRedis, get_redis
+from utils.logging_config import error_logger
+
+# Proxies in front of the API that append to X-Forwarded-For (Railway's edge = 1)
+RATE_LIMIT_PROXY_HOPS = int(os.getenv("RATE_LIMIT_PROXY_HOPS", "1"))
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").strip().lower() not in ("0", "false", "no", "off")
+MEMORY_PRUNE_EVERY = 1000   # hits between sweeps of expired in-process counters
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: int            # seconds; 0 when allowed
+
+
+# ── Backends ──
+
+class MemoryBackend:
+    """Process-local counters: key -> (count, expires_at)."""
+
+    def __init__(self):
+        self._counts: Dict[str, Tuple[int, float]] = {}
+        self._ops = 0
+
+    def _get(self, key: str, now: float) -> int:
+        item = self._counts.get(key)
+        if item is None or item[1] <= now:
+            return 0
+        return item[0]
+
+    async def hit(self, cur_key: str, prev_key: str, limit: int, window: int, prev_weight: float, cost: int) -> Tuple[bool, int, int]:
+        now = time.time()
+        self._ops += 1
+        if self._ops % MEMORY_PRUNE_EVERY == 0:
+            self._counts = {k: v for k, v in self._counts.items() if v[1] > now}
+        cur, prev = self._get(cur_key, now), self._get(prev_key, now)
+        if prev * prev_weight + cur + cost > limit:
+            return False, cur, prev
+        expires_at = self._counts[cur_key][1] if cur else now + 2 * window
+        self._counts[cur_key] = (cur + cost, expires_at)
+        return True, cur + cost, prev
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "keys": len(self._counts)}
+
+
+class RedisBackend:
+    """Shared counters; check-and-increment is one Lua call."""
+
+    _SCRIPT = """
+        local cur = tonumber(redis.call('GET', KEYS[1]) or '0')
+        local prev = tonumber(redis.call('GET', KEYS[2]) or '0')
+        local cost = tonumber(ARGV[4])
+        if prev * tonumber(ARGV[3]) + cur + cost > tonumber(ARGV[1]) then
+            return {0, cur, prev}
+        end
+        cur = redis.call('INCRBY', KEYS[1], cost)
+        if cur == cost then
+            redis.call('EXPIRE', KEYS[1], 2 * tonumber(ARGV[2]))
+        end
+        return {1, cur, prev}
+    """
+
+    def __init__(self, client):
+        self._redis = client
+
+    async def hit(self, cur_key: str, prev_key: str, limit: int, window: int, prev_weight: float, cost: int) -> Tuple[bool, int, int]:
+        allowed, cur, prev = await self._redis.eval(
+            self._SCRIPT, 2, cur_key, prev_key, limit, window, repr(prev_weight), cost,
+        )
+        return bool(allowed), int(cur), int(prev)
+
+    def stats(self) -> dict:
+        return {"backend": "redis"}
+
+
+_backend = None
+
+
+def _get_backend():
+    global _backend
+    if _backend is None:
+        client = get_redis()
+        _backend = RedisBackend(client) if client is not None and not isinstance(client, FakeRedis) else MemoryBackend()
+    return _backend
+
+
+# ── Limits ──
+
+_registry: List["RateLimit"] = []
+
+
+class RateLimit:
+    """`limit` hits per `window` seconds per key, over a sliding window."""
+
+    def __init__(self, name: str, limit: int, window: int, detail: str = "Too many requests. Please try again later."):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.detail = detail
+        self.rejected = 0
+        _registry.append(self)
+
+    async def check(self, key: str, cost: int = 1) -> RateLimitResult:
+        """Count a hit against `key` if it fits; never raises."""
+        now = time.time()
+        current = int(now // self.window)
+        elapsed = now - current * self.window
+        prev_weight = 1 - elapsed / self.window
+        # Keys may be phone numbers or emails; only a digest is stored
+        base = f"tr:rl:{self.name}:{hashlib.sha256(str(key).encode()).hexdigest()[:32]}"
+        try:
+            allowed, cur, prev = await _get_backend().hit(
+                f"{base}:{current}", f"{base}:{current - 1}", self.limit, self.window, prev_weight, cost,
+            )
+        except Exception as e:
+            error_logger.warning(f"Rate limit backend error ({self.name}), allowing: {e}")
+            return RateLimitResult(True, self.limit, self.limit, 0)
+
+        used = prev * prev_weight + cur
+        if allowed:
+            return RateLimitResult(True, self.limit, max(0, math.floor(self.limit - used)), 0)
+
+        return RateLimitResult(False, self.limit, 0, max(1, math.ceil(self._retry_after(cur, prev, elapsed, cost))))
+
+    def _retry_after(self, cur: int, prev: int, elapsed: float, cost: int) -> float:
+        """Seconds until the weighted count leaves room for `cost` more hits."""
+        room = self.limit - cost
+        if prev and cur <= room:
+            # Still in this window, once enough of the previous one has slid out
+            return (1 - (room - cur) / prev) * self.window - elapsed
+        # In the next window, once enough of this one has slid out
+        return self.window - elapsed + max(0.0, 1 - max(room, 0) / cur) * self.window if cur else self.window - elapsed
+
+    async def enforce(self, *keys: Optional[str], cost: int = 1) -> None:
+        """Count a hit against every non-empty key; raise 429 if any is over its limit."""
+        if not RATE_LIMIT_ENABLED:
+            return
+        for key in keys:
+            if not key:
+                continue
+            result = await self.check(key, cost)
+            if not result.allowed:
+                self.rejected += 1
+                error_logger.warning(f"Rate limit {self.name} hit for {key} (retry in {result.retry_after}s)")
+                raise HTTPException(
+                    status_code=429,
+                    detail=self.detail,
+                    headers={
+                        "Retry-After": str(result.retry_after),
+                        "X-RateLimit-Limit": str(self.limit),
+                        "X-RateLimit-Remaining": "0",
+                    },
+                )
+
+    def depends(self, key_func: Callable[[Request], Optional[str]]):
+        """FastAPI dependency: `Depends(LIMIT.depends(client_ip))`."""
+        async def dependency(request: Request):
+            await self.enforce(key_func(request))
+        return dependency
+
+
+# ── Keys ──
+
+def client_ip(request: Request) -> Optional[str]:
+    """The caller's IP: the X-Forwarded-For entry added by our own proxy, else the peer address."""
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded and RATE_LIMIT_PROXY_HOPS > 0:
+        hops = [h.strip() for h in forwarded.split(",") if h.strip()]
+        if hops:
+            return hops[-min(RATE_LIMIT_PROXY_HOPS, len(hops))]
+    return request.client.host if request.client else None
+
+
+def header_key(name: str) -> Callable[[Request], Optional[str]]:
+    """Key by a request header, e.g. a device hash sent by the client."""
+    return lambda request: request.headers.get(name) or None
+
+
+def rate_limit_stats() -> dict:
+    return {
+        **_get_backend().stats(),
+        "enabled": RATE_LIMIT_ENABLED,
+        "rejected": {rl.name: rl.rejected for rl in _registry if rl.rejected},
+    }
@@ -0,0 +1,119 @@
+"""
+Optional shared Redis connection.
+
+Redis is only used when REDIS_URL is set (and the `redis` package is
+installed); every subsystem that can use it falls back to an in-process
+backend otherwise. REDIS_URL=fake:// selects FakeRedis, an in-memory stand-in
+with the same async API, for local development and tests.
+"""
+
+import fnmatch
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+try:
+    import redis.asyncio as redis_asyncio
+    REDIS_AVAILABLE = True
+except ImportError:
+    redis_asyncio = None
+    REDIS_AVAILABLE = False
+
+from utils.logging_config import error_logger
+
+_client = None
+_missing_package_logged = False
+
+
+class FakeRedis:
+    """Minimal in-memory subset of redis.asyncio.Redis (strings, counters, TTLs)."""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[object, Optional[float]]] = {}
+
+    def _live(self, key: str):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def get(self, key: str):
+        return self._live(key)
+
+    async def mget(self, keys):
+        return [self._live(k) for k in keys]
+
+    async def set(self, key: str, value, ex: Optional[int] = None, px: Optional[int] = None, nx: bool = False):
+        if nx and self._live(key) is not None:
+            return None
+        ttl = ex if ex is not None else (px / 1000 if px is not None else None)
+        self._data[key] = (value, time.monotonic() + ttl if ttl is not None else None)
+        return True
+
+    async def getdel(self, key: str):
+        value = self._live(key)
+        if value is not None:
+            del self._data[key]
+        return value
+
+    async def incr(self, key: str, amount: int = 1) -> int:
+        current = self._live(key)
+        expires_at = self._data[key][1] if current is not None else None
+        value = int(current or 0) + amount
+        self._data[key] = (value, expires_at)
+        return value
+
+    async def expire(self, key: str, seconds: int) -> bool:
+        value = self._live(key)
+        if value is None:
+            return False
+        self._data[key] = (value, time.monotonic() + seconds)
+        return True
+
+    async def ttl(self, key: str) -> int:
+        if self._live(key) is None:
+            return -2
+        expires_at = self._data[key][1]
+        return -1 if expires_at is None else max(0, int(expires_at - time.monotonic()))
+
+    async def delete(self, *keys) -> int:
+        removed = 0
+        for key in keys:
+            if self._live(key) is not None:
+                del self._data[key]
+                removed += 1
+        return removed
+
+    async def keys(self, pattern: str = "*"):
+        return [k for k in list(self._data) if self._live(k) is not None and fnmatch.fnmatchcase(k, pattern)]
+
+    async def close(self):
+        self._data.clear()
+
+
+def get_redis():
+    """Return the process-wide Redis client, or None when Redis isn't configured."""
+    global _client, _missing_package_logged
+    if _client is not None:
+        return _client
+    url = os.getenv("REDIS_URL", "")
+    if not url:
+        return None
+    if url.startswith("fake://"):
+        _client = FakeRedis()
+    elif REDIS_AVAILABLE:
+        _client = redis_asyncio.from_url(url, decode_responses=True)
+    else:
+        # Each replica would silently keep its own state: say so loudly, once
+        if not _missing_package_logged:
+            _missing_package_logged = True
+            error_logger.error(
+                "REDIS_URL is set but the redis package is not installed (pip install 'redis>=5'); "
+                "falling back to per-process backends"
+            )
+        return None
+    return _client
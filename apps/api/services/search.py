@@ -0,0 +1,103 @@
+"""
+Directory search for GET /businesses.
+
+- Full-text match on the generated `search_vector` column (name A, trade B,
+  suburb C) using prefix terms, so "plumb" finds "Plumbing".
+- Typo tolerance through pg_trgm word similarity on the same columns.
+- Ranking blends text relevance with `listing_rank`; without a query the
+  directory keeps its listing_rank / newest-first order.
+- Keyset pagination and totals come from utils.pagination: each page returns
+  an opaque `next_cursor`; totals are estimated unless count="exact".
+
+Schema and indexes: neon/migrations/020_business_search.sql.
+"""
+
+import re
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from utils.pagination import paginate
+
+MAX_QUERY_TERMS = 8
+
+_TERM_RE = re.compile(r"[^\W_]+")
+
+# Relevance: ts_rank_cd already applies the A/B/C weights; trigram similarity
+# rescues misspellings the prefix match misses; listing_rank is a gentle boost.
+_SCORE_SQL = """(
+    ts_rank_cd(search_vector, to_tsquery('simple', :tsquery))
+    + 0.6 * word_similarity(:q, business_name)
+    + 0.3 * word_similarity(:q, trade_category)
+    + 0.2 * word_similarity(:q, suburb)
+    + 0.1 * ln(1 + greatest(listing_rank, 0))
+)::float8"""
+
+_MATCH_SQL = """(
+    search_vector @@ to_tsquery('simple', :tsquery)
+    OR :q <% business_name OR :q <% trade_category OR :q <% suburb
+)"""
+
+
+def build_tsquery(q: Optional[str]) -> Optional[str]:
+    """Turn free text into a prefix tsquery ("joe plumb" -> "joe:* & plumb:*")."""
+    terms = _TERM_RE.findall((q or "").lower())[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    return " & ".join(f"{t}:*" for t in terms)
+
+
+async def search_businesses(
+    db: AsyncSession,
+    columns: str,
+    q: Optional[str] = None,
+    suburb: Optional[str] = None,
+    category: Optional[str] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    page: int = 1,
+    count: Optional[str] = None,
+) -> dict:
+    """
+    One page of public, active businesses. `columns` is the caller's public
+    column list. Pass `cursor` (from a previous `next_cursor`) to page forward;
+    `page` is honoured only when no cursor is given.
+    """
+    tsquery = build_tsquery(q)
+    where = ["status = 'active'", "listing_visibility = 'public'"]
+    params = {}
+    if tsquery:
+        where.append(_MATCH_SQL)
+        params["tsquery"] = tsquery
+        params["q"] = q.strip().lower()
+    if suburb:
+        where.append("suburb ILIKE :suburb_pattern")
+        params["suburb_pattern"] = f"%{suburb}%"
+    if category:
+        where.append("trade_category = :category")
+        params["category"] = category
+
+    if tsquery:
+        data = await paginate(
+            db,
+            select="SELECT *",
+            from_=f"""FROM (
+                SELECT {columns}, {_SCORE_SQL} AS score
+                FROM businesses
+                WHERE {' AND '.join(where)}
+            ) ranked""",
+            order=[("score", "score"), ("id", "id")],
+            params=params, limit=limit, cursor=cursor, page=page, count=count,
+        )
+        for row in data["rows"]:
+            row.pop("score", None)
+    else:
+        data = await paginate(
+            db,
+            select=f"SELECT {columns}",
+            from_="FROM businesses",
+            where=where,
+            order=[("listing_rank", "listing_rank"), ("created_at", "created_at"), ("id", "id")],
+            params=params, limit=limit, cursor=cursor, page=page, count=count,
+        )
+
+    data["businesses"] = data.pop("rows")
+    return data
@@ -1,9 +1,8 @@
 import os
-import asyncio
 from typing import Optional
-from utils.logging_config import email_logger, error_logger
-
-import random
+from utils.logging_config import email_logger
+from services.job_queue import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, job_handler, submit, submit_many
+from services.sms_delivery import SmsSendError, get_sms_dispatcher
 
 TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID", "")
 TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN", "")
@@ -12,45 +11,54 @@ TWILIO_FROM_NUMBERS = [n.strip() for n in _from_numbers_raw.split(",") if n.stri
 FRONTEND_URL = os.getenv("FRONTEND_URL", "https://traderefer.au")
 
 
-async def _send_sms(to: str, body: str, from_number: Optional[str] = None, raise_on_error: bool = False):
-    """Send SMS via Twilio. Skips gracefully if credentials not set.
-    
+async def _send_sms(to: str, body: str, from_number: Optional[str] = None, raise_on_error: bool = False,
+                    priority: int = PRIORITY_NORMAL, db=None):
+    """Send SMS via Twilio.
+
+    Messages are queued for the background worker (retried with backoff);
+    `raise_on_error=True` sends right away and re-raises Twilio exceptions —
+    use it for OTP flows where delivery must be confirmed in the request.
+
     Args:
         to: Recipient phone number
         body: SMS message body
-        from_number: Specific Twilio number to send from (optional, random if not provided)
-        raise_on_error: If True, re-raises Twilio exceptions (use for OTP flows where delivery must be confirmed)
+        from_number: Specific Twilio number to send from (optional, least busy number if not provided)
+        raise_on_error: If True, send inline and re-raise Twilio exceptions
+        priority: Queue priority (PRIORITY_HIGH for screening questions)
+        db: Queue the job in this session's transaction (sent only if the caller commits)
     """
-    if not TWILIO_ACCOUNT_SID or not TWILIO_AUTH_TOKEN or not TWILIO_FROM_NUMBERS:
+    if raise_on_error:
+        return await _send_sms_now(to, body, from_number, raise_on_error=True)
+    await submit(
+        "sms.send", {"to": to, "body": body, "from_number": from_number},
+        priority=priority, subject=to, db=db,
+    )
+
+
+async def _send_sms_many(messages: list[dict], priority: int = PRIORITY_NORMAL, db=None):
+    """Queue fan-out SMS ({"to", "body"} dicts) in one insert; `db` as for _send_sms."""
+    messages = [m for m in messages if m.get("to")]
+    await submit_many(
+        "sms.send", [{"to": m["to"], "body": m["body"], "from_number": None} for m in messages],
+        priority=priority, db=db,
+    )
+
+
+@job_handler("sms.send")
+async def _deliver_sms(payload: dict):
+    await _send_sms_now(payload["to"], payload["body"], payload.get("from_number"), raise_on_error=True)
+
+
+async def _send_sms_now(to: str, body: str, from_number: Optional[str] = None, raise_on_error: bool = False):
+    """Send SMS via the shared Twilio dispatcher right away. Skips gracefully if credentials not set."""
+    dispatcher = get_sms_dispatcher()
+    if dispatcher is None:
         email_logger.warning(f"Twilio credentials not set — skipping SMS to {to}")
         return
-
-    # Normalise AU mobile numbers to E.164
-    phone = to.strip().replace(" ", "")
-    if phone.startswith("04"):
-        phone = "+61" + phone[1:]
-    elif phone.startswith("4") and len(phone) == 9:
-        phone = "+61" + phone
-
-    try:
-        from twilio.rest import Client
-
-        def _send():
-            _from = from_number if from_number else random.choice(TWILIO_FROM_NUMBERS)
-            client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-            return client.messages.create(
-                body=body,
-                from_=_from,
-                to=phone,
-            )
-
-        result = await asyncio.to_thread(_send)
-        email_logger.info(f"SMS sent | to={phone} | from={from_number or 'random'} | sid={result.sid}")
-        return result
-    except Exception as e:
-        error_logger.error(f"SMS failed | to={phone} | error={e}", exc_info=True)
-        if raise_on_error:
-            raise
+    result = await dispatcher.send(to, body, from_number)
+    if not result["ok"] and raise_on_error:
+        raise SmsSendError(result["error"])
+    return result
 
 
 def _lead_first_name(full_name: str) -> str:
@@ -69,17 +77,31 @@ def _lead_summary(job_description: str, max_len: int = 80) -> str:
 # CLAIMED BUSINESS — new enquiry teaser
 # ─────────────────────────────────────────────
 
-async def send_sms_claimed_new_lead(phone: str, business_name: str, consumer_name: str, suburb: str, job_description: str):
-    """Notify a claimed business owner that a new enquiry has arrived. No details — drive login."""
+def _claimed_new_lead_body(business_name: str, consumer_name: str, suburb: str, job_description: str) -> str:
     first_name = _lead_first_name(consumer_name)
     summary = _lead_summary(job_description)
-    body = (
+    return (
         f"TradeRefer: New enquiry for {business_name} from {first_name} in {suburb}. "
         f"Summary: {summary} "
         f"Log in to view and respond: {FRONTEND_URL}/dashboard/business/leads\n"
         f"Reply STOP to opt out."
     )
-    await _send_sms(phone, body)
+
+
+async def send_sms_claimed_new_lead(phone: str, business_name: str, consumer_name: str, suburb: str, job_description: str):
+    """Notify a claimed business owner that a new enquiry has arrived. No details — drive login."""
+    await _send_sms(phone, _claimed_new_lead_body(business_name, consumer_name, suburb, job_description))
+
+
+async def send_sms_claimed_new_leads(leads: list[dict], db=None):
+    """Fan-out version: `leads` are {"phone", "business_name", "consumer_name", "suburb", "job_description"} rows."""
+    await _send_sms_many([
+        {
+            "to": lead["phone"],
+            "body": _claimed_new_lead_body(lead["business_name"], lead["consumer_name"], lead["suburb"], lead["job_description"]),
+        }
+        for lead in leads
+    ], db=db)
 
 
 # ─────────────────────────────────────────────
@@ -181,14 +203,14 @@ async def send_sms_new_message(phone: str, recipient_name: str, sender_name: str
 # CONSUMER — AI screening questions
 # ─────────────────────────────────────────────
 
-async def send_sms_screening_q1(phone: str, consumer_name: str, business_name: str, trade_category: str, from_number: Optional[str] = None):
+async def send_sms_screening_q1(phone: str, consumer_name: str, business_name: str, trade_category: str, from_number: Optional[str] = None, db=None):
     body = (
         f"Hi {consumer_name}, {business_name} received your job enquiry via TradeRefer.\n\n"
         f"Quick 3 questions to confirm your request:\n"
         f"1. What type of {trade_category} work do you need?\n"
         f"Reply with a short description. TradeRefer"
     )
-    result = await _send_sms(phone, body, from_number)
+    result = await _send_sms(phone, body, from_number, priority=PRIORITY_HIGH, db=db)
     return result
 
 async def send_sms_screening_q2(phone: str, from_number: Optional[str] = None):
@@ -196,18 +218,18 @@ async def send_sms_screening_q2(phone: str, from_number: Optional[str] = None):
         "Thanks! Q2: What's your timeframe? (e.g. urgent, within a week, flexible)\n"
         "Reply now. TradeRefer"
     )
-    await _send_sms(phone, body, from_number)
+    await _send_sms(phone, body, from_number, priority=PRIORITY_HIGH)
 
 async def send_sms_screening_q3(phone: str, from_number: Optional[str] = None):
     body = (
         "Last one! Q3: What's the scope? (e.g. small repair, full renovation, new install)\n"
         "Reply now. TradeRefer"
     )
-    await _send_sms(phone, body, from_number)
+    await _send_sms(phone, body, from_number, priority=PRIORITY_HIGH)
 
 async def send_sms_screening_follow_up(phone: str, follow_up: str, from_number: Optional[str] = None):
     body = f"TradeRefer: {follow_up}\nReply with your answer."
-    await _send_sms(phone, body, from_number)
+    await _send_sms(phone, body, from_number, priority=PRIORITY_HIGH)
 
 async def send_sms_referrer_screening_failed(phone: str, full_name: str, business_name: str):
     body = (
@@ -229,12 +251,14 @@ async def send_sms_business_survey(phone: str, suburb: str, job_type: str):
     )
     await _send_sms(phone, body)
 
-async def send_sms_business_survey_followup(phone: str, suburb: str, round_num: int):
-    body = (
+def _business_survey_followup_body(suburb: str, round_num: int) -> str:
+    return (
         f"TradeRefer follow-up #{round_num}: Lead in {suburb} — outcome?\n"
         f"1 = Won  2 = Not won  3 = Pending\nReply 1, 2 or 3."
     )
-    await _send_sms(phone, body)
+
+async def send_sms_business_survey_followup(phone: str, suburb: str, round_num: int):
+    await _send_sms(phone, _business_survey_followup_body(suburb, round_num))
 
 async def send_sms_business_survey_job_value(phone: str):
     body = "Great! Estimated job value in dollars? (e.g. 1200, or 0 to skip) TradeRefer"
@@ -261,12 +285,33 @@ async def send_sms_customer_survey(phone: str, consumer_name: str, business_name
     )
     await _send_sms(phone, body)
 
-async def send_sms_customer_survey_followup(phone: str, consumer_name: str, business_name: str, round_num: int):
-    body = (
+def _customer_survey_followup_body(consumer_name: str, business_name: str, round_num: int) -> str:
+    return (
         f"Hi {consumer_name}, TradeRefer follow-up #{round_num}: Did you hire {business_name}?\n"
         f"1 = Yes  2 = No  3 = No longer needed\nReply 1, 2 or 3."
     )
-    await _send_sms(phone, body)
+
+async def send_sms_customer_survey_followup(phone: str, consumer_name: str, business_name: str, round_num: int):
+    await _send_sms(phone, _customer_survey_followup_body(consumer_name, business_name, round_num))
+
+async def send_sms_survey_followups(leads: list[dict], round_num: int, db=None):
+    """
+    Follow-up round `round_num` to both sides of each lead. `leads` are
+    {"business_phone", "consumer_phone", "consumer_suburb", "consumer_name", "business_name"} rows.
+    """
+    messages = []
+    for lead in leads:
+        messages.append({
+            "to": lead["business_phone"],
+            "body": _business_survey_followup_body(lead["consumer_suburb"] or "your area", round_num),
+        })
+        messages.append({
+            "to": lead["consumer_phone"],
+            "body": _customer_survey_followup_body(
+                lead["consumer_name"] or "there", lead["business_name"] or "the business", round_num,
+            ),
+        })
+    await _send_sms_many(messages, db=db)
 
 async def send_sms_customer_survey_reason(phone: str):
     body = (
@@ -280,13 +325,22 @@ async def send_sms_customer_survey_reason(phone: str):
 # BUSINESS — wallet & refund notifications
 # ─────────────────────────────────────────────
 
-async def send_sms_business_lead_refunded(phone: str, business_name: str, amount_dollars: float, reason: str):
-    body = (
+def _business_lead_refunded_body(business_name: str, amount_dollars: float, reason: str) -> str:
+    return (
         f"TradeRefer: {business_name}, your ${amount_dollars:.2f} referral fee has been refunded "
         f"to your wallet. Reason: {reason}. "
         f"View: {FRONTEND_URL}/dashboard/business\nReply STOP to opt out."
     )
-    await _send_sms(phone, body)
+
+async def send_sms_business_lead_refunded(phone: str, business_name: str, amount_dollars: float, reason: str):
+    await _send_sms(phone, _business_lead_refunded_body(business_name, amount_dollars, reason))
+
+async def send_sms_business_leads_refunded(refunds: list[dict], reason: str, db=None):
+    """Fan-out version: `refunds` are {"phone", "business_name", "amount_dollars"} rows."""
+    await _send_sms_many([
+        {"to": row["phone"], "body": _business_lead_refunded_body(row["business_name"], row["amount_dollars"], reason)}
+        for row in refunds
+    ], db=db)
 
 async def send_sms_business_wallet_low(phone: str, business_name: str, balance_dollars: float):
     body = (
@@ -377,4 +431,4 @@ async def send_sms_reengagement(phone: str, full_name: str, next_badge_label: st
         body = f"Hey {first}, you're close to unlocking '{next_badge_label}' on TradeRefer 💪 {FRONTEND_URL}/dashboard/referrer"
     else:
         body = f"Hey {first}, businesses in your area are looking for referrers right now. Log in: {FRONTEND_URL}/dashboard/referrer"
-    await _send_sms(phone, body)
+    await _send_sms(phone, body, priority=PRIORITY_LOW)
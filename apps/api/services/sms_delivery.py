@@ -0,0 +1,192 @@
+"""
+SMS delivery engine.
+
+Every SMS goes through `get_sms_dispatcher()`: one long-lived httpx client to
+the Twilio REST API (no per-message `twilio.rest.Client` or worker thread),
+a semaphore bounding in-flight requests, and per-sender pacing so each number
+in TWILIO_FROM_NUMBERS stays within its throughput (SMS_PER_NUMBER_MPS).
+Messages without a pinned sender go out on whichever number frees up first,
+spreading bursts across the pool. 429 and 5xx responses are retried with
+backoff.
+
+Results are reported as dicts:
+    {"to": "+614...", "ok": True, "sid": "SM...", "from": "+614...", "error": None}
+
+SMS_TRANSPORT=fake selects FakeSmsTransport, which records messages in memory
+instead of sending them — for local development and tests.
+"""
+
+import asyncio
+import os
+import random
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from utils.logging_config import email_logger, error_logger
+
+TWILIO_API_URL = os.getenv("TWILIO_API_URL", "https://api.twilio.com")
+SMS_TRANSPORT = os.getenv("SMS_TRANSPORT", "twilio")  # twilio | fake
+SMS_CONCURRENCY = int(os.getenv("SMS_CONCURRENCY", "8"))
+SMS_PER_NUMBER_MPS = float(os.getenv("SMS_PER_NUMBER_MPS", "1"))  # messages/second per sender number
+REQUEST_TIMEOUT = 15.0
+MAX_ATTEMPTS = 3
+RETRY_BASE = 0.5            # seconds; doubled per attempt
+MAX_RETRY_AFTER = 10        # longer waits go back to the job queue
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class SmsSendError(Exception):
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+def normalize_au_phone(to: str) -> str:
+    """Normalise AU mobile numbers to E.164."""
+    phone = to.strip().replace(" ", "")
+    if phone.startswith("04"):
+        phone = "+61" + phone[1:]
+    elif phone.startswith("4") and len(phone) == 9:
+        phone = "+61" + phone
+    return phone
+
+
+class TwilioTransport:
+    """Twilio Messages API over a shared httpx client."""
+
+    def __init__(self, account_sid: str, auth_token: str):
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=TWILIO_API_URL,
+                timeout=REQUEST_TIMEOUT,
+                auth=(self.account_sid, self.auth_token),
+                limits=httpx.Limits(max_connections=SMS_CONCURRENCY, max_keepalive_connections=SMS_CONCURRENCY),
+            )
+        return self._client
+
+    async def send(self, to: str, body: str, from_number: str) -> str:
+        path = f"/2010-04-01/Accounts/{self.account_sid}/Messages.json"
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                response = await self._http().post(path, data={"To": to, "From": from_number, "Body": body})
+            except httpx.TransportError as e:
+                if attempt == MAX_ATTEMPTS:
+                    raise SmsSendError(f"Twilio request failed: {e}")
+                await asyncio.sleep(RETRY_BASE * 2 ** (attempt - 1))
+                continue
+            if response.status_code in RETRYABLE_STATUSES and attempt < MAX_ATTEMPTS:
+                retry_after = float(response.headers.get("retry-after") or RETRY_BASE * 2 ** (attempt - 1))
+                if retry_after <= MAX_RETRY_AFTER:
+                    await asyncio.sleep(retry_after)
+                    continue
+            if response.status_code >= 400:
+                raise SmsSendError(f"Twilio HTTP {response.status_code}: {response.text[:300]}", response.status_code)
+            return response.json().get("sid")
+        raise SmsSendError("Twilio retries exhausted")
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class FakeSmsTransport:
+    """Records messages instead of sending them; `fail` holds numbers that error."""
+
+    def __init__(self):
+        self.sent: List[Dict[str, str]] = []
+        self.fail: set[str] = set()
+
+    async def send(self, to: str, body: str, from_number: str) -> str:
+        if to in self.fail:
+            raise SmsSendError(f"fake failure for {to}", 400)
+        self.sent.append({"to": to, "body": body, "from": from_number})
+        return f"SMfake{len(self.sent)}"
+
+    async def aclose(self) -> None:
+        pass
+
+
+class SmsDispatcher:
+    """Bounded-concurrency sends, paced per sender number."""
+
+    def __init__(self, transport, from_numbers: List[str], concurrency: int = SMS_CONCURRENCY,
+                 per_number_mps: float = SMS_PER_NUMBER_MPS):
+        self.transport = transport
+        self.from_numbers = list(from_numbers)
+        self._limit = asyncio.Semaphore(concurrency)
+        self._interval = 1.0 / per_number_mps if per_number_mps > 0 else 0.0
+        self._next_slot: Dict[str, float] = {}
+
+    def _reserve(self, from_number: Optional[str]) -> tuple[str, float]:
+        """Pick the sender (the pinned one, or the earliest free) and book its next slot."""
+        now = time.monotonic()
+        if from_number is None:
+            candidates = self.from_numbers[:]
+            random.shuffle(candidates)  # ties go to a random number
+            from_number = min(candidates, key=lambda n: self._next_slot.get(n, 0.0))
+        slot = max(now, self._next_slot.get(from_number, 0.0))
+        self._next_slot[from_number] = slot + self._interval
+        return from_number, slot - now
+
+    async def send(self, to: str, body: str, from_number: Optional[str] = None) -> dict:
+        phone = normalize_au_phone(to)
+        sender, wait = self._reserve(from_number)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        try:
+            async with self._limit:
+                sid = await self.transport.send(phone, body, sender)
+        except Exception as e:
+            error_logger.error(f"SMS failed | to={phone} | from={sender} | error={e}")
+            return {"to": phone, "ok": False, "sid": None, "from": sender, "error": str(e)[:500]}
+        email_logger.info(f"SMS sent | to={phone} | from={sender} | sid={sid}")
+        return {"to": phone, "ok": True, "sid": sid, "from": sender, "error": None}
+
+    async def send_many(self, messages: List[dict]) -> List[dict]:
+        """Send {"to", "body", "from_number"?} dicts concurrently, spread across senders."""
+        return list(await asyncio.gather(
+            *(self.send(m["to"], m["body"], m.get("from_number")) for m in messages)
+        ))
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+_dispatcher: Optional[SmsDispatcher] = None
+
+
+def _from_numbers() -> List[str]:
+    raw = os.getenv("TWILIO_FROM_NUMBERS", os.getenv("TWILIO_FROM_NUMBER", ""))
+    return [n.strip() for n in raw.split(",") if n.strip()]
+
+
+def get_sms_dispatcher() -> Optional[SmsDispatcher]:
+    """Process-wide dispatcher, or None when Twilio isn't configured."""
+    global _dispatcher
+    if _dispatcher is not None:
+        return _dispatcher
+    numbers = _from_numbers()
+    if SMS_TRANSPORT == "fake":
+        _dispatcher = SmsDispatcher(FakeSmsTransport(), numbers or ["+61400000000"])
+        return _dispatcher
+    account_sid = os.getenv("TWILIO_ACCOUNT_SID", "")
+    auth_token = os.getenv("TWILIO_AUTH_TOKEN", "")
+    if not account_sid or not auth_token or not numbers:
+        return None
+    _dispatcher = SmsDispatcher(TwilioTransport(account_sid, auth_token), numbers)
+    return _dispatcher
+
+
+def set_sms_transport(transport, from_numbers: Optional[List[str]] = None) -> SmsDispatcher:
+    """Swap the transport (tests: `set_sms_transport(FakeSmsTransport())`)."""
+    global _dispatcher
+    _dispatcher = SmsDispatcher(transport, from_numbers or _from_numbers() or ["+61400000000"])
+    return _dispatcher
@@ -0,0 +1,377 @@
+"""
+Stripe webhook events: stored on receipt, processed by the job worker.
+
+The webhook endpoints only verify the signature and insert the raw event into
+`stripe_events` (neon/migrations/029_stripe_events.sql), keyed by the Stripe
+event id, so a redelivered event is recognised and dropped. A "stripe.event"
+job is queued in the same transaction and the endpoint answers at once.
+
+The worker processes events per Stripe object (payment intent, account, ...)
+in the order Stripe created them: it takes an advisory lock on the object and
+runs every unprocessed event for it up to the one it was queued for. A
+failing event is retried by the job queue and holds back later events for
+the same object until it succeeds or is dead-lettered.
+
+Handlers register with `@stripe_event_handler("payment_intent.succeeded")`
+and receive (db, event). They write but don't commit: the event is marked
+done in the same transaction, so its effects apply exactly once. A handler
+may return a coroutine function to run after the commit (notifications).
+
+Replay: /admin/stripe-events, or `python scripts/replay_stripe_events.py`.
+"""
+
+import json
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.database import AsyncSessionLocal
+from services.job_queue import JOB_QUEUE_MODE, PRIORITY_HIGH, enqueue, idempotency_scope, job_handler
+from utils.logging_config import error_logger, payment_logger
+
+AfterCommit = Optional[Callable[[], Awaitable[None]]]
+Handler = Callable[[AsyncSession, dict], Awaitable[AfterCommit]]
+_handlers: Dict[str, List[Handler]] = {}
+
+
+def stripe_event_handler(event_type: str):
+    """Register a handler for a Stripe event type (several may share a type)."""
+    def register(fn: Handler) -> Handler:
+        _handlers.setdefault(event_type, []).append(fn)
+        return fn
+    return register
+
+
+# ── Ingestion ──
+
+async def ingest(db: AsyncSession, event: dict) -> bool:
+    """Store a verified event and queue its processing. Returns False for a redelivery."""
+    obj = (event.get("data") or {}).get("object") or {}
+    result = await db.execute(text("""
+        INSERT INTO stripe_events (id, type, object_id, stripe_created, payload)
+        VALUES (:id, :type, :object_id, :created, CAST(:payload AS jsonb))
+        ON CONFLICT (id) DO NOTHING
+        RETURNING id
+    """), {
+        "id": event["id"], "type": event.get("type", ""), "object_id": obj.get("id") or event["id"],
+        "created": int(event.get("created") or 0), "payload": json.dumps(event),
+    })
+    if result.scalar() is None:
+        return False
+    if JOB_QUEUE_MODE == "inline":
+        await db.commit()
+        try:
+            await process_event(event["id"])
+        except Exception:
+            pass    # stored as failed and logged; replay from the admin
+        return True
+    await enqueue("stripe.event", {"event_id": event["id"]}, priority=PRIORITY_HIGH,
+                  idempotency_key=f"stripe-event:{event['id']}", db=db)
+    await db.commit()
+    return True
+
+
+async def replay(db: AsyncSession, event_id: str) -> bool:
+    """
+    Queue a failed (or stuck pending) event again. Processed events are left
+    alone: their effects are already committed. Caller commits.
+    """
+    result = await db.execute(text("""
+        UPDATE stripe_events SET status = 'pending', last_error = NULL
+        WHERE id = :id AND status <> 'done'
+        RETURNING id
+    """), {"id": event_id})
+    if result.scalar() is None:
+        return False
+    await enqueue("stripe.event", {"event_id": event_id}, priority=PRIORITY_HIGH, db=db)
+    return True
+
+
+# ── Processing ──
+
+@job_handler("stripe.event")
+async def _process_job(payload: dict):
+    await process_event(payload["event_id"])
+
+
+async def process_event(event_id: str) -> None:
+    """Process an event and any earlier unprocessed events for the same object, in order."""
+    async with AsyncSessionLocal() as lock_db:
+        result = await lock_db.execute(
+            text("SELECT object_id, stripe_created, received_at FROM stripe_events WHERE id = :id"),
+            {"id": event_id},
+        )
+        target = result.mappings().first()
+        if target is None:
+            error_logger.warning(f"Stripe event {event_id} not found")
+            return
+        # Held until this transaction ends; serializes work on the object across workers
+        await lock_db.execute(
+            text("SELECT pg_advisory_xact_lock(hashtext(:key))"),
+            {"key": f"stripe:{target['object_id']}"},
+        )
+        result = await lock_db.execute(text("""
+            SELECT id, payload FROM stripe_events
+            WHERE object_id = :object_id AND status <> 'done'
+              AND (stripe_created, received_at) <= (:created, :received_at)
+            ORDER BY stripe_created, received_at
+        """), {"object_id": target["object_id"], "created": target["stripe_created"], "received_at": target["received_at"]})
+        for row in result.mappings().all():
+            event = row["payload"]
+            if isinstance(event, str):
+                event = json.loads(event)
+            await _run_handlers(row["id"], event)
+        await lock_db.rollback()
+
+
+async def _run_handlers(event_id: str, event: dict) -> None:
+    follow_ups = []
+    async with AsyncSessionLocal() as db:
+        try:
+            for handler in _handlers.get(event.get("type"), []):
+                follow_up = await handler(db, event)
+                if follow_up is not None:
+                    follow_ups.append(follow_up)
+            await db.execute(text("""
+                UPDATE stripe_events
+                SET status = 'done', attempts = attempts + 1, processed_at = now(), last_error = NULL
+                WHERE id = :id
+            """), {"id": event_id})
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            await db.execute(text("""
+                UPDATE stripe_events SET status = 'failed', attempts = attempts + 1, last_error = :error
+                WHERE id = :id
+            """), {"id": event_id, "error": str(e)[:1000]})
+            await db.commit()
+            error_logger.error(f"Stripe event {event_id} ({event.get('type')}) failed: {e}", exc_info=True)
+            raise
+
+    # A redelivered or replayed event must not notify twice
+    with idempotency_scope(f"stripe:{event_id}"):
+        for follow_up in follow_ups:
+            try:
+                await follow_up()
+            except Exception as e:
+                error_logger.warning(f"Stripe event {event_id} follow-up failed (non-fatal): {e}")
+
+
+# ── Handlers ──
+
+@stripe_event_handler("payment_intent.succeeded")
+async def handle_lead_unlock_payment(db: AsyncSession, event: dict) -> AfterCommit:
+    """A lead unlocked by card: unlock it, record the earning and the transactions."""
+    payment_intent = event["data"]["object"]
+    metadata = payment_intent.get("metadata", {})
+    lead_id = metadata.get("lead_id")
+    business_id = metadata.get("business_id")
+    if not (lead_id and business_id):
+        return None
+
+    # 1. Fetch Lead Details for dynamic payout (Spec Part 3.4)
+    res = await db.execute(text("""
+        SELECT referrer_id, referral_link_id, unlock_fee_cents, referrer_payout_amount_cents
+        FROM leads WHERE id = :id
+    """), {"id": lead_id})
+    lead = res.mappings().first()
+    if not lead:
+        error_logger.warning(f"Lead {lead_id} not found in webhook")
+        return None
+
+    payout_amount = lead["referrer_payout_amount_cents"] or int(lead["unlock_fee_cents"] * 0.7)
+    platform_cut = lead["unlock_fee_cents"] - payout_amount
+    referrer_id = lead["referrer_id"]
+    link_id = lead["referral_link_id"]
+
+    payment_logger.info(f"Payment succeeded for lead {lead_id}. Referrer payout pending: {payout_amount}")
+
+    # 2. Unlock the lead
+    await db.execute(text("""
+        UPDATE leads
+        SET status = 'UNLOCKED', unlocked_at = now(), unlock_payment_type = 'STRIPE'
+        WHERE id = :id
+    """), {"id": lead_id})
+
+    # 3. Increment business totals
+    await db.execute(text("""
+        UPDATE businesses
+        SET total_leads_unlocked = total_leads_unlocked + 1
+        WHERE id = :id
+    """), {"id": business_id})
+
+    # 4. Log Wallet Transaction for Business
+    await db.execute(text("""
+        INSERT INTO wallet_transactions (business_id, amount_cents, type, lead_id, payment_ref, notes, balance_after_cents)
+        VALUES (:bid, :amount, 'DEBIT', :lid, :pref, 'Lead unlocked via Stripe', 0)
+    """), {
+        "bid": business_id,
+        "amount": lead["unlock_fee_cents"],
+        "lid": lead_id,
+        "pref": payment_intent.get("id"),
+    })
+
+    # 5. Create Referrer Earning record (PENDING - 7 day hold)
+    if referrer_id:
+        await db.execute(text("""
+            INSERT INTO referrer_earnings (referrer_id, lead_id, gross_cents, platform_cut_cents, status, available_at)
+            VALUES (:rid, :lid, :gross, :cut, 'PENDING', now() + interval '7 days')
+        """), {"rid": referrer_id, "lid": lead_id, "gross": payout_amount, "cut": platform_cut})
+
+        # Update Stats (not wallet yet)
+        await db.execute(text("""
+            UPDATE referrers
+            SET total_leads_unlocked = total_leads_unlocked + 1,
+                pending_cents = pending_cents + :amount
+            WHERE id = :rid
+        """), {"rid": referrer_id, "amount": payout_amount})
+
+        if link_id:
+            await db.execute(text("""
+                UPDATE referral_links
+                SET leads_unlocked = leads_unlocked + 1
+                WHERE id = :lid
+            """), {"lid": link_id})
+
+        # 6. Log Unlock Transaction
+        await db.execute(text("""
+            INSERT INTO payment_transactions (lead_id, business_id, type, amount_cents, platform_fee_cents, status, eway_transaction_id)
+            VALUES (:lid, :bid, 'lead_unlock', :amount, :fee, 'completed', :tid)
+        """), {
+            "lid": lead_id,
+            "bid": business_id,
+            "amount": lead["unlock_fee_cents"],
+            "fee": platform_cut,
+            "tid": payment_intent.get("id"),
+        })
+
+    async def notify():
+        await _notify_lead_unlocked(lead_id, business_id, referrer_id, payout_amount)
+    return notify
+
+
+async def _notify_lead_unlocked(lead_id: str, business_id: str, referrer_id, payout_amount: int):
+    from services.email import send_business_lead_unlocked, send_referrer_lead_unlocked
+    from services.event_bus import event_bus
+    from services.sms import send_sms_business_lead_unlocked
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(text("""
+            SELECT l.consumer_name, l.consumer_phone, l.consumer_email, l.consumer_suburb, l.job_description,
+                   b.business_name, b.business_email, b.business_phone, b.user_id AS business_user_id,
+                   r.email AS referrer_email, r.full_name AS referrer_name, r.user_id AS referrer_user_id
+            FROM leads l
+            JOIN businesses b ON b.id = l.business_id
+            LEFT JOIN referrers r ON r.id = :rid
+            WHERE l.id = :lid
+        """), {"lid": lead_id, "rid": referrer_id})
+        full = result.mappings().first()
+    if not full:
+        return
+
+    # SSE: push real-time events to connected dashboards
+    if full["business_user_id"]:
+        event_bus.publish(str(full["business_user_id"]), "lead_unlocked", {"lead_id": lead_id})
+        event_bus.publish(str(full["business_user_id"]), "wallet_updated", {"lead_id": lead_id})
+    if referrer_id and full["referrer_user_id"]:
+        event_bus.publish(str(full["referrer_user_id"]), "earning_update", {"lead_id": lead_id, "amount_cents": payout_amount})
+
+    # Email: notify business of unlocked lead with full contact details
+    if full["business_email"]:
+        await send_business_lead_unlocked(
+            email=full["business_email"],
+            business_name=full["business_name"],
+            consumer_name=full["consumer_name"],
+            consumer_phone=full["consumer_phone"],
+            consumer_email=full["consumer_email"],
+            suburb=full["consumer_suburb"],
+            job_description=full["job_description"],
+        )
+    if full["business_phone"]:
+        await send_sms_business_lead_unlocked(
+            phone=full["business_phone"],
+            business_name=full["business_name"],
+            consumer_name=full["consumer_name"],
+            consumer_phone=full["consumer_phone"],
+            suburb=full["consumer_suburb"],
+        )
+
+    # Email: notify referrer of pending earning
+    if referrer_id and full["referrer_email"]:
+        available = (datetime.utcnow() + timedelta(days=7)).strftime("%d %b %Y")
+        await send_referrer_lead_unlocked(
+            email=full["referrer_email"],
+            full_name=full["referrer_name"] or full["referrer_email"],
+            business_name=full["business_name"] or "the business",
+            suburb=full["consumer_suburb"],
+            payout_dollars=payout_amount / 100,
+            available_date=available,
+        )
+
+
+@stripe_event_handler("payment_intent.succeeded")
+async def handle_wallet_topup(db: AsyncSession, event: dict) -> AfterCommit:
+    """A wallet top-up paid by card: credit the wallet once per payment intent."""
+    from services.wallet import NOT_FOUND, credit_wallet, topup_key
+
+    payment_intent = event["data"]["object"]
+    metadata = payment_intent.get("metadata", {})
+    if metadata.get("type") != "wallet_topup":
+        return None
+    business_id = metadata.get("business_id")
+    amount = payment_intent["amount"]
+
+    entry = await credit_wallet(
+        db, business_id, amount, "TOPUP", payment_ref=payment_intent["id"],
+        notes="Stripe wallet top-up (webhook)", idempotency_key=topup_key(payment_intent["id"]),
+    )
+    if entry.status == NOT_FOUND:
+        error_logger.warning(f"Wallet top-up {payment_intent['id']}: business {business_id} not found")
+        return None
+    if not entry.applied:
+        return None   # already credited by /wallet/topup/confirm
+    payment_logger.info(f"Wallet top-up via webhook: business {business_id} +${amount/100:.2f}")
+
+    async def publish():
+        # SSE: push wallet update to business dashboard
+        from services.event_bus import event_bus
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(text("SELECT user_id FROM businesses WHERE id = :id"), {"id": business_id})
+            user_id = result.scalar()
+        if user_id:
+            event_bus.publish(str(user_id), "wallet_updated", {"new_balance_cents": entry.balance_cents})
+    return publish
+
+
+# ── Admin ──
+
+async def list_events(db: AsyncSession, status: Optional[str] = None, limit: int = 50) -> list:
+    result = await db.execute(text("""
+        SELECT id, type, object_id, status, attempts, last_error, received_at, processed_at
+        FROM stripe_events
+        WHERE CAST(:status AS text) IS NULL OR status = :status
+        ORDER BY received_at DESC
+        LIMIT :limit
+    """), {"status": status, "limit": limit})
+    events = []
+    for r in result.mappings().all():
+        row = dict(r)
+        for key in ("received_at", "processed_at"):
+            if row[key]:
+                row[key] = row[key].isoformat()
+        events.append(row)
+    return events
+
+
+async def stripe_event_stats(db: AsyncSession) -> dict:
+    result = await db.execute(text("""
+        SELECT status, COUNT(*) AS n, MIN(received_at) AS oldest
+        FROM stripe_events WHERE status <> 'done'
+        GROUP BY status
+    """))
+    return {
+        r["status"]: {"count": r["n"], "oldest": r["oldest"].isoformat() if r["oldest"] else None}
+        for r in result.mappings().all()
+    }
@@ -1,10 +1,11 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from datetime import datetime, timedelta
-from services.email import send_referrer_earning_available
+from services.email import send_business_new_leads, send_referrer_earnings_available
 import os
 from utils.logging_config import cron_logger, error_logger
-from services.sms import send_sms_business_survey_followup, send_sms_customer_survey_followup
+from services.sms import send_sms_business_leads_refunded, send_sms_claimed_new_leads, send_sms_survey_followups
+from services.tasks.runner import CronJob
 
 
 async def send_reengagement_nudges(db: AsyncSession):
@@ -161,54 +162,44 @@ async def expire_unlocked_leads(db: AsyncSession):
 async def release_pending_earnings(db: AsyncSession):
     """
     Finds referrer_earnings in PENDING state that have passed their available_at time
-    and moves them to AVAILABLE.
+    and moves them to AVAILABLE, crediting each referrer's wallet once with the total.
     """
-    # 1. Update earning status
-    query = text("""
-        UPDATE referrer_earnings 
-        SET status = 'AVAILABLE', updated_at = now()
-        WHERE status = 'PENDING' AND available_at < now()
-        RETURNING id, referrer_id, gross_cents
-    """)
-    result = await db.execute(query)
+    result = await db.execute(text("""
+        WITH released AS (
+            UPDATE referrer_earnings
+            SET status = 'AVAILABLE', updated_at = now()
+            WHERE status = 'PENDING' AND available_at < now()
+            RETURNING id, referrer_id, lead_id, gross_cents
+        ), credited AS (
+            UPDATE referrers r
+            SET wallet_balance_cents = r.wallet_balance_cents + t.total,
+                pending_cents = r.pending_cents - t.total
+            FROM (SELECT referrer_id, SUM(gross_cents) AS total FROM released GROUP BY referrer_id) t
+            WHERE r.id = t.referrer_id
+        )
+        SELECT re.gross_cents, r.email, r.full_name, b.business_name
+        FROM released re
+        JOIN referrers r ON r.id = re.referrer_id
+        LEFT JOIN leads l ON l.id = re.lead_id
+        LEFT JOIN businesses b ON b.id = l.business_id
+    """))
     released_earnings = result.mappings().all()
-    
+
     if released_earnings:
         cron_logger.info(f"Released {len(released_earnings)} pending earnings")
-        
-        # 2. Update referrer wallet balances and send emails
-        for earning in released_earnings:
-            await db.execute(text("""
-                UPDATE referrers 
-                SET wallet_balance_cents = wallet_balance_cents + :amount,
-                    pending_cents = pending_cents - :amount
-                WHERE id = :rid
-            """), {
-                "amount": earning["gross_cents"],
-                "rid": earning["referrer_id"]
-            })
-
-            # Email referrer that their earning is now available
-            try:
-                ref_info = await db.execute(text("""
-                    SELECT r.email, r.full_name, b.business_name
-                    FROM referrer_earnings re
-                    JOIN referrers r ON r.id = re.referrer_id
-                    LEFT JOIN leads l ON l.id = re.lead_id
-                    LEFT JOIN businesses b ON b.id = l.business_id
-                    WHERE re.id = :eid
-                """), {"eid": earning["id"]})
-                ref_row = ref_info.mappings().first()
-                if ref_row and ref_row["email"]:
-                    await send_referrer_earning_available(
-                        email=ref_row["email"],
-                        full_name=ref_row["full_name"] or ref_row["email"],
-                        amount_dollars=earning["gross_cents"] / 100,
-                        business_name=ref_row["business_name"] or "TradeRefer",
-                    )
-            except Exception as e:
-                error_logger.warning(f"Cron earning email error (non-fatal): {e}")
-            
+
+        # Email referrers that their earnings are now available
+        await send_referrer_earnings_available([
+            {
+                "email": row["email"],
+                "full_name": row["full_name"] or row["email"],
+                "amount_dollars": row["gross_cents"] / 100,
+                "business_name": row["business_name"] or "TradeRefer",
+            }
+            for row in released_earnings
+        ], db=db)
+
+    await db.commit()
     return len(released_earnings)
 
 async def cleanup_expired_pins(db: AsyncSession):
@@ -230,125 +221,123 @@ async def cleanup_expired_pins(db: AsyncSession):
     return len(expired_pins)
 
 
-async def send_d7_survey_followups(db: AsyncSession):
+async def _send_survey_followups(db: AsyncSession, round_num: int, days: int) -> int:
     """
-    Sends D7 follow-up surveys to business + customer for leads where:
-    - status = PAYMENT_PENDING_CONFIRMATION
-    - surveys_sent_at is between 7 and 8 days ago (D7 window)
-    - No round-1 survey record exists yet
+    Records survey round `round_num` for leads whose surveys went out `days`
+    to `days + 1` days ago and texts both sides, in one statement.
     """
     res = await db.execute(text("""
-        SELECT l.id, l.consumer_suburb, l.job_description,
-               l.consumer_name, l.consumer_phone,
-               b.business_phone, b.business_name
-        FROM leads l
-        JOIN businesses b ON b.id = l.business_id
-        WHERE l.status = 'PAYMENT_PENDING_CONFIRMATION'
-          AND l.surveys_sent_at < (now() - interval '7 days')
-          AND l.surveys_sent_at > (now() - interval '8 days')
-          AND NOT EXISTS (
-              SELECT 1 FROM lead_surveys ls
-              WHERE ls.lead_id = l.id AND ls.survey_round = 1
-          )
-    """))
+        WITH due AS (
+            SELECT l.id, l.consumer_suburb, l.consumer_name, l.consumer_phone,
+                   b.business_phone, b.business_name
+            FROM leads l
+            JOIN businesses b ON b.id = l.business_id
+            WHERE l.status = 'PAYMENT_PENDING_CONFIRMATION'
+              AND l.surveys_sent_at < (now() - make_interval(days => CAST(:days AS integer)))
+              AND l.surveys_sent_at > (now() - make_interval(days => CAST(:days AS integer) + 1))
+              AND NOT EXISTS (
+                  SELECT 1 FROM lead_surveys ls
+                  WHERE ls.lead_id = l.id AND ls.survey_round = :round
+              )
+        ), recorded AS (
+            INSERT INTO lead_surveys (lead_id, respondent_type, survey_round, sent_at)
+            SELECT due.id, t.respondent_type, CAST(:round AS integer), now()
+            FROM due CROSS JOIN (VALUES ('business'), ('customer')) AS t(respondent_type)
+        )
+        SELECT * FROM due
+    """), {"round": round_num, "days": days})
     leads = res.mappings().all()
 
-    for lead in leads:
-        lead_id = str(lead["id"])
-        suburb = lead["consumer_suburb"] or "your area"
-
-        for respondent_type in ("business", "customer"):
-            await db.execute(text("""
-                INSERT INTO lead_surveys (lead_id, respondent_type, survey_round, sent_at)
-                VALUES (:lid, :rtype, 1, now())
-            """), {"lid": lead_id, "rtype": respondent_type})
-
-        if lead["business_phone"]:
-            await send_sms_business_survey_followup(lead["business_phone"], suburb, 1)
-        if lead["consumer_phone"]:
-            await send_sms_customer_survey_followup(
-                lead["consumer_phone"],
-                lead["consumer_name"] or "there",
-                lead["business_name"] or "the business",
-                1
-            )
-
+    await send_sms_survey_followups([dict(lead) for lead in leads], round_num, db=db)
     await db.commit()
-    if leads:
-        cron_logger.info(f"Sent D7 survey follow-ups to {len(leads)} leads")
     return len(leads)
 
 
+async def send_d7_survey_followups(db: AsyncSession):
+    """
+    Sends D7 follow-up surveys to business + customer for leads where:
+    - status = PAYMENT_PENDING_CONFIRMATION
+    - surveys_sent_at is between 7 and 8 days ago (D7 window)
+    - No round-1 survey record exists yet
+    """
+    count = await _send_survey_followups(db, 1, 7)
+    if count:
+        cron_logger.info(f"Sent D7 survey follow-ups to {count} leads")
+    return count
+
+
 async def send_d14_survey_followups(db: AsyncSession):
     """
     Sends D14 follow-up surveys. Last chance before auto-UNCONFIRMED.
     """
-    res = await db.execute(text("""
-        SELECT l.id, l.consumer_suburb, l.job_description,
-               l.consumer_name, l.consumer_phone,
-               b.business_phone, b.business_name
-        FROM leads l
-        JOIN businesses b ON b.id = l.business_id
-        WHERE l.status = 'PAYMENT_PENDING_CONFIRMATION'
-          AND l.surveys_sent_at < (now() - interval '14 days')
-          AND l.surveys_sent_at > (now() - interval '15 days')
-          AND NOT EXISTS (
-              SELECT 1 FROM lead_surveys ls
-              WHERE ls.lead_id = l.id AND ls.survey_round = 2
-          )
-    """))
-    leads = res.mappings().all()
+    count = await _send_survey_followups(db, 2, 14)
+    if count:
+        cron_logger.info(f"Sent D14 survey follow-ups to {count} leads")
+    return count
 
-    for lead in leads:
-        lead_id = str(lead["id"])
-        suburb = lead["consumer_suburb"] or "your area"
 
-        for respondent_type in ("business", "customer"):
-            await db.execute(text("""
-                INSERT INTO lead_surveys (lead_id, respondent_type, survey_round, sent_at)
-                VALUES (:lid, :rtype, 2, now())
-            """), {"lid": lead_id, "rtype": respondent_type})
-
-        if lead["business_phone"]:
-            await send_sms_business_survey_followup(lead["business_phone"], suburb, 2)
-        if lead["consumer_phone"]:
-            await send_sms_customer_survey_followup(
-                lead["consumer_phone"],
-                lead["consumer_name"] or "there",
-                lead["business_name"] or "the business",
-                2
-            )
-
-    await db.commit()
-    if leads:
-        cron_logger.info(f"Sent D14 survey follow-ups to {len(leads)} leads")
-    return len(leads)
+UNCONFIRMED_REASON = "No confirmation received after 14 days"
 
 
 async def close_unconfirmed_leads(db: AsyncSession):
     """
     After D14 with no dual YES: move to UNCONFIRMED and refund business wallet.
+    Same effects as survey_service.trigger_unconfirmed, for every due lead at once:
+    one refund per business, earnings reversed and clawed back per referrer.
     """
     res = await db.execute(text("""
-        SELECT l.id
-        FROM leads l
-        WHERE l.status = 'PAYMENT_PENDING_CONFIRMATION'
-          AND l.surveys_sent_at < (now() - interval '15 days')
-    """))
+        WITH closed AS (
+            UPDATE leads
+            SET status = 'UNCONFIRMED', refund_issued_at = now(), refund_reason = :reason,
+                surveys_closed_at = now()
+            WHERE status = 'PAYMENT_PENDING_CONFIRMATION'
+              AND surveys_sent_at < (now() - interval '15 days')
+            RETURNING id, business_id, referrer_id, COALESCE(unlock_fee_cents, 0) AS fee
+        ), refunded AS (
+            UPDATE businesses b
+            SET wallet_balance_cents = COALESCE(b.wallet_balance_cents, 0) + t.total
+            FROM (SELECT business_id, SUM(fee) AS total FROM closed GROUP BY business_id) t
+            WHERE b.id = t.business_id
+            RETURNING b.id, b.wallet_balance_cents, b.business_phone, b.business_name
+        ), refund_entries AS (
+            INSERT INTO wallet_transactions
+                (business_id, amount_cents, type, lead_id, notes, balance_after_cents)
+            SELECT c.business_id, c.fee, 'LEAD_REFUND', c.id, :reason,
+                   -- running balance when one business gets several refunds
+                   rf.wallet_balance_cents - COALESCE(SUM(c.fee) OVER (
+                       PARTITION BY c.business_id ORDER BY c.id
+                       ROWS BETWEEN 1 FOLLOWING AND UNBOUNDED FOLLOWING
+                   ), 0)
+            FROM closed c
+            JOIN refunded rf ON rf.id = c.business_id
+        ), reversed AS (
+            UPDATE referrer_earnings e
+            SET status = 'REVERSED'
+            FROM closed c
+            WHERE e.lead_id = c.id AND e.referrer_id = c.referrer_id
+              AND e.status IN ('PENDING', 'AVAILABLE')
+            RETURNING e.referrer_id, e.gross_cents
+        ), clawed_back AS (
+            UPDATE referrers r
+            SET wallet_balance_cents = GREATEST(0, r.wallet_balance_cents - t.total)
+            FROM (SELECT referrer_id, SUM(gross_cents) AS total FROM reversed GROUP BY referrer_id) t
+            WHERE r.id = t.referrer_id
+        )
+        SELECT c.id, c.fee, rf.business_phone, rf.business_name
+        FROM closed c
+        JOIN refunded rf ON rf.id = c.business_id
+    """), {"reason": UNCONFIRMED_REASON})
     leads = res.mappings().all()
 
-    count = 0
-    for lead in leads:
-        try:
-            from services.survey_service import trigger_unconfirmed
-            await trigger_unconfirmed(str(lead["id"]), db)
-            count += 1
-        except Exception as e:
-            error_logger.error(f"Error closing unconfirmed lead {lead['id']}: {e}")
+    await send_sms_business_leads_refunded([
+        {"phone": lead["business_phone"], "business_name": lead["business_name"] or "there", "amount_dollars": lead["fee"] / 100}
+        for lead in leads
+    ], UNCONFIRMED_REASON, db=db)
+    await db.commit()
 
-    if count:
-        cron_logger.info(f"Closed {count} unconfirmed leads (D14+) and refunded wallets")
-    return count
+    if leads:
+        cron_logger.info(f"Closed {len(leads)} unconfirmed leads (D14+) and refunded wallets")
+    return len(leads)
 
 
 async def auto_pass_stalled_screening(db: AsyncSession):
@@ -357,48 +346,40 @@ async def auto_pass_stalled_screening(db: AsyncSession):
     Prevents good leads from stalling.
     """
     res = await db.execute(text("""
-        SELECT l.id, l.referrer_id,
-               b.business_name, b.business_email, b.business_phone, b.is_claimed, b.slug,
-               l.consumer_name, l.consumer_suburb, l.job_description, l.unlock_fee_cents
-        FROM leads l
-        JOIN businesses b ON b.id = l.business_id
-        WHERE l.status = 'SCREENING'
+        UPDATE leads l
+        SET screening_status = 'SKIPPED', status = 'READY_FOR_BUSINESS'
+        FROM businesses b
+        WHERE b.id = l.business_id
+          AND l.status = 'SCREENING'
           AND l.created_at < (now() - interval '24 hours')
+        RETURNING l.id, b.business_name, b.business_email, b.business_phone, b.is_claimed,
+                  l.consumer_name, l.consumer_suburb, l.job_description, l.unlock_fee_cents
     """))
     leads = res.mappings().all()
 
-    for lead in leads:
-        lead_id = str(lead["id"])
-        await db.execute(text("""
-            UPDATE leads SET screening_status = 'SKIPPED', status = 'READY_FOR_BUSINESS'
-            WHERE id = :id
-        """), {"id": lead_id})
-
-        if lead["is_claimed"]:
-            try:
-                from services.email import send_business_new_lead
-                from services.sms import send_sms_claimed_new_lead
-                if lead["business_email"]:
-                    await send_business_new_lead(
-                        email=lead["business_email"],
-                        business_name=lead["business_name"],
-                        consumer_name=lead["consumer_name"],
-                        suburb=lead["consumer_suburb"],
-                        job_description=lead["job_description"],
-                        lead_id=lead_id,
-                        unlock_fee_dollars=(lead["unlock_fee_cents"] or 0) / 100,
-                        is_first_lead=False,
-                    )
-                if lead["business_phone"]:
-                    await send_sms_claimed_new_lead(
-                        phone=lead["business_phone"],
-                        business_name=lead["business_name"],
-                        consumer_name=lead["consumer_name"],
-                        suburb=lead["consumer_suburb"],
-                        job_description=lead["job_description"],
-                    )
-            except Exception as e:
-                error_logger.warning(f"Auto-pass notify error for lead {lead_id}: {e}")
+    # Claimed businesses hear about the lead now it's ready
+    claimed = [lead for lead in leads if lead["is_claimed"]]
+    await send_business_new_leads([
+        {
+            "email": lead["business_email"],
+            "business_name": lead["business_name"],
+            "consumer_name": lead["consumer_name"],
+            "suburb": lead["consumer_suburb"],
+            "job_description": lead["job_description"],
+            "unlock_fee_dollars": (lead["unlock_fee_cents"] or 0) / 100,
+        }
+        for lead in claimed
+    ], db=db)
+    await send_sms_claimed_new_leads([
+        {
+            "phone": lead["business_phone"],
+            "business_name": lead["business_name"],
+            "consumer_name": lead["consumer_name"],
+            "suburb": lead["consumer_suburb"],
+            "job_description": lead["job_description"],
+        }
+        for lead in claimed
+    ], db=db)
 
     await db.commit()
     if leads:
@@ -406,6 +387,22 @@ async def auto_pass_stalled_screening(db: AsyncSession):
     return len(leads)
 
 
+# Run by /admin/cron/process-lifecycle (services/tasks/runner.py), concurrently
+# except where `after` orders them; names are the keys of the report.
+LIFECYCLE_JOBS = [
+    CronJob("expired_leads", expire_pending_leads),
+    CronJob("expired_unlocked", expire_unlocked_leads),
+    CronJob("released_earnings", release_pending_earnings),
+    CronJob("expired_pins", cleanup_expired_pins),
+    CronJob("d7_survey_followups", send_d7_survey_followups),
+    CronJob("d14_survey_followups", send_d14_survey_followups),
+    # Reverses earnings and claws back referrer wallets: after this run's releases
+    CronJob("closed_unconfirmed", close_unconfirmed_leads, after=("released_earnings",)),
+    CronJob("auto_passed_screening", auto_pass_stalled_screening),
+    CronJob("reengagement_nudges_sent", send_reengagement_nudges, timeout=900),
+]
+
+
 async def sync_outreach_campaigns(db: AsyncSession) -> dict:
     """
     Cron job: sync stats + replies from Instantly for all active/paused campaigns.
@@ -0,0 +1,202 @@
+"""
+Scheduled task runner for /admin/cron/process-lifecycle.
+
+Every job runs on its own AsyncSession, up to CRON_CONCURRENCY at once, so
+a slow or failing job can't hold up or poison the rest. A job may name jobs
+it must run after (`after=`); those still run in order.
+
+- Timeouts: each job is cancelled after its `timeout` (CRON_JOB_TIMEOUT
+  seconds by default) and its transaction rolled back.
+- Single instance: a job runs under a lease row in cron_locks
+  (neon/migrations/033_cron_locks.sql), taken only once the previous
+  lease has expired. If a previous cron call is still running the job,
+  this call records it as skipped rather than sending the same
+  notifications twice. The lease is handed back when the job finishes;
+  if the process dies it lapses after the job's timeout plus
+  CRON_LEASE_MARGIN. Rows rather than advisory locks, because the jobs
+  commit as they go and Neon's "-pooler" endpoint pools per transaction.
+- History: every run is written to cron_runs (neon/migrations/030_cron_runs.sql)
+  with its status, duration and rows touched; `cron_status()` reports the
+  latest run per job.
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.database import AsyncSessionLocal
+from utils.logging_config import cron_logger, error_logger
+
+CRON_JOB_TIMEOUT = float(os.getenv("CRON_JOB_TIMEOUT", "300"))   # seconds per job
+CRON_CONCURRENCY = int(os.getenv("CRON_CONCURRENCY", "4"))        # jobs (and DB connections) at once
+CRON_RUN_RETENTION_DAYS = 30
+CRON_LEASE_MARGIN = 60      # seconds a dead run's lease outlives its timeout
+
+OK = "ok"
+FAILED = "failed"
+TIMEOUT = "timeout"
+SKIPPED = "skipped"     # already running elsewhere, or a job it runs after didn't succeed
+
+
+@dataclass(frozen=True)
+class CronJob:
+    name: str
+    fn: Callable[[AsyncSession], Awaitable[object]]
+    after: Sequence[str] = ()
+    timeout: Optional[float] = None
+
+
+@dataclass
+class CronRun:
+    job: str
+    status: str
+    started_at: Optional[datetime] = None
+    duration_ms: float = 0.0
+    rows_touched: Optional[int] = None
+    result: object = None
+    error: Optional[str] = None
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _rows_touched(result) -> Optional[int]:
+    if isinstance(result, bool):
+        return None
+    if isinstance(result, int):
+        return result
+    if isinstance(result, dict):
+        return sum(v for v in result.values() if isinstance(v, int) and not isinstance(v, bool))
+    return None
+
+
+async def _take_lease(db: AsyncSession, job: str, holder: str, seconds: float) -> bool:
+    result = await db.execute(text("""
+        INSERT INTO cron_locks (job, holder, locked_until)
+        VALUES (:job, :holder, now() + make_interval(secs => :seconds))
+        ON CONFLICT (job) DO UPDATE
+            SET holder = EXCLUDED.holder, locked_until = EXCLUDED.locked_until
+            WHERE cron_locks.locked_until < now()
+        RETURNING holder
+    """), {"job": job, "holder": holder, "seconds": seconds})
+    taken = result.scalar() is not None
+    await db.commit()
+    return taken
+
+
+async def _release_lease(db: AsyncSession, job: str, holder: str) -> None:
+    await db.execute(
+        text("UPDATE cron_locks SET locked_until = now() WHERE job = :job AND holder = :holder"),
+        {"job": job, "holder": holder},
+    )
+    await db.commit()
+
+
+async def _run_job(job: CronJob) -> CronRun:
+    timeout = job.timeout or CRON_JOB_TIMEOUT
+    holder = uuid.uuid4().hex
+    async with AsyncSessionLocal() as db:
+        if not await _take_lease(db, job.name, holder, timeout + CRON_LEASE_MARGIN):
+            cron_logger.info(f"Cron {job.name}: already running, skipped")
+            return CronRun(job.name, SKIPPED, started_at=_now(), error="already running")
+
+        run = CronRun(job.name, OK, started_at=_now())
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(job.fn(db), timeout)
+            await db.commit()
+            run.result, run.rows_touched = result, _rows_touched(result)
+        except asyncio.TimeoutError:
+            await db.rollback()
+            run.status, run.error = TIMEOUT, f"timed out after {timeout:.0f}s"
+            error_logger.error(f"Cron {job.name} timed out after {timeout:.0f}s")
+        except Exception as e:
+            await db.rollback()
+            run.status, run.error = FAILED, str(e)[:1000]
+            error_logger.error(f"Cron {job.name} failed: {e}", exc_info=True)
+        finally:
+            run.duration_ms = round((time.perf_counter() - started) * 1000, 1)
+            try:
+                await _release_lease(db, job.name, holder)
+            except Exception as e:
+                # The lease lapses on its own
+                error_logger.warning(f"Cron {job.name}: lease not released, expires in {timeout + CRON_LEASE_MARGIN:.0f}s: {e}")
+        return run
+
+
+async def _record(runs: List[CronRun]) -> None:
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(text("""
+                INSERT INTO cron_runs (job, started_at, status, duration_ms, rows_touched, result, error)
+                SELECT r.job, r.started_at, r.status, r.duration_ms, r.rows_touched, r.result, r.error
+                FROM jsonb_to_recordset(CAST(:runs AS jsonb)) AS r(
+                    job text, started_at timestamptz, status text, duration_ms double precision,
+                    rows_touched integer, result jsonb, error text
+                )
+            """), {"runs": json.dumps([
+                {
+                    "job": run.job, "started_at": run.started_at or _now(), "status": run.status,
+                    "duration_ms": run.duration_ms,
+                    "rows_touched": run.rows_touched, "result": run.result, "error": run.error,
+                }
+                for run in runs
+            ], default=str)})
+            await db.execute(
+                text("DELETE FROM cron_runs WHERE started_at < now() - make_interval(days => :days)"),
+                {"days": CRON_RUN_RETENTION_DAYS},
+            )
+            await db.commit()
+    except Exception as e:
+        error_logger.warning(f"Cron run history not recorded (non-fatal): {e}")
+
+
+async def run_jobs(jobs: List[CronJob]) -> Dict[str, CronRun]:
+    """Run `jobs` concurrently (respecting `after`), record the runs, return them by name."""
+    tasks: Dict[str, asyncio.Task] = {}
+    slots = asyncio.Semaphore(CRON_CONCURRENCY)
+
+    async def run(job: CronJob) -> CronRun:
+        for name in job.after:
+            if name in tasks and (await tasks[name]).status != OK:
+                return CronRun(job.name, SKIPPED, started_at=_now(), error=f"{name} did not succeed")
+        async with slots:
+            try:
+                return await _run_job(job)
+            except Exception as e:
+                # Couldn't get a connection or the lease
+                error_logger.error(f"Cron {job.name} not started: {e}")
+                return CronRun(job.name, FAILED, started_at=_now(), error=str(e)[:1000])
+
+    for job in jobs:
+        tasks[job.name] = asyncio.create_task(run(job))
+    runs = {name: await task for name, task in tasks.items()}
+    await _record(list(runs.values()))
+    return runs
+
+
+async def cron_status(db: AsyncSession) -> List[dict]:
+    """Latest run of every job, plus when it last succeeded."""
+    result = await db.execute(text("""
+        SELECT DISTINCT ON (job) job, started_at, status, duration_ms, rows_touched, error,
+               (SELECT MAX(s.started_at) FROM cron_runs s WHERE s.job = c.job AND s.status = 'ok') AS last_success_at
+        FROM cron_runs c
+        ORDER BY job, started_at DESC
+    """))
+    jobs = []
+    for r in result.mappings().all():
+        row = dict(r)
+        for key in ("started_at", "last_success_at"):
+            if row[key]:
+                row[key] = row[key].isoformat()
+        jobs.append(row)
+    return jobs
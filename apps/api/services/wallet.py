@@ -0,0 +1,167 @@
+"""
+Business wallet ledger.
+
+Every balance change is one statement: a conditional
+`UPDATE businesses SET wallet_balance_cents = wallet_balance_cents ± :amount`
+whose RETURNING feeds the `wallet_transactions` insert. The row lock taken by
+the UPDATE serializes concurrent changes to a wallet, and a debit only applies
+while the balance still covers it. Nothing is read into Python first, so two
+concurrent unlocks can't both spend the same money.
+
+Entries may carry an idempotency key (`unlock:<lead_id>`, `topup:<payment
+intent>`, ...), unique in wallet_transactions (neon/migrations/028): a key
+that was already applied is reported as a duplicate and changes nothing. If
+two requests race with the same key, the loser's statement fails on the
+unique index; it is rolled back to a savepoint, so the rest of the caller's
+transaction survives, and reported as a duplicate with the current balance.
+
+Callers commit.
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from utils.logging_config import payment_logger
+
+APPLIED = "applied"
+DUPLICATE = "duplicate"                 # idempotency key already used
+INSUFFICIENT = "insufficient_funds"     # debit not covered; balance unchanged
+NOT_FOUND = "not_found"                 # no such business
+
+
+@dataclass
+class LedgerResult:
+    status: str
+    balance_cents: Optional[int]        # after the change, or the current balance when not applied
+    transaction_id: Optional[str] = None
+
+    @property
+    def applied(self) -> bool:
+        return self.status == APPLIED
+
+
+_LEDGER_SQL = """
+    WITH change AS (
+        UPDATE businesses
+        SET wallet_balance_cents = COALESCE(wallet_balance_cents, 0) + :delta{extra_set}
+        WHERE id = :bid
+          AND (CAST(:min_balance AS integer) IS NULL OR COALESCE(wallet_balance_cents, 0) >= :min_balance)
+          AND NOT EXISTS (
+              SELECT 1 FROM wallet_transactions
+              WHERE idempotency_key = CAST(:key AS text)
+          )
+        RETURNING wallet_balance_cents
+    ), entry AS (
+        INSERT INTO wallet_transactions
+            (business_id, amount_cents, type, lead_id, payment_ref, notes, balance_after_cents, idempotency_key)
+        SELECT CAST(:bid AS uuid), CAST(:amount AS integer), CAST(:type AS text), CAST(:lead_id AS uuid),
+               CAST(:payment_ref AS text), CAST(:notes AS text), change.wallet_balance_cents, CAST(:key AS text)
+        FROM change
+        RETURNING id
+    )
+    SELECT
+        (SELECT wallet_balance_cents FROM change) AS balance_after,
+        (SELECT id FROM entry) AS transaction_id,
+        (SELECT wallet_balance_cents FROM businesses WHERE id = :bid) AS balance_before,
+        EXISTS (
+            SELECT 1 FROM wallet_transactions WHERE idempotency_key = CAST(:key AS text)
+        ) AS duplicate
+"""
+
+
+async def _apply(
+    db: AsyncSession,
+    business_id,
+    delta: int,
+    amount: int,
+    entry_type: str,
+    min_balance: Optional[int],
+    lead_id,
+    payment_ref: Optional[str],
+    notes: Optional[str],
+    idempotency_key: Optional[str],
+    leads_unlocked: int,
+) -> LedgerResult:
+    extra_set = ", total_leads_unlocked = total_leads_unlocked + :unlocked" if leads_unlocked else ""
+    params = {
+        "bid": business_id, "delta": delta, "amount": amount, "type": entry_type,
+        "min_balance": min_balance, "lead_id": lead_id, "payment_ref": payment_ref,
+        "notes": notes, "key": idempotency_key,
+    }
+    if leads_unlocked:
+        params["unlocked"] = leads_unlocked
+    try:
+        async with db.begin_nested():
+            result = await db.execute(text(_LEDGER_SQL.format(extra_set=extra_set)), params)
+    except IntegrityError:
+        # Lost a race with the same idempotency key; the winner has committed, so read its balance
+        payment_logger.info(f"Wallet {entry_type} {idempotency_key} for business {business_id} already applied concurrently")
+        balance = await db.execute(
+            text("SELECT wallet_balance_cents FROM businesses WHERE id = :bid"), {"bid": business_id}
+        )
+        return LedgerResult(DUPLICATE, balance.scalar())
+    row = result.mappings().first()
+
+    if row["transaction_id"] is not None:
+        return LedgerResult(APPLIED, row["balance_after"], str(row["transaction_id"]))
+    if row["balance_before"] is None:
+        return LedgerResult(NOT_FOUND, None)
+    # Rows read in the statement's snapshot, so balance_before is the current balance
+    if row["duplicate"]:
+        return LedgerResult(DUPLICATE, row["balance_before"])
+    return LedgerResult(INSUFFICIENT, row["balance_before"])
+
+
+async def debit_wallet(
+    db: AsyncSession,
+    business_id,
+    amount_cents: int,
+    entry_type: str,
+    *,
+    min_balance_cents: Optional[int] = None,
+    lead_id=None,
+    payment_ref: Optional[str] = None,
+    notes: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+    leads_unlocked: int = 0,
+) -> LedgerResult:
+    """
+    Take `amount_cents` from a business wallet if the balance is at least
+    `min_balance_cents` (default: the amount). `leads_unlocked` bumps
+    total_leads_unlocked in the same UPDATE.
+    """
+    floor = amount_cents if min_balance_cents is None else max(min_balance_cents, amount_cents)
+    return await _apply(
+        db, business_id, -amount_cents, amount_cents, entry_type, floor,
+        lead_id, payment_ref, notes, idempotency_key, leads_unlocked,
+    )
+
+
+async def credit_wallet(
+    db: AsyncSession,
+    business_id,
+    amount_cents: int,
+    entry_type: str,
+    *,
+    lead_id=None,
+    payment_ref: Optional[str] = None,
+    notes: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+) -> LedgerResult:
+    """Add `amount_cents` to a business wallet."""
+    return await _apply(
+        db, business_id, amount_cents, amount_cents, entry_type, None,
+        lead_id, payment_ref, notes, idempotency_key, 0,
+    )
+
+
+def unlock_key(lead_id) -> str:
+    return f"unlock:{lead_id}"
+
+
+def topup_key(payment_intent_id: str) -> str:
+    return f"topup:{payment_intent_id}"
@@ -0,0 +1,287 @@
+"""
+WebSocket chat rooms (one room per conversation).
+
+Every connection gets a bounded outbound queue drained by its own writer
+task. A broadcast serializes the payload once per variant and enqueues it,
+so it never waits on a socket. A slow or dead socket can't stall the room:
+a send that takes longer than WS_SEND_TIMEOUT, or a full queue, closes that
+socket only.
+
+Broadcasts and presence are shared with the other processes through the
+pub/sub backend (services/pubsub.py, EVENT_BUS_BACKEND), so both parties of
+a conversation see each other even when connected to different workers or
+replicas. Each process announces the users it holds per room on join/leave
+and again every PRESENCE_INTERVAL; announcements not refreshed within
+PRESENCE_TTL expire, so a crashed replica's users drop out.
+
+Load test: python scripts/ws_load_test.py
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import Counter
+from typing import Dict, FrozenSet, Optional, Set, Tuple
+
+from fastapi import WebSocket
+
+from services.pubsub import Channel, select_backend
+from utils.logging_config import error_logger
+
+WS_ROOMS_CHANNEL = os.getenv("WS_ROOMS_CHANNEL", "traderefer_rooms")
+WS_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", "100"))          # outbound messages buffered per socket
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "5"))      # seconds before a stuck socket is closed
+PRESENCE_INTERVAL = 30
+PRESENCE_TTL = 3 * PRESENCE_INTERVAL
+PRESENCE_BATCH = 50         # rooms per presence announcement (NOTIFY payloads are capped at 8 KB)
+CLOSE_TRY_AGAIN = 1013
+
+
+def _dumps(message: dict) -> str:
+    # Same encoding as WebSocket.send_json
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+class RoomConnection:
+    __slots__ = ("id", "websocket", "user_id", "room", "queue", "writer")
+
+    def __init__(self, websocket: WebSocket, user_id: str, room: str):
+        self.id = uuid.uuid4().hex
+        self.websocket = websocket
+        self.user_id = str(user_id)
+        self.room = room
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=WS_QUEUE_SIZE)
+        self.writer: Optional[asyncio.Task] = None
+
+
+_UNSET = object()
+
+
+class RoomManager:
+    """Manages active WebSocket connections per conversation room."""
+
+    def __init__(self, backend=_UNSET):
+        self._rooms: Dict[str, Set[RoomConnection]] = {}
+        self._users: Dict[str, Counter] = {}                 # room -> user_id -> local connections
+        self._by_ws: Dict[WebSocket, RoomConnection] = {}
+        # room -> origin process -> (user_ids, expires_at)
+        self._remote: Dict[str, Dict[str, Tuple[FrozenSet[str], float]]] = {}
+        self._origin = uuid.uuid4().hex[:12]
+        self._backend = backend
+        self._channel: Optional[Channel] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._pending: Set[asyncio.Task] = set()
+        self._stats = {"broadcasts": 0, "sent": 0, "dropped": 0, "remote_received": 0, "publish_failures": 0}
+
+    # ── Membership ──
+
+    async def connect(self, conversation_id: str, websocket: WebSocket, user_id: str) -> RoomConnection:
+        await websocket.accept()
+        self._ensure_started()
+        conn = RoomConnection(websocket, user_id, conversation_id)
+        conn.writer = asyncio.create_task(self._write_loop(conn))
+        self._rooms.setdefault(conversation_id, set()).add(conn)
+        self._by_ws[websocket] = conn
+        users = self._users.setdefault(conversation_id, Counter())
+        users[conn.user_id] += 1
+        if users[conn.user_id] == 1:
+            self._announce([conversation_id])
+        return conn
+
+    def disconnect(self, conversation_id: str, websocket: WebSocket):
+        conn = self._by_ws.pop(websocket, None)
+        if conn is None:
+            return
+        room = self._rooms.get(conversation_id)
+        if room is not None:
+            room.discard(conn)
+            if not room:
+                del self._rooms[conversation_id]
+        users = self._users.get(conversation_id)
+        if users is not None:
+            users[conn.user_id] -= 1
+            if users[conn.user_id] <= 0:
+                del users[conn.user_id]
+                self._announce([conversation_id])
+            if not users:
+                del self._users[conversation_id]
+        if conn.writer is not None and conn.writer is not asyncio.current_task():
+            conn.writer.cancel()
+
+    # ── Sending ──
+
+    def send(self, websocket: WebSocket, message: dict):
+        """Queue a message for one socket (keeps all writes on its writer task)."""
+        conn = self._by_ws.get(websocket)
+        if conn is not None:
+            self._enqueue(conn, _dumps(message))
+
+    async def broadcast(self, conversation_id: str, message: dict, exclude_ws: WebSocket = None, exclude_user_id: str = None, sender_user_id: str = None):
+        """Send a message to all connected clients in a conversation room, on every process."""
+        self._stats["broadcasts"] += 1
+        exclude = self._by_ws.get(exclude_ws) if exclude_ws is not None else None
+        exclude_conn = exclude.id if exclude else None
+        sender = str(sender_user_id) if sender_user_id else None
+        excluded_user = str(exclude_user_id) if exclude_user_id else None
+        self._deliver(conversation_id, message, exclude_conn, excluded_user, sender)
+        if self._channel is not None:
+            envelope = {"o": self._origin, "m": message, "xc": exclude_conn, "xu": excluded_user, "s": sender}
+            try:
+                await self._channel.publish(conversation_id, json.dumps(envelope))
+            except Exception as e:
+                self._stats["publish_failures"] += 1
+                error_logger.warning(f"WebSocket room publish via {self._channel.backend.name} failed: {e}")
+
+    def _deliver(self, room_id: str, message: dict, exclude_conn: Optional[str], exclude_user_id: Optional[str], sender_user_id: Optional[str]):
+        room = self._rooms.get(room_id)
+        if not room:
+            return
+        # Tailor the payload for messages: set is_mine correctly for this recipient's specific session
+        # This ensures that if a user is logged in on both mobile and web, their messages appear as 'mine' on both.
+        tailored = bool(sender_user_id) and message.get("type") == "message" and "data" in message
+        if tailored:
+            mine = _dumps({"type": "message", "data": {**message["data"], "is_mine": True}})
+            theirs = _dumps({"type": "message", "data": {**message["data"], "is_mine": False}})
+        else:
+            mine = theirs = _dumps(message)
+        for conn in list(room):
+            if conn.id == exclude_conn or (exclude_user_id and conn.user_id == exclude_user_id):
+                continue
+            self._enqueue(conn, mine if tailored and conn.user_id == sender_user_id else theirs)
+
+    def _enqueue(self, conn: RoomConnection, text: str):
+        try:
+            conn.queue.put_nowait(text)
+        except asyncio.QueueFull:
+            error_logger.warning(f"WebSocket queue full for user {conn.user_id[:8]}…, closing")
+            self._drop(conn)
+
+    async def _write_loop(self, conn: RoomConnection):
+        try:
+            while True:
+                text = await conn.queue.get()
+                await asyncio.wait_for(conn.websocket.send_text(text), WS_SEND_TIMEOUT)
+                self._stats["sent"] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error_logger.warning(f"WebSocket send failed for user {conn.user_id[:8]}…, closing: {e}")
+            self._drop(conn)
+
+    def _drop(self, conn: RoomConnection):
+        """Remove a slow or broken socket and close it in the background."""
+        if self._by_ws.get(conn.websocket) is not conn:
+            return
+        self._stats["dropped"] += 1
+        self.disconnect(conn.room, conn.websocket)
+        self._spawn(self._close(conn.websocket))
+
+    @staticmethod
+    async def _close(websocket: WebSocket):
+        try:
+            await asyncio.wait_for(websocket.close(code=CLOSE_TRY_AGAIN), WS_SEND_TIMEOUT)
+        except Exception:
+            pass
+
+    def _spawn(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    # ── Presence ──
+
+    def present_users(self, conversation_id: str) -> Set[str]:
+        """User ids connected to the room on any process."""
+        users = set(self._users.get(conversation_id, ()))
+        now = time.monotonic()
+        for remote_users, expires_at in self._remote.get(conversation_id, {}).values():
+            if expires_at > now:
+                users |= remote_users
+        return users
+
+    def active_count(self, conversation_id: str) -> int:
+        """Connections to the room on this process."""
+        return len(self._rooms.get(conversation_id, ()))
+
+    def _announce(self, room_ids):
+        if self._channel is None:
+            return
+        room_ids = list(room_ids)
+        for i in range(0, len(room_ids), PRESENCE_BATCH):
+            presence = {r: sorted(self._users.get(r, ())) for r in room_ids[i:i + PRESENCE_BATCH]}
+            self._spawn(self._publish_presence(json.dumps({"o": self._origin, "p": presence})))
+
+    async def _publish_presence(self, envelope: str):
+        try:
+            await self._channel.publish("", envelope)
+        except Exception as e:
+            self._stats["publish_failures"] += 1
+            error_logger.warning(f"WebSocket presence publish failed: {e}")
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(PRESENCE_INTERVAL)
+            now = time.monotonic()
+            for room_id in list(self._remote):
+                origins = self._remote[room_id]
+                for origin in [o for o, (_, expires_at) in origins.items() if expires_at <= now]:
+                    del origins[origin]
+                if not origins:
+                    del self._remote[room_id]
+            self._announce(self._users)
+
+    # ── Cross-process ──
+
+    def _on_remote(self, _seq: Optional[int], room_id: str, raw: str):
+        try:
+            envelope = json.loads(raw)
+        except ValueError:
+            return
+        origin = envelope.get("o")
+        if origin == self._origin:
+            return
+        if "p" in envelope:
+            expires_at = time.monotonic() + PRESENCE_TTL
+            for presence_room, users in envelope["p"].items():
+                origins = self._remote.setdefault(presence_room, {})
+                if users:
+                    origins[origin] = (frozenset(users), expires_at)
+                else:
+                    origins.pop(origin, None)
+                    if not origins:
+                        del self._remote[presence_room]
+            return
+        self._stats["remote_received"] += 1
+        self._deliver(room_id, envelope["m"], envelope.get("xc"), envelope.get("xu"), envelope.get("s"))
+
+    def _ensure_started(self):
+        if self._backend is _UNSET:
+            self._backend = select_backend(WS_ROOMS_CHANNEL)
+        if self._backend is None:
+            return
+        if self._channel is None:
+            self._channel = Channel(self._backend, self._on_remote)
+        self._channel.start()
+        loop = asyncio.get_running_loop()
+        if self._heartbeat is None or self._heartbeat.done() or self._heartbeat.get_loop() is not loop:
+            self._heartbeat = loop.create_task(self._heartbeat_loop())
+
+    # ── Metrics ──
+
+    def stats(self) -> dict:
+        """Per-process room, connection and delivery counters."""
+        return {
+            "backend": self._channel.backend.name if self._channel else "memory",
+            "backend_ready": self._channel.ready if self._channel else True,
+            "rooms": len(self._rooms),
+            "connections": len(self._by_ws),
+            "queued": sum(c.queue.qsize() for c in self._by_ws.values()),
+            "remote_rooms": len(self._remote),
+            **self._stats,
+        }
+
+
+# Global singleton — lives for the lifetime of the process
+room_manager = RoomManager()
@@ -27,6 +27,8 @@ def has_legacy_hash_suffix(slug: str) -> bool:
 
 
 def canonical_business_slug(slug: str) -> str:
+    # Keep in step with the SQL function behind businesses.canonical_slug
+    # (neon/migrations/031_business_canonical_slug.sql)
     slug = slugify_value(slug)
     if has_legacy_hash_suffix(slug):
         return slug.rsplit("-", 1)[0]
@@ -41,6 +43,10 @@ def serialize_business_slug(slug: str) -> str:
     return canonical_business_slug(slug)
 
 
+# How many numbered fallbacks (`name-2`, `name-3`, ...) to test per query
+COUNTER_BATCH_SIZE = 50
+
+
 async def find_business_by_slug(
     db: AsyncSession,
     columns: str,
@@ -48,43 +54,45 @@ async def find_business_by_slug(
     extra_where: str = "",
     extra_params: Optional[dict[str, Any]] = None,
 ):
+    """
+    Resolve a (possibly legacy) slug with one indexed lookup on canonical_slug,
+    falling back to business_slug_redirects for slugs a business has moved away from.
+    Until canonical_slug is unique (migration 032), a shared canonical slug goes to
+    the business whose slug matches exactly, else the oldest.
+    """
     params = dict(extra_params or {})
     requested_slug = slugify_value(slug)
-    canonical_slug = canonical_business_slug(requested_slug)
     params["requested_slug"] = requested_slug
-    params["canonical_slug"] = canonical_slug
-    params["legacy_pattern"] = f"{canonical_slug}-%"
+    params["canonical_slug"] = canonical_business_slug(requested_slug)
 
     query = text(
         f"""
         SELECT {columns}
         FROM businesses
-        WHERE (slug = :requested_slug OR slug = :canonical_slug OR slug LIKE :legacy_pattern)
+        WHERE id = COALESCE(
+            (SELECT id FROM businesses WHERE canonical_slug = :canonical_slug
+             ORDER BY (slug = :requested_slug) DESC, created_at, id LIMIT 1),
+            (SELECT business_id FROM business_slug_redirects
+             WHERE old_slug IN (:requested_slug, :canonical_slug)
+             ORDER BY created_at DESC LIMIT 1)
+        )
         {extra_where}
-        ORDER BY CASE
-            WHEN slug = :requested_slug THEN 0
-            WHEN slug = :canonical_slug THEN 1
-            ELSE 2
-        END, updated_at DESC NULLS LAST, created_at DESC NULLS LAST
         """
     )
     result = await db.execute(query, params)
-    for row in result.mappings().all():
-        row_slug = StringOrEmpty(row.get("slug"))
-        if canonical_business_slug(row_slug) == canonical_slug:
-            return row
-    return None
+    return result.mappings().first()
 
 
-async def business_slug_exists(
+async def taken_business_slugs(
     db: AsyncSession,
-    slug: str,
+    slugs: list[str],
     exclude_id: Optional[str] = None,
-) -> bool:
-    params: dict[str, Any] = {
-        "canonical_slug": canonical_business_slug(slug),
-        "legacy_pattern": f"{canonical_business_slug(slug)}-%",
-    }
+) -> set[str]:
+    """Return which of `slugs` (canonicalised) are already used, in a single query."""
+    canonical = sorted({canonical_business_slug(s) for s in slugs if s})
+    if not canonical:
+        return set()
+    params: dict[str, Any] = {"slugs": canonical}
     exclude_sql = ""
     if exclude_id:
         params["exclude_id"] = exclude_id
@@ -93,18 +101,41 @@ async def business_slug_exists(
     result = await db.execute(
         text(
             f"""
-            SELECT id, slug
+            SELECT canonical_slug
             FROM businesses
-            WHERE (slug = :canonical_slug OR slug LIKE :legacy_pattern)
+            WHERE canonical_slug = ANY(:slugs)
             {exclude_sql}
             """
         ),
         params,
     )
-    for row in result.mappings().all():
-        if canonical_business_slug(StringOrEmpty(row.get("slug"))) == params["canonical_slug"]:
-            return True
-    return False
+    return {row[0] for row in result.fetchall()}
+
+
+async def business_slug_exists(
+    db: AsyncSession,
+    slug: str,
+    exclude_id: Optional[str] = None,
+) -> bool:
+    return bool(await taken_business_slugs(db, [slug], exclude_id=exclude_id))
+
+
+async def record_slug_redirect(db: AsyncSession, business_id: Any, old_slug: str, new_slug: str) -> None:
+    """Remember a business's previous slug so old links keep resolving. Caller commits."""
+    old_slug = slugify_value(old_slug)
+    if not old_slug or canonical_business_slug(old_slug) == canonical_business_slug(new_slug):
+        return
+    await db.execute(
+        text(
+            """
+            INSERT INTO business_slug_redirects (old_slug, business_id)
+            VALUES (:old_slug, :business_id)
+            ON CONFLICT (old_slug) DO UPDATE
+                SET business_id = EXCLUDED.business_id, created_at = now()
+            """
+        ),
+        {"old_slug": old_slug, "business_id": business_id},
+    )
 
 
 async def generate_unique_business_slug(
@@ -136,18 +167,22 @@ async def generate_unique_business_slug(
     if suburb_slug and trade_slug:
         candidates.append(f"{base}-{suburb_slug}-{trade_slug}")
 
-    seen: set[str] = set()
+    ordered: list[str] = []
     for candidate in candidates:
         candidate = canonical_business_slug(candidate)
-        if not candidate or candidate in seen:
-            continue
-        seen.add(candidate)
-        if not await business_slug_exists(db, candidate, exclude_id=exclude_id):
+        if candidate and candidate not in ordered:
+            ordered.append(candidate)
+
+    taken = await taken_business_slugs(db, ordered, exclude_id=exclude_id)
+    for candidate in ordered:
+        if candidate not in taken:
             return candidate
 
-    counter = 2
+    start = 2
     while True:
-        candidate = f"{base}-{counter}"
-        if not await business_slug_exists(db, candidate, exclude_id=exclude_id):
-            return candidate
-        counter += 1
+        numbered = [f"{base}-{n}" for n in range(start, start + COUNTER_BATCH_SIZE)]
+        taken = await taken_business_slugs(db, numbered, exclude_id=exclude_id)
+        for candidate in numbered:
+            if candidate not in taken:
+                return candidate
+        start += COUNTER_BATCH_SIZE
@@ -0,0 +1,184 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+Rows are ordered by `(sort_key DESC, ..., id DESC)` and each page returns an
+opaque `next_cursor` holding the last row's sort values, so the next page is a
+`(sort_key, id) < (...)` index range instead of an OFFSET that reads and
+discards every earlier row. The legacy `page` parameter still works (OFFSET)
+when no cursor is sent.
+
+Totals are cheap by default:
+- "estimate" (default): pg_class.reltuples for an unfiltered table, otherwise
+  the planner's row estimate for the filtered query; cached for a minute.
+- "exact": COUNT(*) with the same filters (opt-in).
+- "none": skip the total.
+"""
+
+import base64
+import json
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+COUNT_MODES = ("exact", "estimate", "none")
+COUNT_MODE_PATTERN = "^(exact|estimate|none)$"
+APPROX_COUNT_TTL = 60  # seconds
+APPROX_COUNT_CACHE_SIZE = 1000
+
+_approx_counts: Dict[str, Tuple[float, int]] = {}
+
+
+# ── Cursors ──
+
+def encode_cursor(values: Sequence) -> str:
+    """Opaque, URL-safe cursor for a row's sort values."""
+    tagged = [{"dt": v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(tagged, separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """Inverse of encode_cursor; raises 400 on anything malformed."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError("wrong size")
+        return [datetime.fromisoformat(v["dt"]) if isinstance(v, dict) else v for v in values]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# ── Counts ──
+
+def _cached_count(key: str) -> Optional[int]:
+    cached = _approx_counts.get(key)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    return None
+
+
+def _store_count(key: str, value: int) -> int:
+    if len(_approx_counts) >= APPROX_COUNT_CACHE_SIZE:
+        _approx_counts.clear()
+    _approx_counts[key] = (time.monotonic() + APPROX_COUNT_TTL, value)
+    return value
+
+
+async def approximate_table_count(db: AsyncSession, table: str) -> int:
+    """Row count from pg_class.reltuples (kept current by autovacuum/ANALYZE)."""
+    key = f"table:{table}"
+    cached = _cached_count(key)
+    if cached is not None:
+        return cached
+    result = await db.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"),
+        {"table": table},
+    )
+    value = result.scalar()
+    if value is None or value < 0:
+        # Never analyzed — fall back to a real count once
+        value = (await db.execute(text(f"SELECT COUNT(*) FROM {table}"))).scalar() or 0
+    return _store_count(key, int(value))
+
+
+async def estimate_count(db: AsyncSession, from_where_sql: str, params: dict) -> int:
+    """Planner row estimate for `SELECT 1 {from_where_sql}` (no rows are read)."""
+    key = f"{from_where_sql}|{sorted(params.items(), key=lambda kv: kv[0])!r}"
+    cached = _cached_count(key)
+    if cached is not None:
+        return cached
+    result = await db.execute(text(f"EXPLAIN (FORMAT JSON) SELECT 1 {from_where_sql}"), params)
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return _store_count(key, int(plan[0]["Plan"]["Plan Rows"]))
+
+
+# ── Pages ──
+
+async def paginate(
+    db: AsyncSession,
+    *,
+    select: str,
+    from_: str,
+    order: Sequence[Tuple[str, str]],
+    where: Sequence[str] = (),
+    params: Optional[dict] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    page: int = 1,
+    count: Optional[str] = None,
+    count_from: Optional[str] = None,
+    table: Optional[str] = None,
+) -> dict:
+    """
+    Fetch one page ordered by `order` — (sql_expression, result_key) pairs,
+    all descending, the last one unique (normally the id).
+
+    `count_from` is a cheaper FROM clause for the total (e.g. without joins
+    that only add columns); `table` enables the reltuples estimate when
+    `where` is empty. Returns rows, next_cursor, total and total_is_estimate.
+    """
+    params = dict(params or {})
+    conditions = list(where)
+    count_conditions = list(conditions)
+    offset = 0 if cursor else (max(1, page) - 1) * limit
+
+    if cursor:
+        values = decode_cursor(cursor, len(order))
+        names = [f"_cursor_{i}" for i in range(len(order))]
+        conditions.append(
+            f"({', '.join(expr for expr, _ in order)}) < ({', '.join(':' + n for n in names)})"
+        )
+        params.update(zip(names, values))
+
+    where_sql = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    order_sql = ", ".join(f"{expr} DESC" for expr, _ in order)
+    result = await db.execute(
+        text(f"{select} {from_} {where_sql} ORDER BY {order_sql} LIMIT :_limit OFFSET :_offset"),
+        {**params, "_limit": limit + 1, "_offset": offset},
+    )
+    rows: List[dict] = [dict(r) for r in result.mappings().all()]
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor([rows[-1][key] for _, key in order]) if has_more else None
+
+    if count not in COUNT_MODES:
+        # Cursor pages reuse the total from the first page unless asked again
+        count = "none" if cursor else "estimate"
+
+    total = None
+    is_estimate = False
+    count_params = {k: v for k, v in params.items() if not k.startswith("_cursor_")}
+    count_where = f"WHERE {' AND '.join(count_conditions)}" if count_conditions else ""
+    count_from_sql = f"{count_from or from_} {count_where}"
+    if not cursor and not has_more:
+        # Everything fits on this page — the total is known for free
+        total = offset + len(rows)
+    elif count == "exact":
+        total = (await db.execute(text(f"SELECT COUNT(*) {count_from_sql}"), count_params)).scalar() or 0
+    elif count == "estimate":
+        if table and not count_conditions:
+            total = await approximate_table_count(db, table)
+        else:
+            total = await estimate_count(db, count_from_sql, count_params)
+        if not cursor:
+            # Never report fewer rows than this page has already shown
+            total = max(total, offset + len(rows) + int(has_more))
+        is_estimate = True
+
+    return {
+        "rows": rows,
+        "next_cursor": next_cursor,
+        "total": total,
+        "total_is_estimate": is_estimate,
+    }
+
+
+def page_count(total: Optional[int], per_page: int) -> Optional[int]:
+    if total is None:
+        return None
+    return max(1, (total + per_page - 1) // per_page)
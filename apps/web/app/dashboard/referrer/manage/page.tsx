@@ -66,7 +66,12 @@ function InlineChat({ businessId, businessName, token }: { businessId: string; b
     const [input, setInput] = useState("");
     const [sending, setSending] = useState(false);
     const [loading, setLoading] = useState(true);
+    const [hasMore, setHasMore] = useState(false);
+    const [loadingOlder, setLoadingOlder] = useState(false);
     const bottomRef = useRef<HTMLDivElement>(null);
+    const scrollRef = useRef<HTMLDivElement>(null);
+    const messagesRef = useRef<Message[]>([]);
+    messagesRef.current = messages;
 
     const authHeaders = useCallback(
         (includeJson = false): HeadersInit => ({
@@ -86,6 +91,7 @@ function InlineChat({ businessId, businessName, token }: { businessId: string; b
 
             const data = await response.json();
             setMessages(Array.isArray(data.messages) ? data.messages : []);
+            setHasMore(!!data.has_more);
             setTimeout(() => {
                 bottomRef.current?.scrollIntoView({ behavior: "smooth" });
             }, 50);
@@ -93,12 +99,67 @@ function InlineChat({ businessId, businessName, token }: { businessId: string; b
         [authHeaders]
     );
 
+    // Poll for messages newer than the newest loaded one, keeping any older pages already fetched
+    const loadNewMessages = useCallback(
+        async (conversationId: string) => {
+            const newest = messagesRef.current[messagesRef.current.length - 1];
+            if (!newest) {
+                await loadMessages(conversationId);
+                return;
+            }
+
+            const response = await fetch(`${API}/messages/conversations/${conversationId}/since?after=${newest.id}`, {
+                headers: authHeaders(),
+            }).catch(() => null);
+
+            if (!response?.ok) return;
+
+            const data = await response.json();
+            const incoming: Message[] = Array.isArray(data.messages) ? data.messages : [];
+            if (incoming.length === 0) return;
+
+            setMessages((prev) => [...prev, ...incoming.filter((m) => !prev.some((p) => p.id === m.id))]);
+            setTimeout(() => {
+                bottomRef.current?.scrollIntoView({ behavior: "smooth" });
+            }, 50);
+        },
+        [authHeaders, loadMessages]
+    );
+
+    // Fetch the page of history just before the oldest loaded message, keeping the scroll position
+    const loadOlder = useCallback(async () => {
+        const oldest = messagesRef.current[0];
+        if (!convId || !oldest || loadingOlder) return;
+
+        setLoadingOlder(true);
+        try {
+            const response = await fetch(`${API}/messages/conversations/${convId}?before=${oldest.id}`, {
+                headers: authHeaders(),
+            }).catch(() => null);
+
+            if (!response?.ok) return;
+
+            const data = await response.json();
+            const older: Message[] = Array.isArray(data.messages) ? data.messages : [];
+            const el = scrollRef.current;
+            const prevHeight = el?.scrollHeight ?? 0;
+            setMessages((prev) => [...older.filter((m) => !prev.some((p) => p.id === m.id)), ...prev]);
+            setHasMore(!!data.has_more);
+            requestAnimationFrame(() => {
+                if (el) el.scrollTop += el.scrollHeight - prevHeight;
+            });
+        } finally {
+            setLoadingOlder(false);
+        }
+    }, [authHeaders, convId, loadingOlder]);
+
     useEffect(() => {
         let cancelled = false;
 
         const initializeConversation = async () => {
             setLoading(true);
             setMessages([]);
+            setHasMore(false);
             setConvId(null);
 
             const response = await fetch(`${API}/messages/conversations/start-with-business/${businessId}`, {
@@ -137,13 +198,13 @@ function InlineChat({ businessId, businessName, token }: { businessId: string; b
         if (!convId) return;
 
         const intervalId = setInterval(() => {
-            void loadMessages(convId);
+            void loadNewMessages(convId);
         }, 6000);
 
         return () => {
             clearInterval(intervalId);
         };
-    }, [convId, loadMessages]);
+    }, [convId, loadNewMessages]);
 
     const handleSend = async () => {
         if (!input.trim() || !convId) return;
@@ -158,7 +219,7 @@ function InlineChat({ businessId, businessName, token }: { businessId: string; b
             body: JSON.stringify({ body: text }),
         });
 
-        await loadMessages(convId);
+        await loadNewMessages(convId);
         setSending(false);
     };
 
@@ -177,7 +238,20 @@ function InlineChat({ businessId, businessName, token }: { businessId: string; b
                 </Link>
             </div>
 
-            <div className="flex-1 space-y-2 overflow-y-auto bg-zinc-50 px-4 py-3">
+            <div ref={scrollRef} className="flex-1 space-y-2 overflow-y-auto bg-zinc-50 px-4 py-3">
+                {!loading && hasMore && (
+                    <div className="flex justify-center">
+                        <button
+                            onClick={() => {
+                                void loadOlder();
+                            }}
+                            disabled={loadingOlder}
+                            className="rounded-full bg-zinc-100 px-3 py-1.5 text-xs font-bold text-zinc-500 transition-colors hover:text-orange-600"
+                        >
+                            {loadingOlder ? <Loader2 className="h-3.5 w-3.5 animate-spin" /> : "Load earlier messages"}
+                        </button>
+                    </div>
+                )}
                 {loading ? (
                     <div className="flex h-full items-center justify-center">
                         <Loader2 className="h-5 w-5 animate-spin text-zinc-300" />
@@ -4,10 +4,11 @@ export const revalidate = 86400; // 24-hour edge cache
 
 // Sub-sitemaps are served from the same domain via Next.js rewrites,
 // which proxy to the Railway API (no timeout / no response-size limits).
+// The API also generates the index, listing every 50k-URL chunk.
 const BASE_URL = 'https://traderefer.au';
+const API_URL = process.env.NEXT_PUBLIC_API_URL;
 
-export async function GET() {
-    const xml = `<?xml version="1.0" encoding="UTF-8"?>
+const FALLBACK_INDEX = `<?xml version="1.0" encoding="UTF-8"?>
 <sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
   <sitemap><loc>${BASE_URL}/sitemaps/general</loc></sitemap>
   <sitemap><loc>${BASE_URL}/sitemaps/profiles</loc></sitemap>
@@ -16,6 +17,20 @@ export async function GET() {
   <sitemap><loc>${BASE_URL}/sitemaps/top</loc></sitemap>
 </sitemapindex>`;
 
+async function loadIndex(): Promise<string> {
+    if (!API_URL) return FALLBACK_INDEX;
+    try {
+        const res = await fetch(`${API_URL}/sitemaps/index.xml`, { next: { revalidate } });
+        if (!res.ok) return FALLBACK_INDEX;
+        return await res.text();
+    } catch {
+        return FALLBACK_INDEX;
+    }
+}
+
+export async function GET() {
+    const xml = await loadIndex();
+
     return new NextResponse(xml, {
         headers: {
             'Content-Type': 'application/xml; charset=utf-8',
@@ -137,6 +137,8 @@ export function MessagesView({ role }: { role?: 'business' | 'referrer' }) {
     const searchParams = useSearchParams();
     const convParam = searchParams.get('conv');
     const lastMsgIdRef = useRef<string | null>(null);
+    const [hasMore, setHasMore] = useState(false);
+    const [loadingOlder, setLoadingOlder] = useState(false);
     const [partnerTyping, setPartnerTyping] = useState(false);
     const typingTimeoutRef = useRef<NodeJS.Timeout | null>(null);
     const lastTypingSentRef = useRef<boolean>(false);
@@ -253,6 +255,12 @@ export function MessagesView({ role }: { role?: 'business' | 'referrer' }) {
                     
                     // Play notification sound + vibrate for incoming partner messages
                     if (!finalIsMine) {
+                        // Read receipt — the conversation is open, so the message has been seen
+                        getToken().then(freshToken => fetch(`${API}/messages/conversations/${convId}/read`, {
+                            method: 'POST',
+                            headers: { Authorization: `Bearer ${freshToken}`, 'Content-Type': 'application/json' },
+                            body: JSON.stringify({ last_seen_id: msg.id }),
+                        })).catch(() => {});
                         try {
                             const audio = new Audio('/sounds/message.mp3');
                             audio.play().catch(() => {});
@@ -263,7 +271,7 @@ export function MessagesView({ role }: { role?: 'business' | 'referrer' }) {
                     // Update contact list preview
                     setContacts(prev => prev.map(c =>
                         c.conversation_id === convId
-                            ? { ...c, last_message: msg.body || '📷 Image', last_message_at: msg.created_at, unread_count: finalIsMine ? c.unread_count : c.unread_count + 1 }
+                            ? { ...c, last_message: msg.body || '📷 Image', last_message_at: msg.created_at }
                             : c
                     ));
                 } else if (payload.type === 'typing') {
@@ -408,6 +416,7 @@ export function MessagesView({ role }: { role?: 'business' | 'referrer' }) {
         setPartnerName(contact.contact_name);
         setPartnerLogo(contact.contact_logo);
         setMessages([]);
+        setHasMore(false);
         setImagePreview(null);
         setImageUrl(null);
         const convId = contact.conversation_id ?? await ensureConversation(contact.contact_id);
@@ -426,12 +435,38 @@ export function MessagesView({ role }: { role?: 'business' | 'referrer' }) {
             if (res.ok) {
                 const data = await res.json();
                 setMessages(data.messages);
+                setHasMore(!!data.has_more);
                 setMyType(data.my_type);
                 setPartnerName(data.my_type === 'business' ? data.referrer_name : data.business_name);
             }
         } catch {}
     }, [getToken]);
 
+    // Fetch the page of history just before the oldest loaded message, keeping the scroll position
+    const loadOlder = useCallback(async () => {
+        const oldest = messages.find(m => !m.id.startsWith('opt-'));
+        if (!activeConvId || !oldest || loadingOlder) return;
+        setLoadingOlder(true);
+        try {
+            const token = await getToken();
+            const res = await fetch(`${API}/messages/conversations/${activeConvId}?before=${oldest.id}`, {
+                headers: { Authorization: `Bearer ${token}` },
+            });
+            if (res.ok) {
+                const data = await res.json();
+                const el = scrollContainerRef.current;
+                const prevHeight = el?.scrollHeight ?? 0;
+                setMessages(prev => [...data.messages.filter((m: Message) => !prev.some(p => p.id === m.id)), ...prev]);
+                setHasMore(!!data.has_more);
+                requestAnimationFrame(() => {
+                    if (el) el.scrollTop += el.scrollHeight - prevHeight;
+                });
+            }
+        } catch {} finally {
+            setLoadingOlder(false);
+        }
+    }, [activeConvId, messages, loadingOlder, getToken]);
+
     useEffect(() => {
         if (!activeConvId) return;
 
@@ -677,6 +712,17 @@ export function MessagesView({ role }: { role?: 'business' | 'referrer' }) {
                 >
                     {activeContactId && (
                         <div className="px-3 py-4 md:px-5 md:py-6 max-w-4xl mx-auto w-full">
+                            {hasMore && (
+                                <div className="flex justify-center mb-4">
+                                    <button
+                                        onClick={loadOlder}
+                                        disabled={loadingOlder}
+                                        className="text-xs font-bold text-zinc-500 hover:text-orange-600 bg-zinc-100 px-3 py-1.5 rounded-full transition-colors"
+                                    >
+                                        {loadingOlder ? <Loader2 className="w-3.5 h-3.5 animate-spin" /> : 'Load earlier messages'}
+                                    </button>
+                                </div>
+                            )}
                             {messages.length === 0 ? (
                                 <div className="flex flex-col items-center justify-center text-center py-20 opacity-40">
                                     <MessageSquare className="w-12 h-12 text-zinc-200 mb-3" />
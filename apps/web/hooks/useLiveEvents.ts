@@ -41,6 +41,8 @@ export function useLiveEventsManager(): LiveEventsContextValue {
   const esRef = useRef<EventSource | null>(null);
   const [connected, setConnected] = useState(false);
   const reconnectTimer = useRef<ReturnType<typeof setTimeout> | null>(null);
+  // Id of the last event received; sent on reconnect so missed events are replayed
+  const lastEventIdRef = useRef<string>("");
 
   const dispatch = useCallback((event: LiveEvent) => {
     // Dispatch to type-specific listeners
@@ -81,7 +83,9 @@ export function useLiveEventsManager(): LiveEventsContextValue {
 
       // Connect directly to Railway API for SSE (Vercel serverless can't hold long connections)
       const apiBase = (process.env.NEXT_PUBLIC_API_URL || "").trim().replace(/\/$/, "");
-      const sseUrl = `${apiBase}/api/events/stream?token=${encodeURIComponent(token)}`;
+      const lastEventId = lastEventIdRef.current;
+      const sseUrl = `${apiBase}/api/events/stream?token=${encodeURIComponent(token)}`
+        + (lastEventId ? `&last_event_id=${encodeURIComponent(lastEventId)}` : "");
 
       const es = new EventSource(sseUrl);
       esRef.current = es;
@@ -91,6 +95,7 @@ export function useLiveEventsManager(): LiveEventsContextValue {
       };
 
       es.onmessage = (event) => {
+        if (event.lastEventId) lastEventIdRef.current = event.lastEventId;
         try {
           const data = JSON.parse(event.data);
           if (data.type && data.type !== "connected") {
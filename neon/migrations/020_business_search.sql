@@ -0,0 +1,25 @@
+-- Migration 020: Full-text + trigram search for the public directory (GET /businesses)
+-- Replaces the '%q%' ILIKE scans with indexed, ranked search and keyset pagination.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Weighted document: name (A) > trade (B) > suburb (C). 'simple' config keeps
+-- business names and suburbs unstemmed.
+ALTER TABLE businesses ADD COLUMN IF NOT EXISTS search_vector tsvector
+  GENERATED ALWAYS AS (
+    setweight(to_tsvector('simple', coalesce(business_name, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(trade_category, '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce(suburb, '')), 'C')
+  ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_businesses_search_vector ON businesses USING GIN (search_vector);
+
+-- Typo tolerance (word_similarity / <%) and the suburb ILIKE filter
+CREATE INDEX IF NOT EXISTS idx_businesses_name_trgm ON businesses USING GIN (business_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_businesses_trade_trgm ON businesses USING GIN (trade_category gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_businesses_suburb_trgm ON businesses USING GIN (suburb gin_trgm_ops);
+
+-- Keyset pagination for the unfiltered directory listing
+CREATE INDEX IF NOT EXISTS idx_businesses_public_listing
+  ON businesses (listing_rank DESC, created_at DESC, id DESC)
+  WHERE status = 'active' AND listing_visibility = 'public';
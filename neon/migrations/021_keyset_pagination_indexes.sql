@@ -0,0 +1,7 @@
+-- Migration 021: (created_at, id) indexes backing cursor pagination on the admin console
+-- Lists page with `(created_at, id) < (cursor)` ORDER BY created_at DESC, id DESC.
+
+CREATE INDEX IF NOT EXISTS idx_businesses_created_id ON businesses (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_referrers_created_id ON referrers (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_leads_created_id ON leads (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_notifications_created_id ON notifications (created_at DESC, id DESC);
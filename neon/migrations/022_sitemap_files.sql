@@ -0,0 +1,13 @@
+-- Migration 022: Precomputed, gzip'd sitemap files served by routers/sitemaps.py
+-- One row per (family, chunk); each chunk holds at most 50,000 URLs.
+
+CREATE TABLE IF NOT EXISTS sitemap_files (
+  family        TEXT NOT NULL,               -- general, profiles, suburbs, trades, top, jobs
+  chunk         INTEGER NOT NULL,
+  body_gz       BYTEA NOT NULL,              -- gzip'd <urlset> document
+  url_count     INTEGER NOT NULL,
+  lastmod       DATE,                        -- newest <lastmod> in the file
+  etag          TEXT NOT NULL,
+  generated_at  TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (family, chunk)
+);
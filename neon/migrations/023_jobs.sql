@@ -0,0 +1,32 @@
+-- Migration 023: Durable background job queue (services/job_queue.py)
+-- Email, SMS and push deliveries are queued here and run by scripts/run_worker.py.
+
+CREATE TABLE IF NOT EXISTS jobs (
+  id               BIGSERIAL PRIMARY KEY,
+  kind             TEXT NOT NULL,                    -- email.send, sms.send, push.send
+  payload          JSONB NOT NULL DEFAULT '{}'::jsonb,
+  priority         SMALLINT NOT NULL DEFAULT 100,    -- lower runs first
+  status           TEXT NOT NULL DEFAULT 'queued'
+                     CHECK (status IN ('queued', 'running', 'done', 'dead')),
+  attempts         INTEGER NOT NULL DEFAULT 0,
+  max_attempts     INTEGER NOT NULL DEFAULT 5,
+  run_at           TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  idempotency_key  TEXT,
+  last_error       TEXT,
+  locked_by        TEXT,
+  locked_at        TIMESTAMPTZ,
+  created_at       TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  finished_at      TIMESTAMPTZ
+);
+
+-- A retried webhook/request can't queue the same notification twice
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_idempotency_key
+  ON jobs (idempotency_key) WHERE idempotency_key IS NOT NULL;
+
+-- Worker claim: next ready jobs by priority
+CREATE INDEX IF NOT EXISTS idx_jobs_ready
+  ON jobs (priority, run_at, id) WHERE status = 'queued';
+
+-- Orphan recovery and admin dead-letter listing
+CREATE INDEX IF NOT EXISTS idx_jobs_running ON jobs (locked_at) WHERE status = 'running';
+CREATE INDEX IF NOT EXISTS idx_jobs_dead ON jobs (finished_at DESC) WHERE status = 'dead';
@@ -0,0 +1,4 @@
+-- Migration 024: Sequence for SSE event ids (services/event_bus.py, EVENT_BUS_BACKEND=postgres)
+-- Each NOTIFY takes the next value, so every user's event ids increase across all workers.
+
+CREATE SEQUENCE IF NOT EXISTS event_bus_seq;
@@ -0,0 +1,43 @@
+-- Migration 025: Denormalized conversation summaries and unread counters (services/conversations.py)
+-- The contacts list and unread badge read these columns instead of scanning messages.
+-- Maintained by the statements that insert messages / mark them read; run this
+-- migration (including the backfill) before deploying the matching API.
+
+ALTER TABLE conversations
+  ADD COLUMN IF NOT EXISTS last_message_preview   TEXT,
+  ADD COLUMN IF NOT EXISTS last_message_has_image BOOLEAN NOT NULL DEFAULT false,
+  ADD COLUMN IF NOT EXISTS last_sender_type       TEXT,
+  ADD COLUMN IF NOT EXISTS business_unread        INTEGER NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS referrer_unread        INTEGER NOT NULL DEFAULT 0;
+
+-- Backfill the latest message per conversation
+UPDATE conversations c SET
+  last_message_preview   = NULLIF(LEFT(lm.body, 200), ''),
+  last_message_has_image = COALESCE(lm.image_url, '') <> '',
+  last_sender_type       = lm.sender_type
+FROM (
+  SELECT DISTINCT ON (conversation_id) conversation_id, body, image_url, sender_type
+  FROM messages
+  ORDER BY conversation_id, created_at DESC
+) lm
+WHERE lm.conversation_id = c.id;
+
+-- Backfill unread counts per side
+UPDATE conversations c SET
+  business_unread = u.business_unread,
+  referrer_unread = u.referrer_unread
+FROM (
+  SELECT conversation_id,
+         COUNT(*) FILTER (WHERE sender_type <> 'business') AS business_unread,
+         COUNT(*) FILTER (WHERE sender_type <> 'referrer') AS referrer_unread
+  FROM messages
+  WHERE is_read = false
+  GROUP BY conversation_id
+) u
+WHERE u.conversation_id = c.id;
+
+-- Badge totals: only conversations with something unread are visited
+CREATE INDEX IF NOT EXISTS idx_conversations_business_unread
+  ON conversations (business_id) INCLUDE (business_unread) WHERE business_unread > 0;
+CREATE INDEX IF NOT EXISTS idx_conversations_referrer_unread
+  ON conversations (referrer_id) INCLUDE (referrer_unread) WHERE referrer_unread > 0;
@@ -0,0 +1,8 @@
+-- Migration 026: Indexes for cursor-based message history (routers/messages.py)
+-- Pages are `(created_at, id) < / > (cursor message)` within one conversation;
+-- read receipts only visit a conversation's unread messages.
+
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_created
+  ON messages (conversation_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_unread
+  ON messages (conversation_id, created_at) WHERE is_read = false;
@@ -0,0 +1,14 @@
+-- Migration 027: Expiring key/value entries (services/kv_store.py, KV_STORE_BACKEND=postgres)
+-- OTP codes and claim verification tokens, shared by every worker and replica.
+-- Expired rows are ignored by every query and deleted by the store's sweeper.
+
+CREATE TABLE IF NOT EXISTS kv_entries (
+    namespace   TEXT NOT NULL,
+    key         TEXT NOT NULL,
+    value       JSONB NOT NULL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    expires_at  TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_kv_entries_expires_at ON kv_entries (expires_at);
@@ -0,0 +1,25 @@
+-- Migration 028: Idempotency keys for wallet ledger entries (services/wallet.py)
+-- A key ("unlock:<lead_id>", "topup:<payment_intent>", "bonus:<payment_intent>")
+-- is applied to a business wallet at most once.
+
+ALTER TABLE wallet_transactions ADD COLUMN IF NOT EXISTS idempotency_key TEXT;
+
+-- Backfill keys for existing unlocks and top-ups (the earliest row wins where
+-- a top-up was credited by both the confirm endpoint and the webhook)
+UPDATE wallet_transactions wt SET idempotency_key = k.key
+FROM (
+    SELECT DISTINCT ON (key) id, key
+    FROM (
+        SELECT id, created_at,
+               CASE WHEN type = 'LEAD_UNLOCK' THEN 'unlock:' || lead_id::text
+                    ELSE 'topup:' || payment_ref END AS key
+        FROM wallet_transactions
+        WHERE (type = 'LEAD_UNLOCK' AND lead_id IS NOT NULL)
+           OR (type = 'TOPUP' AND payment_ref IS NOT NULL)
+    ) candidates
+    ORDER BY key, created_at
+) k
+WHERE wt.id = k.id AND wt.idempotency_key IS NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_wallet_transactions_idempotency_key
+  ON wallet_transactions (idempotency_key) WHERE idempotency_key IS NOT NULL;
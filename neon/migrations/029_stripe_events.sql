@@ -0,0 +1,23 @@
+-- Migration 029: Stripe webhook events (services/stripe_events.py)
+-- Every verified event is stored once, keyed by its Stripe event id, and
+-- processed by the job worker in Stripe's order per object. Redeliveries hit
+-- the primary key and are dropped; failed events stay here for replay.
+
+CREATE TABLE IF NOT EXISTS stripe_events (
+    id              TEXT PRIMARY KEY,                 -- evt_...
+    type            TEXT NOT NULL,
+    object_id       TEXT NOT NULL,                    -- data.object.id (pi_..., acct_...)
+    stripe_created  BIGINT NOT NULL,                  -- event.created, unix seconds
+    payload         JSONB NOT NULL,
+    status          TEXT NOT NULL DEFAULT 'pending',  -- pending | done | failed
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    last_error      TEXT,
+    received_at     TIMESTAMPTZ NOT NULL DEFAULT now(),
+    processed_at    TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_stripe_events_object
+    ON stripe_events (object_id, stripe_created, received_at);
+
+CREATE INDEX IF NOT EXISTS idx_stripe_events_unprocessed
+    ON stripe_events (received_at) WHERE status <> 'done';
@@ -0,0 +1,17 @@
+-- Migration 030: Cron run history (services/tasks/runner.py)
+-- One row per job per /admin/cron/process-lifecycle call; /admin/cron/status
+-- shows the latest per job. Rows older than 30 days are pruned by the runner.
+
+CREATE TABLE IF NOT EXISTS cron_runs (
+    id            BIGSERIAL PRIMARY KEY,
+    job           TEXT NOT NULL,
+    started_at    TIMESTAMPTZ NOT NULL DEFAULT now(),
+    status        TEXT NOT NULL,              -- ok | failed | timeout | skipped
+    duration_ms   DOUBLE PRECISION NOT NULL DEFAULT 0,
+    rows_touched  INTEGER,
+    result        JSONB,
+    error         TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_cron_runs_job_started ON cron_runs (job, started_at DESC);
+CREATE INDEX IF NOT EXISTS idx_cron_runs_started ON cron_runs (started_at);
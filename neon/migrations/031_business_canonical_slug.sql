@@ -0,0 +1,37 @@
+-- Migration 031: Canonical business slugs (utils/business_slugs.py)
+-- canonical_business_slug() mirrors the Python helper of the same name; the
+-- generated canonical_slug column is what find_business_by_slug looks up.
+-- Slugs a business has moved away from keep resolving through
+-- business_slug_redirects.
+--
+-- Then backfill: python apps/api/migrate_business_slugs.py --apply
+-- and apply 032 (unique index) once no canonical slugs collide.
+
+CREATE OR REPLACE FUNCTION canonical_business_slug(value text) RETURNS text AS $$
+DECLARE
+    s text;
+    m text[];
+BEGIN
+    s := trim(both '-' from regexp_replace(lower(trim(coalesce(value, ''))), '[^a-z0-9]+', '-', 'g'));
+    m := regexp_match(s, '^(.+)-([a-z0-9]{5,8})$');
+    IF m IS NOT NULL AND (m[2] ~ '[0-9]' OR m[2] !~ '[aeiou]') THEN
+        RETURN m[1];
+    END IF;
+    RETURN s;
+END
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+ALTER TABLE businesses
+    ADD COLUMN IF NOT EXISTS canonical_slug TEXT
+    GENERATED ALWAYS AS (canonical_business_slug(slug)) STORED;
+
+-- Lookups stay indexed until 032 replaces this with the unique index
+CREATE INDEX IF NOT EXISTS idx_businesses_canonical_slug ON businesses (canonical_slug);
+
+CREATE TABLE IF NOT EXISTS business_slug_redirects (
+    old_slug    TEXT PRIMARY KEY,
+    business_id UUID NOT NULL REFERENCES businesses(id) ON DELETE CASCADE,
+    created_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_business_slug_redirects_business ON business_slug_redirects (business_id);
@@ -0,0 +1,7 @@
+-- Migration 032: One business per canonical slug
+-- Apply after migrate_business_slugs.py --apply (see 031); fails while any
+-- canonical slugs still collide. Not in a transaction: CONCURRENTLY.
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS businesses_canonical_slug_key ON businesses (canonical_slug);
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_businesses_canonical_slug;
@@ -0,0 +1,12 @@
+-- Migration 033: Cron job leases (services/tasks/runner.py)
+-- One row per job. A run takes the lease when locked_until has passed and
+-- hands it back when it finishes; a run that dies keeps it only until
+-- locked_until (its timeout plus a margin). Plain rows rather than advisory
+-- locks, so it works through Neon's "-pooler" endpoint (PgBouncer, transaction
+-- mode) and survives the jobs' own commits.
+
+CREATE TABLE IF NOT EXISTS cron_locks (
+    job           TEXT PRIMARY KEY,
+    holder        TEXT NOT NULL,              -- run id of the current or last holder
+    locked_until  TIMESTAMPTZ NOT NULL
+);